@@ -0,0 +1,60 @@
+"""Benchmarks for the map's cluster index as the history grows.
+
+The viewport query over a fixed small area should cost about the same
+at 1k and 100k saved points; add/remove should be flat too.
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import measure, time_once
+from domain.cluster_index import ClusterIndex
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+# a city-sized view and a country-sized one
+CITY_VIEW = ((47.33, 8.48, 47.41, 8.60), 13)
+COUNTRY_VIEW = ((45.8, 5.9, 47.8, 10.5), 7)
+
+
+def _points(n, rng):
+    return [(i, rng.uniform(-60, 60), rng.uniform(-180, 180)) for i in range(n)]
+
+
+def run(sizes=None, min_time=0.2):
+    sizes = sizes or DEFAULT_SIZES
+    rng = random.Random(7)
+    results = {}
+
+    for n in sizes:
+        points = _points(n, rng)
+        index = ClusterIndex()
+        results[f"clusters.load[n={n}]"] = time_once(lambda: index.load(points))
+
+        for name, (box, zoom) in (("city", CITY_VIEW), ("country", COUNTRY_VIEW)):
+            results[f"clusters.query_{name}[n={n}]"] = measure(
+                lambda: index.query(*box, zoom), min_time=min_time,
+            )
+        results[f"clusters.query_world[n={n}]"] = measure(
+            lambda: index.query(-85, -180, 85, 180, 2), min_time=min_time,
+        )
+
+        counter = [n]
+
+        def add_remove():
+            key = counter[0]
+            counter[0] += 1
+            index.add(key, rng.uniform(-60, 60), rng.uniform(-180, 180))
+            index.remove(key)
+
+        results[f"clusters.add_remove[n={n}]"] = measure(add_remove, min_time=min_time)
+
+    return results
+
+
+if __name__ == "__main__":
+    from benchmarks.harness import format_seconds
+    for name, stats in run().items():
+        print(f"{name:48s} {format_seconds(stats['best'])}")
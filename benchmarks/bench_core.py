@@ -0,0 +1,125 @@
+"""Benchmarks for the geodesic and smoothing hot paths.
+
+These run on every compass tick / locate, so they should stay cheap:
+  - calculate_destination (scalar) and calculate_destinations (batch)
+  - estimate_accuracy
+  - project_batch, redoing saved history after a calculator change
+  - propagate_covariance (per locate) and covariance_batch
+  - smooth_heading over the window sizes the services use
+  - heading_to_cardinal, and heading_spread for the heading variance
+  - the magnetometer calibration: applying it to every reading, adding
+    a reading to the fit while calibrating, and solving the fit
+  - the interference check on every reading
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import measure
+from domain.coordinate_calculator import CoordinateCalculator
+from domain.magnetic_interference import InterferenceDetector
+from domain.magnetometer_calibration import EllipsoidFit
+from domain.observation import Observation
+from utils.math_utils import smooth_heading, heading_spread, heading_to_cardinal
+
+BATCH_SIZES = (100, 1000, 10000)
+SMOOTHING_WINDOWS = (5, 8, 30)
+
+
+def run(sizes=None, min_time=0.2):
+    calc = CoordinateCalculator()
+    rng = random.Random(42)
+    results = {}
+
+    results["geodesic.calculate_destination"] = measure(
+        lambda: calc.calculate_destination(51.5074, -0.1278, 150.0, 1234.5),
+        min_time=min_time,
+    )
+
+    for n in BATCH_SIZES:
+        distances = [rng.uniform(1, 20_000) for _ in range(n)]
+        results[f"geodesic.calculate_destinations[n={n}]"] = measure(
+            lambda d=distances: calc.calculate_destinations(51.5074, -0.1278, 150.0, d),
+            min_time=min_time,
+        )
+
+    results["accuracy.estimate_accuracy"] = measure(
+        lambda: calc.estimate_accuracy(8.0, 1500.0, compass_error_deg=5.0),
+        min_time=min_time,
+    )
+
+    for n in BATCH_SIZES:
+        observations = [Observation(51.5 + rng.uniform(-1, 1), rng.uniform(-1, 1),
+                                    rng.uniform(3, 20), rng.uniform(0, 360), 0.0, 0.0,
+                                    rng.uniform(1, 20_000))
+                        for _ in range(n)]
+        results[f"geodesic.project_batch[n={n}]"] = measure(
+            lambda o=observations: calc.project_batch(o),
+            min_time=min_time,
+        )
+
+    results["accuracy.propagate_covariance"] = measure(
+        lambda: calc.propagate_covariance(51.5074, -0.1278, 150.0, 1234.5,
+                                          ((25.0, 4.0), (4.0, 16.0)), 25.0, 100.0),
+        min_time=min_time,
+    )
+    for n in BATCH_SIZES:
+        observations = [Observation(51.5 + rng.uniform(-1, 1), rng.uniform(-1, 1),
+                                    rng.uniform(3, 20), rng.uniform(0, 360), 0.0, 0.0,
+                                    rng.uniform(1, 20_000), compass_error=5.0)
+                        for _ in range(n)]
+        results[f"accuracy.covariance_batch[n={n}]"] = measure(
+            lambda o=observations: calc.covariance_batch(o),
+            min_time=min_time,
+        )
+
+    # the compass keeps up to 50 readings around, wrapping near north
+    headings = [(355 + rng.gauss(0, 4)) % 360 for _ in range(50)]
+    for w in SMOOTHING_WINDOWS:
+        results[f"smoothing.smooth_heading[w={w}]"] = measure(
+            lambda w=w: smooth_heading(headings, w),
+            min_time=min_time,
+        )
+
+    results["smoothing.heading_spread[w=8]"] = measure(
+        lambda: heading_spread(headings, 8),
+        min_time=min_time,
+    )
+
+    results["smoothing.heading_to_cardinal"] = measure(
+        lambda: heading_to_cardinal(213.7),
+        min_time=min_time,
+    )
+    # a fit from one turn of a phone with some iron in it
+    fit = EllipsoidFit()
+    for _ in range(200):
+        v = [rng.gauss(0, 1) for _ in range(3)]
+        norm = sum(c * c for c in v) ** 0.5
+        fit.add(45 * v[0] / norm + 20, 55 * v[1] / norm - 15, 50 * v[2] / norm + 8)
+    calibration = fit.solve()
+    results["compass.calibration_apply"] = measure(
+        lambda: calibration.apply(31.2, -4.5, 40.1),
+        min_time=min_time,
+    )
+    results["compass.ellipsoid_fit_solve"] = measure(
+        fit.solve,
+        min_time=min_time,
+    )
+
+    detector = InterferenceDetector()
+    detector.set_expected(65.0, 48.0)
+
+    def check_field():
+        detector.add(31.2, -4.5, 40.1, (0.3, 0.2, 9.8))
+        return detector.score
+
+    results["compass.interference_check"] = measure(check_field, min_time=min_time)
+
+    # last, it piles the same reading into the fit
+    results["compass.ellipsoid_fit_add"] = measure(
+        lambda: fit.add(31.2, -4.5, 40.1),
+        min_time=min_time,
+    )
+    return results
@@ -0,0 +1,121 @@
+"""Cold vs warm access benchmarks for the offline elevation tiles.
+
+Writes a handful of full-size SRTM3 tiles (1201x1201) to a temp dir and
+times:
+  - cold access: first sample from a tile that isn't open yet
+    (open + mmap + first page fault)
+  - warm access: random samples from tiles that are already open
+  - a full terrain ray intersection on the synthetic terrain
+
+Run with:  python benchmarks/bench_elevation_tiles.py
+"""
+import math
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.elevation_tiles import ElevationTileStore, tile_name
+from domain.terrain_intersection import TerrainRaycaster
+
+SRTM3_SAMPLES = 1201
+TILE_COUNT = 4
+WARM_SAMPLES = 100_000
+
+
+def _write_tiles(directory):
+    """Rolling hills, so the ray actually has something to hit."""
+    for lon0 in range(TILE_COUNT):
+        posts = []
+        for r in range(SRTM3_SAMPLES):
+            for c in range(SRTM3_SAMPLES):
+                posts.append(int(400 + 150 * math.sin(r / 40.0) * math.cos(c / 55.0)))
+        path = os.path.join(directory, tile_name(45, lon0) + ".hgt")
+        with open(path, "wb") as f:
+            f.write(struct.pack(f">{len(posts)}h", *posts))
+
+
+def bench_cold(directory):
+    store = ElevationTileStore(directory, max_open=TILE_COUNT)
+    start = time.perf_counter()
+    for lon0 in range(TILE_COUNT):
+        store.elevation(45.5, lon0 + 0.5)
+    elapsed = time.perf_counter() - start
+    store.close()
+    return elapsed / TILE_COUNT
+
+
+def bench_warm(directory):
+    store = ElevationTileStore(directory, max_open=TILE_COUNT)
+    rng = random.Random(42)
+    points = [(45 + rng.random(), rng.random() * TILE_COUNT) for _ in range(WARM_SAMPLES)]
+    for lon0 in range(TILE_COUNT):
+        store.elevation(45.5, lon0 + 0.5)  # open everything first
+
+    start = time.perf_counter()
+    for lat, lon in points:
+        store.elevation(lat, lon)
+    elapsed = time.perf_counter() - start
+    store.close()
+    return elapsed / WARM_SAMPLES
+
+
+def bench_raycast(directory, runs=50):
+    store = ElevationTileStore(directory, max_open=TILE_COUNT)
+    ray = TerrainRaycaster(store)
+    rng = random.Random(7)
+    start = time.perf_counter()
+    hits = 0
+    for _ in range(runs):
+        dist = ray.intersect(45.5, 1.5, rng.uniform(0, 360), rng.uniform(-3.0, -0.5))
+        hits += dist is not None
+    elapsed = time.perf_counter() - start
+    store.close()
+    return elapsed / runs, hits
+
+
+def run(sizes=None, min_time=0.2):
+    """Suite entry point, see benchmarks/run.py."""
+    directory = tempfile.mkdtemp()
+    try:
+        _write_tiles(directory)
+        cold = bench_cold(directory)
+        warm = bench_warm(directory)
+        ray, _ = bench_raycast(directory)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def stat(sec, number):
+        return {"best": sec, "median": sec, "number": number, "repeat": 1}
+
+    return {
+        "terrain.cold_tile_access": stat(cold, TILE_COUNT),
+        "terrain.warm_sample": stat(warm, WARM_SAMPLES),
+        "terrain.ray_intersection": stat(ray, 50),
+    }
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        print(f"writing {TILE_COUNT} SRTM3 tiles...")
+        _write_tiles(directory)
+
+        cold = bench_cold(directory)
+        warm = bench_warm(directory)
+        ray, hits = bench_raycast(directory)
+
+        print(f"cold tile access:  {cold * 1e6:10.1f} us/tile")
+        print(f"warm sample:       {warm * 1e6:10.2f} us/sample")
+        print(f"ray intersection:  {ray * 1e3:10.2f} ms/ray ({hits} hits)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Benchmarks for the offline reverse geocoder.
+
+Builds indexes of 1k/10k/100k synthetic places (cities500 is ~200k) in
+a temp dir and times the one-off build, opening the memory-mapped index
+— what every app start pays — and a nearest-place lookup, which should
+stay well under a millisecond.
+"""
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import measure, time_once
+from data.gazetteer import Gazetteer, build_index
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+
+def _places(n, rng):
+    for i in range(n):
+        lat = math.degrees(math.asin(rng.uniform(-1, 1)))
+        yield f"place{i}", "XX", lat, rng.uniform(-180, 180)
+
+
+def run(sizes=None, min_time=0.2):
+    sizes = sizes or DEFAULT_SIZES
+    rng = random.Random(7)
+    results = {}
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for n in sizes:
+            path = os.path.join(tmpdir, f"places{n}.ppgz")
+            places = list(_places(n, rng))
+            results[f"gazetteer.build[n={n}]"] = time_once(lambda: build_index(places, path))
+            results[f"gazetteer.open[n={n}]"] = measure(
+                lambda: Gazetteer(path).close(), min_time=min_time,
+            )
+
+            gazetteer = Gazetteer(path)
+            queries = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(1024)]
+            counter = [0]
+
+            def lookup():
+                counter[0] += 1
+                gazetteer.nearest(*queries[counter[0] & 1023])
+
+            results[f"gazetteer.nearest[n={n}]"] = measure(lookup, min_time=min_time)
+            gazetteer.close()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    return results
+
+
+if __name__ == "__main__":
+    from benchmarks.harness import format_seconds
+    for name, stats in run().items():
+        print(f"{name:48s} {format_seconds(stats['best'])}")
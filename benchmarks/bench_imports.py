@@ -0,0 +1,125 @@
+"""Import-time budget for the headless core.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter
+for every module in utils.lazy_import.CORE_MODULES, takes the best
+cumulative time over a few runs and checks it against
+benchmarks/import_budget.json.
+
+    python benchmarks/bench_imports.py                 # check the budget
+    python benchmarks/bench_imports.py --save-budget   # re-record it
+
+Exits with status 1 if a module is over budget or pulls in kivy.
+Like the other baselines, budgets are only meaningful on the machine
+that recorded them — re-record with --save-budget after moving.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.lazy_import import CORE_MODULES
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BUDGET_FILE = os.path.join(HERE, "import_budget.json")
+RUNS = 5
+# headroom when recording a new budget: measured * BUDGET_MARGIN +
+# BUDGET_SLACK_MS. The slack is what run-to-run jitter costs even a tiny
+# module (a few ms on a busy machine); the margin covers the jitter
+# that grows with the import.
+BUDGET_MARGIN = 1.5
+BUDGET_SLACK_MS = 5.0
+
+
+def import_time(module):
+    """Cumulative import time of `module` in ms, and every module it loaded."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    cumulative = None
+    loaded = []
+    for line in proc.stderr.splitlines():
+        # "import time:       self [us] |   cumulative | imported package"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        name = parts[2].strip()
+        try:
+            us = int(parts[1])
+        except ValueError:
+            continue  # the header line
+        loaded.append(name)
+        if name == module:
+            cumulative = us / 1000.0
+    return cumulative, loaded
+
+
+def measure(modules=CORE_MODULES, runs=RUNS):
+    results = {}
+    for module in modules:
+        best = None
+        loaded = []
+        for _ in range(runs):
+            ms, loaded = import_time(module)
+            if ms is not None and (best is None or ms < best):
+                best = ms
+        kivy = sorted({name for name in loaded if name.split(".")[0] == "kivy"})
+        results[module] = {"ms": best, "kivy": kivy}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless core import budget")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--save-budget", action="store_true",
+                        help=f"record {os.path.relpath(BUDGET_FILE)} from this run")
+    args = parser.parse_args(argv)
+
+    results = measure(runs=args.runs)
+
+    budget = {}
+    if os.path.exists(BUDGET_FILE):
+        with open(BUDGET_FILE) as f:
+            budget = json.load(f)["budget_ms"]
+
+    failed = []
+    print(f"{'module':36s} {'import':>9s} {'budget':>9s}")
+    for module, res in results.items():
+        ms = res["ms"]
+        limit = budget.get(module)
+        flag = ""
+        if res["kivy"]:
+            flag = "  IMPORTS KIVY"
+            failed.append(module)
+        elif limit is not None and ms > limit:
+            flag = "  OVER BUDGET"
+            failed.append(module)
+        limit_text = f"{limit:7.1f}ms" if limit is not None else f"{'-':>9s}"
+        print(f"{module:36s} {ms:7.1f}ms {limit_text}{flag}")
+
+    if args.save_budget:
+        new_budget = {
+            module: round(res["ms"] * BUDGET_MARGIN + BUDGET_SLACK_MS, 1)
+            for module, res in results.items()
+        }
+        with open(BUDGET_FILE, "w") as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "budget_ms": new_budget,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"\nbudget written to {BUDGET_FILE}")
+        return 0
+
+    if failed:
+        print(f"\n{len(failed)} module(s) failed: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Benchmarks for the history screen's label search.
+
+Every keystroke in the search box is one search(), so at 50k saved
+labels a lookup has to stay well inside a 16 ms frame — including the
+worst case, a one-letter prefix that matches thousands of labels.
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import measure, time_once
+from domain.label_index import LabelIndex
+
+DEFAULT_SIZES = (1_000, 10_000, 50_000)
+
+WORDS = (
+    "tower", "church", "summit", "bridge", "antenna", "chimney", "lighthouse",
+    "peak", "ridge", "hut", "castle", "crane", "mast", "lake", "station",
+    "water", "old", "north", "south", "east", "west", "big", "little",
+)
+PLACES = (
+    "Zürich", "Zug", "Winterthur", "Lugano", "Genève", "Basel", "Bern",
+    "Luzern", "Chur", "Sion", "Thun", "Biel", "Aarau", "Olten", "Baden",
+)
+
+
+def _labels(n, rng):
+    labels = []
+    for i in range(n):
+        words = rng.sample(WORDS, rng.randint(1, 3))
+        # plenty of distinct tokens too, like house numbers and own names
+        words.append(f"{rng.choice(PLACES)}{rng.randrange(1000)}")
+        if rng.random() < 0.5:
+            words.insert(0, f"near {rng.choice(PLACES)}")
+        labels.append((i, " ".join(words)))
+    return labels
+
+
+def run(sizes=None, min_time=0.2):
+    sizes = sizes or DEFAULT_SIZES
+    rng = random.Random(11)
+    results = {}
+
+    for n in sizes:
+        labels = _labels(n, rng)
+        index = LabelIndex()
+        results[f"labels.load[n={n}]"] = time_once(lambda: index.load(labels))
+
+        for name, query in (("letter", "t"), ("word", "tower"),
+                            ("two_words", "near zu"), ("miss", "qqq")):
+            results[f"labels.search_{name}[n={n}]"] = measure(
+                lambda: index.search(query), min_time=min_time,
+            )
+        results[f"labels.search_letter_page[n={n}]"] = measure(
+            lambda: index.search("t", limit=25), min_time=min_time,
+        )
+
+        counter = [n]
+
+        def add_remove():
+            key = counter[0]
+            counter[0] += 1
+            index.add(key, "near Zug — new crane 17")
+            index.remove(key)
+
+        results[f"labels.add_remove[n={n}]"] = measure(add_remove, min_time=min_time)
+
+    return results
+
+
+if __name__ == "__main__":
+    from benchmarks.harness import format_seconds
+    for name, stats in run().items():
+        print(f"{name:48s} {format_seconds(stats['best'])}")
@@ -0,0 +1,247 @@
+"""Benchmarks for LocationRepository as the history grows.
+
+Each size gets a fresh store pre-filled on disk, then we time loading
+it and the common operations against it. add/delete append to the
+journal, so they should stay flat as the store grows, apart from the
+odd compaction. refresh_* is a second repository on the same store,
+as another process would have it.
+
+The tiered_* runs are the same store with hot_days set: all but the
+newest HOT records are archived, so compacting only rewrites those and the
+first history page never opens a segment; deep pages and sorted ones
+pay for decompressing.
+
+reproject is the same tiered store with a sighting kept on every record,
+redone for a newer calculator VERSION: one project_batch over all of
+them plus rewriting every segment.
+"""
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import measure, time_once
+from data.location_repository import LocationRepository, SavedLocation, STORAGE_FILE
+from domain.coordinate_calculator import CoordinateCalculator
+from domain.observation import Observation
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+# records that stay hot in the tiered runs
+HOT = 1_000
+
+
+def _make_location(rng):
+    lat = rng.uniform(-60, 60)
+    lon = rng.uniform(-180, 180)
+    return SavedLocation(
+        src_lat=lat, src_lon=lon,
+        dest_lat=lat + rng.uniform(-0.05, 0.05),
+        dest_lon=lon + rng.uniform(-0.05, 0.05),
+        bearing=rng.uniform(0, 360),
+        distance=rng.uniform(10, 5000),
+        accuracy=rng.uniform(3, 300),
+    )
+
+
+def _fill(directory, n, rng):
+    with open(os.path.join(directory, STORAGE_FILE), "w") as f:
+        json.dump([_make_location(rng).to_dict() for _ in range(n)], f)
+
+
+def _with_sighting(loc):
+    loc.sightings = [Observation(loc.src_lat, loc.src_lon, 5.0, loc.bearing, loc.bearing,
+                                 0.0, loc.distance, calculator_version=1)]
+    loc.calculator_version = 1
+    return loc
+
+
+def _fill_aged(directory, n, rng, sightings=False):
+    """n locations an hour apart up to now, newest first like the file."""
+    now = datetime.now()
+    records = []
+    for i in range(n):
+        loc = _make_location(rng)
+        d = (_with_sighting(loc) if sightings else loc).to_dict()
+        d["timestamp"] = (now - timedelta(hours=i)).isoformat()
+        records.append(d)
+    with open(os.path.join(directory, STORAGE_FILE), "w") as f:
+        json.dump(records, f)
+
+
+def _measure_during_writes(repo, fn, min_time, repeat):
+    """measure(fn) while another thread keeps adding to repo."""
+    stop = threading.Event()
+    writer_rng = random.Random(0)
+
+    def writer():
+        while not stop.is_set():
+            repo.add(_make_location(writer_rng))
+
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    try:
+        return measure(fn, min_time=min_time, repeat=repeat)
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _run_tiered(n, rng, min_time, repeat, results):
+    directory = tempfile.mkdtemp()
+    try:
+        _fill_aged(directory, n, rng)
+        # hot_days such that the newest HOT hours stay in memory
+        hot_days = HOT / 24.0
+        results[f"repo.tiered_roll[n={n}]"] = time_once(
+            lambda: LocationRepository(storage_dir=directory, hot_days=hot_days)
+        )
+        holder = {}
+        results[f"repo.tiered_load[n={n}]"] = time_once(
+            lambda: holder.setdefault("repo", LocationRepository(storage_dir=directory))
+        )
+        repo = holder["repo"]
+        results[f"repo.tiered_query_page[n={n}]"] = measure(
+            lambda: repo.query(limit=25), min_time=min_time, repeat=repeat,
+        )
+        # readers work from a snapshot, so a save in progress only costs
+        # them the GIL switches, not the wait for the save
+        results[f"repo.tiered_query_page_during_writes[n={n}]"] = _measure_during_writes(
+            repo, lambda: repo.query(limit=25), min_time, repeat,
+        )
+
+        # a page half way back, with and without its segment still cached
+        def deep_page_cold():
+            repo._segments.clear()
+            repo.query(offset=n // 2, limit=25)
+
+        results[f"repo.tiered_deep_page_cold[n={n}]"] = measure(
+            deep_page_cold, min_time=min_time, repeat=repeat,
+        )
+        results[f"repo.tiered_deep_page[n={n}]"] = measure(
+            lambda: repo.query(offset=n // 2, limit=25), min_time=min_time, repeat=repeat,
+        )
+        results[f"repo.tiered_get_all[n={n}]"] = measure(
+            repo.get_all, min_time=min_time, repeat=repeat,
+        )
+        # last: adds are cheap enough now that measuring them grows the
+        # store by thousands
+        results[f"repo.tiered_add[n={n}]"] = measure(
+            lambda: repo.add(_make_location(rng)), min_time=min_time, repeat=repeat,
+        )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class _NextCalculator(CoordinateCalculator):
+    VERSION = CoordinateCalculator.VERSION + 1
+
+
+def _run_reproject(n, rng, results):
+    directory = tempfile.mkdtemp()
+    try:
+        _fill_aged(directory, n, rng, sightings=True)
+        repo = LocationRepository(storage_dir=directory, hot_days=HOT / 24.0)
+        results[f"repo.reproject[n={n}]"] = time_once(
+            lambda: repo.reproject(_NextCalculator())
+        )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def run(sizes=None, min_time=0.2):
+    sizes = sizes or DEFAULT_SIZES
+    rng = random.Random(42)
+    results = {}
+
+    for n in sizes:
+        directory = tempfile.mkdtemp()
+        try:
+            _fill(directory, n, rng)
+
+            holder = {}
+            results[f"repo.load[n={n}]"] = time_once(
+                lambda: holder.setdefault("repo", LocationRepository(storage_dir=directory))
+            )
+            repo = holder["repo"]
+
+            # big stores get fewer repeats
+            repeat = 5 if n <= 10_000 else 3
+            results[f"repo.get_all[n={n}]"] = measure(
+                repo.get_all, min_time=min_time, repeat=repeat,
+            )
+            # history pages: the plain first page, and the sorted ones that
+            # have to look at everything
+            results[f"repo.query_page[n={n}]"] = measure(
+                lambda: repo.query(limit=25), min_time=min_time, repeat=repeat,
+            )
+            results[f"repo.query_accuracy[n={n}]"] = measure(
+                lambda: repo.query(limit=25, sort="accuracy"),
+                min_time=min_time, repeat=repeat,
+            )
+            results[f"repo.query_nearest[n={n}]"] = measure(
+                lambda: repo.query(limit=25, sort="distance", near=(47.0, 8.0)),
+                min_time=min_time, repeat=repeat,
+            )
+
+            # merge-on-save's duplicate lookup on its own, the add it
+            # goes with is the same file rewrite as above
+            probe = _make_location(rng)
+            results[f"repo.merge_index_build[n={n}]"] = time_once(
+                lambda: repo._find_duplicate(probe)
+            )
+            results[f"repo.find_duplicate[n={n}]"] = measure(
+                lambda: repo._find_duplicate(_make_location(rng)),
+                min_time=min_time, repeat=repeat,
+            )
+            # the writes after the reads: an add only appends to the
+            # journal (bar the odd compaction), cheap enough that measuring
+            # it grows the store by thousands
+            results[f"repo.add[n={n}]"] = measure(
+                lambda: repo.add(_make_location(rng)),
+                min_time=min_time, repeat=repeat,
+            )
+            results[f"repo.delete[n={n}]"] = measure(
+                lambda: repo.delete(repo.count // 2),
+                min_time=min_time, repeat=repeat,
+            )
+
+            # an exporter asking for the last ten changes: the first call
+            # sorts the hot records into change order, after that it's
+            # just the changes
+            since = repo.seq - 10
+            results[f"repo.change_feed_build[n={n}]"] = time_once(
+                lambda: list(repo.changes_since(since))
+            )
+            results[f"repo.changes_since[n={n}]"] = measure(
+                lambda: list(repo.changes_since(since)), min_time=min_time, repeat=repeat,
+            )
+
+            # another process's view of the same store: checking for
+            # changes, and picking up one add (compare with repo.load)
+            other = LocationRepository(storage_dir=directory)
+            results[f"repo.refresh_idle[n={n}]"] = measure(
+                other.refresh, min_time=min_time, repeat=repeat,
+            )
+
+            def add_elsewhere():
+                repo.add(_make_location(rng))
+                other.refresh()
+
+            results[f"repo.add_and_refresh_elsewhere[n={n}]"] = measure(
+                add_elsewhere, min_time=min_time, repeat=repeat,
+            )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        if n > HOT:
+            _run_tiered(n, rng, min_time, repeat, results)
+            _run_reproject(n, rng, results)
+
+    return results
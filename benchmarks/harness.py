@@ -0,0 +1,63 @@
+"""Tiny timing harness shared by the benchmark modules.
+
+Just enough of timeit to give stable numbers without pulling in a
+benchmarking framework: auto-calibrate the loop count, repeat a few
+times, keep the best and median per-call time.
+"""
+import gc
+import statistics
+import time
+
+
+def _time(fn, number):
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def measure(fn, min_time=0.2, repeat=5, max_number=1_000_000):
+    """Time fn() and return per-call stats in seconds.
+
+    The loop count is grown until one repeat takes at least
+    min_time / repeat, so fast and slow functions both get enough
+    samples to be meaningful.
+    """
+    target = min_time / repeat
+    number = 1
+    while number < max_number:
+        if _time(fn, number) >= target:
+            break
+        number *= 4
+
+    per_call = [_time(fn, number) / number for _ in range(repeat)]
+    return {
+        "best": min(per_call),
+        "median": statistics.median(per_call),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def time_once(fn):
+    """Wall time of a single call — for setup-heavy things like loading a file."""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    return {"best": elapsed, "median": elapsed, "number": 1, "repeat": 1}
+
+
+def format_seconds(sec):
+    if sec < 1e-6:
+        return f"{sec * 1e9:8.1f} ns"
+    if sec < 1e-3:
+        return f"{sec * 1e6:8.2f} us"
+    if sec < 1:
+        return f"{sec * 1e3:8.2f} ms"
+    return f"{sec:8.2f} s "
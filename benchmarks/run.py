@@ -0,0 +1,128 @@
+"""Run the benchmark suite and compare against a stored baseline.
+
+Headless — nothing here imports kivy.
+
+    python benchmarks/run.py                          # run, print, write results.json
+    python benchmarks/run.py --output out.json        # results somewhere else
+    python benchmarks/run.py --compare benchmarks/baseline.json
+    python benchmarks/run.py --save-baseline          # overwrite the baseline
+    python benchmarks/run.py --only repo --sizes 1000,10000
+
+--compare exits with status 1 if any benchmark got slower than the
+baseline by more than --threshold (default 1.5x). Baselines are only
+meaningful on the machine that recorded them.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import (
+    bench_core, bench_repository, bench_elevation_tiles, bench_cluster_index,
+    bench_gazetteer, bench_label_index,
+)
+from benchmarks.harness import format_seconds
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(HERE, "baseline.json")
+
+SUITES = {
+    "core": bench_core,
+    "repo": bench_repository,
+    "terrain": bench_elevation_tiles,
+    "clusters": bench_cluster_index,
+    "gazetteer": bench_gazetteer,
+    "labels": bench_label_index,
+}
+
+
+def run_suites(names, sizes, min_time):
+    results = {}
+    for name in names:
+        print(f"-- {name}", flush=True)
+        suite_results = SUITES[name].run(sizes=sizes, min_time=min_time)
+        for bench, stats in suite_results.items():
+            print(f"   {bench:48s} {format_seconds(stats['best'])}", flush=True)
+        results.update(suite_results)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison table and return the names that regressed."""
+    regressions = []
+    print(f"\n{'benchmark':48s} {'baseline':>11s} {'current':>11s}  ratio")
+    for name, stats in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:48s} {'-':>11s} {format_seconds(stats['best'])}    new")
+            continue
+        ratio = stats["best"] / base["best"] if base["best"] > 0 else float("inf")
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:48s} {format_seconds(base['best'])} "
+              f"{format_seconds(stats['best'])}  {ratio:5.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PinPoint benchmark suite")
+    parser.add_argument("--only", help="comma-separated suites: " + ",".join(SUITES))
+    parser.add_argument("--sizes", help="repository sizes, e.g. 1000,10000,100000")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="seconds to spend per benchmark (default 0.2)")
+    parser.add_argument("--output", default="results.json",
+                        help="where to write the results JSON")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="compare against a baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=1.5,
+                        help="slowdown ratio that counts as a regression")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help=f"also write results to {os.path.relpath(BASELINE_FILE)}")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(SUITES)
+    unknown = [n for n in names if n not in SUITES]
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(unknown)}")
+    sizes = tuple(int(s) for s in args.sizes.split(",")) if args.sizes else None
+
+    results = run_suites(names, sizes, args.min_time)
+
+    doc = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(doc, f, indent=2, sort_keys=True)
+    print(f"\nwrote {args.output}")
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(doc, f, indent=2, sort_keys=True)
+        print(f"wrote {BASELINE_FILE}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold}x")
+            return 1
+        print("\nno regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,7 @@ package.name = pinpoint
 package.domain = org.pinpoint
 
 source.dir = .
-source.include_exts = py,png,jpg,kv,atlas,json
+source.include_exts = py,png,jpg,kv,atlas,json,COF
 
 version = 1.0.0
 
@@ -0,0 +1,217 @@
+"""Offline elevation tiles backed by memory maps.
+
+Reads SRTM-style 1x1 degree tiles straight from disk. Files are named
+after their south-west corner (e.g. N37W122.hgt) and hold a square grid
+of signed 16-bit heights in meters, north row first. SRTM .hgt files are
+big-endian; .raw files use the same layout in little-endian order, which
+is what you get when exporting a GeoTIFF tile with
+`gdal_translate -of ENVI -ot Int16`.
+
+Tiles are mmap'd rather than read, so opening one costs a syscall and the
+OS only pages in the rows we actually sample. A small LRU keeps the
+most recently used tiles open.
+"""
+import math
+import mmap
+import os
+import re
+import struct
+from collections import OrderedDict
+
+from utils.lazy_import import get_logger
+
+# kivy's logger when the app is running, stdlib logging for headless use —
+# never imports kivy itself, see utils/lazy_import.py
+Logger = get_logger(__name__)
+
+
+TILE_DIR = "dem"
+VOID = -32768  # SRTM marker for missing data
+
+# file extension -> struct byte order
+TILE_FORMATS = {
+    ".hgt": ">",
+    ".raw": "<",
+}
+
+_TILE_NAME = re.compile(r"^([NS])(\d{2})([EW])(\d{3})$", re.IGNORECASE)
+
+
+def tile_name(lat0, lon0):
+    """Name of the tile whose south-west corner is (lat0, lon0), no extension."""
+    ns = "N" if lat0 >= 0 else "S"
+    ew = "E" if lon0 >= 0 else "W"
+    return f"{ns}{abs(lat0):02d}{ew}{abs(lon0):03d}"
+
+
+def parse_tile_name(name):
+    """Inverse of tile_name. Returns (lat0, lon0) or None if it doesn't match."""
+    m = _TILE_NAME.match(name)
+    if not m:
+        return None
+    lat0 = int(m.group(2)) * (1 if m.group(1).upper() == "N" else -1)
+    lon0 = int(m.group(4)) * (1 if m.group(3).upper() == "E" else -1)
+    return lat0, lon0
+
+
+class ElevationTile:
+    """One memory-mapped 1x1 degree height grid."""
+
+    def __init__(self, path, lat0, lon0, byteorder=">"):
+        size = os.path.getsize(path)
+        samples = int(round(math.sqrt(size / 2)))
+        if samples < 2 or samples * samples * 2 != size:
+            raise ValueError(f"{path} is not a square int16 grid ({size} bytes)")
+
+        self.path = path
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.samples = samples
+        self._scale = samples - 1  # grid intervals per degree
+        self._row_stride = samples * 2
+        self._unpack = struct.Struct(byteorder + "h").unpack_from
+
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def _raw(self, row, col):
+        return self._unpack(self._mm, row * self._row_stride + col * 2)[0]
+
+    def sample(self, lat, lon):
+        """Bilinearly interpolated height at (lat, lon), or None if void.
+
+        Void corners are dropped and the remaining weights renormalized,
+        so a single missing post doesn't punch a hole in the terrain.
+        """
+        # fractional grid position, row 0 is the northern edge
+        y = (self.lat0 + 1 - lat) * self._scale
+        x = (lon - self.lon0) * self._scale
+
+        last = self._scale
+        row = min(max(int(y), 0), last - 1)
+        col = min(max(int(x), 0), last - 1)
+        fy = min(max(y - row, 0.0), 1.0)
+        fx = min(max(x - col, 0.0), 1.0)
+
+        h00 = self._raw(row, col)
+        h01 = self._raw(row, col + 1)
+        h10 = self._raw(row + 1, col)
+        h11 = self._raw(row + 1, col + 1)
+
+        if VOID not in (h00, h01, h10, h11):
+            top = h00 + (h01 - h00) * fx
+            bottom = h10 + (h11 - h10) * fx
+            return top + (bottom - top) * fy
+
+        total = 0.0
+        weight = 0.0
+        for h, w in ((h00, (1 - fx) * (1 - fy)), (h01, fx * (1 - fy)),
+                     (h10, (1 - fx) * fy), (h11, fx * fy)):
+            if h != VOID:
+                total += h * w
+                weight += w
+        if weight <= 0:
+            return None
+        return total / weight
+
+
+class ElevationTileStore:
+    """Looks up terrain heights from a directory of tiles.
+
+    Keeps at most `max_open` tiles mapped at once. Tiles that don't exist
+    on disk are remembered so we don't hit the filesystem for every
+    sample over the ocean or outside the downloaded area.
+    """
+
+    def __init__(self, tile_dir, max_open=8):
+        self._dir = tile_dir
+        self._max_open = max_open
+        self._open = OrderedDict()  # (lat0, lon0) -> ElevationTile
+        self._missing = set()
+
+    @property
+    def open_count(self):
+        return len(self._open)
+
+    def has_tiles(self):
+        """True if the tile directory has at least one usable tile."""
+        try:
+            names = os.listdir(self._dir)
+        except OSError:
+            return False
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            if ext.lower() in TILE_FORMATS and parse_tile_name(stem):
+                return True
+        return False
+
+    def get_tile(self, lat0, lon0):
+        """Return the open tile for a south-west corner, or None if not on disk."""
+        key = (lat0, lon0)
+        tile = self._open.get(key)
+        if tile is not None:
+            self._open.move_to_end(key)
+            return tile
+        if key in self._missing:
+            return None
+
+        tile = self._open_tile(lat0, lon0)
+        if tile is None:
+            self._missing.add(key)
+            return None
+
+        self._open[key] = tile
+        if len(self._open) > self._max_open:
+            _, evicted = self._open.popitem(last=False)
+            evicted.close()
+        return tile
+
+    def _open_tile(self, lat0, lon0):
+        stem = tile_name(lat0, lon0)
+        for ext, byteorder in TILE_FORMATS.items():
+            path = os.path.join(self._dir, stem + ext)
+            if not os.path.exists(path):
+                continue
+            try:
+                return ElevationTile(path, lat0, lon0, byteorder)
+            except (OSError, ValueError) as e:
+                Logger.warning(f"ElevationTiles: can't open {path} - {e}")
+        return None
+
+    def elevation(self, lat, lon):
+        """Terrain height in meters at (lat, lon), or None if no data."""
+        tile = self.get_tile(math.floor(lat), math.floor(lon))
+        if tile is None:
+            return None
+        return tile.sample(lat, lon)
+
+    def elevations(self, lats, lons):
+        """Batch version of elevation() for a run of nearby points.
+
+        Points along a ray almost always fall in the same tile, so we
+        only go back to the LRU when the tile actually changes.
+        """
+        out = []
+        key = None
+        tile = None
+        for lat, lon in zip(lats, lons):
+            k = (math.floor(lat), math.floor(lon))
+            if k != key:
+                key = k
+                tile = self.get_tile(*k)
+            out.append(tile.sample(lat, lon) if tile is not None else None)
+        return out
+
+    def close(self):
+        for tile in self._open.values():
+            tile.close()
+        self._open.clear()
+        self._missing.clear()
@@ -0,0 +1,308 @@
+"""Offline reverse geocoding against a local gazetteer.
+
+Users drop a GeoNames dump (https://download.geonames.org/export/dump/,
+e.g. cities500.txt) into the app's data directory as places.txt. The
+first time it's seen we build a static KD-tree over the places as unit
+vectors on the sphere — so there's no trouble at the poles or across the
+antimeridian — and write it next to the dump as places.ppgz. After that
+the index is only memory-mapped, which costs a few syscalls at startup
+however big it is, and the OS pages in just the nodes a lookup visits.
+
+The tree is implicit: points are stored in an order where the node for
+a range [lo, hi) is the middle element and its two halves are the left
+and right subtrees, so there are no child pointers at all. Index layout,
+native byte order (a cache built on another machine just gets rebuilt):
+
+    header      magic, version, byte order, count, names length,
+                source size and mtime (to spot a replaced dump)
+    xyz         float64 x, y, z per place, tree order
+    axes        uint8 split axis per node
+    offsets     uint32 start of each name in the blob, count + 1
+    names       utf-8 "name<TAB>country code" for each place
+
+No kivy imports here.
+"""
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import namedtuple
+
+from utils.math_utils import deg_to_rad, EARTH_RADIUS
+from utils.lazy_import import get_logger
+
+# kivy's logger when the app is running, stdlib logging for headless use —
+# never imports kivy itself, see utils/lazy_import.py
+Logger = get_logger(__name__)
+
+
+GAZETTEER_FILE = "places.txt"
+INDEX_SUFFIX = ".ppgz"
+
+# past this the nearest place isn't much of a landmark any more
+DEFAULT_MAX_DISTANCE = 25_000  # meters
+
+_MAGIC = b"PPGZ"
+_VERSION = 1
+# magic, version, byte order, count, names length, source size, source mtime
+_HEADER = struct.Struct("<4sHHIIqq")
+_BYTE_ORDER = 1 if sys.byteorder == "little" else 2
+
+# GeoNames main table columns we use
+_COL_NAME = 1
+_COL_LAT = 4
+_COL_LON = 5
+_COL_CLASS = 6
+_COL_COUNTRY = 8
+
+Place = namedtuple("Place", "name country lat lon distance")
+
+
+def _unit_vector(lat, lon):
+    lat_r = deg_to_rad(lat)
+    lon_r = deg_to_rad(lon)
+    cos_lat = math.cos(lat_r)
+    return cos_lat * math.cos(lon_r), cos_lat * math.sin(lon_r), math.sin(lat_r)
+
+
+def parse_geonames(lines, feature_classes=("P",)):
+    """Yield (name, country, lat, lon) from GeoNames-style TSV lines.
+
+    Only populated places (feature class P) by default — the full dump
+    also has every hill, stream and bus stop. Lines that don't parse are
+    skipped rather than failing the whole build.
+    """
+    for line in lines:
+        if not line or line.startswith("#"):
+            continue
+        cols = line.rstrip("\r\n").split("\t")
+        if len(cols) <= _COL_COUNTRY:
+            continue
+        if feature_classes and cols[_COL_CLASS] not in feature_classes:
+            continue
+        try:
+            lat = float(cols[_COL_LAT])
+            lon = float(cols[_COL_LON])
+        except ValueError:
+            continue
+        yield cols[_COL_NAME], cols[_COL_COUNTRY], lat, lon
+
+
+def _source_stamp(source_path):
+    st = os.stat(source_path)
+    return st.st_size, st.st_mtime_ns
+
+
+def build_index(places, index_path, source_stamp=(0, 0)):
+    """Build the KD-tree for (name, country, lat, lon) places and write it.
+
+    Each node splits its range on the axis with the widest spread, at the
+    median. Sorting every range costs O(n log^2 n), a few seconds for
+    the ~200k places in cities500 — it only happens once per dump.
+
+    Returns:
+        number of places written
+    """
+    coords = []
+    labels = []
+    for name, country, lat, lon in places:
+        coords.append(_unit_vector(lat, lon))
+        labels.append(f"{name}\t{country}")
+    n = len(coords)
+    # one list per axis, so the hot loops are plain C-level map/sort calls
+    columns = [[c[a] for c in coords] for a in range(3)]
+
+    order = list(range(n))
+    axes = bytearray(n)
+    stack = [(0, n)]
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo < 2:
+            continue
+        span = order[lo:hi]
+        spreads = []
+        for column in columns:
+            values = list(map(column.__getitem__, span))
+            spreads.append(max(values) - min(values))
+        axis = spreads.index(max(spreads))
+        span.sort(key=columns[axis].__getitem__)
+        order[lo:hi] = span
+        mid = (lo + hi) >> 1
+        axes[mid] = axis
+        stack.append((lo, mid))
+        stack.append((mid + 1, hi))
+
+    xyz = array("d")
+    offsets = array("I", [0])
+    blob = bytearray()
+    for i in order:
+        xyz.extend(coords[i])
+        blob += labels[i].encode("utf-8")
+        offsets.append(len(blob))
+    # keep the offsets 4-byte aligned after the 1-byte axes
+    pad = b"\0" * (-(_HEADER.size + len(xyz) * 8 + n) % 4)
+
+    tmp = index_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, _BYTE_ORDER, n, len(blob),
+                             *source_stamp))
+        f.write(xyz.tobytes())
+        f.write(bytes(axes))
+        f.write(pad)
+        f.write(offsets.tobytes())
+        f.write(blob)
+    # a reader never sees a half written index
+    os.replace(tmp, index_path)
+    return n
+
+
+class Gazetteer:
+    """Nearest named place lookups on a memory-mapped index file."""
+
+    def __init__(self, index_path):
+        self.path = index_path
+        self._file = open(index_path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+        try:
+            self._map_arrays()
+        except ValueError:
+            self.close()
+            raise
+
+    def _map_arrays(self):
+        if len(self._mm) < _HEADER.size:
+            raise ValueError(f"{self.path} is too short for a gazetteer index")
+        (magic, version, byte_order, n, names_len,
+         src_size, src_mtime) = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION or byte_order != _BYTE_ORDER:
+            raise ValueError(f"{self.path} is not a gazetteer index for this build")
+
+        pos = _HEADER.size
+        xyz_end = pos + n * 24
+        axes_end = xyz_end + n
+        off_start = axes_end + (-axes_end % 4)
+        off_end = off_start + (n + 1) * 4
+        if len(self._mm) != off_end + names_len:
+            raise ValueError(f"{self.path} is truncated")
+
+        view = memoryview(self._mm)
+        self._views = [view]
+        self._xyz = view[pos:xyz_end].cast("d")
+        self._axes = view[xyz_end:axes_end]
+        self._offsets = view[off_start:off_end].cast("I")
+        self._names = view[off_end:]
+        self._views += [self._xyz, self._axes, self._offsets, self._names]
+        self._count = n
+        self.source_stamp = (src_size, src_mtime)
+
+    @classmethod
+    def open(cls, source_path, index_path=None):
+        """Open the index for a gazetteer dump, building it if needed.
+
+        The index is rebuilt when the dump has changed since. With the
+        dump gone but an index left behind, the index is used as is.
+
+        Returns:
+            Gazetteer, or None if there's neither a dump nor an index
+        """
+        if index_path is None:
+            index_path = os.path.splitext(source_path)[0] + INDEX_SUFFIX
+        stamp = _source_stamp(source_path) if os.path.exists(source_path) else None
+
+        if os.path.exists(index_path):
+            try:
+                gazetteer = cls(index_path)
+            except (OSError, ValueError) as e:
+                Logger.warning(f"Gazetteer: ignoring {index_path} - {e}")
+            else:
+                if stamp is None or gazetteer.source_stamp == stamp:
+                    return gazetteer
+                gazetteer.close()
+
+        if stamp is None:
+            return None
+        try:
+            with open(source_path, encoding="utf-8", errors="replace") as f:
+                count = build_index(parse_geonames(f), index_path, stamp)
+            Logger.info(f"Gazetteer: indexed {count} places from {source_path}")
+            return cls(index_path)
+        except (OSError, ValueError) as e:
+            Logger.warning(f"Gazetteer: can't index {source_path} - {e}")
+            return None
+
+    def close(self):
+        # views have to go before the map they point into
+        for view in reversed(getattr(self, "_views", ())):
+            view.release()
+        self._views = []
+        self._mm.close()
+        self._file.close()
+
+    def __len__(self):
+        return self._count
+
+    def _place(self, i, chord_sq):
+        label = bytes(self._names[self._offsets[i]:self._offsets[i + 1]])
+        name, _, country = label.decode("utf-8").partition("\t")
+        x, y, z = self._xyz[i * 3:i * 3 + 3]
+        lat = math.degrees(math.asin(max(-1.0, min(1.0, z))))
+        lon = math.degrees(math.atan2(y, x))
+        # chord length on the unit sphere -> great circle distance
+        distance = 2.0 * math.asin(min(1.0, math.sqrt(chord_sq) / 2.0)) * EARTH_RADIUS
+        return Place(name, country, lat, lon, distance)
+
+    def nearest(self, lat, lon):
+        """The closest place to (lat, lon), or None for an empty index."""
+        if not self._count:
+            return None
+        q = _unit_vector(lat, lon)
+        qx, qy, qz = q
+        xyz = self._xyz
+        axes = self._axes
+
+        best = math.inf
+        best_i = -1
+        # (lo, hi, lower bound on the squared distance to anything in it)
+        stack = [(0, self._count, 0.0)]
+        while stack:
+            lo, hi, bound = stack.pop()
+            if bound >= best:
+                continue
+            mid = (lo + hi) >> 1
+            b = mid * 3
+            dx = xyz[b] - qx
+            dy = xyz[b + 1] - qy
+            dz = xyz[b + 2] - qz
+            d = dx * dx + dy * dy + dz * dz
+            if d < best:
+                best = d
+                best_i = mid
+            if hi - lo == 1:
+                continue
+            axis = axes[mid]
+            diff = q[axis] - xyz[b + axis]
+            # far side first so the near side is searched first
+            if diff < 0:
+                if mid + 1 < hi:
+                    stack.append((mid + 1, hi, diff * diff))
+                if lo < mid:
+                    stack.append((lo, mid, 0.0))
+            else:
+                if lo < mid:
+                    stack.append((lo, mid, diff * diff))
+                if mid + 1 < hi:
+                    stack.append((mid + 1, hi, 0.0))
+        return self._place(best_i, best)
+
+    def label(self, lat, lon, max_distance=DEFAULT_MAX_DISTANCE):
+        """A "near X" label for a location, or "" if nothing is close enough."""
+        place = self.nearest(lat, lon)
+        if place is None or place.distance > max_distance:
+            return ""
+        return f"near {place.name}"
@@ -0,0 +1,212 @@
+"""Compressed archive segments for old saved locations.
+
+LocationRepository keeps the last few weeks of history "hot" in memory
+and in its JSON file; anything older gets rolled into segments here.
+A segment is a run of records (oldest first) written once and never
+modified — changing a record in it means writing a replacement segment
+and switching the manifest over to it.
+
+On disk a segment is zlib-compressed JSON, one column per field.
+Coordinates are stored as 1e-7 degree integers (~1 cm), each one the
+difference from the record before it. Consecutive sightings are usually
+close together, so the differences are short numbers and compress well.
+A segment comes back exactly as written, except that coordinates are
+rounded to that 1e-7 degree grid.
+
+manifest.json lists the segments oldest first, with their record count,
+timestamp range and newest change number (seq), so a query or the
+change feed can tell which ones it needs without opening them. Segment files and the manifest are both replaced
+atomically (write to a temp file, then os.replace).
+
+No kivy imports here.
+"""
+import json
+import os
+import zlib
+from collections import namedtuple
+
+from utils.lazy_import import get_logger
+
+# kivy's logger when the app is running, stdlib logging for headless use —
+# never imports kivy itself, see utils/lazy_import.py
+Logger = get_logger(__name__)
+
+
+MANIFEST_FILE = "manifest.json"
+SEGMENT_SUFFIX = ".ppz"
+
+FORMAT = "pinpoint-archive"
+VERSION = 1
+# 2 added seq to the segments; 1 is still read, as seq 0
+MANIFEST_VERSION = 2
+
+COORD_SCALE = 10_000_000  # 1e-7 degrees
+COORD_FIELDS = ("src_lat", "src_lon", "dest_lat", "dest_lon")
+
+# first/last are the oldest and newest timestamps in the segment, seq
+# the highest change number in it
+SegmentInfo = namedtuple("SegmentInfo", "file count first last seq", defaults=(0,))
+
+
+def encode_segment(records):
+    """Pack record dicts (all with the same keys) into segment bytes."""
+    columns = {}
+    fields = list(records[0]) if records else []
+    for field in fields:
+        values = [r.get(field) for r in records]
+        if field in COORD_FIELDS:
+            fixed = [round(v * COORD_SCALE) for v in values]
+            values = fixed[:1] + [b - a for a, b in zip(fixed, fixed[1:])]
+        columns[field] = values
+    doc = {"format": FORMAT, "version": VERSION, "count": len(records),
+           "columns": columns}
+    return zlib.compress(json.dumps(doc, separators=(",", ":")).encode("utf-8"), 9)
+
+
+def decode_segment(data):
+    """Record dicts from segment bytes, oldest first.
+
+    Raises:
+        ValueError: not a segment, or one from a newer version
+    """
+    try:
+        doc = json.loads(zlib.decompress(data))
+    except zlib.error as e:
+        raise ValueError(f"not an archive segment: {e}") from None
+    if not isinstance(doc, dict) or doc.get("format") != FORMAT:
+        raise ValueError("not an archive segment")
+    if doc.get("version") != VERSION:
+        raise ValueError(f"unsupported archive segment version {doc.get('version')}")
+
+    columns = doc["columns"]
+    for field in COORD_FIELDS:
+        deltas = columns.get(field)
+        if deltas is None:
+            continue
+        values = []
+        total = 0
+        for d in deltas:
+            total += d
+            values.append(total / COORD_SCALE)
+        columns[field] = values
+    fields = list(columns)
+    records = [dict(zip(fields, row)) for row in zip(*(columns[f] for f in fields))]
+    if len(records) != doc["count"]:
+        raise ValueError("archive segment is truncated")
+    return records
+
+
+def _write_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class LocationArchive:
+    """The segments in one directory, through their manifest.
+
+    Nothing is created on disk until the first segment is written.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._manifest_path = os.path.join(directory, MANIFEST_FILE)
+        # SegmentInfo oldest first — a tuple that's replaced, never changed,
+        # so a reader on another thread can hold on to it
+        self.segments = ()
+        self._next = 1
+        # replaced segment file -> its replacement (None if dropped), for
+        # readers that listed the segments just before the swap
+        self._moved = {}
+        self._read_manifest()
+
+    def __len__(self):
+        return sum(info.count for info in self.segments)
+
+    def _read_manifest(self):
+        """Raises OSError or ValueError if there's a manifest but it's unusable."""
+        if not os.path.exists(self._manifest_path):
+            return
+        with open(self._manifest_path, "r") as f:
+            doc = json.load(f)
+        try:
+            version = doc.get("version")
+            if version not in (1, MANIFEST_VERSION):
+                raise ValueError(f"unsupported archive manifest version {version}")
+            self.segments = tuple(SegmentInfo(**s) for s in doc["segments"])
+            self._next = doc["next"]
+        except (AttributeError, KeyError, TypeError):
+            raise ValueError(f"{self._manifest_path} is not an archive manifest") from None
+
+    def _write_manifest(self):
+        doc = {
+            "version": MANIFEST_VERSION,
+            "segments": [info._asdict() for info in self.segments],
+            "next": self._next,
+        }
+        _write_atomic(self._manifest_path, json.dumps(doc, indent=2).encode("utf-8"))
+
+    def read(self, info):
+        """Record dicts of a segment, oldest first.
+
+        If the segment was replaced since info was listed, what replaced it.
+        """
+        while True:
+            try:
+                with open(os.path.join(self.directory, info.file), "rb") as f:
+                    return decode_segment(f.read())
+            except FileNotFoundError:
+                if info.file not in self._moved:
+                    raise
+                info = self._moved[info.file]
+                if info is None:
+                    return []
+
+    def _write_segment(self, records):
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"seg-{self._next:06d}{SEGMENT_SUFFIX}"
+        self._next += 1
+        _write_atomic(os.path.join(self.directory, name), encode_segment(records))
+        # a record re-added with its old timestamp can be out of order
+        timestamps = [r["timestamp"] for r in records]
+        return SegmentInfo(name, len(records), min(timestamps), max(timestamps),
+                           max(r.get("seq", 0) for r in records))
+
+    def _discard(self, info):
+        try:
+            os.remove(os.path.join(self.directory, info.file))
+        except OSError as e:
+            Logger.warning(f"LocationArchive: couldn't remove {info.file} - {e}")
+
+    def append(self, records):
+        """Write records (oldest first, all newer than the archive) as a new segment."""
+        info = self._write_segment(records)
+        self.segments = self.segments + (info,)
+        self._write_manifest()
+        return info
+
+    def replace(self, info, records):
+        """Swap a segment for one holding records instead.
+
+        Returns:
+            the new SegmentInfo, or None if records was empty and the
+            segment was just dropped
+        """
+        i = self.segments.index(info)
+        new = self._write_segment(records) if records else None
+        self.segments = self.segments[:i] + ((new,) if new else ()) + self.segments[i + 1:]
+        self._write_manifest()
+        self._moved[info.file] = new
+        self._discard(info)
+        return new
+
+    def clear(self):
+        old = self.segments
+        self.segments = ()
+        for info in old:
+            self._moved[info.file] = None
+        if os.path.exists(self._manifest_path):
+            self._write_manifest()
+        for info in old:
+            self._discard(info)
@@ -2,27 +2,110 @@
 
 Uses a simple JSON file. Nothing fancy — SQLite would be overkill for
 what's basically a list of coordinates with timestamps.
+
+Changes go to a journal next to it (one JSON line each) rather than
+rewriting the whole file, which is only written out again now and then.
+That's also what lets the app and a batch import/export script share
+one store, see LocationRepository.
+
+Years of history don't have to live in that file though: with hot_days
+set, records older than that are rolled into compressed, read-only
+archive segments (data/location_archive.py) and only read back when
+something reaches that far.
 """
+import heapq
 import json
+import math
 import os
-import logging
-from datetime import datetime
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import chain, islice, takewhile
+from operator import attrgetter, itemgetter
+
+from data.location_archive import LocationArchive, MANIFEST_FILE
+from domain.observation import observation_from_dict
+from domain.label_index import LabelIndex
+from domain.spatial_grid import SpatialGrid
+from utils.file_lock import FileLock
+from utils.lru_cache import LRUCache
+from utils.math_utils import great_circle_distance
+from utils.profiler import profiled
+from utils.lazy_import import get_logger, kivy_loaded
 
-# use stdlib logging so this module works without kivy installed (for tests)
-try:
-    from kivy.logger import Logger
-except ImportError:
-    Logger = logging.getLogger(__name__)
+# kivy's logger when the app is running, stdlib logging for headless use —
+# never imports kivy itself, see utils/lazy_import.py
+Logger = get_logger(__name__)
 
 
 STORAGE_FILE = "saved_locations.json"
+ARCHIVE_DIR = "saved_locations.archive"
+JOURNAL_SUFFIX = ".journal"
+LOCK_SUFFIX = ".lock"
+
+# the storage file as {"version", "seq", "locations"}; version 1 was
+# just the list of locations
+STORE_VERSION = 2
+# journal entries before the storage file is written out again, at least
+# this many and at least half the hot records
+COMPACT_MIN = 256
+# how long deletions are remembered for changes_since()
+TOMBSTONE_DAYS = 90
+
+# what the app keeps hot; older records go to the archive
+HOT_DAYS = 42
+# records per archive segment, and the fewest worth making one for
+SEGMENT_RECORDS = 2000
+ARCHIVE_MIN = 200
+# decoded segments kept in memory
+SEGMENT_CACHE = 4
+
+SORT_ORDERS = ("newest", "oldest", "accuracy", "distance")
+
+# one page of query() results; offset + len(items) is where the next starts
+Page = namedtuple("Page", "items offset has_more")
+
+# one entry of changes_since(); location is None if it was deleted
+Change = namedtuple("Change", "seq id location")
+
+
+def _stat_key(path):
+    """What changes whenever the file is written or replaced, None if it's missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def new_location_id():
+    """128 random bits as hex, like a uuid4 without importing uuid (~15 ms)."""
+    return os.urandom(16).hex()
 
 
 class SavedLocation:
-    """Represents one saved result."""
+    """Represents one saved result.
+
+    id is stable for the life of the record — what the UI and indexes
+    refer to it by. observations counts how many sightings have been
+    merged into it, see absorb(). seq is the number of the repository
+    change that last touched it, 0 for anything from before those.
+
+    sightings are the raw inputs (Observations) of every sighting merged
+    in, and calculator_version the CoordinateCalculator.VERSION that
+    dest_lat/dest_lon/accuracy came from. Records from before either
+    have no sightings and can't be redone; see derived().
+    """
+
+    _derived = None  # (calculator version, lat, lon, accuracy), not saved
 
     def __init__(self, src_lat, src_lon, dest_lat, dest_lon,
-                 bearing, distance, accuracy, timestamp=None, label=""):
+                 bearing, distance, accuracy, timestamp=None, label="",
+                 observations=1, id=None, seq=0, sightings=(),
+                 calculator_version=0):
+        self.id = id or new_location_id()
         self.src_lat = src_lat
         self.src_lon = src_lon
         self.dest_lat = dest_lat
@@ -32,9 +115,67 @@ class SavedLocation:
         self.accuracy = accuracy
         self.timestamp = timestamp or datetime.now().isoformat()
         self.label = label
+        self.observations = observations
+        self.seq = seq
+        self.sightings = list(sightings)
+        self.calculator_version = calculator_version
+
+    def absorb(self, other):
+        """Fold another sighting of the same target into this one.
+
+        The position is averaged with 1/accuracy² weights and the accuracy
+        becomes that of the combined estimate, so every repeat sighting
+        pulls the target in and tightens it. The source, bearing, distance
+        and timestamp follow the newer sighting; a label we already have
+        is kept.
+        """
+        w_self = 1.0 / max(self.accuracy, 0.1) ** 2
+        w_other = 1.0 / max(other.accuracy, 0.1) ** 2
+        f = w_other / (w_self + w_other)
+
+        # step along the shorter way round in longitude
+        dlon = (other.dest_lon - self.dest_lon + 180.0) % 360.0 - 180.0
+
+        # one dict update, so a reader on another thread sees the record
+        # from before or after the merge, never half of each
+        self.__dict__.update(
+            dest_lat=self.dest_lat + (other.dest_lat - self.dest_lat) * f,
+            dest_lon=(self.dest_lon + dlon * f + 180.0) % 360.0 - 180.0,
+            accuracy=(w_self + w_other) ** -0.5,
+            src_lat=other.src_lat,
+            src_lon=other.src_lon,
+            bearing=other.bearing,
+            distance=other.distance,
+            timestamp=other.timestamp,
+            label=self.label or other.label,
+            observations=self.observations + other.observations,
+            # a record from before sightings were kept can't be redone
+            sightings=(self.sightings + other.sightings
+                       if self.sightings and other.sightings else []),
+            calculator_version=min(self.calculator_version, other.calculator_version),
+            _derived=None,
+        )
+
+    def derived(self, calculator):
+        """(dest_lat, dest_lon, accuracy) as this calculator works them out.
+
+        The stored ones if they came from the same VERSION or there are
+        no sightings to redo them from. Otherwise they're worked out from
+        the sightings once and kept for that version — the stored fields
+        stay as they are until LocationRepository.reproject().
+        """
+        version = calculator.VERSION
+        if version == self.calculator_version or not self.sightings:
+            return self.dest_lat, self.dest_lon, self.accuracy
+        cached = self._derived
+        if cached is None or cached[0] != version:
+            cached = (version,) + tuple(calculator.project_sightings(self.sightings))
+            self._derived = cached
+        return cached[1:]
 
     def to_dict(self):
         return {
+            "id": self.id,
             "src_lat": self.src_lat,
             "src_lon": self.src_lon,
             "dest_lat": self.dest_lat,
@@ -44,6 +185,10 @@ class SavedLocation:
             "accuracy": self.accuracy,
             "timestamp": self.timestamp,
             "label": self.label,
+            "observations": self.observations,
+            "seq": self.seq,
+            "sightings": [obs._asdict() for obs in self.sightings],
+            "calculator_version": self.calculator_version,
         }
 
     @classmethod
@@ -58,62 +203,1206 @@ class SavedLocation:
             accuracy=d["accuracy"],
             timestamp=d.get("timestamp", ""),
             label=d.get("label", ""),
+            observations=d.get("observations", 1),
+            id=d.get("id"),
+            seq=d.get("seq", 0),
+            sightings=[observation_from_dict(o) for o in d.get("sightings", ())],
+            calculator_version=d.get("calculator_version", 0),
         )
 
 
 class LocationRepository:
-    def __init__(self, storage_dir=None):
+    """Saved locations, newest first.
+
+    Pass load=False and call load_in_background() to read the file off
+    the main thread at startup. Every public method waits for a pending
+    load to finish first, so nothing can see (or save over) a half
+    loaded list.
+
+    Safe to share between threads. Changes (add, delete, relabel, load,
+    archiving) take _lock one at a time, listeners are called with it
+    held. Reads don't take it: they work from a tuple snapshot of the
+    hot records and the archive's segments, copied once per change
+    (_view()) and never in the middle of one (_changing()), so paging or
+    exporting on a worker never holds up a save. Record fields only ever
+    change all at once, see SavedLocation.absorb(). The label index is
+    the exception — it's looked up under the lock, a few ms at most.
+
+    Records live in a dict keyed by id, in insertion order — oldest
+    first, so "newest first" is just iterating it reversed. Adding,
+    deleting by id, updating a label and moving a merged record to the
+    top are all O(1) in memory, and so is saving one: it appends a line
+    to the journal. Rewriting the whole file only happens once the
+    journal has grown past COMPACT_MIN or half the hot records, so that
+    O(n) is spread over at least as many changes.
+
+    Indexes built on top (e.g. the map's ClusterIndex) keep in step via
+    add_listener() instead of rescanning the whole list.
+
+    With merge_duplicates, add() folds a location into an existing one
+    whose accuracy circle overlaps it (same target, sighted again)
+    instead of storing a second copy. Candidates come from a SpatialGrid
+    that's only built the first time a merge is asked for.
+
+    Label search goes through a LabelIndex (word prefixes -> ids), also
+    built on first use and then kept in step by every change.
+
+    With hot_days, loading rolls records older than that into archive
+    segments of SEGMENT_RECORDS, so _by_id and the JSON file only hold
+    recent history and saving stays cheap. The archive is always the
+    older end of the list. Pages walk into it a segment at a time, and
+    skip whole segments that a page offset or a since/until range goes
+    past; the sorted orders, get_all() and the first label search or
+    lookup of an archived id read all of it. Relabelling or deleting an
+    archived record writes a replacement segment. Merge-on-save only
+    looks at hot records.
+
+    Several processes can share one store (the app and an import script,
+    say). Every change is numbered (seq) and appended to the journal as
+    one line; the storage file is a snapshot of the hot records up to
+    some seq, replaced atomically when the journal has grown past
+    COMPACT_MIN. Changes hold an advisory lock on the ".lock" file and
+    first catch up with whatever the other processes did: a journal that
+    grew is replayed from where we last stopped, listeners get the usual
+    events for it, and only a new snapshot we can't account for or a
+    changed archive means reading everything again. refresh() does the
+    same catching up on its own, the app calls it every few seconds.
+    Reads never take the file lock.
+
+    The numbering doubles as a change feed for exporters: each record
+    keeps the seq of its last change, deletions leave a tombstone (id,
+    seq) for TOMBSTONE_DAYS, and changes_since() hands back what's newer
+    than a given seq without looking at the rest of the store.
+
+    Records keep the raw inputs of their sightings; reproject() works
+    them all out again when the CoordinateCalculator VERSION changes.
+    """
+
+    def __init__(self, storage_dir=None, load=True, merge_duplicates=False,
+                 hot_days=None):
         if storage_dir:
             self._path = os.path.join(storage_dir, STORAGE_FILE)
         else:
-            # use app's user_data_dir at runtime
-            from kivy.app import App
-            app = App.get_running_app()
+            # use app's user_data_dir at runtime — but only look if the app
+            # has loaded kivy already, headless tools shouldn't pay for it
+            kivy_app = kivy_loaded("kivy.app")
+            app = kivy_app.App.get_running_app() if kivy_app else None
             if app:
                 self._path = os.path.join(app.user_data_dir, STORAGE_FILE)
             else:
                 self._path = STORAGE_FILE
 
-        self._locations = []
-        self._load()
+        self.merge_duplicates = merge_duplicates
+        self.hot_days = hot_days
+        self._lock = threading.RLock()
+        self._cache_lock = threading.Lock()  # for the decoded segment LRU
+        self._by_id = {}  # id -> SavedLocation, oldest first, hot ones only
+        self._version = 0  # odd while a change is underway, see _changing()
+        self._changing_depth = 0
+        self._snapshot = (-1, ((), ()))  # (version, what _view() returns)
+        self._load_thread = None
+        self._listeners = ()
+        self._grid = None
+        self._labels = None
+        self._archive = None
+        self._archive_ids = None  # archived id -> SegmentInfo, built on first use
+        self._segments = LRUCache(SEGMENT_CACHE)  # file -> (locations, by id)
+        self._seq = 0              # number of the last change we have
+        self._snapshot_key = None  # _stat_key() of the storage file as we last saw it
+        self._manifest_key = None  # ... and of the archive manifest
+        self._journal_ino = None
+        self._journal_offset = 0   # bytes of the journal we've applied
+        self._journal_entries = 0
+        self._file_locked = False
+        self._tombstones = {}      # deleted id -> (seq, when), oldest first
+        self._horizon = 0          # highest seq of a deletion we've forgotten
+        self._feed = None          # hot and deleted id -> seq in seq order, built on first use
+        self._calculator_version = 0  # CoordinateCalculator.VERSION of the last reproject()
+        if load:
+            self._load()
+
+    @property
+    def _journal_path(self):
+        return self._path + JOURNAL_SUFFIX
+
+    @property
+    def _manifest_path(self):
+        return os.path.join(os.path.dirname(self._path), ARCHIVE_DIR, MANIFEST_FILE)
+
+    def load_in_background(self, on_loaded=None):
+        """Load the file on a worker thread.
+
+        Args:
+            on_loaded: called with no arguments on the worker thread when
+                done — use Clock.schedule_once to get back to the UI
+        """
+        def worker():
+            self._load()
+            if on_loaded:
+                on_loaded()
+
+        self._load_thread = threading.Thread(
+            target=worker, name="repo-load", daemon=True
+        )
+        self._load_thread.start()
+
+    @property
+    def is_loaded(self):
+        thread = self._load_thread
+        return thread is None or not thread.is_alive()
+
+    def _wait_loaded(self):
+        thread = self._load_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+            self._load_thread = None
+
+    def add_listener(self, callback):
+        """Call callback(event, location) after every change.
+
+        event is "add", "update" (merged into or relabelled) or "delete"
+        with the location concerned, or "reload" with None when the whole
+        list was replaced (load, clear).
+        A background load notifies from the worker thread; in general
+        it's whichever thread made the change, holding the repository's
+        lock, so a listener mustn't wait on another thread that uses it.
+        """
+        self._listeners = self._listeners + (callback,)
+
+    def remove_listener(self, callback):
+        self._listeners = tuple(cb for cb in self._listeners if cb != callback)
+
+    def _notify(self, event, location=None):
+        for callback in self._listeners:
+            callback(event, location)
+
+    @contextmanager
+    def _changing(self):
+        """Around every change to which records are hot, their order or the
+        archive's segments. Needs _lock; nests.
+
+        The version is odd for as long as the change is underway. Keep
+        saving and notifying outside: readers that turn up meanwhile wait
+        it out, unless they already have the snapshot from just before.
+        """
+        if not self._changing_depth:
+            self._version += 1
+        self._changing_depth += 1
+        try:
+            yield
+        finally:
+            self._changing_depth -= 1
+            if not self._changing_depth:
+                self._version += 1
+
+    def _view(self):
+        """(hot locations oldest first, archive segments), for readers.
+
+        A seqlock: copied by whichever reader gets there first after a
+        change, and only kept if the version didn't move while copying,
+        so no reader ever sees a change half done — a merged record
+        missing or an archived one in both tiers. Writers hold _lock and
+        use _by_id and the archive directly instead.
+        """
+        while True:
+            version = self._version
+            copied, view = self._snapshot
+            if copied == version or (version & 1 and copied == version - 1):
+                # the latter: a change is underway, this is what it started from
+                return view
+            if not version & 1:
+                segments = self._archive.segments if self._archive is not None else ()
+                # tuple() copies the dict view in one go in C
+                view = (tuple(self._by_id.values()), segments)
+                if self._version == version:
+                    self._snapshot = (version, view)
+                    return view
+            else:
+                time.sleep(0.001)
 
     def _load(self):
-        if os.path.exists(self._path):
+        with self._lock, self._file_lock():
+            self._read()
+            self.archive_old()
+            self._notify("reload")
+
+    def _read(self):
+        """Read everything: archive, storage file and journal. Needs both locks."""
+        with self._changing():
+            self._grid = None
+            self._labels = None
+            self._read_archive()
+            self._manifest_key = _stat_key(self._manifest_path)
+            self._snapshot_key = _stat_key(self._path)
+            self._journal_ino = None
+            self._journal_offset = 0
+            self._journal_entries = 0
+            self._seq = 0
+            self._tombstones = {}
+            self._horizon = 0
+            self._feed = None
+            self._calculator_version = 0
+            if self._snapshot_key is None:
+                self._by_id = {}
+                self._replay_journal()
+                self._seq_past_archive()
+                return
             try:
                 with open(self._path, "r") as f:
                     data = json.load(f)
-                self._locations = [SavedLocation.from_dict(d) for d in data]
-                Logger.info(f"LocationRepo: loaded {len(self._locations)} locations")
-            except (json.JSONDecodeError, KeyError) as e:
+                if isinstance(data, dict):
+                    self._seq = data.get("seq", 0)
+                    self._horizon = data.get("horizon", 0)
+                    self._calculator_version = data.get("calculator", 0)
+                    self._tombstones = {location_id: (seq, at)
+                                        for location_id, seq, at in data.get("deleted", ())}
+                    data = data["locations"]
+                # the file is newest first
+                locations = [SavedLocation.from_dict(d) for d in reversed(data)]
+                self._by_id = {loc.id: loc for loc in locations}
+                Logger.info(f"LocationRepo: loaded {len(self._by_id)} locations")
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
                 Logger.warning(f"LocationRepo: corrupted data, starting fresh - {e}")
-                self._locations = []
+                self._by_id = {}
+                self._tombstones = {}
+                return
+            self._replay_journal()
+            self._seq_past_archive()
+            # files from before ids just got fresh ones, keep them stable
+            if any("id" not in d for d in data):
+                Logger.info("LocationRepo: assigned ids to saved locations")
+                self._seq += 1
+                self._compact()
+            self._drop_archived()
+
+    def _seq_past_archive(self):
+        # a segment rewrite numbers its records before the change is in
+        # the journal; if that never got there, don't hand the same seq out again
+        if self._archive is not None and self._archive.segments:
+            self._seq = max(self._seq, max(info.seq for info in self._archive.segments))
+
+    @contextmanager
+    def _file_lock(self):
+        """Hold the store's lock file. Needs _lock; nests."""
+        if self._file_locked:
+            yield
+            return
+        with FileLock(self._path + LOCK_SUFFIX):
+            self._file_locked = True
+            try:
+                yield
+            finally:
+                self._file_locked = False
+
+    @contextmanager
+    def _writing(self):
+        """Both locks, caught up with the other processes — for any change."""
+        with self._lock, self._file_lock():
+            self._sync()
+            yield
+
+    def _unchanged_on_disk(self):
+        if (_stat_key(self._path) != self._snapshot_key
+                or _stat_key(self._manifest_path) != self._manifest_key):
+            return False
+        journal = _stat_key(self._journal_path)
+        if journal is None:
+            return self._journal_ino is None
+        return (journal[0], journal[2]) == (self._journal_ino, self._journal_offset)
+
+    def _sync(self):
+        """Catch up with changes other processes wrote. Needs both locks.
+
+        Returns:
+            True if there were any
+        """
+        if self._unchanged_on_disk():
+            return False
+        if _stat_key(self._manifest_path) != self._manifest_key:
+            self._reload()
+            return True
+        snapshot = _stat_key(self._path)
+        if snapshot != self._snapshot_key:
+            # a compaction: if the journal it started follows on from what
+            # we have, the new storage file holds nothing we haven't got.
+            # Not at 0, that's also any file from before seq numbers
+            if not self._seq or self._journal_base() != self._seq:
+                self._reload()
+                return True
+            self._snapshot_key = snapshot
+        self._replay_journal(notify=True)
+        return True
+
+    def _reload(self):
+        Logger.info("LocationRepo: store changed on disk, reloading")
+        self._read()
+        self._notify("reload")
+
+    def refresh(self):
+        """Pick up changes another process made to the store.
+
+        Cheap when there aren't any: a few stat() calls, no locks.
+
+        Returns:
+            True if anything changed
+        """
+        self._wait_loaded()
+        if self._unchanged_on_disk():
+            return False
+        with self._lock, self._file_lock():
+            return self._sync()
+
+    def _journal_base(self):
+        """The seq the journal starts after, None if there's no usable journal."""
+        try:
+            with open(self._journal_path, "rb") as f:
+                header = json.loads(f.readline())
+            return header["base"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _replay_journal(self, notify=False):
+        """Apply journal entries we haven't seen yet.
+
+        A journal that was replaced (compacted) since we last looked is
+        read from the start; entries at or below our seq are skipped
+        either way, so a compaction that died between writing the
+        storage file and emptying the journal does no harm. A last line
+        without its newline was cut off by a crash, the next write cuts
+        it off the file.
+        """
+        try:
+            with open(self._journal_path, "rb") as f:
+                ino = os.fstat(f.fileno()).st_ino
+                if ino != self._journal_ino:
+                    self._journal_ino = ino
+                    self._journal_offset = 0
+                    self._journal_entries = 0
+                f.seek(self._journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            self._journal_ino = None
+            self._journal_offset = 0
+            self._journal_entries = 0
+            return
+        except OSError as e:
+            Logger.error(f"LocationRepo: can't read journal - {e}")
+            return
+        end = data.rfind(b"\n") + 1
+        events = []
+        with self._changing():
+            for line in data[:end].splitlines():
+                try:
+                    entry = json.loads(line)
+                    if "base" in entry:
+                        continue
+                    self._journal_entries += 1
+                    if entry["seq"] <= self._seq:
+                        continue
+                    event = self._apply(entry)
+                except (ValueError, KeyError, TypeError) as e:
+                    Logger.warning(f"LocationRepo: skipping bad journal entry - {e}")
+                    continue
+                self._seq = entry["seq"]
+                if event is not None:
+                    events.append(event)
+        self._journal_offset += end
+        if notify:
+            for event, location in events:
+                self._notify(event, location)
+
+    def _apply(self, entry):
+        """Replay one journal entry on the hot records.
+
+        Returns:
+            (event, location) for listeners, or None if it changed
+            nothing we hold (an archived record — the archive itself has
+            already been rewritten)
+        """
+        op = entry["op"]
+        seq = entry["seq"]
+        if op in ("add", "merge"):
+            location = SavedLocation.from_dict(entry["location"])
+            existing = self._by_id.pop(location.id, None)
+            if op == "merge" and existing is not None:
+                # same object, so whoever holds it sees the merge
+                existing.__dict__.update(vars(location))
+                location = existing
+            self._by_id[location.id] = location
+            self._note_change(location.id, seq, location)
+            if self._grid is not None:
+                self._grid.insert(location.id, location.dest_lat, location.dest_lon,
+                                  location.accuracy)
+            if self._labels is not None:
+                self._labels.add(location.id, location.label)
+            return ("update" if op == "merge" else "add"), location
+        if op == "label":
+            location = self._by_id.get(entry["id"])
+            if location is None:
+                return None
+            location.label = entry["label"]
+            self._note_change(location.id, seq, location)
+            if self._labels is not None:
+                self._labels.update(location.id, location.label)
+            return "update", location
+        if op == "delete":
+            location = self._by_id.pop(entry["id"], None)
+            # archived ones too, the tombstone is all that's left of them
+            self._note_change(entry["id"], seq, at=entry.get("at"))
+            if location is None:
+                return None
+            if self._grid is not None:
+                self._grid.remove(location.id)
+            if self._labels is not None:
+                self._labels.remove(location.id)
+            return "delete", location
+        raise ValueError(f"unknown journal op {op!r}")
+
+    def _note_change(self, location_id, seq, location=None, at=None):
+        """Keep the change feed in step: location_id changed at seq.
+
+        Without a location it was deleted, at `at` (an ISO timestamp,
+        defaults to now). Call it once the location is in _by_id, or
+        after it was taken out.
+        """
+        if location is not None:
+            location.seq = seq
+            self._tombstones.pop(location_id, None)
         else:
-            self._locations = []
+            self._tombstones[location_id] = (seq, at or datetime.now().isoformat())
+        feed = self._feed
+        if feed is not None:
+            feed.pop(location_id, None)
+            # archived records are found through their segment's seq
+            if location is None or location_id in self._by_id:
+                feed[location_id] = seq
+
+    def _feed_index(self):
+        """Hot and deleted ids -> seq of their last change, in seq order."""
+        if self._feed is None:
+            changes = [(loc.id, loc.seq) for loc in self._by_id.values()]
+            changes += [(location_id, seq)
+                        for location_id, (seq, _) in self._tombstones.items()]
+            # mostly in order already (adds go to the top), which the sort
+            # is quick about as long as it only compares the numbers
+            changes.sort(key=itemgetter(1))
+            self._feed = dict(changes)
+        return self._feed
 
-    def _save(self):
+    def _read_archive(self):
+        self._archive = None
+        self._archive_ids = None
+        self._segments = LRUCache(SEGMENT_CACHE)  # file -> (locations, by id)
+        directory = os.path.join(os.path.dirname(self._path), ARCHIVE_DIR)
+        try:
+            self._archive = LocationArchive(directory)
+        except (OSError, ValueError) as e:
+            # without it nothing gets archived either, so nothing is lost
+            Logger.error(f"LocationRepo: archive unreadable, not using it - {e}")
+            return
+        if self._archive.segments:
+            Logger.info(f"LocationRepo: {len(self._archive)} archived locations "
+                        f"in {len(self._archive.segments)} segments")
+
+    def _drop_archived(self):
+        """Drop hot records that a roll interrupted before saving already archived."""
+        archive = self._archive
+        if archive is None or not self._by_id:
+            return
+        # only segments from the roll that was cut short can overlap, and
+        # those reach past the oldest hot record
+        oldest = next(iter(self._by_id.values())).timestamp
+        dupes = []
+        for info in reversed(archive.segments):
+            if info.last < oldest:
+                break
+            archived = self._segment(info)[1]
+            dupes += [i for i in self._by_id if i in archived]
+        if dupes:
+            with self._changing():
+                for location_id in dupes:
+                    del self._by_id[location_id]
+            if self._feed is not None:
+                for location_id in dupes:
+                    self._feed.pop(location_id, None)
+            Logger.warning(f"LocationRepo: {len(dupes)} locations were already archived")
+            self._compact()
+
+    def _segment(self, info):
+        """(locations oldest first, {id: location}) of an archive segment."""
+        segments = self._segments
+        with self._cache_lock:
+            cached = segments.get(info.file)
+        if cached is None:
+            # decoding happens outside the lock; two readers after the same
+            # segment may both decode it, which is harmless
+            try:
+                records = self._archive.read(info)
+            except (OSError, ValueError) as e:
+                Logger.error(f"LocationRepo: can't read archive {info.file} - {e}")
+                records = []
+            locations = [SavedLocation.from_dict(d) for d in records]
+            cached = (locations, {loc.id: loc for loc in locations})
+            with self._cache_lock:
+                segments.put(info.file, cached)
+        return cached
+
+    def _archived(self, segments=None, newest_first=True, since=None, until=None, skip=0):
+        """Archived locations, read a segment at a time as the caller gets to them.
+
+        segments defaults to the archive's current ones; readers pass the
+        ones from their snapshot. skip leaves out that many from the
+        start, without reading the segments that are skipped whole.
+        """
+        if segments is None:
+            segments = self._archive.segments if self._archive is not None else ()
+        for info in (reversed(segments) if newest_first else segments):
+            if since is not None and info.last < since:
+                continue
+            if until is not None and info.first > until:
+                continue
+            if skip >= info.count:
+                skip -= info.count
+                continue
+            locations = self._segment(info)[0]
+            if newest_first:
+                locations = locations[::-1]
+            yield from islice(locations, skip, None)
+            skip = 0
+
+    def _archive_lookup(self):
+        ids = self._archive_ids
+        if ids is None:
+            # built under the lock so no archiving or rewrite slips past it
+            with self._lock:
+                if self._archive_ids is None:
+                    ids = {}
+                    for info in self._archive.segments if self._archive else ():
+                        for loc in self._segment(info)[0]:
+                            ids[loc.id] = info
+                    self._archive_ids = ids
+                ids = self._archive_ids
+        return ids
+
+    def _get_archived(self, location_id):
+        """(SegmentInfo, location) of an archived id, or (None, None)."""
+        if self._archive is None:
+            return None, None
+        info = self._archive_lookup().get(location_id)
+        if info is None:
+            return None, None
+        return info, self._segment(info)[1].get(location_id)
+
+    def _rewrite_segment(self, info, locations):
+        """Replace an archive segment with these locations (oldest first)."""
+        old_ids = list(self._segment(info)[1])
+        records = [loc.to_dict() for loc in locations]
+        with self._changing():
+            new = self._archive.replace(info, records)
+        self._manifest_key = _stat_key(self._manifest_path)
+        with self._cache_lock:
+            self._segments.pop(info.file)
+        ids = self._archive_ids
+        if ids is not None:
+            for location_id in old_ids:
+                del ids[location_id]
+            if new is not None:
+                for loc in locations:
+                    ids[loc.id] = new
+        if new is not None:
+            with self._cache_lock:
+                self._segments.put(new.file,
+                                   (locations, {loc.id: loc for loc in locations}))
+
+    def archive_old(self, now=None):
+        """Roll the oldest hot records, if older than hot_days, into new segments.
+
+        Nothing happens unless at least ARCHIVE_MIN have aged out. The
+        hot file is written once at the end; if that never happens,
+        _drop_archived() sorts it out on the next load.
+
+        Returns:
+            how many were archived
+        """
+        self._wait_loaded()
+        with self._writing():
+            if not self.hot_days or self._archive is None:
+                return 0
+            cutoff = ((now or datetime.now()) - timedelta(days=self.hot_days)).isoformat()
+            # ISO timestamps compare correctly as strings
+            cold = list(takewhile(lambda loc: loc.timestamp < cutoff,
+                                  self._by_id.values()))
+            if len(cold) < ARCHIVE_MIN:
+                return 0
+
+            archived = 0
+            for start in range(0, len(cold), SEGMENT_RECORDS):
+                chunk = cold[start:start + SEGMENT_RECORDS]
+                records = [loc.to_dict() for loc in chunk]
+                # one change per chunk: readers see it hot or archived,
+                # never both
+                with self._changing():
+                    try:
+                        info = self._archive.append(records)
+                    except OSError as e:
+                        Logger.error(f"LocationRepo: archiving failed - {e}")
+                        break
+                    # in the archive before they leave _by_id, so a lookup
+                    # by id finds them in one or the other
+                    if self._archive_ids is not None:
+                        for loc in chunk:
+                            self._archive_ids[loc.id] = info
+                    for loc in chunk:
+                        del self._by_id[loc.id]
+                for loc in chunk:
+                    if self._grid is not None:
+                        self._grid.remove(loc.id)
+                    if self._feed is not None:
+                        self._feed.pop(loc.id, None)
+                archived += len(chunk)
+            if archived:
+                # our own change, not one to reload for
+                self._manifest_key = _stat_key(self._manifest_path)
+                self._compact()
+                Logger.info(f"LocationRepo: archived {archived} locations")
+            return archived
+
+    @profiled("repo.save")
+    def _append(self, op, **fields):
+        """Number a change already made in memory and add it to the journal.
+
+        A journal that's long enough is compacted first, so the new
+        storage file already has this change in it but is numbered from
+        just before. That's harmless — every entry sets things rather than
+        adding to them, applying one twice is the same as once — and the
+        new journal follows straight on from the old one for anybody who
+        was caught up with it. Needs both locks.
+        """
+        journal = _stat_key(self._journal_path)
+        if ((journal is not None and journal[0] != self._journal_ino)
+                or self._journal_entries >= max(COMPACT_MIN, len(self._by_id) // 2)):
+            # too long, or one we couldn't read
+            self._compact()
+            journal = _stat_key(self._journal_path)
+            if journal is not None and journal[0] != self._journal_ino:
+                return  # the compaction failed and said so
+        self._seq += 1
+        entry = {"seq": self._seq, "op": op}
+        entry.update(fields)
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+        try:
+            if journal is None:
+                os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+                header = self._journal_header(self._seq - 1)
+                with open(self._journal_path, "wb") as f:
+                    f.write(header + line)
+                    self._journal_ino = os.fstat(f.fileno()).st_ino
+                self._journal_offset = len(header)
+            else:
+                with open(self._journal_path, "r+b") as f:
+                    # drops a line a crashed writer left half written
+                    f.truncate(self._journal_offset)
+                    f.seek(self._journal_offset)
+                    f.write(line)
+        except OSError as e:
+            Logger.error(f"LocationRepo: save failed - {e}")
+            return
+        self._journal_offset += len(line)
+        self._journal_entries += 1
+
+    @staticmethod
+    def _journal_header(base):
+        return (json.dumps({"base": base}) + "\n").encode("utf-8")
+
+    def _forget_tombstones(self):
+        """Drop deletions older than TOMBSTONE_DAYS, moving the horizon past them."""
+        if not self._tombstones:
+            return
+        cutoff = (datetime.now() - timedelta(days=TOMBSTONE_DAYS)).isoformat()
+        old = [(seq, location_id) for location_id, (seq, at) in self._tombstones.items()
+               if at < cutoff]
+        for seq, location_id in old:
+            del self._tombstones[location_id]
+            if self._feed is not None:
+                self._feed.pop(location_id, None)
+            self._horizon = max(self._horizon, seq)
+
+    @profiled("repo.compact")
+    def _compact(self):
+        """Write the hot records out as the storage file, start an empty journal.
+
+        Both are replaced atomically, storage file first. Needs both locks.
+        """
+        self._forget_tombstones()
+        doc = {
+            "version": STORE_VERSION,
+            "seq": self._seq,
+            "horizon": self._horizon,
+            "calculator": self._calculator_version,
+            "deleted": [[location_id, seq, at]
+                        for location_id, (seq, at) in self._tombstones.items()],
+            "locations": [loc.to_dict() for loc in reversed(self._by_id.values())],
+        }
+        header = self._journal_header(self._seq)
         try:
             os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
-            with open(self._path, "w") as f:
-                json.dump([loc.to_dict() for loc in self._locations], f, indent=2)
-        except IOError as e:
+            tmp = self._path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(doc, f, indent=2)
+            os.replace(tmp, self._path)
+            self._snapshot_key = _stat_key(self._path)
+            tmp = self._journal_path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(header)
+            os.replace(tmp, self._journal_path)
+        except OSError as e:
             Logger.error(f"LocationRepo: save failed - {e}")
+            return
+        self._journal_ino = _stat_key(self._journal_path)[0]
+        self._journal_offset = len(header)
+        self._journal_entries = 0
+
+    def add(self, location, merge=None):
+        """Save a location, newest first.
+
+        Args:
+            location: the SavedLocation to add
+            merge: fold it into an overlapping saved location instead,
+                defaults to the repository's merge_duplicates
+
+        Returns:
+            the stored SavedLocation — `location` itself, or the existing
+            one it was merged into
+        """
+        self._wait_loaded()
+        if merge is None:
+            merge = self.merge_duplicates
+        with self._writing():
+            target = self._find_duplicate(location) if merge else None
 
-    def add(self, location):
-        self._locations.insert(0, location)  # newest first
-        self._save()
+            if target is None:
+                # re-adding a saved id moves it to the top like a new one
+                with self._changing():
+                    self._by_id.pop(location.id, None)
+                    self._by_id[location.id] = location
+                self._note_change(location.id, self._seq + 1, location)
+                if self._grid is not None:
+                    self._grid.insert(location.id, location.dest_lat, location.dest_lon,
+                                      location.accuracy)
+                if self._labels is not None:
+                    self._labels.add(location.id, location.label)
+                self._append("add", location=location.to_dict())
+                self._notify("add", location)
+                return location
+
+            target.absorb(location)
+            # it was just seen again, so it moves up to the top
+            with self._changing():
+                del self._by_id[target.id]
+                self._by_id[target.id] = target
+            self._note_change(target.id, self._seq + 1, target)
+            self._grid.insert(target.id, target.dest_lat, target.dest_lon, target.accuracy)
+            if self._labels is not None:
+                self._labels.add(target.id, target.label)
+            self._append("merge", location=target.to_dict())
+            self._notify("update", target)
+            return target
+
+    def _find_duplicate(self, location):
+        """Hot saved location whose accuracy circle overlaps this one's, or None."""
+        if self._grid is None:
+            self._grid = SpatialGrid()
+            for loc in self._by_id.values():
+                self._grid.insert(loc.id, loc.dest_lat, loc.dest_lon, loc.accuracy)
+        matches = self._grid.overlapping(location.dest_lat, location.dest_lon,
+                                         location.accuracy)
+        return self._by_id[matches[0][1]] if matches else None
+
+    def _label_index(self):
+        if self._labels is None:
+            # oldest first, so the index ranks them in the same order
+            items = []
+            archive_ids = {}
+            for info in self._archive.segments if self._archive else ():
+                for loc in self._segment(info)[0]:
+                    items.append((loc.id, loc.label))
+                    archive_ids[loc.id] = info
+            if self._archive_ids is None:
+                self._archive_ids = archive_ids
+            items += [(loc.id, loc.label) for loc in self._by_id.values()]
+            labels = LabelIndex()
+            labels.load(items)
+            self._labels = labels
+        return self._labels
+
+    def search(self, text, limit=None):
+        """Saved locations whose label has every word of text as a word prefix.
+
+        "zur tow" finds "Near Zürich — water tower". Newest first.
+        """
+        self._wait_loaded()
+        # the index changes in place, so it's only read under the lock
+        with self._lock:
+            ids = self._label_index().search(text, limit)
+        found = []
+        for location_id in ids:
+            location = self._by_id.get(location_id) or self._get_archived(location_id)[1]
+            if location is not None:
+                found.append(location)
+        return found
+
+    def get(self, location_id):
+        """The saved location with this id, or None."""
+        self._wait_loaded()
+        location = self._by_id.get(location_id)
+        if location is None:
+            location = self._get_archived(location_id)[1]
+        return location
 
     def get_all(self):
-        return list(self._locations)
+        """All saved locations, newest first."""
+        self._wait_loaded()
+        hot, segments = self._view()
+        return list(chain(reversed(hot), self._archived(segments)))
+
+    def query(self, offset=0, limit=None, sort="newest", since=None, until=None,
+              max_accuracy=None, label=None, near=None, within=None, search=None):
+        """One page of saved locations, filtered and sorted.
+
+        Safe to call from a worker thread. "newest"/"oldest" stop scanning
+        once the page is full, so the first page of a big store is cheap
+        and archive segments are only read when a page reaches them;
+        "accuracy"/"distance" keep only the best offset + limit in a heap
+        rather than sorting everything.
+
+        Args:
+            offset: matches to skip
+            limit: page size, None for everything after offset
+            sort: one of SORT_ORDERS — "accuracy" is best first,
+                "distance" closest to `near` first
+            since: earliest timestamp to include (datetime or ISO string)
+            until: latest timestamp to include (datetime or ISO string)
+            max_accuracy: only locations at least this accurate, in meters
+            label: case-insensitive substring of the label
+            search: words to look up in the label index, see search()
+            near: (lat, lon) that "distance" and `within` measure from
+            within: only locations this many meters from `near`
+
+        Returns:
+            Page(items, offset, has_more)
+        """
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"unknown sort order {sort!r}")
+        if near is None and (sort == "distance" or within is not None):
+            raise ValueError("sorting or filtering by distance needs `near`")
+        self._wait_loaded()
+
+        if isinstance(since, datetime):
+            since = since.isoformat()
+        if isinstance(until, datetime):
+            until = until.isoformat()
+        needle = label.casefold() if label else None
+        filtering = (since, until, max_accuracy, needle, within) != (None,) * 5
+
+        plain = not filtering and sort in ("newest", "oldest")
+        newest_first = sort != "oldest"
+        skip = 0
+        if search:
+            # the index hands back just the matches, newest first
+            ordered = self.search(search)
+            if not newest_first:
+                ordered.reverse()
+        else:
+            values, segments = self._view()
+            hot = reversed(values) if newest_first else values
+            # a deep page can skip whole archive segments by their counts
+            # instead of reading through them
+            if plain and newest_first:
+                skip = max(0, offset - len(values))
+            elif plain:
+                skip = min(offset, sum(info.count for info in segments))
+            archived = self._archived(segments, newest_first, since, until, skip)
+            ordered = chain(hot, archived) if newest_first else chain(archived, hot)
+
+        # the plain newest/oldest page only walks offset + limit records
+        if plain:
+            start = offset - skip
+            stop = None if limit is None else start + limit + 1
+            window = list(islice(ordered, start, stop))
+            if limit is not None and len(window) > limit:
+                return Page(window[:limit], offset, True)
+            return Page(window, offset, False)
+
+        distance = closeness = None
+        if near is not None:
+            lat0, lon0 = near
+
+            def distance(loc):
+                return great_circle_distance(lat0, lon0, loc.dest_lat, loc.dest_lon)
+
+            # the haversine term before the asin/sqrt — same order as the
+            # distance and a good deal cheaper when ranking everything
+            sin, cos, rad = math.sin, math.cos, math.radians
+            p0 = rad(lat0)
+            cos_p0 = cos(p0)
+
+            def closeness(loc):
+                p = rad(loc.dest_lat)
+                return (sin((p - p0) / 2) ** 2
+                        + cos_p0 * cos(p) * sin(rad(loc.dest_lon - lon0) / 2) ** 2)
+
+        def matches(loc):
+            # ISO timestamps compare correctly as strings
+            if since is not None and loc.timestamp < since:
+                return False
+            if until is not None and loc.timestamp > until:
+                return False
+            if max_accuracy is not None and loc.accuracy > max_accuracy:
+                return False
+            if needle is not None and needle not in loc.label.casefold():
+                return False
+            if within is not None and distance(loc) > within:
+                return False
+            return True
+
+        found = filter(matches, ordered) if filtering else iter(ordered)
+
+        # one extra to find out if there's another page
+        wanted = None if limit is None else offset + limit + 1
+        if sort == "accuracy":
+            key = attrgetter("accuracy")
+        elif sort == "distance":
+            key = closeness
+        else:
+            key = None
+
+        if key is None:
+            window = list(islice(found, offset, wanted))
+        elif wanted is None:
+            window = sorted(found, key=key)[offset:]
+        else:
+            window = heapq.nsmallest(wanted, found, key=key)[offset:]
+
+        if limit is not None and len(window) > limit:
+            return Page(window[:limit], offset, True)
+        return Page(window, offset, False)
+
+    def delete_by_id(self, location_id):
+        """Delete a saved location. Returns False if there's no such id."""
+        self._wait_loaded()
+        with self._writing():
+            with self._changing():
+                location = self._by_id.pop(location_id, None)
+            if location is not None:
+                if self._grid is not None:
+                    self._grid.remove(location_id)
+            else:
+                info, location = self._get_archived(location_id)
+                if location is None:
+                    return False
+                self._rewrite_segment(info, [loc for loc in self._segment(info)[0]
+                                             if loc.id != location_id])
+            at = datetime.now().isoformat()
+            self._note_change(location_id, self._seq + 1, at=at)
+            self._append("delete", id=location_id, at=at)
+            if self._labels is not None:
+                self._labels.remove(location_id)
+            self._notify("delete", location)
+            return True
+
+    def remove(self, location):
+        """Delete a particular saved location. Returns False if it isn't saved."""
+        self._wait_loaded()
+        with self._writing():
+            if location.id in self._by_id:
+                if self._by_id[location.id] is not location:
+                    return False
+            elif self._get_archived(location.id)[1] is None:
+                # archived records are re-read from disk, so only the id counts
+                return False
+            return self.delete_by_id(location.id)
 
     def delete(self, index):
-        if 0 <= index < len(self._locations):
-            self._locations.pop(index)
-            self._save()
+        """Delete by position in get_all() order.
+
+        Kept for older callers — positions shift under a reload, so
+        prefer delete_by_id().
+        """
+        self._wait_loaded()
+        if index < 0:
+            return
+        with self._writing():
+            archived_ids = (loc.id for loc in self._archived())
+            location_id = next(islice(chain(reversed(self._by_id), archived_ids), index,
+                                      None), None)
+            if location_id is not None:
+                self.delete_by_id(location_id)
+
+    def update_label(self, location_id, label):
+        """Relabel a saved location. Returns False if there's no such id."""
+        self._wait_loaded()
+        with self._writing():
+            location = self._by_id.get(location_id)
+            if location is not None:
+                location.label = label
+                self._note_change(location_id, self._seq + 1, location)
+            else:
+                info, location = self._get_archived(location_id)
+                if location is None:
+                    return False
+                location.label = label
+                # numbered before it's written, so the segment's seq covers it
+                self._note_change(location_id, self._seq + 1, location)
+                self._rewrite_segment(info, self._segment(info)[0])
+            self._append("label", id=location_id, label=label)
+            if self._labels is not None:
+                self._labels.update(location_id, label)
+            self._notify("update", location)
+            return True
+
+    def reproject(self, calculator):
+        """Redo saved locations that an older calculator VERSION worked out.
+
+        Records that kept their sightings get their position and accuracy
+        worked out again from them, all in one project_batch(); older ones
+        stay as they are. The store remembers the version it was last
+        redone for, so once it's caught up this is just a comparison.
+        Changed records all get the same new seq, listeners get a
+        "reload".
+
+        Returns:
+            how many were changed
+        """
+        self._wait_loaded()
+        version = calculator.VERSION
+        with self._writing():
+            if self._calculator_version == version:
+                return 0
+
+            def stale(locations):
+                return [loc for loc in locations
+                        if loc.sightings and loc.calculator_version != version]
+
+            seq = self._seq + 1
+            hot = stale(self._by_id.values())
+            self._reproject(hot, calculator, seq)
+            changed = len(hot)
+            if self._archive is not None:
+                for info in self._archive.segments:
+                    locations = self._segment(info)[0]
+                    cold = stale(locations)
+                    if cold:
+                        self._reproject(cold, calculator, seq)
+                        self._rewrite_segment(info, locations)
+                        changed += len(cold)
+
+            if changed:
+                self._seq = seq
+                self._grid = None
+            self._calculator_version = version
+            self._compact()
+            if changed:
+                Logger.info(f"LocationRepo: reprojected {changed} locations "
+                            f"for calculator version {version}")
+                self._notify("reload")
+            return changed
+
+    def _reproject(self, locations, calculator, seq):
+        # every sighting in one batch, then fused back per record
+        results = iter(calculator.project_batch(
+            [obs for loc in locations for obs in loc.sightings]))
+        for loc in locations:
+            dest_lat, dest_lon, accuracy = calculator.fuse(
+                list(islice(results, len(loc.sightings))))
+            loc.__dict__.update(dest_lat=dest_lat, dest_lon=dest_lon, accuracy=accuracy,
+                                calculator_version=calculator.VERSION, _derived=None)
+            self._note_change(loc.id, seq, loc)
 
     def clear(self):
-        self._locations.clear()
-        self._save()
+        self._wait_loaded()
+        with self._writing():
+            with self._changing():
+                self._by_id.clear()
+                if self._archive is not None:
+                    self._archive.clear()
+            self._grid = None
+            self._labels = None
+            if self._archive is not None:
+                self._archive_ids = None
+                with self._cache_lock:
+                    self._segments.clear()
+                self._manifest_key = _stat_key(self._manifest_path)
+            self._seq += 1
+            # no tombstones for all of it: a feed from before has to start over
+            self._tombstones = {}
+            self._horizon = self._seq
+            self._feed = None
+            self._compact()
+            self._notify("reload")
 
     @property
     def count(self):
-        return len(self._locations)
+        self._wait_loaded()
+        # the same seqlock as _view(), without copying anything
+        while True:
+            version = self._version
+            if not version & 1:
+                count = len(self._by_id)
+                if self._archive is not None:
+                    count += len(self._archive)
+                if self._version == version:
+                    return count
+            time.sleep(0.001)
+
+    @property
+    def seq(self):
+        """Number of the latest change — where changes_since() carries on from now."""
+        self._wait_loaded()
+        return self._seq
+
+    def changes_since(self, seq):
+        """What changed after seq, oldest change first.
+
+        For exporters and sync tools: hand back the seq of the last
+        change dealt with and get everything since. A record changed
+        several times since then shows up once, at its latest change.
+        The cost is in the number of changes, not the size of the store —
+        recent ones come from an index kept in change order, archived
+        records only from segments holding something newer than seq.
+
+        Args:
+            seq: 0 for everything since changes were first numbered;
+                records last changed before then are only in get_all()
+
+        Returns:
+            iterator of Change(seq, id, location), location None if deleted
+
+        Raises:
+            ValueError: deletions after seq have been forgotten (they're
+                kept for TOMBSTONE_DAYS; clear() drops them all) — start
+                over from get_all() and the current `seq`
+        """
+        self._wait_loaded()
+        with self._lock:
+            if seq < self._horizon:
+                raise ValueError(f"changes before seq {self._horizon} are no longer "
+                                 f"kept, start over from get_all()")
+            recent = []
+            for location_id, change in reversed(self._feed_index().items()):
+                if change <= seq:
+                    break
+                recent.append(Change(change, location_id, self._by_id.get(location_id)))
+            recent.reverse()
+            segments = [info for info in self._archive.segments
+                        if info.seq > seq] if self._archive is not None else []
+        return heapq.merge(recent, self._archived_changes(segments, seq),
+                           key=attrgetter("seq"))
+
+    def _archived_changes(self, segments, seq):
+        # only read once the merge gets to them
+        changes = []
+        for info in segments:
+            changes += [Change(loc.seq, loc.id, loc) for loc in self._segment(info)[0]
+                        if loc.seq > seq]
+        changes.sort(key=attrgetter("seq"))
+        yield from changes
@@ -0,0 +1,122 @@
+"""Offline map tiles from an MBTiles file.
+
+MBTiles is a plain SQLite database (https://github.com/mapbox/mbtiles-spec):
+a `tiles` table of (zoom_level, tile_column, tile_row, tile_data) with
+rows counted from the bottom (TMS), plus a `metadata` key/value table.
+Users sideload one for their area into the app's data directory, or a
+tool pre-seeds it with MBTiles.create() / put_tile().
+
+Lookups here use XYZ rows like everything else (utils/tile_math.py),
+the flip to TMS happens inside. Tiles are returned as the raw encoded
+image bytes; decoding and the texture LRU live in the map widget.
+
+No kivy imports here.
+"""
+import os
+import sqlite3
+
+from utils.tile_math import tms_row
+from utils.lazy_import import get_logger
+
+# kivy's logger when the app is running, stdlib logging for headless use —
+# never imports kivy itself, see utils/lazy_import.py
+Logger = get_logger(__name__)
+
+
+TILE_CACHE_FILE = "tiles.mbtiles"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT, value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (
+    zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB
+);
+CREATE UNIQUE INDEX IF NOT EXISTS tile_index
+    ON tiles (zoom_level, tile_column, tile_row);
+"""
+
+
+class MBTiles:
+    """Read (and optionally write) tiles in an MBTiles file."""
+
+    def __init__(self, path, writable=False):
+        self.path = path
+        if writable:
+            self._db = sqlite3.connect(path)
+        else:
+            # read-only, so a half-copied file can't get "repaired" by us
+            self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        self._metadata = None
+        self._zoom_range = None
+
+    @classmethod
+    def create(cls, path, name="pinpoint", image_format="png"):
+        """Create an empty MBTiles file (or open an existing one) for writing."""
+        tiles = cls(path, writable=True)
+        tiles._db.executescript(_SCHEMA)
+        if not tiles.metadata():
+            tiles._db.executemany(
+                "INSERT INTO metadata (name, value) VALUES (?, ?)",
+                [("name", name), ("format", image_format), ("type", "baselayer")],
+            )
+            tiles._db.commit()
+            tiles._metadata = None
+        return tiles
+
+    @classmethod
+    def open(cls, path):
+        """Open read-only, or return None if there's no usable file."""
+        if not os.path.exists(path):
+            return None
+        try:
+            tiles = cls(path)
+            tiles.metadata()
+            return tiles
+        except sqlite3.Error as e:
+            Logger.warning(f"MBTiles: can't open {path} - {e}")
+            return None
+
+    def metadata(self):
+        if self._metadata is None:
+            try:
+                rows = self._db.execute("SELECT name, value FROM metadata").fetchall()
+            except sqlite3.OperationalError:
+                rows = []
+            self._metadata = dict(rows)
+        return self._metadata
+
+    @property
+    def image_format(self):
+        return self.metadata().get("format", "png")
+
+    @property
+    def zoom_range(self):
+        """(min, max) zoom level actually present, or None when empty."""
+        if self._zoom_range is None:
+            row = self._db.execute(
+                "SELECT MIN(zoom_level), MAX(zoom_level) FROM tiles"
+            ).fetchone()
+            self._zoom_range = None if row[0] is None else (row[0], row[1])
+        return self._zoom_range
+
+    def tile_data(self, zoom, x, y):
+        """Encoded image bytes for XYZ tile (x, y), or None if not cached."""
+        row = self._db.execute(
+            "SELECT tile_data FROM tiles "
+            "WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (zoom, x, tms_row(y, zoom)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_tile(self, zoom, x, y, data):
+        self._db.execute(
+            "INSERT OR REPLACE INTO tiles "
+            "(zoom_level, tile_column, tile_row, tile_data) VALUES (?, ?, ?, ?)",
+            (zoom, x, tms_row(y, zoom), sqlite3.Binary(data)),
+        )
+        self._zoom_range = None
+
+    def commit(self):
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,245 @@
+"""Grid clustering of saved points for the map.
+
+With thousands of saved destinations the map turns into a blob of
+overlapping dots. ClusterIndex buckets the points into a grid of
+CELL_PX screen pixels at every zoom level from min_zoom to max_zoom,
+so at any zoom each cell becomes one cluster with a count and centroid.
+
+Per level the cells are kept as a sorted list of occupied rows, each
+with a sorted list of occupied columns, so a viewport query bisects to
+the rows and columns it needs and never looks at a cell outside the
+view — the cost follows the number of clusters returned, not the number
+of points stored. add() and remove() touch one cell per level.
+
+Points are keyed by whatever the caller likes (a SavedLocation, an id)
+and positioned in zoom 0 web mercator pixels, see utils/tile_math.py.
+Each point also gets a serial number and cells keep the sum of their
+serials, so a cell holding one point knows exactly which one it is.
+"""
+import bisect
+from collections import namedtuple
+
+from utils.tile_math import latlon_to_pixel, pixel_to_latlon
+
+# key is only set for single-point clusters
+Cluster = namedtuple("Cluster", "lat lon count key")
+
+
+class _Level:
+    """Occupied cells of one zoom level."""
+
+    __slots__ = ("rows", "cols", "cells")
+
+    def __init__(self):
+        self.rows = []   # sorted occupied rows
+        self.cols = {}   # row -> sorted occupied columns
+        self.cells = {}  # (row, col) -> [count, sum_x, sum_y, sum_serial]
+
+    def add(self, row, col, x, y, serial):
+        cell = self.cells.get((row, col))
+        if cell is None:
+            self.cells[(row, col)] = [1, x, y, serial]
+            cols = self.cols.get(row)
+            if cols is None:
+                bisect.insort(self.rows, row)
+                self.cols[row] = [col]
+            else:
+                bisect.insort(cols, col)
+        else:
+            cell[0] += 1
+            cell[1] += x
+            cell[2] += y
+            cell[3] += serial
+
+    def build(self, cells):
+        """Replace the contents with a ready-made cell dict, sorting once."""
+        self.cells = cells
+        cols = {}
+        for row, col in cells:
+            cols.setdefault(row, []).append(col)
+        for row_cols in cols.values():
+            row_cols.sort()
+        self.cols = cols
+        self.rows = sorted(cols)
+
+    def remove(self, row, col, x, y, serial):
+        cell = self.cells[(row, col)]
+        cell[0] -= 1
+        if cell[0] > 0:
+            cell[1] -= x
+            cell[2] -= y
+            cell[3] -= serial
+            return
+        del self.cells[(row, col)]
+        cols = self.cols[row]
+        del cols[bisect.bisect_left(cols, col)]
+        if not cols:
+            del self.cols[row]
+            del self.rows[bisect.bisect_left(self.rows, row)]
+
+    def cells_in(self, row0, col0, row1, col1):
+        """Yield (row, col, cell) for occupied cells in the inclusive range."""
+        rows = self.rows
+        for i in range(bisect.bisect_left(rows, row0), bisect.bisect_right(rows, row1)):
+            row = rows[i]
+            cols = self.cols[row]
+            for j in range(bisect.bisect_left(cols, col0), bisect.bisect_right(cols, col1)):
+                col = cols[j]
+                yield row, col, self.cells[(row, col)]
+
+
+class ClusterIndex:
+
+    CELL_PX = 64  # cluster radius on screen, roughly
+
+    def __init__(self, min_zoom=0, max_zoom=16, cell_px=None):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.cell_px = cell_px or self.CELL_PX
+        self.clear()
+
+    def clear(self):
+        self._points = {}  # key -> (x0, y0, serial), position in zoom 0 pixels
+        self._keys = {}    # serial -> key
+        self._next_serial = 1
+        self._levels = [_Level() for _ in range(self.min_zoom, self.max_zoom + 1)]
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def _cell(self, x0, y0, zoom):
+        scale = 2.0 ** zoom / self.cell_px
+        return int(y0 * scale), int(x0 * scale)
+
+    def add(self, key, lat, lon):
+        if key in self._points:
+            self.remove(key)
+        x0, y0 = latlon_to_pixel(lat, lon, 0)
+        serial = self._new_serial(key)
+        self._points[key] = (x0, y0, serial)
+        for zoom, level in zip(range(self.min_zoom, self.max_zoom + 1), self._levels):
+            row, col = self._cell(x0, y0, zoom)
+            level.add(row, col, x0, y0, serial)
+
+    def _new_serial(self, key):
+        serial = self._next_serial
+        self._next_serial += 1
+        self._keys[serial] = key
+        return serial
+
+    def load(self, items):
+        """Add many (key, lat, lon) at once.
+
+        Into an empty index the levels are built in one pass and sorted
+        once, instead of an insort per point.
+        """
+        if self._points:
+            for key, lat, lon in items:
+                self.add(key, lat, lon)
+            return
+
+        points = self._points
+        for key, lat, lon in items:
+            if key in points:
+                del self._keys[points[key][2]]
+            x0, y0 = latlon_to_pixel(lat, lon, 0)
+            points[key] = (x0, y0, self._new_serial(key))
+
+        # the finest level from the points ...
+        scale = 2.0 ** self.max_zoom / self.cell_px
+        cells = {}
+        for x0, y0, serial in points.values():
+            rc = (int(y0 * scale), int(x0 * scale))
+            cell = cells.get(rc)
+            if cell is None:
+                cells[rc] = [1, x0, y0, serial]
+            else:
+                cell[0] += 1
+                cell[1] += x0
+                cell[2] += y0
+                cell[3] += serial
+        self._levels[-1].build(cells)
+
+        # ... then each coarser one from the level below, a cell's parent
+        # is just (row // 2, col // 2)
+        for level in reversed(self._levels[:-1]):
+            parents = {}
+            for (row, col), (count, sx, sy, ss) in cells.items():
+                rc = (row >> 1, col >> 1)
+                cell = parents.get(rc)
+                if cell is None:
+                    parents[rc] = [count, sx, sy, ss]
+                else:
+                    cell[0] += count
+                    cell[1] += sx
+                    cell[2] += sy
+                    cell[3] += ss
+            level.build(parents)
+            cells = parents
+
+    def remove(self, key):
+        """Returns False if the key wasn't indexed."""
+        point = self._points.pop(key, None)
+        if point is None:
+            return False
+        x0, y0, serial = point
+        del self._keys[serial]
+        for zoom, level in zip(range(self.min_zoom, self.max_zoom + 1), self._levels):
+            row, col = self._cell(x0, y0, zoom)
+            level.remove(row, col, x0, y0, serial)
+        return True
+
+    def _level_zoom(self, zoom):
+        return max(self.min_zoom, min(self.max_zoom, int(zoom)))
+
+    def query(self, south, west, north, east, zoom):
+        """Clusters inside a lat/lon box at a (possibly fractional) zoom.
+
+        A box with west > east crosses the antimeridian.
+
+        Returns:
+            list of Cluster
+        """
+        if west > east:
+            return (self.query(south, west, north, 180.0, zoom)
+                    + self.query(south, -180.0, north, east, zoom))
+        x0, y1 = latlon_to_pixel(south, west, 0)
+        x1, y0 = latlon_to_pixel(north, east, 0)
+        return self.query_pixels(x0, y0, x1, y1, zoom)
+
+    def query_pixels(self, x0, y0, x1, y1, zoom):
+        """Clusters inside a box given in zoom 0 mercator pixels."""
+        level_zoom = self._level_zoom(zoom)
+        level = self._levels[level_zoom - self.min_zoom]
+        row0, col0 = self._cell(x0, y0, level_zoom)
+        row1, col1 = self._cell(x1, y1, level_zoom)
+
+        clusters = []
+        for _, _, (count, sum_x, sum_y, sum_serial) in level.cells_in(row0, col0, row1, col1):
+            lat, lon = pixel_to_latlon(sum_x / count, sum_y / count, 0)
+            # with one point in the cell the serial sum is its serial
+            key = self._keys[sum_serial] if count == 1 else None
+            clusters.append(Cluster(lat, lon, count, key))
+        return clusters
+
+    def expansion_zoom(self, lat, lon, zoom):
+        """Lowest zoom above `zoom` at which the cluster at (lat, lon) splits up.
+
+        What the map zooms to when a cluster is tapped.
+        """
+        x0, y0 = latlon_to_pixel(lat, lon, 0)
+        level_zoom = self._level_zoom(zoom)
+        row, col = self._cell(x0, y0, level_zoom)
+        cell = self._levels[level_zoom - self.min_zoom].cells.get((row, col))
+        if cell is None:
+            return level_zoom + 1
+        count = cell[0]
+        for z in range(level_zoom + 1, self.max_zoom + 1):
+            r, c = self._cell(x0, y0, z)
+            sub = self._levels[z - self.min_zoom].cells.get((r, c))
+            if sub is None or sub[0] < count:
+                return z
+        return self.max_zoom + 1
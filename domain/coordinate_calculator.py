@@ -1,7 +1,29 @@
 import math
+
 from utils.math_utils import deg_to_rad, rad_to_deg, EARTH_RADIUS
 
 
+class ErrorEllipse(tuple):
+    """(major, minor, bearing): semi-axes in meters, and the direction of
+    the major axis in degrees clockwise from north (0-180).
+
+    A namedtuple in all but name — collections would add ~2 ms to
+    importing this module, which the import budget doesn't allow.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, major, minor, bearing):
+        return tuple.__new__(cls, (major, minor, bearing))
+
+    def __repr__(self):
+        return "ErrorEllipse(major=%r, minor=%r, bearing=%r)" % self
+
+    major = property(lambda self: self[0])
+    minor = property(lambda self: self[1])
+    bearing = property(lambda self: self[2])
+
+
 class CoordinateCalculator:
     """Handles forward geodesic projection.
 
@@ -9,8 +31,18 @@ class CoordinateCalculator:
     calculates the destination point on the Earth's surface.
     Uses the spherical Earth model which is accurate enough for
     distances under ~100km.
+
+    Saved locations keep the raw inputs of their sightings (see
+    domain/observation.py) and which VERSION worked them out, so old
+    results can be redone when this changes.
     """
 
+    # bump whenever a change here would move saved results
+    VERSION = 1
+    # compass error for when the caller has no better idea, e.g. records
+    # from before CompassService.heading_error
+    COMPASS_ERROR_DEG = 5.0
+
     def __init__(self, earth_radius=EARTH_RADIUS):
         self._R = earth_radius
 
@@ -51,15 +83,221 @@ class CoordinateCalculator:
 
         return (rad_to_deg(lat2), rad_to_deg(lon2))
 
-    def estimate_accuracy(self, gps_accuracy_m, distance_m, compass_error_deg=5.0):
+    def calculate_destinations(self, lat, lon, bearing_deg, distances):
+        """Project many distances along the same bearing in one pass.
+
+        Same math as calculate_destination, but the trig that only depends
+        on the start point and bearing is done once. Used for sampling
+        points along a sight line (terrain ray marching).
+
+        Returns:
+            tuple of (lats, lons) lists in degrees, one entry per distance
+        """
+        lat1 = deg_to_rad(lat)
+        lon1 = deg_to_rad(lon)
+        bearing = deg_to_rad(bearing_deg)
+
+        sin_lat1 = math.sin(lat1)
+        cos_lat1 = math.cos(lat1)
+        cos_brg = math.cos(bearing)
+        sin_brg_cos_lat1 = math.sin(bearing) * cos_lat1
+
+        lats = []
+        lons = []
+        for distance_m in distances:
+            if distance_m <= 0:
+                raise ValueError(f"Distance must be positive, got {distance_m}")
+            d_over_r = distance_m / self._R
+            sin_d = math.sin(d_over_r)
+            cos_d = math.cos(d_over_r)
+
+            sin_lat2 = sin_lat1 * cos_d + cos_lat1 * sin_d * cos_brg
+            lat2 = math.asin(sin_lat2)
+            lon2 = lon1 + math.atan2(sin_brg_cos_lat1 * sin_d, cos_d - sin_lat1 * sin_lat2)
+
+            lats.append(rad_to_deg(lat2))
+            lons.append(rad_to_deg(lon2))
+        return lats, lons
+
+    def estimate_accuracy(self, gps_accuracy_m, distance_m, compass_error_deg=None):
         """Rough estimate of how accurate the projected point is.
 
         Takes into account GPS error, compass error, and the fact that
-        angular error grows linearly with distance.
+        angular error grows linearly with distance. compass_error_deg is
+        what the compass thinks of itself right now (heading_error, worse
+        near interference); COMPASS_ERROR_DEG if not given.
         """
+        if compass_error_deg is None:
+            compass_error_deg = self.COMPASS_ERROR_DEG
         # lateral error from compass inaccuracy
         angular_error_rad = deg_to_rad(compass_error_deg)
         lateral_error = distance_m * math.tan(angular_error_rad)
 
         total_error = math.sqrt(gps_accuracy_m ** 2 + lateral_error ** 2)
         return round(total_error, 1)
+
+    def project_batch(self, observations):
+        """(dest_lat, dest_lon, accuracy) for each of many Observations.
+
+        The same projection and accuracy estimate as a locate does, in
+        one pass with the lookups hoisted out of the loop — for redoing
+        a whole history after VERSION changes.
+        """
+        sin, cos, asin, atan2, tan, sqrt = (math.sin, math.cos, math.asin, math.atan2,
+                                            math.tan, math.sqrt)
+        rad = math.pi / 180.0
+        deg = 180.0 / math.pi
+        radius = self._R
+        default_error = tan(self.COMPASS_ERROR_DEG * rad)
+        results = []
+        for obs in observations:
+            distance_m = obs.distance
+            if distance_m <= 0:
+                raise ValueError(f"Distance must be positive, got {distance_m}")
+            lat1 = obs.src_lat * rad
+            bearing = obs.heading * rad
+            d_over_r = distance_m / radius
+            sin_lat1 = sin(lat1)
+            cos_lat1 = cos(lat1)
+            sin_d = sin(d_over_r)
+            cos_d = cos(d_over_r)
+            sin_lat2 = sin_lat1 * cos_d + cos_lat1 * sin_d * cos(bearing)
+            lat2 = asin(sin_lat2)
+            lon2 = obs.src_lon * rad + atan2(sin(bearing) * sin_d * cos_lat1,
+                                             cos_d - sin_lat1 * sin_lat2)
+            error = obs.compass_error
+            lateral = distance_m * (default_error if error is None else tan(error * rad))
+            accuracy = round(sqrt(obs.src_accuracy ** 2 + lateral * lateral), 1)
+            results.append((lat2 * deg, lon2 * deg, accuracy))
+        return results
+
+    @staticmethod
+    def fuse(results):
+        """One (lat, lon, accuracy) from several projections of the same target.
+
+        Weighted by 1/accuracy², like SavedLocation.absorb() merging
+        them one at a time.
+        """
+        lat, lon, accuracy = results[0]
+        weight = 1.0 / max(accuracy, 0.1) ** 2
+        for other_lat, other_lon, other_accuracy in results[1:]:
+            w = 1.0 / max(other_accuracy, 0.1) ** 2
+            f = w / (weight + w)
+            # step along the shorter way round in longitude
+            dlon = (other_lon - lon + 180.0) % 360.0 - 180.0
+            lat += (other_lat - lat) * f
+            lon = (lon + dlon * f + 180.0) % 360.0 - 180.0
+            weight += w
+        return lat, lon, weight ** -0.5 if len(results) > 1 else accuracy
+
+    def project_sightings(self, observations):
+        """Where a saved location with these sightings is, and how accurately."""
+        return self.fuse(self.project_batch(observations))
+
+    def propagate_covariance(self, lat, lon, bearing_deg, distance_m, position_cov,
+                             heading_var, distance_var=0.0):
+        """East/north covariance (m²) of the projected point.
+
+        The input errors are carried through the Jacobian of the forward
+        geodesic (first order, exact for the spherical formula): the start
+        point's error moves the result with it, heading error moves it
+        sideways by about distance × angle, distance error along the line.
+
+        Args:
+            position_cov: 2x2 east/north covariance of the start point, m²
+            heading_var: variance of the bearing, deg²
+            distance_var: variance of the distance, m² (0 if not known)
+
+        Returns:
+            ((ee, en), (en, nn)) in m²
+        """
+        return self._propagate([(lat, lon, bearing_deg, distance_m, position_cov,
+                                 heading_var, distance_var)])[0]
+
+    def covariance_batch(self, observations):
+        """propagate_covariance() for many Observations in one pass.
+
+        The heading variance is the square of the compass error the
+        sighting was worked out with, which already includes the reading
+        jitter. A missing position_cov is a circle of src_accuracy, a
+        missing distance_var 0.
+        """
+        rows = []
+        for obs in observations:
+            cov = obs.position_cov
+            if cov is None:
+                var = obs.src_accuracy * obs.src_accuracy
+                cov = ((var, 0.0), (0.0, var))
+            error = self.COMPASS_ERROR_DEG if obs.compass_error is None else obs.compass_error
+            rows.append((obs.src_lat, obs.src_lon, obs.heading, obs.distance, cov,
+                         error * error, obs.distance_var or 0.0))
+        return self._propagate(rows)
+
+    def _propagate(self, rows):
+        sin, cos, sqrt = math.sin, math.cos, math.sqrt
+        rad = math.pi / 180.0
+        radius = self._R
+        results = []
+        for lat, lon, bearing_deg, distance_m, position_cov, heading_var, distance_var in rows:
+            (c_ee, c_en), (_, c_nn) = position_cov
+            heading_var *= rad * rad
+            lat1 = lat * rad
+            bearing = bearing_deg * rad
+            delta = distance_m / radius
+            sin_lat1 = sin(lat1)
+            cos_lat1 = max(cos(lat1), 1e-12)  # the longitude is meaningless at a pole
+            sin_d = sin(delta)
+            cos_d = cos(delta)
+            sin_b = sin(bearing)
+            cos_b = cos(bearing)
+
+            # sin(lat2) and its derivatives by lat1, bearing and delta
+            sin_lat2 = sin_lat1 * cos_d + cos_lat1 * sin_d * cos_b
+            cos_lat2 = sqrt(max(1.0 - sin_lat2 * sin_lat2, 1e-24))
+            ds_lat = cos_lat1 * cos_d - sin_lat1 * sin_d * cos_b
+            ds_brg = -cos_lat1 * sin_d * sin_b
+            ds_dst = -sin_lat1 * sin_d + cos_lat1 * cos_d * cos_b
+
+            # lon2 - lon1 = atan2(y, x), and the same derivatives of it
+            y = sin_b * sin_d * cos_lat1
+            x = cos_d - sin_lat1 * sin_lat2
+            q = x * x + y * y
+            dl_lat = (x * (-sin_b * sin_d * sin_lat1)
+                      - y * (-cos_lat1 * sin_lat2 - sin_lat1 * ds_lat)) / q
+            dl_brg = (x * (cos_b * sin_d * cos_lat1) - y * (-sin_lat1 * ds_brg)) / q
+            dl_dst = (x * (sin_b * cos_d * cos_lat1) - y * (-sin_d - sin_lat1 * ds_dst)) / q
+
+            # Jacobian in meters: rows east/north at the destination,
+            # columns start east, start north, bearing (rad), distance
+            e_e = cos_lat2 / cos_lat1
+            e_n = cos_lat2 * dl_lat
+            e_b = radius * cos_lat2 * dl_brg
+            e_d = cos_lat2 * dl_dst
+            n_n = ds_lat / cos_lat2
+            n_b = radius * ds_brg / cos_lat2
+            n_d = ds_dst / cos_lat2
+
+            ee = (e_e * e_e * c_ee + 2.0 * e_e * e_n * c_en + e_n * e_n * c_nn
+                  + e_b * e_b * heading_var + e_d * e_d * distance_var)
+            nn = n_n * n_n * c_nn + n_b * n_b * heading_var + n_d * n_d * distance_var
+            en = (e_e * n_n * c_en + e_n * n_n * c_nn
+                  + e_b * n_b * heading_var + e_d * n_d * distance_var)
+            results.append(((ee, en), (en, nn)))
+        return results
+
+    @staticmethod
+    def error_ellipse(covariance, scale=1.0):
+        """ErrorEllipse of an east/north covariance.
+
+        One standard deviation by default; scale=2.45 gives the ellipse
+        the point is inside 95% of the time.
+        """
+        (ee, en), (_, nn) = covariance
+        mean = (ee + nn) / 2.0
+        half_diff = math.sqrt(((ee - nn) / 2.0) ** 2 + en * en)
+        major = math.sqrt(mean + half_diff)
+        minor = math.sqrt(max(mean - half_diff, 0.0))
+        # angle of the major axis from east, counterclockwise
+        angle = 0.5 * math.atan2(2.0 * en, ee - nn)
+        bearing = (90.0 - rad_to_deg(angle)) % 180.0
+        return ErrorEllipse(major * scale, minor * scale, bearing)
@@ -0,0 +1,273 @@
+"""Offline World Magnetic Model (WMM).
+
+The compass gives us magnetic heading, but the geodesic math wants a
+true bearing. The difference (declination) is 10-15° in parts of the
+world, which at 1 km is a 200 m miss.
+
+MagneticModel evaluates the spherical harmonic expansion from a WMM.COF
+coefficient file (the format NOAA publishes). The bundled file is
+WMM-2025, good until the end of 2029; drop a newer WMM.COF in its
+place to update the model.
+
+A full degree-12 evaluation is ~170 terms, too much to do on every
+compass tick, so DeclinationGrid caches the model on a coarse
+lat/lon/time grid and interpolates between nodes.
+"""
+import math
+import os
+from collections import namedtuple
+from datetime import datetime
+
+from utils.math_utils import deg_to_rad, rad_to_deg
+from utils.lazy_import import get_logger
+
+# kivy's logger when the app is running, stdlib logging for headless use —
+# never imports kivy itself, see utils/lazy_import.py
+Logger = get_logger(__name__)
+
+
+WMM_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "WMM.COF")
+MODEL_LIFESPAN_YEARS = 5.0  # WMM is only published for a 5 year window
+
+# WGS84 ellipsoid, km
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+GEOMAG_REF_RADIUS = 6371.2  # reference radius used by the WMM coefficients
+
+FieldElements = namedtuple(
+    "FieldElements",
+    ["north", "east", "down", "declination", "inclination", "intensity"],
+)
+FieldElements.__doc__ = """Magnetic field at a point.
+
+north/east/down are nT in the local geodetic frame. declination and
+inclination are degrees (declination positive east of true north,
+inclination positive pointing down). intensity is total field in nT.
+"""
+
+
+def decimal_year(when=None):
+    """Convert a datetime (default: now) to e.g. 2024.53."""
+    when = when or datetime.now()
+    start = datetime(when.year, 1, 1)
+    end = datetime(when.year + 1, 1, 1)
+    return when.year + (when - start).total_seconds() / (end - start).total_seconds()
+
+
+class MagneticModel:
+    """Spherical harmonic geomagnetic model loaded from a .COF file."""
+
+    def __init__(self, path=WMM_FILE):
+        self.epoch, self.name, self._coeffs = self._load(path)
+        self.max_degree = max(n for n, _ in self._coeffs)
+        self._warned_expired = False
+
+    @staticmethod
+    def _load(path):
+        with open(path, "r") as f:
+            header = f.readline().split()
+            epoch = float(header[0])
+            name = header[1] if len(header) > 1 else "WMM"
+
+            coeffs = {}
+            for line in f:
+                parts = line.split()
+                if not parts or parts[0].startswith("9999"):
+                    break
+                n, m = int(parts[0]), int(parts[1])
+                g, h, g_dot, h_dot = (float(v) for v in parts[2:6])
+                coeffs[(n, m)] = (g, h, g_dot, h_dot)
+        return epoch, name, coeffs
+
+    def is_valid_for(self, year):
+        return self.epoch <= year < self.epoch + MODEL_LIFESPAN_YEARS
+
+    def field(self, lat, lon, alt_km=0.0, year=None):
+        """Evaluate the model at a geodetic position.
+
+        Args:
+            lat: geodetic latitude in degrees
+            lon: longitude in degrees
+            alt_km: height above the WGS84 ellipsoid in km
+            year: decimal year, defaults to today
+
+        Returns:
+            FieldElements
+        """
+        if year is None:
+            year = decimal_year()
+        if not self.is_valid_for(year) and not self._warned_expired:
+            Logger.warning(
+                f"Geomagnetism: {self.name} is not valid for {year:.1f}, "
+                f"results are extrapolated"
+            )
+            self._warned_expired = True
+        dt = year - self.epoch
+
+        # the poles are a singularity for the east component, nudge off them
+        lat = max(min(lat, 89.9999), -89.9999)
+
+        # geodetic -> geocentric spherical
+        phi = deg_to_rad(lat)
+        sin_phi = math.sin(phi)
+        cos_phi = math.cos(phi)
+        n_radius = WGS84_A / math.sqrt(1 - WGS84_E2 * sin_phi * sin_phi)
+        p = (n_radius + alt_km) * cos_phi
+        z = (n_radius * (1 - WGS84_E2) + alt_km) * sin_phi
+        r = math.sqrt(p * p + z * z)
+        phi_c = math.asin(z / r)
+
+        # legendre functions are in terms of colatitude
+        cos_t = math.sin(phi_c)
+        sin_t = math.cos(phi_c)
+        lam = deg_to_rad(lon)
+
+        nmax = self.max_degree
+        P, dP = self._schmidt_legendre(nmax, cos_t, sin_t)
+        cos_ml = [math.cos(m * lam) for m in range(nmax + 1)]
+        sin_ml = [math.sin(m * lam) for m in range(nmax + 1)]
+
+        bx = by = bz = 0.0
+        ratio = GEOMAG_REF_RADIUS / r
+        rpow = ratio * ratio
+        for n in range(1, nmax + 1):
+            rpow *= ratio  # (a/r)^(n+2)
+            for m in range(n + 1):
+                c = self._coeffs.get((n, m))
+                if c is None:
+                    continue
+                g = c[0] + dt * c[2]
+                h = c[1] + dt * c[3]
+                gc_hs = g * cos_ml[m] + h * sin_ml[m]
+                # d/dphi = -d/dtheta
+                bx += rpow * gc_hs * dP[n][m]
+                by += rpow * m * (g * sin_ml[m] - h * cos_ml[m]) * P[n][m]
+                bz -= rpow * (n + 1) * gc_hs * P[n][m]
+        by /= sin_t
+
+        # rotate from geocentric back to geodetic frame
+        psi = phi_c - phi
+        north = bx * math.cos(psi) - bz * math.sin(psi)
+        down = bx * math.sin(psi) + bz * math.cos(psi)
+        east = by
+
+        horizontal = math.hypot(north, east)
+        return FieldElements(
+            north=north,
+            east=east,
+            down=down,
+            declination=rad_to_deg(math.atan2(east, north)),
+            inclination=rad_to_deg(math.atan2(down, horizontal)),
+            intensity=math.hypot(horizontal, down),
+        )
+
+    def declination(self, lat, lon, alt_km=0.0, year=None):
+        return self.field(lat, lon, alt_km, year).declination
+
+    @staticmethod
+    def _schmidt_legendre(nmax, cos_t, sin_t):
+        """Schmidt semi-normalized P_n^m(cos theta) and dP/dtheta."""
+        P = [[0.0] * (nmax + 1) for _ in range(nmax + 1)]
+        dP = [[0.0] * (nmax + 1) for _ in range(nmax + 1)]
+        P[0][0] = 1.0
+        for n in range(1, nmax + 1):
+            # sectoral terms
+            if n == 1:
+                P[1][1] = sin_t
+                dP[1][1] = cos_t
+            else:
+                k = math.sqrt((2 * n - 1) / (2 * n))
+                P[n][n] = k * sin_t * P[n - 1][n - 1]
+                dP[n][n] = k * (cos_t * P[n - 1][n - 1] + sin_t * dP[n - 1][n - 1])
+            # everything below the diagonal by recursion on n
+            for m in range(n):
+                a = (2 * n - 1) / math.sqrt(n * n - m * m)
+                b = math.sqrt(((n - 1) ** 2 - m * m) / (n * n - m * m)) if n > 1 else 0.0
+                P[n][m] = a * cos_t * P[n - 1][m]
+                dP[n][m] = a * (cos_t * dP[n - 1][m] - sin_t * P[n - 1][m])
+                if n > 1:
+                    P[n][m] -= b * P[n - 2][m]
+                    dP[n][m] -= b * dP[n - 2][m]
+        return P, dP
+
+
+class DeclinationGrid:
+    """Interpolated lookups into a MagneticModel.
+
+    Model output is computed lazily at grid nodes `cell_deg` apart in
+    lat/lon and `year_step` apart in time, then linearly interpolated
+    between the 8 surrounding nodes. The corners of the last cell are
+    kept around, so repeated lookups from the same spot (the normal
+    case — the user isn't moving far between compass ticks) are just
+    a handful of multiplications.
+    """
+
+    def __init__(self, model=None, cell_deg=2.0, year_step=0.5):
+        self._model = model
+        self.cell_deg = cell_deg
+        self.year_step = year_step
+        self._nodes = {}  # (i, j, k) -> (declination, inclination, intensity)
+        self._cell = None
+        self._corners = None
+
+    @property
+    def model(self):
+        # parsing the coefficient file is cheap but not free — wait until needed
+        if self._model is None:
+            self._model = MagneticModel()
+        return self._model
+
+    @property
+    def node_count(self):
+        return len(self._nodes)
+
+    def _node(self, i, j, k):
+        key = (i, j, k)
+        node = self._nodes.get(key)
+        if node is None:
+            lat = max(min(i * self.cell_deg, 90.0), -90.0)
+            lon = j * self.cell_deg
+            f = self.model.field(lat, lon, 0.0, k * self.year_step)
+            node = (f.declination, f.inclination, f.intensity)
+            self._nodes[key] = node
+        return node
+
+    def elements(self, lat, lon, year=None):
+        """Interpolated (declination, inclination, intensity) at sea level."""
+        if year is None:
+            year = decimal_year()
+
+        y = lat / self.cell_deg
+        x = lon / self.cell_deg
+        t = year / self.year_step
+        i, j, k = math.floor(y), math.floor(x), math.floor(t)
+
+        cell = (i, j, k)
+        if cell != self._cell:
+            self._corners = [self._node(i + di, j + dj, k + dk)
+                             for dk in (0, 1) for di in (0, 1) for dj in (0, 1)]
+            self._cell = cell
+        c = self._corners
+
+        fy, fx, ft = y - i, x - j, t - k
+        weights = (
+            (1 - ft) * (1 - fy) * (1 - fx), (1 - ft) * (1 - fy) * fx,
+            (1 - ft) * fy * (1 - fx), (1 - ft) * fy * fx,
+            ft * (1 - fy) * (1 - fx), ft * (1 - fy) * fx,
+            ft * fy * (1 - fx), ft * fy * fx,
+        )
+
+        # declination is an angle — interpolate offsets from the first corner
+        # so a cell straddling +/-180 (near the magnetic poles) doesn't average to 0
+        d0 = c[0][0]
+        decl = incl = intensity = 0.0
+        for w, node in zip(weights, c):
+            decl += w * ((node[0] - d0 + 180.0) % 360.0 - 180.0)
+            incl += w * node[1]
+            intensity += w * node[2]
+        decl = (d0 + decl + 180.0) % 360.0 - 180.0
+        return decl, incl, intensity
+
+    def declination(self, lat, lon, year=None):
+        return self.elements(lat, lon, year)[0]
@@ -0,0 +1,164 @@
+"""Inverted index over saved location labels, for search as you type.
+
+Labels are split into lowercase, accent-stripped word tokens ("Near
+Zürich HB" -> near, zurich, hb). Each token maps to the set of ids
+whose label has it, and the distinct tokens are also kept in a sorted
+list, so a prefix ("zu") is a bisect to the first token that starts
+with it plus a walk over the ones that follow. A query matches the ids
+that have every one of its words as a prefix of some token.
+
+Results come back newest first: every id gets an increasing rank when
+it's added, and re-adding (a record moved to the top) gives it a new
+one. update() changes the text without touching the rank.
+
+No kivy imports here.
+"""
+import bisect
+import heapq
+import re
+import unicodedata
+from itertools import islice
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lowercase, accent-free word tokens of a label."""
+    text = text.casefold()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    return _WORD.findall(text)
+
+
+class LabelIndex:
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._postings = {}  # token -> set of ids
+        self._tokens = []    # sorted distinct tokens, for prefix lookups
+        self._docs = {}      # id -> tokens, to undo an add
+        self._rank = {}      # id -> insertion rank, higher is newer
+        self._next_rank = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, key):
+        return key in self._docs
+
+    def add(self, key, text):
+        """Index (or re-index) a label, as the newest entry."""
+        self.remove(key)
+        self._rank[key] = self._next_rank
+        self._next_rank += 1
+        self._index(key, text)
+
+    def update(self, key, text):
+        """Change a label and keep its place in the order."""
+        rank = self._rank.get(key)
+        if rank is None:
+            self.add(key, text)
+            return
+        self._unindex(key)
+        self._index(key, text)
+
+    def load(self, items):
+        """Add many (key, text) at once, oldest first."""
+        if self._docs:
+            for key, text in items:
+                self.add(key, text)
+            return
+        # empty index: fill the postings first and sort the tokens once,
+        # instead of an insort per new token
+        postings = self._postings
+        for key, text in items:
+            if key in self._rank:
+                self._unindex_postings(key)
+                del self._rank[key]
+            self._rank[key] = self._next_rank
+            self._next_rank += 1
+            tokens = frozenset(tokenize(text))
+            self._docs[key] = tokens
+            for token in tokens:
+                ids = postings.get(token)
+                if ids is None:
+                    postings[token] = {key}
+                else:
+                    ids.add(key)
+        self._tokens = sorted(postings)
+
+    def remove(self, key):
+        """Returns False if the key wasn't indexed."""
+        if key not in self._docs:
+            return False
+        self._unindex(key)
+        del self._rank[key]
+        return True
+
+    def _index(self, key, text):
+        tokens = frozenset(tokenize(text))
+        self._docs[key] = tokens
+        for token in tokens:
+            ids = self._postings.get(token)
+            if ids is None:
+                self._postings[token] = {key}
+                bisect.insort(self._tokens, token)
+            else:
+                ids.add(key)
+
+    def _unindex(self, key):
+        for token in self._unindex_postings(key):
+            del self._tokens[bisect.bisect_left(self._tokens, token)]
+
+    def _unindex_postings(self, key):
+        """Drop key from its postings; returns the tokens left with no ids."""
+        emptied = []
+        for token in self._docs.pop(key):
+            ids = self._postings[token]
+            ids.discard(key)
+            if not ids:
+                del self._postings[token]
+                emptied.append(token)
+        return emptied
+
+    def _prefix_matches(self, prefix):
+        tokens = self._tokens
+        postings = self._postings
+        i = bisect.bisect_left(tokens, prefix)
+        sets = []
+        while i < len(tokens) and tokens[i].startswith(prefix):
+            sets.append(postings[tokens[i]])
+            i += 1
+        if len(sets) == 1:
+            return sets[0]
+        return set().union(*sets)
+
+    def search(self, query, limit=None):
+        """Ids whose label has a token starting with every word of query.
+
+        Returns:
+            list of ids, newest first — all of them for an empty query
+        """
+        words = set(tokenize(query))
+        if not words:
+            # re-adding moves a key to the end, so the rank dict is in order
+            return list(islice(reversed(self._rank), limit))
+
+        # rarest first, so the intersection shrinks as fast as possible
+        groups = sorted((self._prefix_matches(w) for w in words), key=len)
+        ids = groups[0]
+        for group in groups[1:]:
+            if not ids:
+                break
+            ids = ids & group
+        if limit is not None and limit < len(ids):
+            if limit * len(self._rank) < len(ids) * len(ids):
+                # matches are common: walking newest first finds limit of
+                # them sooner than ranking every match would
+                return list(islice((k for k in reversed(self._rank) if k in ids), limit))
+            return heapq.nlargest(limit, ids, key=self._rank.__getitem__)
+        rank = self._rank.__getitem__
+        return sorted(ids, key=rank, reverse=True)
@@ -0,0 +1,129 @@
+"""Spotting magnetic interference from the field the compass sees.
+
+Next to a car, a steel beam or a laptop the compass still gives a
+steady heading, just a wrong one. What gives it away is the field
+itself: the earth's field at a place has a known strength and dip
+(inclination, from the WMM in domain/geomagnetism.py), and turning the
+phone changes neither. Iron nearby adds a field of its own, so the
+strength or the dip comes out wrong, or they wander as the phone moves.
+
+InterferenceDetector keeps running means and variances of both
+(utils/streaming_stats.EwmStats: Welford's update, forgetting old
+readings) and compares them with what's expected. A reading costs a
+few multiplications and keeps nothing, like the smoothers.
+
+No kivy imports here.
+"""
+import math
+
+from utils.streaming_stats import EwmStats
+
+# what the sensor and the model get wrong anyway, not interference
+STRENGTH_TOLERANCE = 0.10  # of the expected field
+DIP_TOLERANCE = 5.0        # degrees
+# how much readings from a phone turning in a clean field spread
+STRENGTH_SPREAD = 0.03     # of the field
+DIP_SPREAD = 2.0           # degrees
+# dip to assume for the horizontal field when there's nothing better
+# (mid latitudes)
+DEFAULT_DIP = 60.0
+MIN_READINGS = 10
+
+
+class InterferenceDetector:
+    """Compares the field readings' strength and dip with the expected field.
+
+    Feed it calibrated readings with add(). Without set_expected() (no
+    GPS fix yet) only the spread of the readings counts; without gravity
+    readings, only the strength.
+    """
+
+    def __init__(self, alpha=0.1):
+        self.strength = EwmStats(alpha=alpha)  # µT
+        self.dip = EwmStats(alpha=alpha)       # degrees, positive down
+        self.expected_strength = None
+        self.expected_dip = None
+
+    def set_expected(self, dip, strength):
+        """The earth's field here: dip in degrees (positive down), strength in µT."""
+        self.expected_dip = dip
+        self.expected_strength = strength
+
+    def reset(self):
+        self.strength.reset()
+        self.dip.reset()
+
+    def add(self, x, y, z, gravity=None):
+        """One field reading (µT, phone axes).
+
+        gravity is the accelerometer's (ax, ay, az) at the same time, if
+        there is one — at rest it points up, which gives the dip.
+        """
+        strength = math.sqrt(x * x + y * y + z * z)
+        if strength == 0.0:
+            return
+        self.strength.add(strength)
+        if gravity is None:
+            return
+        gx, gy, gz = gravity
+        g = math.sqrt(gx * gx + gy * gy + gz * gz)
+        if g == 0.0:
+            return
+        down = -(x * gx + y * gy + z * gz) / (strength * g)
+        self.dip.add(math.degrees(math.asin(max(-1.0, min(1.0, down)))))
+
+    def _deviation(self):
+        """(disturbing field in µT, worst deviation in multiples of its tolerance)."""
+        strength = self.strength
+        if strength.count < MIN_READINGS:
+            return 0.0, 0.0
+        field = self.expected_strength or strength.mean
+        spread = strength.std
+        worst = spread / (STRENGTH_SPREAD * field)
+        disturbance = spread - STRENGTH_SPREAD * field
+        if self.expected_strength:
+            off = abs(strength.mean - field)
+            worst = max(worst, off / (STRENGTH_TOLERANCE * field))
+            disturbance = max(disturbance, off - STRENGTH_TOLERANCE * field)
+
+        dip = self.dip
+        if dip.count >= MIN_READINGS:
+            # a field of the right strength tilted by an angle is a chord away
+            def tilted_by(angle):
+                return 2.0 * field * math.sin(math.radians(max(angle, 0.0)) / 2.0)
+
+            worst = max(worst, dip.std / DIP_SPREAD)
+            disturbance = max(disturbance, tilted_by(dip.std - DIP_SPREAD))
+            if self.expected_dip is not None:
+                off = abs(dip.mean - self.expected_dip)
+                worst = max(worst, off / DIP_TOLERANCE)
+                disturbance = max(disturbance, tilted_by(off - DIP_TOLERANCE))
+        return max(disturbance, 0.0), worst
+
+    @property
+    def score(self):
+        """0..1, how sure we are there's interference. 0.5 right at the tolerances."""
+        worst = self._deviation()[1]
+        return worst * worst / (1.0 + worst * worst)
+
+    @property
+    def heading_error(self):
+        """Degrees the heading could be off by because of the disturbing field.
+
+        At most asin(disturbance / horizontal field), when the
+        disturbance is at right angles to the earth's field.
+        """
+        disturbance = self._deviation()[0]
+        if disturbance == 0.0:
+            return 0.0
+        field = self.expected_strength or self.strength.mean
+        if self.expected_dip is not None:
+            dip = self.expected_dip
+        elif self.dip.count >= MIN_READINGS:
+            dip = self.dip.mean
+        else:
+            dip = DEFAULT_DIP
+        horizontal = field * math.cos(math.radians(dip))
+        if disturbance >= horizontal:
+            return 90.0
+        return math.degrees(math.asin(disturbance / horizontal))
@@ -0,0 +1,311 @@
+"""Hard- and soft-iron calibration for the magnetometer.
+
+Iron in and around the phone bends the field the magnetometer sees. A
+magnet or magnetised part adds a constant offset (hard iron), so the
+readings from a full turn circle around the wrong center. Steel and the
+like stretch the field unevenly (soft iron), which turns the sphere the
+readings should lie on into an ellipsoid. Either one skews the heading
+by degrees, worst on some headings and fine on others.
+
+EllipsoidFit collects raw readings while the user turns the phone every
+which way and fits an ellipsoid to them by least squares. The result,
+a MagnetometerCalibration, maps that ellipsoid back onto a sphere
+around the origin with one affine transform:
+
+    corrected = matrix · (raw - offset)
+
+The sphere keeps the fitted field's strength, so corrected readings are
+still in the sensor's units (µT) and can be compared with the expected
+field.
+
+No kivy imports here.
+"""
+import json
+import math
+import os
+from datetime import datetime
+
+from utils.lazy_import import get_logger
+
+# kivy's logger when the app is running, stdlib logging for headless use —
+# never imports kivy itself, see utils/lazy_import.py
+Logger = get_logger(__name__)
+
+
+CALIBRATION_FILE = "compass_calibration.json"
+CALIBRATION_VERSION = 1
+
+MIN_SAMPLES = 60
+# the readings have to reach this far towards both ends of the fitted
+# ellipsoid on every axis, i.e. the phone was really turned all round
+MIN_COVERAGE = 0.8
+# phones are a few percent out of round; more than this is a bad fit
+MAX_AXIS_RATIO = 1.5
+# rms of the fit residual, relative to the field
+MAX_RESIDUAL = 0.05
+
+
+class MagnetometerCalibration:
+    """Hard-iron offset and soft-iron matrix: corrected = matrix · (raw - offset).
+
+    field is the strength of the fitted field (the radius of the sphere
+    corrected readings lie on), samples and residual say how good the
+    fit was.
+    """
+
+    def __init__(self, offset, matrix, field=0.0, samples=0, residual=0.0,
+                 fitted_at=None):
+        self.offset = tuple(offset)
+        self.matrix = tuple(tuple(row) for row in matrix)
+        self.field = field
+        self.samples = samples
+        self.residual = residual
+        self.fitted_at = fitted_at or datetime.now().isoformat()
+
+    def apply(self, x, y, z):
+        """Corrected (x, y, z) of one raw reading."""
+        ox, oy, oz = self.offset
+        (m00, m01, m02), (m10, m11, m12), (m20, m21, m22) = self.matrix
+        x -= ox
+        y -= oy
+        z -= oz
+        return (m00 * x + m01 * y + m02 * z,
+                m10 * x + m11 * y + m12 * z,
+                m20 * x + m21 * y + m22 * z)
+
+    def to_dict(self):
+        return {
+            "version": CALIBRATION_VERSION,
+            "offset": list(self.offset),
+            "matrix": [list(row) for row in self.matrix],
+            "field": self.field,
+            "samples": self.samples,
+            "residual": self.residual,
+            "fitted_at": self.fitted_at,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        """Raises ValueError if d isn't a calibration this version can read."""
+        try:
+            if d["version"] != CALIBRATION_VERSION:
+                raise ValueError(f"unsupported calibration version {d['version']}")
+            offset = [float(v) for v in d["offset"]]
+            matrix = [[float(v) for v in row] for row in d["matrix"]]
+            if len(offset) != 3 or len(matrix) != 3 or any(len(row) != 3 for row in matrix):
+                raise ValueError("calibration offset/matrix have the wrong shape")
+            return cls(offset, matrix, field=d.get("field", 0.0),
+                       samples=d.get("samples", 0), residual=d.get("residual", 0.0),
+                       fitted_at=d.get("fitted_at"))
+        except (KeyError, TypeError):
+            raise ValueError("not a magnetometer calibration") from None
+
+    def save(self, path):
+        """Write to path, replacing it atomically. Raises OSError."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """The calibration saved at path, or None if there's none (or it's unusable)."""
+        try:
+            with open(path, "r") as f:
+                return cls.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            Logger.warning(f"MagnetometerCalibration: ignoring {path} - {e}")
+            return None
+
+
+class EllipsoidFit:
+    """Least-squares ellipsoid through raw readings, added one at a time.
+
+    Fits the general quadric
+
+        a x² + b y² + c z² + 2d xy + 2e xz + 2f yz + 2g x + 2h y + 2i z = 1
+
+    keeping only its 9x9 normal equations, so add() is a fixed amount of
+    work and memory stays the same however long the user keeps turning.
+    solve() works the calibration out of them whenever asked. Readings
+    are scaled by the first one's magnitude to keep the sums well
+    conditioned.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._scale = None
+        self._ata = [[0.0] * 9 for _ in range(9)]  # upper triangle only
+        self._atb = [0.0] * 9
+        self._low = [math.inf] * 3
+        self._high = [-math.inf] * 3
+
+    def add(self, x, y, z):
+        scale = self._scale
+        if scale is None:
+            norm = math.sqrt(x * x + y * y + z * z)
+            if norm == 0.0:
+                return
+            scale = self._scale = 1.0 / norm
+        x *= scale
+        y *= scale
+        z *= scale
+        row = (x * x, y * y, z * z, 2 * x * y, 2 * x * z, 2 * y * z, 2 * x, 2 * y, 2 * z)
+        ata = self._ata
+        atb = self._atb
+        for i in range(9):
+            ri = row[i]
+            atb[i] += ri
+            ata_i = ata[i]
+            for j in range(i, 9):
+                ata_i[j] += ri * row[j]
+        for axis, v in enumerate((x, y, z)):
+            if v < self._low[axis]:
+                self._low[axis] = v
+            if v > self._high[axis]:
+                self._high[axis] = v
+        self.count += 1
+
+    @property
+    def progress(self):
+        """Rough 0..1 for the UI: enough readings, and turned round every axis.
+
+        Before a fit there's no radius to compare the spread with, so
+        it's the narrowest axis against the widest one.
+        """
+        if self.count < 2:
+            return 0.0
+        spans = [high - low for low, high in zip(self._low, self._high)]
+        turned = min(spans) / max(spans) / MIN_COVERAGE if max(spans) > 0 else 0.0
+        return min(1.0, self.count / MIN_SAMPLES, turned)
+
+    def solve(self):
+        """The calibration these readings make, or None if they don't make a good one.
+
+        None with too few readings, readings that don't cover the
+        ellipsoid (the phone wasn't turned round every axis), or a fit
+        that isn't an ellipsoid, is too lopsided or too far off the
+        readings to trust — a phone shaken next to a steel door, say.
+        """
+        if self.count < MIN_SAMPLES:
+            return None
+        n = self.count
+        ata = [[self._ata[min(i, j)][max(i, j)] for j in range(9)] for i in range(9)]
+        p = _solve(ata, self._atb)
+        if p is None:
+            return None
+        a, b, c, d, e, f, g, h, i = p
+        m = ((a, d, e), (d, b, f), (e, f, c))
+        m_inv = _inverse3(m)
+        if m_inv is None:
+            return None
+        center = [-(m_inv[r][0] * g + m_inv[r][1] * h + m_inv[r][2] * i) for r in range(3)]
+        # (v - center)ᵀ m (v - center) = k on the ellipsoid
+        k = 1.0 + sum(center[r] * m[r][col] * center[col]
+                      for r in range(3) for col in range(3))
+        if k <= 0.0:
+            return None
+
+        # sum of squared residuals of the quadric, straight from the sums
+        fitted = sum(p[r] * ata[r][col] * p[col] for r in range(9) for col in range(9))
+        residual = math.sqrt(max(0.0, fitted - 2.0 * sum(pr * br for pr, br in
+                                                       zip(p, self._atb)) + n) / n)
+        if residual > MAX_RESIDUAL:
+            return None
+
+        # back in raw units: (raw - offset)ᵀ q (raw - offset) = 1
+        scale = self._scale
+        q = [[m[r][col] * scale * scale / k for col in range(3)] for r in range(3)]
+        values, vectors = _eigh3(q)
+        if min(values) <= 0.0:
+            return None
+        radii = [1.0 / math.sqrt(v) for v in values]
+        if max(radii) / min(radii) > MAX_AXIS_RATIO:
+            return None
+        q_inv = _inverse3(q)
+        for axis in range(3):
+            # half the ellipsoid's extent along this axis, in scaled units
+            half = math.sqrt(q_inv[axis][axis]) * scale
+            reach = min(center[axis] - self._low[axis], self._high[axis] - center[axis])
+            if reach < MIN_COVERAGE * half:
+                return None
+
+        # symmetric square root of q, scaled to a sphere of the mean radius
+        field = (radii[0] * radii[1] * radii[2]) ** (1.0 / 3.0)
+        roots = [math.sqrt(v) * field for v in values]
+        matrix = [[sum(vectors[r][t] * roots[t] * vectors[col][t] for t in range(3))
+                   for col in range(3)] for r in range(3)]
+        offset = [v / scale for v in center]
+        return MagnetometerCalibration(offset, matrix, field=field, samples=n,
+                                       residual=residual)
+
+
+def _solve(a, b):
+    """x with a·x = b, Gaussian elimination with partial pivoting. None if singular."""
+    n = len(b)
+    rows = [list(a[r]) + [b[r]] for r in range(n)]
+    biggest = max(abs(rows[r][r]) for r in range(n))
+    if biggest == 0.0:
+        return None
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        if abs(rows[pivot][col]) < 1e-12 * biggest:
+            return None
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        top = rows[col]
+        for r in range(col + 1, n):
+            factor = rows[r][col] / top[col]
+            if factor:
+                row = rows[r]
+                for t in range(col, n + 1):
+                    row[t] -= factor * top[t]
+    x = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        row = rows[r]
+        x[r] = (row[n] - sum(row[t] * x[t] for t in range(r + 1, n))) / row[r]
+    return x
+
+
+def _inverse3(m):
+    (a, b, c), (d, e, f), (g, h, i) = m
+    det = a * (e * i - f * h) - b * (d * i - f * g) + c * (d * h - e * g)
+    if det == 0.0:
+        return None
+    return ((( e * i - f * h) / det, -(b * i - c * h) / det, ( b * f - c * e) / det),
+            (-(d * i - f * g) / det, ( a * i - c * g) / det, -(a * f - c * d) / det),
+            (( d * h - e * g) / det, -(a * h - b * g) / det, ( a * e - b * d) / det))
+
+
+def _eigh3(m):
+    """Eigenvalues and eigenvectors (as columns) of a symmetric 3x3, by Jacobi rotations."""
+    a = [list(row) for row in m]
+    v = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+    for _ in range(50):
+        off = abs(a[0][1]) + abs(a[0][2]) + abs(a[1][2])
+        if off < 1e-15 * (abs(a[0][0]) + abs(a[1][1]) + abs(a[2][2])):
+            break
+        for p, q in ((0, 1), (0, 2), (1, 2)):
+            if a[p][q] == 0.0:
+                continue
+            theta = (a[q][q] - a[p][p]) / (2.0 * a[p][q])
+            t = math.copysign(1.0, theta) / (abs(theta) + math.sqrt(theta * theta + 1.0))
+            cos = 1.0 / math.sqrt(t * t + 1.0)
+            sin = t * cos
+            for k in range(3):
+                akp, akq = a[k][p], a[k][q]
+                a[k][p] = cos * akp - sin * akq
+                a[k][q] = sin * akp + cos * akq
+            for k in range(3):
+                apk, aqk = a[p][k], a[q][k]
+                a[p][k] = cos * apk - sin * aqk
+                a[q][k] = sin * apk + cos * aqk
+            for k in range(3):
+                vkp, vkq = v[k][p], v[k][q]
+                v[k][p] = cos * vkp - sin * vkq
+                v[k][q] = sin * vkp + cos * vkq
+    return [a[0][0], a[1][1], a[2][2]], v
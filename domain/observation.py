@@ -0,0 +1,39 @@
+"""Raw inputs of one sighting, kept so its result can be worked out again.
+
+A saved location used to hold only what the calculator made of the
+sighting. With the inputs kept alongside, a later model (a compass bias
+fix, better declination, an ellipsoid) can redo old records — see
+CoordinateCalculator.project_batch() and LocationRepository.reproject().
+
+Fields:
+    src_lat, src_lon: the fix projected from, degrees
+    src_accuracy: its accuracy in meters
+    heading: the smoothed true heading that was used, degrees
+    raw_heading: the unfiltered magnetic reading at the time, degrees
+    declination: what was added to the smoothed magnetic heading to get
+        `heading`, degrees east
+    distance: meters along the heading, typed in or from the terrain
+    pitch: elevation of the sight line in degrees, negative below the
+        horizon (SensorService.elevation), 0 when not known
+    position_cov: 2x2 east/north covariance of the fix in m², or None
+    heading_var: variance of the compass readings in deg², or None
+    distance_var: variance of the distance in m², None when typed in
+    calculator_version: CoordinateCalculator.VERSION at the time
+    compass_error: the compass error in degrees the accuracy was worked
+        out with, None for the calculator's fixed default
+
+No kivy imports here.
+"""
+from collections import namedtuple
+
+Observation = namedtuple("Observation", (
+    "src_lat", "src_lon", "src_accuracy",
+    "heading", "raw_heading", "declination", "distance", "pitch",
+    "position_cov", "heading_var", "distance_var",
+    "calculator_version", "compass_error",
+), defaults=(0.0, None, None, None, 0, None))
+
+
+def observation_from_dict(d):
+    """Observation from a dict, ignoring fields a newer version may have added."""
+    return Observation(**{k: v for k, v in d.items() if k in Observation._fields})
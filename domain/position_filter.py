@@ -0,0 +1,229 @@
+"""GPS fix smoothing.
+
+Raw fixes jump around by several meters even when standing still, which
+moves the source point of a locate between taps. PositionFilter runs a
+small Kalman filter on the fixes in a local east/north frame (meters
+around a reference point), weighting each fix by its reported accuracy
+and throwing away fixes that would imply an impossible jump.
+
+The state is a handful of floats and every update does the same fixed
+amount of arithmetic — no lists or history buffers — since this runs on
+every GPS callback.
+
+PositionAverager is the "standing still" counterpart: it keeps a running
+weighted mean of every fix so the source position keeps improving for
+as long as the user holds still.
+"""
+import math
+import time
+
+from utils.math_utils import deg_to_rad, EARTH_RADIUS
+
+METERS_PER_DEG = math.pi * EARTH_RADIUS / 180.0
+
+
+class PositionFilter:
+    """Accuracy-weighted Kalman filter for GPS fixes.
+
+    Position is modelled as a random walk: between fixes the variance
+    grows by (WALK_SPEED * dt)^2, so the filter follows a walking user
+    but averages out jitter when they stand still. Each fix's accuracy
+    is used as its 1-sigma error per axis.
+    """
+
+    WALK_SPEED = 1.5            # m/s, expected movement between fixes
+    MAX_SPEED = 50.0            # m/s, anything faster is a bad fix
+    GATE = 13.8                 # chi-square 2 dof, 99.9%
+    MAX_REJECTS = 5             # after this many rejects in a row, trust the GPS
+    REANCHOR_DISTANCE = 10_000  # m, keep the flat-earth frame small
+
+    def __init__(self, walk_speed=None, max_speed=None):
+        self.walk_speed = walk_speed if walk_speed is not None else self.WALK_SPEED
+        self.max_speed = max_speed if max_speed is not None else self.MAX_SPEED
+        self.reset()
+
+    def reset(self, lat=None, lon=None, accuracy=None, timestamp=None):
+        """Forget history. If a position is given, start from it."""
+        self._initialized = False
+        self._rejects = 0
+        self.rejected_count = 0
+        if lat is not None:
+            self._init(lat, lon, accuracy, timestamp)
+
+    @property
+    def is_initialized(self):
+        return self._initialized
+
+    def _init(self, lat, lon, accuracy, timestamp):
+        self._anchor(lat, lon)
+        self._e = 0.0
+        self._n = 0.0
+        var = max(accuracy or 0.0, 0.1) ** 2
+        self._var_e = var
+        self._var_n = var
+        self._t = timestamp if timestamp is not None else time.monotonic()
+        self._rejects = 0
+        self._initialized = True
+
+    def _anchor(self, lat, lon):
+        self._lat0 = lat
+        self._lon0 = lon
+        self._m_per_deg_lon = METERS_PER_DEG * math.cos(deg_to_rad(lat))
+
+    def update(self, lat, lon, accuracy, timestamp=None):
+        """Feed one GPS fix.
+
+        Returns:
+            True if the fix was used, False if it was rejected as an outlier
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if not self._initialized:
+            self._init(lat, lon, accuracy, timestamp)
+            return True
+
+        # predict: uncertainty grows with time since the last fix
+        dt = max(timestamp - self._t, 0.0)
+        q = (self.walk_speed * dt) ** 2
+        var_e = self._var_e + q
+        var_n = self._var_n + q
+
+        # measurement in the local frame
+        z_e = (lon - self._lon0) * self._m_per_deg_lon
+        z_n = (lat - self._lat0) * METERS_PER_DEG
+        r = max(accuracy, 0.1) ** 2
+
+        d_e = z_e - self._e
+        d_n = z_n - self._n
+        s_e = var_e + r
+        s_n = var_n + r
+
+        # outlier check: statistically unlikely AND physically implausible
+        mahalanobis = d_e * d_e / s_e + d_n * d_n / s_n
+        if mahalanobis > self.GATE:
+            jump = math.sqrt(d_e * d_e + d_n * d_n) - accuracy
+            if jump > self.max_speed * max(dt, 1.0):
+                self._rejects += 1
+                self.rejected_count += 1
+                if self._rejects < self.MAX_REJECTS:
+                    return False
+                # we keep disagreeing with the GPS, it's probably us
+                self._init(lat, lon, accuracy, timestamp)
+                return True
+
+        k_e = var_e / s_e
+        k_n = var_n / s_n
+        self._e += k_e * d_e
+        self._n += k_n * d_n
+        self._var_e = (1.0 - k_e) * var_e
+        self._var_n = (1.0 - k_n) * var_n
+        self._t = timestamp
+        self._rejects = 0
+
+        if self._e * self._e + self._n * self._n > self.REANCHOR_DISTANCE ** 2:
+            self._reanchor()
+        return True
+
+    def _reanchor(self):
+        lat = self.latitude
+        lon = self.longitude
+        self._anchor(lat, lon)
+        self._e = 0.0
+        self._n = 0.0
+
+    @property
+    def latitude(self):
+        return self._lat0 + self._n / METERS_PER_DEG
+
+    @property
+    def longitude(self):
+        return self._lon0 + self._e / self._m_per_deg_lon
+
+    @property
+    def covariance(self):
+        """2x2 east/north position covariance in m^2."""
+        return ((self._var_e, 0.0), (0.0, self._var_n))
+
+    @property
+    def accuracy(self):
+        """1-sigma horizontal error in meters, comparable to GPS accuracy."""
+        return math.sqrt((self._var_e + self._var_n) / 2.0)
+
+
+class PositionAverager:
+    """Accuracy-weighted average of fixes taken from one spot.
+
+    While the user stands still we can keep every fix instead of
+    letting the filter forget them. Each fix is weighted by 1/accuracy^2
+    and folded into a running mean and covariance (West's weighted
+    variant of Welford's algorithm), so memory stays constant no matter
+    how long they wait.
+
+    The error of the mean shrinks like accuracy / sqrt(n). GPS errors
+    are correlated over a few seconds though, so we never report
+    better than the observed scatter over sqrt(n), nor better than
+    MIN_ACCURACY.
+    """
+
+    MIN_ACCURACY = 1.0  # m, multipath and atmosphere don't average out
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self._weight = 0.0
+        self._e = 0.0
+        self._n = 0.0
+        self._s_ee = 0.0
+        self._s_nn = 0.0
+        self._s_en = 0.0
+
+    def add(self, lat, lon, accuracy):
+        if self.count == 0:
+            self._lat0 = lat
+            self._lon0 = lon
+            self._m_per_deg_lon = METERS_PER_DEG * math.cos(deg_to_rad(lat))
+
+        x_e = (lon - self._lon0) * self._m_per_deg_lon
+        x_n = (lat - self._lat0) * METERS_PER_DEG
+        w = 1.0 / max(accuracy, 0.1) ** 2
+
+        self.count += 1
+        self._weight += w
+        d_e = x_e - self._e
+        d_n = x_n - self._n
+        self._e += d_e * w / self._weight
+        self._n += d_n * w / self._weight
+        # weighted sums of squares, using old and new mean deltas
+        self._s_ee += w * d_e * (x_e - self._e)
+        self._s_nn += w * d_n * (x_n - self._n)
+        self._s_en += w * d_e * (x_n - self._n)
+
+    @property
+    def latitude(self):
+        return self._lat0 + self._n / METERS_PER_DEG
+
+    @property
+    def longitude(self):
+        return self._lon0 + self._e / self._m_per_deg_lon
+
+    @property
+    def spread(self):
+        """Weighted east/north covariance of the fixes themselves (m^2)."""
+        if self.count < 2:
+            return ((0.0, 0.0), (0.0, 0.0))
+        return ((self._s_ee / self._weight, self._s_en / self._weight),
+                (self._s_en / self._weight, self._s_nn / self._weight))
+
+    @property
+    def accuracy(self):
+        """1-sigma error of the averaged position in meters."""
+        if self.count == 0:
+            return 0.0
+        # what the reported accuracies promise: sigma / sqrt(n) for equal fixes
+        from_reported = math.sqrt(1.0 / self._weight)
+        # what the scatter actually shows
+        (s_ee, _), (_, s_nn) = self.spread
+        from_scatter = math.sqrt((s_ee + s_nn) / 2.0 / self.count)
+        return max(from_reported, from_scatter, self.MIN_ACCURACY)
@@ -0,0 +1,111 @@
+"""Fixed-size lat/lon grid for "what's within r meters of here" lookups.
+
+Each entry is a disk — a position plus a radius, e.g. a saved target
+with its accuracy — and is filed under every cell that disk touches.
+Two disks can only overlap if they share a cell, so overlapping() only
+has to look in the cells under the query disk instead of scanning
+everything. Cells are cell_deg on a side (~5.5 km north-south at the
+default), big enough that typical accuracies land in one to four cells.
+
+Distances are local equirectangular, which is plenty at these ranges.
+No kivy imports here.
+"""
+import math
+
+from utils.math_utils import deg_to_rad
+from domain.position_filter import METERS_PER_DEG
+
+
+def local_distance(lat1, lon1, lat2, lon2):
+    """Meters between two nearby points, wrapping across the antimeridian."""
+    dlon = (lon2 - lon1 + 180.0) % 360.0 - 180.0
+    dx = dlon * METERS_PER_DEG * math.cos(deg_to_rad((lat1 + lat2) / 2.0))
+    dy = (lat2 - lat1) * METERS_PER_DEG
+    return math.hypot(dx, dy)
+
+
+class SpatialGrid:
+
+    CELL_DEG = 0.05
+
+    def __init__(self, cell_deg=None):
+        self.cell_deg = cell_deg or self.CELL_DEG
+        self._cols = int(round(360.0 / self.cell_deg))
+        self._cells = {}    # (row, col) -> set of keys
+        self._entries = {}  # key -> (lat, lon, radius, cells)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _cover(self, lat, lon, radius):
+        """Cells touched by the disk's bounding box."""
+        dlat = radius / METERS_PER_DEG
+        cos_lat = math.cos(deg_to_rad(min(abs(lat) + dlat, 90.0)))
+        # near the poles the box spans every longitude
+        dlon = 180.0 if cos_lat < 1e-9 else min(radius / (METERS_PER_DEG * cos_lat), 180.0)
+        size = self.cell_deg
+        row0 = math.floor((max(lat - dlat, -90.0) + 90.0) / size)
+        row1 = math.floor((min(lat + dlat, 90.0) + 90.0) / size)
+        col0 = math.floor((lon - dlon + 180.0) / size)
+        col1 = math.floor((lon + dlon + 180.0) / size)
+        if col1 - col0 + 1 >= self._cols:
+            col0, col1 = 0, self._cols - 1
+        cols = self._cols
+        return [(row, col % cols)
+                for row in range(row0, row1 + 1)
+                for col in range(col0, col1 + 1)]
+
+    def insert(self, key, lat, lon, radius):
+        if key in self._entries:
+            self.remove(key)
+        cells = self._cover(lat, lon, radius)
+        for cell in cells:
+            self._cells.setdefault(cell, set()).add(key)
+        self._entries[key] = (lat, lon, radius, cells)
+
+    def remove(self, key):
+        """Returns False if the key wasn't in the grid."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        for cell in entry[3]:
+            keys = self._cells[cell]
+            keys.discard(key)
+            if not keys:
+                del self._cells[cell]
+        return True
+
+    def clear(self):
+        self._cells.clear()
+        self._entries.clear()
+
+    def overlapping(self, lat, lon, radius):
+        """Entries whose disk overlaps the query disk, likeliest match first.
+
+        Radii are treated as standard deviations: the ranking is by the
+        Gaussian negative log likelihood of the offset, so a tight entry
+        right next to the query beats a sloppy one whose disk merely
+        covers it.
+
+        Returns:
+            list of (distance_m, key)
+        """
+        seen = set()
+        matches = []
+        for cell in self._cover(lat, lon, radius):
+            for key in self._cells.get(cell, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                e_lat, e_lon, e_radius, _ = self._entries[key]
+                dist = local_distance(lat, lon, e_lat, e_lon)
+                reach = radius + e_radius
+                if dist <= reach:
+                    var = max(radius * radius + e_radius * e_radius, 1e-6)
+                    score = dist * dist / (2.0 * var) + math.log(var)
+                    matches.append((score, dist, key))
+        matches.sort(key=lambda m: m[0])
+        return [(dist, key) for _, dist, key in matches]
@@ -0,0 +1,116 @@
+"""Terrain ray intersection.
+
+Instead of asking the user how far away the target is, we can follow the
+sight line from the phone (compass bearing + camera pitch) until it dips
+below the terrain surface. The distance where that happens is the
+distance to the target, and can go straight into CoordinateCalculator.
+
+The ray is marched in batches of evenly spaced samples, then the crossing
+is narrowed down with a bisection. Earth curvature and standard
+atmospheric refraction are accounted for, which matters past a few km.
+"""
+import math
+
+from domain.coordinate_calculator import CoordinateCalculator
+from utils.math_utils import deg_to_rad, EARTH_RADIUS
+
+EYE_HEIGHT_M = 1.5       # phone held at roughly eye level
+REFRACTION_K = 0.13      # standard terrestrial refraction coefficient
+
+
+class TerrainRaycaster:
+    """Finds where a sight line hits the ground.
+
+    `elevation_source` is anything with elevation(lat, lon) and
+    elevations(lats, lons) returning meters or None where there is
+    no data — normally a data.elevation_tiles.ElevationTileStore.
+    """
+
+    def __init__(self, elevation_source, calculator=None, step_m=30.0,
+                 max_distance_m=20_000.0, batch_size=64, tolerance_m=1.0):
+        self._source = elevation_source
+        self._calc = calculator or CoordinateCalculator()
+        self.step_m = step_m
+        self.max_distance_m = max_distance_m
+        self.batch_size = batch_size
+        self.tolerance_m = tolerance_m
+        # the ray drops below the tangent plane by d^2 / 2R, refraction
+        # bends it back down a little
+        self._curvature = (1.0 - REFRACTION_K) / (2.0 * EARTH_RADIUS)
+
+    def intersect(self, lat, lon, bearing_deg, pitch_deg, altitude_m=None):
+        """Ground distance in meters to where the sight line meets terrain.
+
+        Args:
+            lat: observer latitude in degrees
+            lon: observer longitude in degrees
+            bearing_deg: true bearing of the sight line
+            pitch_deg: elevation angle of the sight line, negative = below
+                the horizon
+            altitude_m: observer altitude above sea level. Defaults to the
+                terrain height at the observer plus EYE_HEIGHT_M, which is
+                usually better than the GPS altitude. Altitudes below
+                that are raised to it.
+
+        Returns:
+            distance in meters, or None if the ray leaves the available
+            tiles or doesn't hit anything within max_distance_m
+        """
+        ground = self._source.elevation(lat, lon)
+        if ground is None:
+            return None
+        if altitude_m is None or altitude_m < ground + EYE_HEIGHT_M:
+            # GPS altitude is noisy and can put us underground
+            altitude_m = ground + EYE_HEIGHT_M
+
+        slope = math.tan(deg_to_rad(pitch_deg))
+        prev_d = 0.0
+        prev_gap = altitude_m - ground
+
+        d = self.step_m
+        while d <= self.max_distance_m:
+            dists = []
+            while d <= self.max_distance_m and len(dists) < self.batch_size:
+                dists.append(d)
+                d += self.step_m
+
+            lats, lons = self._calc.calculate_destinations(lat, lon, bearing_deg, dists)
+            heights = self._source.elevations(lats, lons)
+
+            for dist, h in zip(dists, heights):
+                if h is None:
+                    # ran off the edge of the downloaded area
+                    return None
+                gap = self._ray_height(altitude_m, slope, dist) - h
+                if gap <= 0:
+                    return self._refine(lat, lon, bearing_deg, altitude_m, slope,
+                                        prev_d, prev_gap, dist, gap)
+                prev_d, prev_gap = dist, gap
+
+        return None
+
+    def _ray_height(self, altitude_m, slope, dist):
+        return altitude_m + dist * slope - dist * dist * self._curvature
+
+    def _gap_at(self, lat, lon, bearing_deg, altitude_m, slope, dist):
+        lats, lons = self._calc.calculate_destinations(lat, lon, bearing_deg, [dist])
+        h = self._source.elevation(lats[0], lons[0])
+        if h is None:
+            return None
+        return self._ray_height(altitude_m, slope, dist) - h
+
+    def _refine(self, lat, lon, bearing_deg, altitude_m, slope,
+                lo, lo_gap, hi, hi_gap):
+        """Bisect the [lo, hi] bracket, then interpolate the last step."""
+        while hi - lo > self.tolerance_m:
+            mid = (lo + hi) / 2
+            gap = self._gap_at(lat, lon, bearing_deg, altitude_m, slope, mid)
+            if gap is None:
+                break
+            if gap > 0:
+                lo, lo_gap = mid, gap
+            else:
+                hi, hi_gap = mid, gap
+
+        # the gap changes sign somewhere in the bracket
+        return lo + (hi - lo) * lo_gap / (lo_gap - hi_gap)
@@ -6,61 +6,144 @@ and get the GPS coordinates of that object. Uses compass heading +
 GPS position + forward geodesic math.
 
 Run with:  python main.py
+
+Sensor recording / replay (desktop debugging):
+    PINPOINT_RECORD=trip.ppsr python main.py
+    PINPOINT_REPLAY=trip.ppsr PINPOINT_REPLAY_SPEED=4 python main.py
+
+Frame-time profiling (overlay on the camera screen, dumped on exit):
+    PINPOINT_PROFILE=1 python main.py
 """
 import os
 import sys
+import threading
+import time
 
 # make sure our project root is on the path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from kivy.config import Config
-# set window size for desktop testing — ignored on mobile
-Config.set("graphics", "width", "400")
-Config.set("graphics", "height", "750")
-Config.set("graphics", "resizable", "0")
-
-from kivy.app import App
-from kivy.uix.screenmanager import ScreenManager, SlideTransition
-from kivy.core.window import Window
-from kivy.clock import Clock
-from kivy.logger import Logger
-
-from domain.coordinate_calculator import CoordinateCalculator
-from services.location_service import LocationService
-from services.compass_service import CompassService
-from services.sensor_service import SensorService
-from data.location_repository import LocationRepository
+# first, so the timer's zero is before any of the heavy imports
+from utils.startup_timing import startup
+
+with startup.stage("import kivy"):
+    from kivy.config import Config
+    # set window size for desktop testing — ignored on mobile
+    Config.set("graphics", "width", "400")
+    Config.set("graphics", "height", "750")
+    Config.set("graphics", "resizable", "0")
+
+    from kivy.app import App
+    from kivy.uix.screenmanager import ScreenManager, SlideTransition
+    from kivy.core.window import Window
+    from kivy.clock import Clock
+    from kivy.logger import Logger
+
+with startup.stage("import domain"):
+    from domain.coordinate_calculator import CoordinateCalculator
+    from domain.terrain_intersection import TerrainRaycaster
+    from domain.magnetometer_calibration import CALIBRATION_FILE
+
+with startup.stage("import services"):
+    from services.location_service import LocationService
+    from services.compass_service import CompassService
+    from services.sensor_service import SensorService
+    from services.sampling_scheduler import SamplingScheduler
+    from services.sensor_recorder import SensorRecorder
+    from services.sensor_replay import SensorReplay
+
+with startup.stage("import data"):
+    from data.location_repository import LocationRepository, HOT_DAYS
+    from data.elevation_tiles import ElevationTileStore, TILE_DIR
+    from data.gazetteer import Gazetteer, GAZETTEER_FILE
+
 from utils.permissions import request_app_permissions
+from utils.profiler import profiler
 from presentation.theme import Colors
 
+# how often to look for changes import/export scripts made to the history
+REPO_REFRESH_INTERVAL = 5.0
+
 
 class PinPointApp(App):
 
+    _repo_refresh = None
+
     def build(self):
         self.title = "PinPoint"
         Window.clearcolor = Colors.BG_PRIMARY
 
         # init services
-        self.calculator = CoordinateCalculator()
-        self.location_svc = LocationService()
-        self.compass_svc = CompassService()
-        self.sensor_svc = SensorService()
-        self.repo = LocationRepository()
+        with startup.stage("calculator"):
+            self.calculator = CoordinateCalculator()
+        with startup.stage("location service"):
+            self.location_svc = LocationService()
+        with startup.stage("compass service"):
+            self.compass_svc = CompassService()
+            self.compass_svc.load_calibration(
+                os.path.join(self.user_data_dir, CALIBRATION_FILE)
+            )
+        with startup.stage("sensor service"):
+            self.sensor_svc = SensorService()
+        # the compass checks the field's dip against gravity
+        self.compass_svc.gravity_source = self.sensor_svc
+
+        # history file is read on a worker thread, the repo blocks callers
+        # until it's done so nothing sees a half loaded list. Saving the
+        # same target again merges into the earlier sighting, and anything
+        # older than a few weeks is moved to the compressed archive
+        self.repo = LocationRepository(load=False, merge_duplicates=True,
+                                       hot_days=HOT_DAYS)
+        self.repo.load_in_background(
+            on_loaded=lambda: Clock.schedule_once(self._on_repo_loaded)
+        )
+
+        # offline DEM tiles for working out distance from the terrain
+        with startup.stage("terrain"):
+            tiles = ElevationTileStore(os.path.join(self.user_data_dir, TILE_DIR))
+            # None without any tiles, so the camera screen asks for a distance
+            self.terrain = (TerrainRaycaster(tiles, calculator=self.calculator)
+                            if tiles.has_tiles() else None)
+
+        # offline place names for "near X" labels. Opening the index is
+        # just an mmap, but the first run after a new dump has to build it
+        self.gazetteer = None
+        threading.Thread(
+            target=self._open_gazetteer, name="gazetteer", daemon=True
+        ).start()
+
+        # sensor rates follow the current screen / motion / pending locate
+        self.scheduler = SamplingScheduler(
+            self.compass_svc, self.sensor_svc, self.location_svc
+        )
+
+        # record raw sensor callbacks, or play a recording back instead
+        self.recorder = None
+        self.replay = None
+        self._setup_recording()
+
+        # keep the compass declination in step with where we are
+        self.location_svc.bind(latitude=self._on_position_changed,
+                               longitude=self._on_position_changed)
+
+        # average GPS fixes while the phone is held still
+        self.sensor_svc.bind(is_stationary=self._on_stationary_changed)
 
         # this gets set by camera screen when user hits "locate"
         self.last_result = None
 
         # screen manager with slide transitions
         self.sm = ScreenManager(transition=SlideTransition(duration=0.25))
+        self.sm.bind(current=self._on_screen_changed)
 
-        # screens are imported here to avoid circular deps
-        from presentation.screens.camera_screen import CameraScreen
-        from presentation.screens.result_screen import ResultScreen
-        from presentation.screens.history_screen import HistoryScreen
+        # only the camera screen is built up front, the others on first use
+        self.camera_screen = self._build_screen("camera")
 
-        self.sm.add_widget(CameraScreen(app_ref=self))
-        self.sm.add_widget(ResultScreen(app_ref=self))
-        self.sm.add_widget(HistoryScreen(app_ref=self))
+        # time every frame against the budget when profiling
+        if profiler.enabled:
+            Clock.schedule_interval(self._on_frame, 0)
+
+        # the camera preview and the startup report wait for the first frame
+        Window.bind(on_flip=self._on_first_frame)
 
         # request permissions then start sensors
         request_app_permissions(callback=self._on_permissions)
@@ -70,29 +153,160 @@ class PinPointApp(App):
 
         return self.sm
 
+    def _build_screen(self, name):
+        # screens are imported here to avoid circular deps (and to keep
+        # the ones we don't need yet off the startup path)
+        with startup.stage(f"{name} screen"):
+            if name == "camera":
+                from presentation.screens.camera_screen import CameraScreen as cls
+            elif name == "result":
+                from presentation.screens.result_screen import ResultScreen as cls
+            elif name == "history":
+                from presentation.screens.history_screen import HistoryScreen as cls
+            elif name == "map":
+                from presentation.screens.map_screen import MapScreen as cls
+            else:
+                raise ValueError(f"unknown screen {name}")
+            screen = cls(app_ref=self)
+            self.sm.add_widget(screen)
+        if startup.first_frame is not None:
+            Logger.info(f"App: built {name} screen in "
+                        f"{startup.stages[-1][1] * 1000:.0f} ms")
+        return screen
+
+    def get_screen(self, name):
+        """The named screen, built on first use."""
+        if not self.sm.has_screen(name):
+            return self._build_screen(name)
+        return self.sm.get_screen(name)
+
+    def show_screen(self, name):
+        """Switch screens, building the target screen the first time."""
+        screen = self.get_screen(name)
+        self.sm.current = name
+        return screen
+
+    def _on_first_frame(self, *args):
+        Window.unbind(on_flip=self._on_first_frame)
+        startup.mark_first_frame()
+        startup.log()
+        # now it's safe to spend time opening the camera provider
+        Clock.schedule_once(lambda dt: self.camera_screen.start_camera())
+
+    def _on_repo_loaded(self, dt):
+        Logger.info(f"App: history loaded ({self.repo.count} locations) "
+                    f"{startup.elapsed() * 1000:.0f} ms after start")
+        # redo history an older calculator worked out; once it's caught up
+        # this returns straight away. Counts as a refresh so they don't overlap
+        self._repo_refresh = threading.Thread(
+            target=self.repo.reproject, args=(self.calculator,),
+            name="repo-reproject", daemon=True
+        )
+        self._repo_refresh.start()
+        Clock.schedule_interval(self._refresh_repo, REPO_REFRESH_INTERVAL)
+
+    def _refresh_repo(self, dt):
+        # usually a few stat() calls, but catching up waits for the file
+        # lock, which a running import may hold for a while
+        thread = self._repo_refresh
+        if thread is None or not thread.is_alive():
+            self._repo_refresh = threading.Thread(
+                target=self.repo.refresh, name="repo-refresh", daemon=True
+            )
+            self._repo_refresh.start()
+
+    def _open_gazetteer(self):
+        gazetteer = Gazetteer.open(os.path.join(self.user_data_dir, GAZETTEER_FILE))
+        if gazetteer is not None:
+            Clock.schedule_once(lambda dt: setattr(self, "gazetteer", gazetteer))
+
+    def place_label(self, lat, lon):
+        """Label like "near Zürich", or "" without a gazetteer or a nearby place."""
+        if self.gazetteer is None:
+            return ""
+        return self.gazetteer.label(lat, lon)
+
+    def _setup_recording(self):
+        record_path = os.environ.get("PINPOINT_RECORD")
+        replay_path = os.environ.get("PINPOINT_REPLAY")
+
+        if replay_path:
+            speed = float(os.environ.get("PINPOINT_REPLAY_SPEED", "1"))
+            try:
+                self.replay = SensorReplay.for_services(
+                    replay_path, self.compass_svc, self.sensor_svc,
+                    self.location_svc, speed=speed,
+                )
+            except (OSError, ValueError) as e:
+                Logger.error(f"App: can't replay {replay_path} - {e}")
+        elif record_path:
+            try:
+                self.recorder = SensorRecorder(record_path)
+            except OSError as e:
+                Logger.error(f"App: can't record to {record_path} - {e}")
+                return
+            self.compass_svc.recorder = self.recorder
+            self.sensor_svc.recorder = self.recorder
+            self.location_svc.recorder = self.recorder
+
+    def _on_frame(self, dt):
+        profiler.record_frame(dt)
+
+    def _dump_profile(self):
+        path = os.path.join(
+            self.user_data_dir, "profile-" + time.strftime("%Y%m%d-%H%M%S") + ".json"
+        )
+        try:
+            profiler.dump(path)
+            Logger.info(f"App: profile written to {path}")
+        except OSError as e:
+            Logger.error(f"App: can't write profile - {e}")
+
     def _on_permissions(self, permissions, grant_results):
         Logger.info(f"Permissions: {permissions} -> {grant_results}")
 
+    def _on_position_changed(self, *args):
+        self.compass_svc.set_location(self.location_svc.latitude,
+                                      self.location_svc.longitude)
+
+    def _on_stationary_changed(self, instance, stationary):
+        self.location_svc.set_averaging(stationary)
+        self.scheduler.set_moving(not stationary)
+
+    def _on_screen_changed(self, instance, name):
+        self.scheduler.set_screen(name)
+
     def _start_services(self, dt):
+        if self.replay:
+            # the replay stands in for the sensors, don't start the mocks
+            Logger.info("App: replaying recorded sensor data")
+            self.replay.start()
+            return
         Logger.info("App: starting sensor services")
-        self.location_svc.start()
-        self.compass_svc.start()
-        self.sensor_svc.start()
+        self.scheduler.start()
 
     def on_pause(self):
-        # called when app goes to background on mobile
+        # called when app goes to background on mobile — no point sampling
+        self.scheduler.pause()
+        # android may kill us in the background without calling on_stop
+        if profiler.enabled:
+            self._dump_profile()
         return True
 
     def on_resume(self):
         # restart sensors when coming back
-        self.location_svc.start()
-        self.compass_svc.start()
-        self.sensor_svc.start()
+        self.scheduler.resume()
 
     def on_stop(self):
-        self.location_svc.stop()
-        self.compass_svc.stop()
-        self.sensor_svc.stop()
+        self.scheduler.stop()
+        if self.replay:
+            self.replay.stop()
+        if self.recorder:
+            self.recorder.close()
+        if self.gazetteer:
+            self.gazetteer.close()
+        if profiler.enabled:
+            self._dump_profile()
 
 
 if __name__ == "__main__":
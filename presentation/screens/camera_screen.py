@@ -18,7 +18,13 @@ from presentation.theme import Colors, Sizing
 from presentation.widgets.heading_display import HeadingDisplay
 from presentation.widgets.accuracy_indicator import AccuracyIndicator
 from presentation.widgets.styled_button import PrimaryButton, SecondaryButton
-from services.camera_service import create_camera_widget
+from presentation.widgets.profiler_overlay import ProfilerOverlay
+from domain.observation import Observation
+from services.camera_service import create_camera_widget, FallbackPreview
+from utils.profiler import profiler, profiled
+
+# meters, when there's no terrain to work the distance out from
+DEFAULT_DISTANCE = 100
 
 
 class CameraScreen(Screen):
@@ -31,20 +37,16 @@ class CameraScreen(Screen):
 
     def _build_ui(self):
         root = FloatLayout()
+        self._root = root
 
         # -- camera preview (fills entire screen) --
-        try:
-            self._camera = create_camera_widget(
-                size_hint=(1, 1),
-                pos_hint={"x": 0, "y": 0},
-            )
-        except Exception as e:
-            Logger.warning(f"CameraScreen: camera init failed - {e}")
-            from services.camera_service import FallbackPreview
-            self._camera = FallbackPreview(
-                size_hint=(1, 1),
-                pos_hint={"x": 0, "y": 0},
-            )
+        # the grid placeholder shows until start_camera() swaps in the real
+        # preview — opening the camera provider would delay the first frame
+        self._camera = FallbackPreview(
+            size_hint=(1, 1),
+            pos_hint={"x": 0, "y": 0},
+        )
+        self._camera_ready = False
         root.add_widget(self._camera)
 
         # -- top overlay: heading + accuracy --
@@ -79,6 +81,29 @@ class CameraScreen(Screen):
         )
         root.add_widget(self._tilt_label)
 
+        # -- compass calibration (only shown while it's needed or running) --
+        self._calibrate_btn = SecondaryButton(
+            text="CALIBRATE COMPASS",
+            size_hint=(0.7, None),
+            height=38,
+            pos_hint={"center_x": 0.5, "center_y": 0.58},
+            opacity=0,
+            disabled=True,
+        )
+        self._calibrate_btn.bind(on_release=self._on_calibrate)
+        root.add_widget(self._calibrate_btn)
+
+        # -- frame timing overlay, only with PINPOINT_PROFILE=1 --
+        self._profiler_overlay = None
+        if profiler.enabled:
+            self._profiler_overlay = ProfilerOverlay(
+                size_hint=(1, None),
+                height=90,
+                pos_hint={"x": 0, "top": 0.88},
+                padding=[Sizing.PADDING_SM, Sizing.PADDING_SM],
+            )
+            root.add_widget(self._profiler_overlay)
+
         # -- bottom controls panel --
         # taller on desktop to fit lat/lon inputs
         is_desktop = platform not in ("android", "ios")
@@ -176,8 +201,11 @@ class CameraScreen(Screen):
             halign="left",
         )
 
+        # with terrain the distance is worked out unless one is typed in
+        auto_distance = self.app.terrain is not None
         self._distance_input = TextInput(
-            text="100",
+            text="" if auto_distance else str(DEFAULT_DISTANCE),
+            hint_text="auto (terrain)" if auto_distance else str(DEFAULT_DISTANCE),
             multiline=False,
             input_filter="float",
             font_size=Sizing.FONT_BODY,
@@ -188,6 +216,9 @@ class CameraScreen(Screen):
             size_hint_x=0.6,
         )
 
+        # typing a distance means a locate is coming — sample faster
+        self._distance_input.bind(focus=self._on_distance_focus)
+
         dist_row.add_widget(dist_label)
         dist_row.add_widget(self._distance_input)
         bottom.add_widget(dist_row)
@@ -226,12 +257,42 @@ class CameraScreen(Screen):
         # update sensor readings on a timer
         Clock.schedule_interval(self._update_display, 1 / 10)
 
+    def start_camera(self):
+        """Create the real camera preview. Called once the first frame is up."""
+        if self._camera_ready:
+            return
+        self._camera_ready = True
+        try:
+            camera = create_camera_widget(
+                size_hint=(1, 1),
+                pos_hint={"x": 0, "y": 0},
+            )
+        except Exception as e:
+            Logger.warning(f"CameraScreen: camera init failed - {e}")
+            return
+        placeholder = self._camera
+        self._root.remove_widget(placeholder)
+        # highest index draws first, i.e. underneath the overlays
+        self._root.add_widget(camera, index=len(self._root.children))
+        self._camera = camera
+        if self.manager and self.manager.current == self.name:
+            camera.start()
+
     def on_enter(self):
         self._camera.start()
+        if self._profiler_overlay:
+            self._profiler_overlay.start()
 
     def on_leave(self):
         self._camera.stop()
+        if self._profiler_overlay:
+            self._profiler_overlay.stop()
+        self.app.scheduler.set_locate_pending(False)
+
+    def _on_distance_focus(self, instance, focused):
+        self.app.scheduler.set_locate_pending(focused)
 
+    @profiled("camera.update_display")
     def _update_display(self, dt):
         loc = self.app.location_svc
         compass = self.app.compass_svc
@@ -245,7 +306,12 @@ class CameraScreen(Screen):
         self._accuracy_indicator.accuracy = loc.accuracy
 
         # update coords display
-        if loc.is_active:
+        if loc.is_active and loc.averaging and loc.averaged_count >= 2:
+            self._coords_label.text = (
+                f"{loc.source_latitude:.6f}, {loc.source_longitude:.6f}  "
+                f"(avg {loc.averaged_count} fixes, ±{loc.source_accuracy:.1f}m)"
+            )
+        elif loc.is_active:
             self._coords_label.text = (
                 f"{loc.latitude:.6f}, {loc.longitude:.6f}"
             )
@@ -258,6 +324,16 @@ class CameraScreen(Screen):
         else:
             self._tilt_label.opacity = 0
 
+        # calibration prompt / progress
+        btn = self._calibrate_btn
+        if compass.calibrating:
+            btn.text = f"TURN PHONE ALL ROUND  {compass.calibration_progress:.0%}"
+        elif compass.needs_calibration:
+            btn.text = "CALIBRATE COMPASS"
+        show = compass.calibrating or compass.needs_calibration
+        btn.opacity = 1 if show else 0
+        btn.disabled = not show
+
     def _validate_distance(self):
         """Returns distance as float or None if invalid."""
         text = self._distance_input.text.strip()
@@ -284,40 +360,87 @@ class CameraScreen(Screen):
             self._show_error("Enter valid lat/lon numbers")
 
     def _on_locate(self, *args):
-        distance = self._validate_distance()
-        if distance is None:
-            self._show_error("Enter a valid distance (positive number)")
-            return
-
         loc = self.app.location_svc
         if not loc.is_active:
             self._show_error("GPS not available")
             return
 
-        bearing = self.app.compass_svc.heading
+        compass = self.app.compass_svc
+        bearing = compass.heading
+
+        if self._distance_input.text.strip():
+            distance = self._validate_distance()
+            if distance is None:
+                self._show_error("Enter a valid distance (positive number)")
+                return
+        elif self.app.terrain is None:
+            # cleared, and nothing to work it out from: what the hint says
+            distance = float(DEFAULT_DISTANCE)
+        else:
+            # no distance typed — follow the sight line until it hits terrain
+            distance = self.app.terrain.intersect(
+                loc.source_latitude, loc.source_longitude, bearing,
+                self.app.sensor_svc.elevation,
+            )
+            if distance is None:
+                self._show_error("No terrain data here — enter a distance")
+                return
 
-        # run the calculation
+        # run the calculation from the smoothed (or averaged, if the user has
+        # been standing still) position — raw fixes jump around
+        src_lat = loc.source_latitude
+        src_lon = loc.source_longitude
         calc = self.app.calculator
         dest_lat, dest_lon = calc.calculate_destination(
-            loc.latitude, loc.longitude, bearing, distance
+            src_lat, src_lon, bearing, distance
+        )
+        # the compass's own idea of its error, worse near interference
+        compass_error = compass.heading_error
+        accuracy = calc.estimate_accuracy(loc.source_accuracy, distance, compass_error)
+        # the inputs too, so a saved location can be worked out again later
+        observation = Observation(
+            src_lat=src_lat,
+            src_lon=src_lon,
+            src_accuracy=loc.source_accuracy,
+            heading=bearing,
+            raw_heading=compass.raw_heading,
+            declination=compass.declination,
+            distance=distance,
+            pitch=self.app.sensor_svc.elevation,
+            position_cov=[list(row) for row in loc.covariance],
+            heading_var=compass.heading_variance,
+            calculator_version=calc.VERSION,
+            compass_error=compass_error,
         )
-        accuracy = calc.estimate_accuracy(loc.accuracy, distance)
+        # which way the error runs: sideways from the compass, along the
+        # line from the distance, any way from the GPS
+        covariance = calc.covariance_batch([observation])[0]
 
         # pass result to result screen
         self.app.last_result = {
-            "src_lat": loc.latitude,
-            "src_lon": loc.longitude,
+            "src_lat": src_lat,
+            "src_lon": src_lon,
             "dest_lat": dest_lat,
             "dest_lon": dest_lon,
             "bearing": bearing,
             "distance": distance,
             "accuracy": accuracy,
+            "observation": observation,
+            "covariance": covariance,
+            "error_ellipse": calc.error_ellipse(covariance),
         }
 
-        self.manager.current = "result"
+        self.app.show_screen("result")
+
+    def _on_calibrate(self, *args):
+        compass = self.app.compass_svc
+        if compass.calibrating:
+            compass.cancel_calibration()
+        else:
+            compass.start_calibration()
 
     def _on_history(self, *args):
-        self.manager.current = "history"
+        self.app.show_screen("history")
 
     def _show_error(self, msg):
         """Quick visual feedback for errors — flash the coords label red."""
@@ -1,9 +1,17 @@
 """History screen — list of previously saved locations.
 
 Shows saved results in a scrollable list. Each entry can be tapped
-to open in maps, or swiped/deleted.
+to show on the in-app map, or deleted.
+
+The list is paged: PAGE_SIZE cards at a time, with the next page
+queried on a worker thread once the list is scrolled near its end, so
+the first page shows straight away however big the history is. Sort,
+time range and accuracy filters go straight to
+LocationRepository.query(), and so does the search box, which looks its
+words up in the repository's label index as you type.
 """
-import webbrowser
+import threading
+from datetime import datetime, timedelta
 
 from kivy.uix.screenmanager import Screen
 from kivy.uix.boxlayout import BoxLayout
@@ -11,17 +19,45 @@ from kivy.uix.scrollview import ScrollView
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
+from kivy.uix.textinput import TextInput
 from kivy.graphics import Color, RoundedRectangle, Rectangle
-from kivy.logger import Logger
+from kivy.clock import Clock
 
 from presentation.theme import Colors, Sizing
 from presentation.widgets.styled_button import PrimaryButton, SecondaryButton
+from utils.profiler import profiled
+
+PAGE_SIZE = 25
+# fetch the next page once less than this many screenfuls are left below
+LOAD_AHEAD = 1.0
+# seconds of typing quiet before the search box re-queries
+SEARCH_DELAY = 0.05
+
+SORT_CHOICES = [
+    ("newest", "Newest"),
+    ("oldest", "Oldest"),
+    ("accuracy", "Most accurate"),
+    ("distance", "Nearest"),
+]
+# days back, None for all
+TIME_CHOICES = [(None, "Any time"), (1, "24 h"), (7, "7 days"), (30, "30 days")]
+# max accuracy in meters, None for all
+ACCURACY_CHOICES = [(None, "Any ±"), (200, "±200 m"), (50, "±50 m")]
 
 
 class HistoryScreen(Screen):
     def __init__(self, app_ref, **kwargs):
         super().__init__(name="history", **kwargs)
         self.app = app_ref
+        self._sort = 0
+        self._time = 0
+        self._accuracy = 0
+        # bumped on every reload, pages for an older one are dropped
+        self._generation = 0
+        self._offset = 0
+        self._has_more = False
+        self._loading = False
+        self._filter_event = None
         self._build_ui()
 
     def _build_ui(self):
@@ -54,8 +90,40 @@ class HistoryScreen(Screen):
         ))
         root.add_widget(header)
 
+        # label search
+        self._search_input = TextInput(
+            hint_text="Search labels",
+            multiline=False,
+            font_size=Sizing.FONT_BODY,
+            foreground_color=Colors.TEXT_PRIMARY,
+            background_color=Colors.INPUT_BG,
+            cursor_color=Colors.ACCENT,
+            padding=[12, 10],
+            size_hint_y=None,
+            height=44,
+        )
+        self._search_input.bind(text=self._on_search_text)
+        root.add_widget(self._search_input)
+
+        # sort / time / accuracy, each button cycles through its choices
+        filters = BoxLayout(
+            orientation="horizontal",
+            size_hint_y=None,
+            height=34,
+            spacing=Sizing.PADDING_SM,
+        )
+        self._sort_btn = self._make_filter_button(SORT_CHOICES[0][1], self._next_sort)
+        self._time_btn = self._make_filter_button(TIME_CHOICES[0][1], self._next_time)
+        self._accuracy_btn = self._make_filter_button(
+            ACCURACY_CHOICES[0][1], self._next_accuracy
+        )
+        filters.add_widget(self._sort_btn)
+        filters.add_widget(self._time_btn)
+        filters.add_widget(self._accuracy_btn)
+        root.add_widget(filters)
+
         # scrollable list area
-        scroll = ScrollView(size_hint=(1, 1))
+        self._scroll = ScrollView(size_hint=(1, 1))
         self._list_layout = GridLayout(
             cols=1,
             spacing=Sizing.PADDING_SM,
@@ -65,12 +133,13 @@ class HistoryScreen(Screen):
         self._list_layout.bind(
             minimum_height=self._list_layout.setter("height")
         )
-        scroll.add_widget(self._list_layout)
-        root.add_widget(scroll)
+        self._scroll.add_widget(self._list_layout)
+        self._scroll.bind(scroll_y=self._on_scroll)
+        root.add_widget(self._scroll)
 
         # empty state label (hidden when there are items)
         self._empty_label = Label(
-            text="No saved locations yet.\nLocate an object to get started.",
+            text="",
             font_size=Sizing.FONT_BODY,
             color=Colors.TEXT_HINT,
             halign="center",
@@ -80,29 +149,132 @@ class HistoryScreen(Screen):
 
         # bottom back button
         back_btn = SecondaryButton(text="BACK", size_hint_y=None, height=48)
-        back_btn.bind(on_release=lambda *a: setattr(self.manager, "current", "camera"))
+        back_btn.bind(on_release=lambda *a: self.app.show_screen("camera"))
         root.add_widget(back_btn)
 
         self.add_widget(root)
 
+    def _make_filter_button(self, text, callback):
+        btn = Button(
+            text=text,
+            font_size=Sizing.FONT_SMALL,
+            color=Colors.ACCENT,
+            background_normal="",
+            background_color=Colors.BG_CARD,
+        )
+        btn.bind(on_release=lambda *a: callback())
+        return btn
+
     def on_enter(self):
         """Refresh list every time screen is shown."""
         self._refresh_list()
 
+    # -- filters --
+
+    def _next_sort(self):
+        self._sort = (self._sort + 1) % len(SORT_CHOICES)
+        # "nearest" needs to know where we are
+        if SORT_CHOICES[self._sort][0] == "distance" and not self._has_position():
+            self._sort = 0
+        self._sort_btn.text = SORT_CHOICES[self._sort][1]
+        self._refresh_list()
+
+    def _next_time(self):
+        self._time = (self._time + 1) % len(TIME_CHOICES)
+        self._time_btn.text = TIME_CHOICES[self._time][1]
+        self._refresh_list()
+
+    def _next_accuracy(self):
+        self._accuracy = (self._accuracy + 1) % len(ACCURACY_CHOICES)
+        self._accuracy_btn.text = ACCURACY_CHOICES[self._accuracy][1]
+        self._refresh_list()
+
+    def _on_search_text(self, instance, text):
+        # the index lookup is a few ms, so this only folds together keys
+        # that arrive in quick succession (autorepeat, paste, IME commits)
+        if self._filter_event is not None:
+            self._filter_event.cancel()
+        self._filter_event = Clock.schedule_once(lambda dt: self._refresh_list(), SEARCH_DELAY)
+
+    def _has_position(self):
+        gps = self.app.location_svc
+        return gps.is_active and (gps.latitude, gps.longitude) != (0.0, 0.0)
+
+    def _query_args(self):
+        sort = SORT_CHOICES[self._sort][0]
+        args = {"sort": sort}
+        if sort == "distance":
+            gps = self.app.location_svc
+            args["near"] = (gps.latitude, gps.longitude)
+        days = TIME_CHOICES[self._time][0]
+        if days is not None:
+            args["since"] = datetime.now() - timedelta(days=days)
+        max_accuracy = ACCURACY_CHOICES[self._accuracy][0]
+        if max_accuracy is not None:
+            args["max_accuracy"] = max_accuracy
+        search = self._search_input.text.strip()
+        if search:
+            args["search"] = search
+        return args
+
+    def _is_filtered(self):
+        return (self._time, self._accuracy) != (0, 0) or bool(self._search_input.text.strip())
+
+    # -- paging --
+
     def _refresh_list(self):
+        self._generation += 1
         self._list_layout.clear_widgets()
+        self._scroll.scroll_y = 1
+        self._offset = 0
+        self._has_more = True
+        self._loading = False
+        self._load_next_page()
+
+    def _load_next_page(self):
+        if self._loading or not self._has_more:
+            return
+        self._loading = True
+        generation = self._generation
+        offset = self._offset
+        args = self._query_args()
+
+        def worker():
+            page = self.app.repo.query(offset=offset, limit=PAGE_SIZE, **args)
+            Clock.schedule_once(lambda dt: self._on_page(generation, page))
+
+        threading.Thread(target=worker, name="history-page", daemon=True).start()
 
-        locations = self.app.repo.get_all()
+    @profiled("history.page")
+    def _on_page(self, generation, page):
+        if generation != self._generation:
+            return  # the filters changed while it was loading
+        self._loading = False
+        self._has_more = page.has_more
+        self._offset = page.offset + len(page.items)
 
-        if not locations:
+        if not page.items and page.offset == 0:
+            self._empty_label.text = (
+                "Nothing matches these filters." if self._is_filtered() else
+                "No saved locations yet.\nLocate an object to get started."
+            )
             self._list_layout.add_widget(self._empty_label)
             return
 
-        for idx, loc in enumerate(locations):
-            card = self._make_card(idx, loc)
-            self._list_layout.add_widget(card)
+        for loc in page.items:
+            self._list_layout.add_widget(self._make_card(loc))
+        # a short page may not fill the view, and then there's nothing
+        # to scroll — check again once it's laid out
+        Clock.schedule_once(lambda dt: self._on_scroll())
+
+    def _on_scroll(self, *args):
+        if not self._has_more or self._loading:
+            return
+        hidden = self._list_layout.height - self._scroll.height
+        if hidden <= 0 or self._scroll.scroll_y * hidden < LOAD_AHEAD * self._scroll.height:
+            self._load_next_page()
 
-    def _make_card(self, index, loc):
+    def _make_card(self, loc):
         """Build a card widget for a single saved location."""
         card = BoxLayout(
             orientation="vertical",
@@ -141,6 +313,8 @@ class HistoryScreen(Screen):
             f"Distance: {loc.distance:.0f}m  |  "
             f"±{loc.accuracy:.0f}m"
         )
+        if loc.observations > 1:
+            details += f"  |  ×{loc.observations}"
         details_lbl = Label(
             text=details,
             font_size=Sizing.FONT_SMALL,
@@ -152,9 +326,12 @@ class HistoryScreen(Screen):
         details_lbl.bind(size=details_lbl.setter("text_size"))
         card.add_widget(details_lbl)
 
-        # timestamp
+        # timestamp, and the label ("near X" when it was saved with a gazetteer)
+        ts_text = loc.timestamp[:19].replace("T", "  ")  # trim microseconds
+        if loc.label:
+            ts_text += f"  ·  {loc.label}"
         ts_lbl = Label(
-            text=loc.timestamp[:19].replace("T", "  "),  # trim microseconds
+            text=ts_text,
             font_size=Sizing.FONT_SMALL,
             color=Colors.TEXT_HINT,
             halign="left",
@@ -180,8 +357,7 @@ class HistoryScreen(Screen):
             background_color=(0, 0, 0, 0),
             size_hint_x=0.5,
         )
-        open_btn.bind(on_release=lambda btn, la=loc.dest_lat, lo=loc.dest_lon:
-                       self._open_in_maps(la, lo))
+        open_btn.bind(on_release=lambda btn, l=loc: self._open_in_maps(l))
 
         del_btn = Button(
             text="Delete",
@@ -191,7 +367,7 @@ class HistoryScreen(Screen):
             background_color=(0, 0, 0, 0),
             size_hint_x=0.5,
         )
-        del_btn.bind(on_release=lambda btn, i=index: self._delete_entry(i))
+        del_btn.bind(on_release=lambda btn, i=loc.id, c=card: self._delete_entry(i, c))
 
         actions.add_widget(open_btn)
         actions.add_widget(del_btn)
@@ -199,13 +375,16 @@ class HistoryScreen(Screen):
 
         return card
 
-    def _open_in_maps(self, lat, lon):
-        url = f"https://www.google.com/maps/search/?api=1&query={lat},{lon}"
-        try:
-            webbrowser.open(url)
-        except Exception as e:
-            Logger.warning(f"HistoryScreen: maps open failed - {e}")
+    def _open_in_maps(self, loc):
+        self.app.get_screen("map").show_result(loc, back_to="history")
+        self.app.show_screen("map")
 
-    def _delete_entry(self, index):
-        self.app.repo.delete(index)
-        self._refresh_list()
+    def _delete_entry(self, location_id, card):
+        # by id — a position could point at another record after a reload
+        if not self.app.repo.delete_by_id(location_id):
+            return
+        # drop just this card so the list keeps its place
+        self._list_layout.remove_widget(card)
+        self._offset = max(self._offset - 1, 0)
+        if not self._list_layout.children and not self._has_more:
+            self._refresh_list()
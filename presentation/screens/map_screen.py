@@ -0,0 +1,110 @@
+"""Map screen — shows a result (and saved locations) on the offline map.
+
+Replaces the old "open Google Maps in the browser" buttons. Tiles come
+from tiles.mbtiles in the app's data directory; without that file the
+points and lines still draw over a blank background.
+"""
+import os
+
+from kivy.uix.screenmanager import Screen
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.label import Label
+from kivy.graphics import Color, Rectangle
+from kivy.clock import Clock
+
+from presentation.theme import Colors, Sizing
+from presentation.widgets.map_view import MapView
+from presentation.widgets.styled_button import SecondaryButton
+from data.tile_cache import MBTiles, TILE_CACHE_FILE
+from domain.cluster_index import ClusterIndex
+
+
+class MapScreen(Screen):
+
+    def __init__(self, app_ref, **kwargs):
+        super().__init__(name="map", **kwargs)
+        self.app = app_ref
+        self._back_to = "camera"
+        self._fit_pending = False
+        self._build_ui()
+
+        # saved destinations, kept in step with the repository
+        self._clusters = ClusterIndex()
+        self._index_all()
+        self.app.repo.add_listener(self._on_repo_change)
+        self._map.set_clusters(self._clusters)
+
+    def _build_ui(self):
+        root = BoxLayout(orientation="vertical")
+
+        with root.canvas.before:
+            Color(*Colors.BG_PRIMARY)
+            self._bg = Rectangle(pos=root.pos, size=root.size)
+        root.bind(
+            pos=lambda *a: setattr(self._bg, "pos", root.pos),
+            size=lambda *a: setattr(self._bg, "size", root.size),
+        )
+
+        tiles = MBTiles.open(os.path.join(self.app.user_data_dir, TILE_CACHE_FILE))
+        self._map = MapView(tiles=tiles, size_hint=(1, 1))
+        root.add_widget(self._map)
+
+        self._info_label = Label(
+            text="" if tiles else "No offline map tiles — showing points only",
+            font_size=Sizing.FONT_SMALL,
+            color=Colors.TEXT_HINT,
+            size_hint_y=None,
+            height=24,
+        )
+        root.add_widget(self._info_label)
+
+        bottom = BoxLayout(
+            orientation="horizontal",
+            size_hint_y=None,
+            height=Sizing.BUTTON_HEIGHT + Sizing.PADDING,
+            padding=[Sizing.PADDING, Sizing.PADDING_SM],
+            spacing=Sizing.PADDING_SM,
+        )
+        fit_btn = SecondaryButton(text="RECENTER")
+        fit_btn.bind(on_release=lambda *a: self._map.fit_result())
+        back_btn = SecondaryButton(text="BACK")
+        back_btn.bind(on_release=lambda *a: self.app.show_screen(self._back_to))
+        bottom.add_widget(fit_btn)
+        bottom.add_widget(back_btn)
+        root.add_widget(bottom)
+
+        self.add_widget(root)
+
+    def show_result(self, result, back_to="camera"):
+        """Show a locate result (dict or SavedLocation) plus the saved history."""
+        get = result.get if isinstance(result, dict) else lambda k: getattr(result, k)
+        self._map.set_result(get("src_lat"), get("src_lon"),
+                             get("dest_lat"), get("dest_lon"), get("accuracy"))
+        self._back_to = back_to
+        self._fit_pending = True
+
+    def on_enter(self):
+        if self._fit_pending:
+            self._fit_pending = False
+            # wait a frame so the map has its real size before fitting
+            Clock.schedule_once(lambda dt: self._map.fit_result())
+
+    def _index_all(self):
+        self._clusters.clear()
+        self._clusters.load(
+            (loc.id, loc.dest_lat, loc.dest_lon) for loc in self.app.repo.get_all()
+        )
+
+    def _on_repo_change(self, event, location):
+        # may come from the repo's load thread, apply it on the UI thread
+        Clock.schedule_once(lambda dt: self._apply_repo_change(event, location))
+
+    def _apply_repo_change(self, event, location):
+        if event in ("add", "update"):
+            # an update (merged sighting) may have moved, add() re-files it
+            self._clusters.add(location.id, location.dest_lat, location.dest_lon)
+        elif event == "delete":
+            self._clusters.remove(location.id)
+        else:
+            self._index_all()
+        self._map.refresh()
@@ -2,8 +2,6 @@
 
 Card-based layout with coordinate details, map link, and action buttons.
 """
-import webbrowser
-
 from kivy.uix.screenmanager import Screen
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.gridlayout import GridLayout
@@ -11,7 +9,6 @@ from kivy.uix.label import Label
 from kivy.uix.scrollview import ScrollView
 from kivy.graphics import Color, RoundedRectangle, Rectangle
 from kivy.clock import Clock
-from kivy.core.clipboard import Clipboard
 from kivy.logger import Logger
 
 from presentation.theme import Colors, Sizing
@@ -52,6 +49,16 @@ class ResultScreen(Screen):
         )
         root.add_widget(title)
 
+        # nearest named place from the offline gazetteer, if there is one
+        self._place_label = Label(
+            text="",
+            font_size=Sizing.FONT_BODY,
+            color=Colors.TEXT_SECONDARY,
+            size_hint_y=None,
+            height=24,
+        )
+        root.add_widget(self._place_label)
+
         # -- result card --
         card = BoxLayout(
             orientation="vertical",
@@ -106,7 +113,7 @@ class ResultScreen(Screen):
             spacing=Sizing.PADDING_SM,
         )
 
-        maps_btn = PrimaryButton(text="OPEN IN MAPS")
+        maps_btn = PrimaryButton(text="SHOW ON MAP")
         maps_btn.bind(on_release=self._open_maps)
 
         save_btn = PrimaryButton(
@@ -168,11 +175,17 @@ class ResultScreen(Screen):
         lat = result["dest_lat"]
         lon = result["dest_lon"]
 
+        self._place_label.text = self.app.place_label(lat, lon)
         self._lat_label._value_label.text = f"{lat:.6f}°"
         self._lon_label._value_label.text = f"{lon:.6f}°"
         self._bearing_label._value_label.text = f"{result['bearing']:.1f}°"
         self._distance_label._value_label.text = f"{result['distance']:.0f} m"
         self._accuracy_label._value_label.text = f"±{result['accuracy']:.0f} m"
+        ellipse = result.get("error_ellipse")
+        if ellipse is not None:
+            self._accuracy_label._value_label.text += (
+                f"  ({ellipse.major:.0f} × {ellipse.minor:.0f} m)"
+            )
 
         # set accuracy color
         acc = result["accuracy"]
@@ -192,13 +205,8 @@ class ResultScreen(Screen):
         result = self.app.last_result
         if not result:
             return
-        lat, lon = result["dest_lat"], result["dest_lon"]
-        # google maps URL works on both desktop and mobile
-        url = f"https://www.google.com/maps/search/?api=1&query={lat},{lon}"
-        try:
-            webbrowser.open(url)
-        except Exception as e:
-            Logger.warning(f"ResultScreen: couldn't open maps - {e}")
+        self.app.get_screen("map").show_result(result, back_to="result")
+        self.app.show_screen("map")
 
     def _save_location(self, *args):
         result = self.app.last_result
@@ -213,16 +221,25 @@ class ResultScreen(Screen):
             bearing=result["bearing"],
             distance=result["distance"],
             accuracy=result["accuracy"],
+            label=self.app.place_label(result["dest_lat"], result["dest_lon"]),
+            sightings=[result["observation"]],
+            calculator_version=result["observation"].calculator_version,
         )
-        self.app.repo.add(loc)
-        Logger.info("ResultScreen: location saved")
+        stored = self.app.repo.add(loc)
+        if stored is loc:
+            Logger.info("ResultScreen: location saved")
+            feedback = "SAVED!"
+        else:
+            Logger.info(f"ResultScreen: merged into a saved location "
+                        f"({stored.observations} sightings)")
+            feedback = f"MERGED ×{stored.observations}"
 
         # visual feedback — briefly change button text
         for child in self.children[0].children:
             if hasattr(child, "children"):
                 for btn in child.children:
                     if hasattr(btn, "text") and btn.text == "SAVE LOCATION":
-                        btn.text = "SAVED!"
+                        btn.text = feedback
                         Clock.schedule_once(
                             lambda dt: setattr(btn, "text", "SAVE LOCATION"), 1.5
                         )
@@ -234,9 +251,12 @@ class ResultScreen(Screen):
             return
         text = f"{result['dest_lat']:.6f}, {result['dest_lon']:.6f}"
         try:
+            # the clipboard provider is picked on first import, don't pay
+            # for that at startup
+            from kivy.core.clipboard import Clipboard
             Clipboard.copy(text)
         except Exception:
             pass
 
     def _go_back(self, *args):
-        self.manager.current = "camera"
+        self.app.show_screen("camera")
@@ -0,0 +1,333 @@
+"""In-app map drawn from the offline tile cache.
+
+Renders web mercator tiles from an MBTiles file (data/tile_cache.py)
+and draws a locate result on top: source point, bearing line, target
+and its accuracy circle, plus saved points clustered through a
+domain/cluster_index.py ClusterIndex. Tapping a cluster zooms in until
+it splits.
+
+Nothing here touches the network. Tiles that aren't cached are drawn
+from a cached lower zoom tile scaled up if there is one, otherwise the
+background grid shows through.
+
+Keeping pan/zoom smooth:
+  - decoded textures live in an LRU keyed by (z, x, y), so panning back
+    and forth never decodes twice
+  - at most DECODES_PER_FRAME tiles are decoded per frame, the rest
+    come in over the next frames
+  - redraws are coalesced with a Clock trigger, one per frame at most
+  - saved points come from the cluster index, which only returns what
+    is in view, so the cost doesn't grow with the size of the history
+"""
+import io
+import math
+
+from kivy.uix.stencilview import StencilView
+from kivy.graphics import Color, Rectangle, Line, Ellipse
+from kivy.properties import NumericProperty
+from kivy.clock import Clock
+from kivy.core.image import Image as CoreImage
+from kivy.core.text import Label as CoreLabel
+from kivy.logger import Logger
+
+from presentation.theme import Colors, Sizing
+from utils.lru_cache import LRUCache
+from utils.tile_math import (
+    TILE_SIZE, latlon_to_pixel, pixel_to_latlon, map_size,
+    meters_per_pixel, visible_tiles, fit_zoom,
+)
+
+
+class MapView(StencilView):
+    zoom = NumericProperty(2.0)       # fractional, tiles snap to the nearest level
+    center_lat = NumericProperty(0.0)
+    center_lon = NumericProperty(0.0)
+
+    MIN_ZOOM = 1
+    MAX_ZOOM = 19
+    TEXTURE_CACHE_SIZE = 96   # ~25 MB of 256x256 RGBA
+    DECODES_PER_FRAME = 4
+    PARENT_FALLBACK_LEVELS = 4
+    SCROLL_ZOOM_STEP = 0.5
+    TAP_SLOP = 10  # px a touch may move and still count as a tap
+
+    def __init__(self, tiles=None, **kwargs):
+        super().__init__(**kwargs)
+        self.tiles = tiles
+        self._textures = LRUCache(self.TEXTURE_CACHE_SIZE)
+        self._missing = set()
+        self._result = None
+        self._clusters = None
+        self._drawn_clusters = []  # (x, y, radius, Cluster) from the last redraw
+        self._count_labels = LRUCache(64)
+        self._touches = []
+
+        self._redraw_trigger = Clock.create_trigger(self._redraw)
+        self.bind(pos=self._redraw_trigger, size=self._redraw_trigger,
+                  zoom=self._redraw_trigger, center_lat=self._redraw_trigger,
+                  center_lon=self._redraw_trigger)
+
+    # -- content --
+
+    def set_result(self, src_lat, src_lon, dest_lat, dest_lon, accuracy):
+        self._result = (src_lat, src_lon, dest_lat, dest_lon, accuracy)
+        self._redraw_trigger()
+
+    def clear_result(self):
+        self._result = None
+        self._redraw_trigger()
+
+    def set_clusters(self, index):
+        """ClusterIndex of saved points to draw. Call refresh() after changing it."""
+        self._clusters = index
+        self._redraw_trigger()
+
+    def refresh(self):
+        self._redraw_trigger()
+
+    def set_tiles(self, tiles):
+        self.tiles = tiles
+        self._textures.clear()
+        self._missing.clear()
+        self._redraw_trigger()
+
+    def center_on(self, lat, lon, zoom=None):
+        self.center_lat = lat
+        self.center_lon = lon
+        if zoom is not None:
+            self.zoom = self._clamp_zoom(zoom)
+
+    def fit(self, lats, lons, padding=40):
+        """Centre and zoom so all the given positions are visible."""
+        zoom, lat, lon = fit_zoom(lats, lons, self.width, self.height,
+                                  padding=padding, min_zoom=self.MIN_ZOOM,
+                                  max_zoom=self.MAX_ZOOM - 2)
+        self.center_on(lat, lon, zoom)
+
+    def fit_result(self):
+        if self._result:
+            src_lat, src_lon, dest_lat, dest_lon, _ = self._result
+            self.fit([src_lat, dest_lat], [src_lon, dest_lon])
+
+    # -- coordinates --
+
+    def _clamp_zoom(self, zoom):
+        return max(self.MIN_ZOOM, min(self.MAX_ZOOM, zoom))
+
+    def _tile_zoom(self):
+        tz = int(round(self.zoom))
+        if self.tiles is not None:
+            zoom_range = self.tiles.zoom_range
+            if zoom_range:
+                tz = max(zoom_range[0], min(zoom_range[1], tz))
+        return tz
+
+    def to_screen(self, lat, lon):
+        gx, gy = latlon_to_pixel(lat, lon, self.zoom)
+        cx, cy = latlon_to_pixel(self.center_lat, self.center_lon, self.zoom)
+        return self.center_x + gx - cx, self.center_y - (gy - cy)
+
+    def _pan(self, dx, dy):
+        size = map_size(self.zoom)
+        cx, cy = latlon_to_pixel(self.center_lat, self.center_lon, self.zoom)
+        cx = (cx - dx) % size
+        cy = max(0.0, min(size, cy + dy))
+        self.center_lat, self.center_lon = pixel_to_latlon(cx, cy, self.zoom)
+
+    # -- touch --
+
+    def on_touch_down(self, touch):
+        if not self.collide_point(*touch.pos):
+            return super().on_touch_down(touch)
+
+        if getattr(touch, "is_mouse_scrolling", False):
+            step = self.SCROLL_ZOOM_STEP
+            if touch.button == "scrolldown":
+                self.zoom = self._clamp_zoom(self.zoom + step)
+            elif touch.button == "scrollup":
+                self.zoom = self._clamp_zoom(self.zoom - step)
+            return True
+
+        if touch.is_double_tap:
+            self.zoom = self._clamp_zoom(round(self.zoom) + 1)
+            return True
+
+        touch.grab(self)
+        self._touches.append(touch)
+        return True
+
+    def on_touch_move(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_move(touch)
+
+        if len(self._touches) == 1:
+            self._pan(touch.dx, touch.dy)
+        elif len(self._touches) >= 2:
+            # pinch: zoom by how much the two fingers moved apart
+            a, b = self._touches[0], self._touches[1]
+            now = math.hypot(a.x - b.x, a.y - b.y)
+            before = math.hypot(a.px - b.px, a.py - b.py)
+            if now > 0 and before > 0:
+                self.zoom = self._clamp_zoom(self.zoom + math.log2(now / before))
+        return True
+
+    def on_touch_up(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_up(touch)
+        touch.ungrab(self)
+        if touch in self._touches:
+            self._touches.remove(touch)
+            if (not self._touches and abs(touch.x - touch.ox) < self.TAP_SLOP
+                    and abs(touch.y - touch.oy) < self.TAP_SLOP):
+                self._on_tap(touch.x, touch.y)
+        return True
+
+    def _on_tap(self, x, y):
+        for cx, cy, radius, cluster in self._drawn_clusters:
+            if cluster.count > 1 and math.hypot(x - cx, y - cy) <= radius:
+                zoom = self._clusters.expansion_zoom(cluster.lat, cluster.lon, self.zoom)
+                self.center_on(cluster.lat, cluster.lon, zoom)
+                return
+
+    # -- textures --
+
+    def _decode(self, key):
+        data = self.tiles.tile_data(*key)
+        if data is None:
+            self._missing.add(key)
+            return None
+        try:
+            texture = CoreImage(io.BytesIO(data), ext=self.tiles.image_format).texture
+        except Exception as e:
+            Logger.warning(f"MapView: bad tile {key} - {e}")
+            self._missing.add(key)
+            return None
+        self._textures.put(key, texture)
+        return texture
+
+    def _fallback_region(self, tz, tx, ty):
+        """Part of a cached lower zoom tile covering (tz, tx, ty), if any."""
+        for dz in range(1, self.PARENT_FALLBACK_LEVELS + 1):
+            if tz - dz < 0:
+                break
+            factor = 2 ** dz
+            parent = self._textures.get((tz - dz, tx // factor, ty // factor))
+            if parent is not None:
+                sub = TILE_SIZE / factor
+                u = (tx % factor) * sub
+                v = TILE_SIZE - (ty % factor + 1) * sub  # texture y is bottom-up
+                return parent.get_region(u, v, sub, sub)
+        return None
+
+    # -- drawing --
+
+    def _redraw(self, *args):
+        self.canvas.clear()
+        tz = self._tile_zoom()
+        scale = 2.0 ** (self.zoom - tz)
+        cx, cy = latlon_to_pixel(self.center_lat, self.center_lon, tz)
+        budget = self.DECODES_PER_FRAME
+        deferred = False
+
+        with self.canvas:
+            Color(*Colors.BG_SURFACE)
+            Rectangle(pos=self.pos, size=self.size)
+
+            if self.tiles is not None:
+                Color(1, 1, 1, 1)
+                tile_px = TILE_SIZE * scale
+                for tx, ty, col in visible_tiles(cx, cy, self.width / scale,
+                                                 self.height / scale, tz):
+                    key = (tz, tx, ty)
+                    texture = self._textures.get(key)
+                    if texture is None and key not in self._missing:
+                        if budget > 0:
+                            budget -= 1
+                            texture = self._decode(key)
+                        else:
+                            deferred = True
+                    if texture is None:
+                        texture = self._fallback_region(tz, tx, ty)
+                    if texture is None:
+                        continue
+                    x = self.center_x + (col * TILE_SIZE - cx) * scale
+                    y = self.center_y - ((ty + 1) * TILE_SIZE - cy) * scale
+                    Rectangle(texture=texture, pos=(x, y), size=(tile_px, tile_px))
+
+            self._draw_clusters()
+            self._draw_result()
+
+        if deferred:
+            # more tiles to decode, carry on next frame
+            self._redraw_trigger()
+
+    def _count_texture(self, count):
+        texture = self._count_labels.get(count)
+        if texture is None:
+            text = str(count) if count < 1000 else f"{count // 1000}k"
+            label = CoreLabel(text=text, font_size=Sizing.FONT_SMALL - 1, bold=True)
+            label.refresh()
+            texture = label.texture
+            self._count_labels.put(count, texture)
+        return texture
+
+    def _draw_clusters(self):
+        self._drawn_clusters = []
+        index = self._clusters
+        if index is None or not len(index):
+            return
+        s = 2.0 ** self.zoom
+        c0x, c0y = latlon_to_pixel(self.center_lat, self.center_lon, 0)
+        half_w = self.width / 2.0 / s
+        half_h = self.height / 2.0 / s
+        clusters = index.query_pixels(c0x - half_w, c0y - half_h,
+                                      c0x + half_w, c0y + half_h, self.zoom)
+
+        ox = self.center_x - c0x * s
+        oy = self.center_y + c0y * s
+        for cluster in clusters:
+            gx, gy = latlon_to_pixel(cluster.lat, cluster.lon, 0)
+            x = ox + gx * s
+            y = oy - gy * s
+            if cluster.count == 1:
+                radius = 5
+                Color(*Colors.ACCENT_WARN)
+                Ellipse(pos=(x - radius, y - radius), size=(radius * 2, radius * 2))
+            else:
+                radius = 11 + 4 * math.log10(cluster.count)
+                Color(*Colors.ACCENT_WARN[:3], 0.85)
+                Ellipse(pos=(x - radius, y - radius), size=(radius * 2, radius * 2))
+                texture = self._count_texture(cluster.count)
+                Color(*Colors.BG_PRIMARY)
+                w, h = texture.size
+                Rectangle(texture=texture, pos=(x - w / 2.0, y - h / 2.0), size=(w, h))
+            self._drawn_clusters.append((x, y, radius, cluster))
+
+    def _draw_result(self):
+        if not self._result:
+            return
+        src_lat, src_lon, dest_lat, dest_lon, accuracy = self._result
+        sx, sy = self.to_screen(src_lat, src_lon)
+        dx, dy = self.to_screen(dest_lat, dest_lon)
+
+        # accuracy circle around the target
+        radius = accuracy / meters_per_pixel(dest_lat, self.zoom)
+        if radius > 2:
+            Color(*Colors.ACCENT_ERROR[:3], 0.18)
+            Ellipse(pos=(dx - radius, dy - radius), size=(radius * 2, radius * 2))
+            Color(*Colors.ACCENT_ERROR[:3], 0.7)
+            Line(circle=(dx, dy, radius), width=1.2)
+
+        # bearing line from where the user stood
+        Color(*Colors.ACCENT)
+        Line(points=[sx, sy, dx, dy], width=2)
+
+        # source
+        Color(*Colors.ACCENT)
+        Ellipse(pos=(sx - 7, sy - 7), size=(14, 14))
+        Color(*Colors.BG_PRIMARY)
+        Ellipse(pos=(sx - 3, sy - 3), size=(6, 6))
+
+        # target
+        Color(*Colors.ACCENT_ERROR)
+        Ellipse(pos=(dx - 6, dy - 6), size=(12, 12))
@@ -0,0 +1,48 @@
+"""Debug overlay with frame and callback timings.
+
+Only added to the camera screen when PINPOINT_PROFILE=1, see
+utils/profiler.py. Shows dropped frames and the slowest callbacks,
+refreshed twice a second so it doesn't skew what it's measuring.
+"""
+from kivy.uix.label import Label
+from kivy.graphics import Color, Rectangle
+from kivy.clock import Clock
+
+from presentation.theme import Colors, Sizing
+from utils.profiler import profiler
+
+REFRESH_INTERVAL = 0.5
+
+
+class ProfilerOverlay(Label):
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("font_size", Sizing.FONT_SMALL - 2)
+        kwargs.setdefault("color", Colors.TEXT_PRIMARY)
+        kwargs.setdefault("halign", "left")
+        kwargs.setdefault("valign", "top")
+        super().__init__(**kwargs)
+
+        with self.canvas.before:
+            Color(*Colors.OVERLAY_BG)
+            self._bg = Rectangle(pos=self.pos, size=self.size)
+        self.bind(pos=self._update_bg, size=self._update_bg)
+
+        self._event = None
+
+    def _update_bg(self, *args):
+        self._bg.pos = self.pos
+        self._bg.size = self.size
+        self.text_size = self.size
+
+    def start(self):
+        if self._event is None:
+            self._event = Clock.schedule_interval(self._refresh, REFRESH_INTERVAL)
+
+    def stop(self):
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    def _refresh(self, dt):
+        self.text = "\n".join(profiler.summary())
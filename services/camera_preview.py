@@ -0,0 +1,62 @@
+"""Live camera preview with the crosshair overlay.
+
+Kept apart from services/camera_service.py because importing
+kivy.uix.camera loads the camera provider (OpenCV on desktop), which
+is slow. create_camera_widget() imports this once the UI is up.
+"""
+from kivy.uix.camera import Camera
+from kivy.graphics import Color, Line, Ellipse
+from kivy.clock import Clock
+
+
+class CameraPreview(Camera):
+    """Camera widget with crosshair overlay.
+
+    Extends Kivy's built-in Camera to add a targeting reticle on top.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("resolution", (640, 480))
+        kwargs.setdefault("play", False)
+        super().__init__(**kwargs)
+        self._crosshair_binds_done = False
+
+    def start(self):
+        self.play = True
+        if not self._crosshair_binds_done:
+            self.bind(size=self._draw_crosshair, pos=self._draw_crosshair)
+            Clock.schedule_once(lambda dt: self._draw_crosshair(), 0.5)
+            self._crosshair_binds_done = True
+
+    def stop(self):
+        self.play = False
+
+    def _draw_crosshair(self, *args):
+        # clear old crosshair graphics
+        self.canvas.after.clear()
+        cx = self.center_x
+        cy = self.center_y
+
+        with self.canvas.after:
+            # outer ring
+            Color(1, 1, 1, 0.6)
+            r = 40
+            Line(circle=(cx, cy, r), width=1.5)
+
+            # inner dot
+            Color(1, 0.2, 0.2, 0.8)
+            dot_r = 4
+            Ellipse(pos=(cx - dot_r, cy - dot_r), size=(dot_r * 2, dot_r * 2))
+
+            # crosshair lines
+            Color(1, 1, 1, 0.4)
+            gap = 15
+            line_len = 25
+            # top
+            Line(points=[cx, cy + gap, cx, cy + gap + line_len], width=1.2)
+            # bottom
+            Line(points=[cx, cy - gap, cx, cy - gap - line_len], width=1.2)
+            # left
+            Line(points=[cx - gap, cy, cx - gap - line_len, cy], width=1.2)
+            # right
+            Line(points=[cx + gap, cy, cx + gap + line_len, cy], width=1.2)
@@ -1,69 +1,16 @@
 """Camera preview service.
 
-On mobile we use Kivy's Camera widget which wraps platform camera APIs.
+On mobile we use Kivy's Camera widget which wraps platform camera APIs
+(see services/camera_preview.py, loaded on demand).
 On desktop it'll try to use a webcam — if none is available we show
 a placeholder gradient instead.
 """
-from kivy.uix.camera import Camera
 from kivy.uix.widget import Widget
 from kivy.graphics import Color, Rectangle, Line, Ellipse
 from kivy.clock import Clock
 from kivy.logger import Logger
 
 
-class CameraPreview(Camera):
-    """Camera widget with crosshair overlay.
-
-    Extends Kivy's built-in Camera to add a targeting reticle on top.
-    """
-
-    def __init__(self, **kwargs):
-        kwargs.setdefault("resolution", (640, 480))
-        kwargs.setdefault("play", False)
-        super().__init__(**kwargs)
-        self._crosshair_binds_done = False
-
-    def start(self):
-        self.play = True
-        if not self._crosshair_binds_done:
-            self.bind(size=self._draw_crosshair, pos=self._draw_crosshair)
-            Clock.schedule_once(lambda dt: self._draw_crosshair(), 0.5)
-            self._crosshair_binds_done = True
-
-    def stop(self):
-        self.play = False
-
-    def _draw_crosshair(self, *args):
-        # clear old crosshair graphics
-        self.canvas.after.clear()
-        cx = self.center_x
-        cy = self.center_y
-
-        with self.canvas.after:
-            # outer ring
-            Color(1, 1, 1, 0.6)
-            r = 40
-            Line(circle=(cx, cy, r), width=1.5)
-
-            # inner dot
-            Color(1, 0.2, 0.2, 0.8)
-            dot_r = 4
-            Ellipse(pos=(cx - dot_r, cy - dot_r), size=(dot_r * 2, dot_r * 2))
-
-            # crosshair lines
-            Color(1, 1, 1, 0.4)
-            gap = 15
-            line_len = 25
-            # top
-            Line(points=[cx, cy + gap, cx, cy + gap + line_len], width=1.2)
-            # bottom
-            Line(points=[cx, cy - gap, cx, cy - gap - line_len], width=1.2)
-            # left
-            Line(points=[cx - gap, cy, cx - gap - line_len, cy], width=1.2)
-            # right
-            Line(points=[cx + gap, cy, cx + gap + line_len, cy], width=1.2)
-
-
 class FallbackPreview(Widget):
     """Shown when camera isn't available (e.g., no webcam on desktop).
 
@@ -126,14 +73,16 @@ def create_camera_widget(**kwargs):
 
     Kivy's Camera widget will throw if no camera provider is available,
     so we catch that and use our grid-based fallback instead.
+
+    The preview isn't started here — call start() once it's on screen.
     """
     # filter out kwargs that FallbackPreview doesn't understand
     fallback_kwargs = {k: v for k, v in kwargs.items()
                        if k in ("size_hint", "pos_hint", "size", "pos")}
     try:
+        # imported here: loading kivy.uix.camera picks the camera provider
+        from services.camera_preview import CameraPreview
         cam = CameraPreview(**kwargs)
-        cam.play = True
-        Clock.schedule_once(lambda dt: None, 0.1)
         Logger.info("CameraService: using real camera")
         return cam
     except Exception as e:
@@ -1,31 +1,152 @@
 """Compass / heading service.
 
 Uses plyer compass on mobile, simulates on desktop.
-Heading values are smoothed using circular averaging to reduce jitter.
+Heading values are smoothed using circular averaging to reduce jitter,
+then corrected from magnetic to true north using the offline WMM.
+
+Raw magnetometer readings go through the phone's hard/soft-iron
+calibration first (domain/magnetometer_calibration.py). The user makes
+one with start_calibration() and a few turns of the phone; it's saved
+and loaded again on the next start.
+
+The corrected readings are also checked against the earth's field here
+(domain/magnetic_interference.py), so `interference` goes up next to a
+car or a steel door and heading_error grows with it.
 """
+import math
+import random
+
 from kivy.event import EventDispatcher
 from kivy.properties import NumericProperty, StringProperty, BooleanProperty
 from kivy.clock import Clock
 from kivy.utils import platform
 from kivy.logger import Logger
 
-from utils.math_utils import smooth_heading, heading_to_cardinal, normalize_heading
+from utils.math_utils import (smooth_heading, heading_spread, heading_to_cardinal,
+                              normalize_heading)
+from domain.geomagnetism import DeclinationGrid
+from domain.magnetometer_calibration import EllipsoidFit, MagnetometerCalibration
+from domain.magnetic_interference import InterferenceDetector
+from utils.profiler import profiled
 
 
 class CompassService(EventDispatcher):
-    heading = NumericProperty(0.0)         # smoothed heading 0-360
-    raw_heading = NumericProperty(0.0)     # unfiltered reading
+    heading = NumericProperty(0.0)         # smoothed true heading 0-360
+    magnetic_heading = NumericProperty(0.0)  # smoothed, before declination
+    raw_heading = NumericProperty(0.0)     # unfiltered magnetic reading
+    declination = NumericProperty(0.0)     # degrees east of true north
     cardinal = StringProperty("N")
     is_active = BooleanProperty(False)
     needs_calibration = BooleanProperty(False)
+    calibrating = BooleanProperty(False)
+    calibration_progress = NumericProperty(0.0)  # 0..1 while calibrating
+    interference = BooleanProperty(False)
+    interference_score = NumericProperty(0.0)    # 0..1, 0.5 is the threshold
 
     SMOOTHING_WINDOW = 8  # number of recent readings to average
+    POLL_HZ = 15          # default rate, see services/sampling_scheduler.py
+    CALIBRATION_CHECK_EVERY = 25  # readings between attempts to finish the fit
+    BASE_ERROR_DEG = 5.0  # a good compass in a clean field, see heading_error
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self._heading_history = []
         self._compass = None
         self._poll_event = None
+        self._poll_fn = None
+        self.poll_hz = self.POLL_HZ
+        self.recorder = None  # services/sensor_recorder.py, set to record
+        self._declination_grid = DeclinationGrid()
+        self.calibration = None       # MagnetometerCalibration, or None for raw readings
+        self._calibration_path = None
+        self._fit = None              # EllipsoidFit while calibrating
+        self._interference = InterferenceDetector()
+        self.gravity_source = None    # has .gravity, the latest accelerometer reading
+
+    def set_location(self, lat, lon):
+        """Update the declination for the user's position.
+
+        Cheap enough to call on every GPS fix — it's a grid lookup, the
+        full magnetic model only runs when we move into a new grid cell.
+        """
+        declination, inclination, intensity = self._declination_grid.elements(lat, lon)
+        self.declination = declination
+        self._interference.set_expected(inclination, intensity / 1000.0)  # nT -> µT
+
+    def load_calibration(self, path):
+        """Use the calibration saved at path, and save new ones there."""
+        self._calibration_path = path
+        self.calibration = MagnetometerCalibration.load(path)
+        if self.calibration is not None:
+            Logger.info(f"CompassService: calibration from {self.calibration.fitted_at} "
+                        f"loaded")
+
+    def start_calibration(self):
+        """Start collecting readings for a new calibration.
+
+        The user should turn the phone slowly through every orientation
+        (a figure eight does it). It finishes on its own as soon as the
+        readings make a good fit — watch `calibrating` and
+        `calibration_progress`.
+        """
+        self._fit = EllipsoidFit()
+        self.calibration_progress = 0.0
+        self.calibrating = True
+
+    def cancel_calibration(self):
+        self._fit = None
+        self.calibrating = False
+
+    def _calibration_sample(self, x, y, z):
+        fit = self._fit
+        fit.add(x, y, z)
+        if fit.count % self.CALIBRATION_CHECK_EVERY:
+            return
+        self.calibration_progress = fit.progress
+        if fit.progress < 1.0:
+            return
+        calibration = fit.solve()
+        if calibration is None:
+            return  # keep turning
+        self._fit = None
+        self.calibration = calibration
+        self._interference.reset()  # what it had was uncorrected
+        self.calibrating = False
+        self.needs_calibration = False
+        Logger.info(f"CompassService: calibrated from {calibration.samples} readings, "
+                    f"field {calibration.field:.1f}, offset "
+                    f"{', '.join(f'{v:.1f}' for v in calibration.offset)}")
+        if self._calibration_path:
+            try:
+                calibration.save(self._calibration_path)
+            except OSError as e:
+                Logger.error(f"CompassService: can't save calibration - {e}")
+
+    @property
+    def heading_variance(self):
+        """Variance (deg²) of the readings the current heading averages."""
+        return heading_spread(self._heading_history, self.SMOOTHING_WINDOW) ** 2
+
+    @property
+    def heading_error(self):
+        """How far off the heading could be right now, in degrees.
+
+        The base error, the jitter of the readings and whatever a
+        disturbed field could add, combined as independent errors. What
+        estimate_accuracy() should get instead of a fixed guess.
+        """
+        error = math.sqrt(self.BASE_ERROR_DEG ** 2 + self.heading_variance
+                          + self._interference.heading_error ** 2)
+        return min(error, 90.0)
+
+    def set_rate(self, hz):
+        """Change the polling rate, rescheduling the timer if running."""
+        if hz == self.poll_hz:
+            return
+        self.poll_hz = hz
+        if self._poll_event:
+            self._poll_event.cancel()
+            self._poll_event = Clock.schedule_interval(self._poll_fn, 1 / hz)
 
     def start(self):
         if self.is_active:
@@ -48,6 +169,7 @@ class CompassService(EventDispatcher):
             self._poll_event = None
 
         self._heading_history.clear()
+        self._interference.reset()
         self.is_active = False
 
     def _start_real_compass(self):
@@ -55,44 +177,70 @@ class CompassService(EventDispatcher):
             from plyer import compass
             self._compass = compass
             self._compass.enable()
-            # poll the compass at ~15 Hz
-            self._poll_event = Clock.schedule_interval(self._read_compass, 1 / 15)
+            self._poll_fn = self._read_compass
+            self._poll_event = Clock.schedule_interval(self._poll_fn, 1 / self.poll_hz)
             self.is_active = True
+            if self.calibration is None:
+                self.needs_calibration = True
             Logger.info("CompassService: real compass enabled")
         except Exception as e:
             Logger.error(f"CompassService: compass failed - {e}")
             self._start_mock_compass()
 
+    @profiled("compass.read")
     def _read_compass(self, dt):
         if not self._compass:
             return
         try:
             field = self._compass.field
             if field and field[0] is not None:
-                import math
-                # plyer gives (x, y, z) magnetic field — compute heading from x,y
-                x, y = field[0], field[1]
-                raw = math.degrees(math.atan2(y, x))
-                raw = normalize_heading(-raw)  # flip sign convention
-                self._update_heading(raw)
+                x, y, z = field[0], field[1], field[2]
+                if self.recorder:
+                    self.recorder.record_compass(x, y, z)
+                self.process_field(x, y, z)
         except Exception as e:
             Logger.warning(f"CompassService: read error - {e}")
             self.needs_calibration = True
 
+    def process_field(self, x, y, z):
+        """Turn one raw magnetometer reading into a heading update.
+
+        Called by the poll timer, or directly by a sensor replay.
+        """
+        if self._fit is not None:
+            # the fit wants what the sensor saw, not what an old calibration made of it
+            self._calibration_sample(x, y, z)
+        calibration = self.calibration
+        if calibration is not None:
+            x, y, z = calibration.apply(x, y, z)
+        self._check_field(x, y, z)
+        # plyer gives (x, y, z) magnetic field — compute heading from x,y
+        raw = math.degrees(math.atan2(y, x))
+        raw = normalize_heading(-raw)  # flip sign convention
+        self._update_heading(raw)
+
+    def _check_field(self, x, y, z):
+        source = self.gravity_source
+        detector = self._interference
+        detector.add(x, y, z, source.gravity if source is not None else None)
+        score = detector.score
+        self.interference_score = score
+        self.interference = score >= 0.5
+
     def _start_mock_compass(self):
         """Simulate compass on desktop — slowly rotates for testing."""
         Logger.info("CompassService: mock compass mode")
         self.is_active = True
         self._mock_angle = 0.0
+        self._poll_fn = self._mock_tick
+        self._poll_event = Clock.schedule_interval(self._poll_fn, 1 / self.poll_hz)
 
-        import random
-        def _tick(dt):
-            # slow rotation with some noise, good enough for UI testing
-            self._mock_angle = (self._mock_angle + 0.5) % 360
-            noise = random.uniform(-2.0, 2.0)
-            self._update_heading(self._mock_angle + noise)
-
-        self._poll_event = Clock.schedule_interval(_tick, 1 / 15)
+    @profiled("compass.mock_tick")
+    def _mock_tick(self, dt):
+        # slow rotation with some noise, good enough for UI testing
+        self._mock_angle = (self._mock_angle + 0.5) % 360
+        noise = random.uniform(-2.0, 2.0)
+        self._update_heading(self._mock_angle + noise)
 
     def _update_heading(self, raw_deg):
         self.raw_heading = normalize_heading(raw_deg)
@@ -102,5 +250,6 @@ class CompassService(EventDispatcher):
         if len(self._heading_history) > 50:
             self._heading_history = self._heading_history[-30:]
 
-        self.heading = smooth_heading(self._heading_history, self.SMOOTHING_WINDOW)
+        self.magnetic_heading = smooth_heading(self._heading_history, self.SMOOTHING_WINDOW)
+        self.heading = normalize_heading(self.magnetic_heading + self.declination)
         self.cardinal = heading_to_cardinal(self.heading)
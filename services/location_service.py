@@ -3,6 +3,11 @@
 Wraps plyer's GPS or falls back to manual input on desktop.
 On actual devices this gives real GPS readings. On desktop/emulator
 it provides mock coordinates for testing.
+
+Raw fixes are also run through a PositionFilter. While averaging is on
+(the phone is held still) accepted fixes are also accumulated into a
+PositionAverager. The source_* properties give the best of the two and
+are what a locate should project from.
 """
 from kivy.event import EventDispatcher
 from kivy.properties import NumericProperty, BooleanProperty
@@ -10,17 +15,68 @@ from kivy.clock import Clock
 from kivy.utils import platform
 from kivy.logger import Logger
 
+from domain.position_filter import PositionFilter, PositionAverager
+from utils.profiler import profiled
+
 
 class LocationService(EventDispatcher):
     latitude = NumericProperty(0.0)
     longitude = NumericProperty(0.0)
     accuracy = NumericProperty(0.0)
+    # smoothed position, see domain/position_filter.py
+    filtered_latitude = NumericProperty(0.0)
+    filtered_longitude = NumericProperty(0.0)
+    filtered_accuracy = NumericProperty(0.0)
+    # best available source point: averaged while stationary, else filtered
+    source_latitude = NumericProperty(0.0)
+    source_longitude = NumericProperty(0.0)
+    source_accuracy = NumericProperty(0.0)
+    averaging = BooleanProperty(False)
+    averaged_count = NumericProperty(0)
     is_active = BooleanProperty(False)
     is_mock = BooleanProperty(False)
 
     _gps = None
     _update_event = None
 
+    MIN_TIME_MS = 1000  # default fix interval, see services/sampling_scheduler.py
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._filter = PositionFilter()
+        self._averager = PositionAverager()
+        self.min_time_ms = self.MIN_TIME_MS
+        self.recorder = None  # services/sensor_recorder.py, set to record
+
+    def set_min_time(self, ms):
+        """Change how often the GPS reports. Restarts the real GPS if running."""
+        if ms == self.min_time_ms:
+            return
+        self.min_time_ms = ms
+        if self._gps and self.is_active and not self.is_mock:
+            try:
+                self._gps.stop()
+                self._gps.start(minTime=ms, minDistance=1)
+            except Exception as e:
+                Logger.warning(f"LocationService: error changing GPS rate - {e}")
+
+    def set_averaging(self, enabled):
+        """Start or stop accumulating fixes (call when the phone stops/starts moving)."""
+        if enabled == self.averaging:
+            return
+        self._averager.reset()
+        self.averaged_count = 0
+        self.averaging = enabled
+        self._publish_source()
+
+    @property
+    def covariance(self):
+        """2x2 east/north covariance (m^2) of the filtered position."""
+        if not self._filter.is_initialized:
+            acc = self.accuracy
+            return ((acc * acc, 0.0), (0.0, acc * acc))
+        return self._filter.covariance
+
     def start(self):
         if self.is_active:
             return
@@ -55,7 +111,7 @@ class LocationService(EventDispatcher):
                 on_location=self._on_location,
                 on_status=self._on_status,
             )
-            self._gps.start(minTime=1000, minDistance=1)
+            self._gps.start(minTime=self.min_time_ms, minDistance=1)
             self.is_active = True
             Logger.info("LocationService: real GPS started")
         except Exception as e:
@@ -68,22 +124,68 @@ class LocationService(EventDispatcher):
         self.latitude = lat
         self.longitude = lon
         self.accuracy = 1.0
+        self._filter.reset(lat, lon, self.accuracy)
+        self._averager.reset()
+        self.averaged_count = 0
+        self._publish_filtered()
         self.is_active = True
         Logger.info(f"LocationService: manual location set to {lat}, {lon}")
 
     def _start_mock_gps(self):
         """Desktop fallback — no real GPS, user enters coords manually."""
         Logger.info("LocationService: mock GPS mode, waiting for manual input")
-        self.latitude = 0.0
-        self.longitude = 0.0
-        self.accuracy = 0.0
+        # keep any manually entered position across stop/start
         self.is_active = True
         self.is_mock = True
 
     def _on_location(self, **kwargs):
+        if self.recorder:
+            self.recorder.record_gps(
+                kwargs.get("lat", self.latitude),
+                kwargs.get("lon", self.longitude),
+                kwargs.get("accuracy", self.accuracy),
+                kwargs.get("altitude", 0.0),
+            )
+        self.process_fix(**kwargs)
+
+    @profiled("location.fix")
+    def process_fix(self, **kwargs):
+        """Handle one GPS fix (plyer on_location kwargs).
+
+        Called by the plyer callback, or directly by a sensor replay,
+        which passes the fix's recorded time as `timestamp` — without it
+        the filter goes by the clock.
+        """
         self.latitude = kwargs.get("lat", self.latitude)
         self.longitude = kwargs.get("lon", self.longitude)
         self.accuracy = kwargs.get("accuracy", self.accuracy)
 
+        if self._filter.update(self.latitude, self.longitude, self.accuracy,
+                               timestamp=kwargs.get("timestamp")):
+            if self.averaging:
+                self._averager.add(self.latitude, self.longitude, self.accuracy)
+                self.averaged_count = self._averager.count
+            self._publish_filtered()
+        else:
+            Logger.info(f"LocationService: rejected outlier fix "
+                        f"{self.latitude:.6f}, {self.longitude:.6f}")
+
+    def _publish_filtered(self):
+        self.filtered_latitude = self._filter.latitude
+        self.filtered_longitude = self._filter.longitude
+        self.filtered_accuracy = self._filter.accuracy
+        self._publish_source()
+
+    def _publish_source(self):
+        avg = self._averager
+        if avg.count >= 2 and avg.accuracy < self.filtered_accuracy:
+            self.source_latitude = avg.latitude
+            self.source_longitude = avg.longitude
+            self.source_accuracy = avg.accuracy
+        else:
+            self.source_latitude = self.filtered_latitude
+            self.source_longitude = self.filtered_longitude
+            self.source_accuracy = self.filtered_accuracy
+
     def _on_status(self, stype, status):
         Logger.info(f"LocationService: status {stype} = {status}")
@@ -0,0 +1,193 @@
+"""Adaptive sensor sampling rates.
+
+The compass used to poll at 15 Hz, the accelerometer at 10 Hz and GPS
+every second no matter what the user was doing — including while they
+were scrolling through history. SamplingScheduler picks a rate profile
+from the current screen, whether the phone is moving and whether a
+locate is about to happen, and pushes it into the services.
+
+It also keeps a tally of timer wakeups compared to the old fixed rates,
+so we can see in the log what it's buying us.
+
+No kivy imports here (services are duck-typed), so the policy can be
+tested headless.
+"""
+import time
+
+from utils.lazy_import import get_logger
+
+# kivy's logger when the app is running, stdlib logging for headless use —
+# never imports kivy itself, see utils/lazy_import.py
+Logger = get_logger(__name__)
+
+
+# (compass Hz, sensor Hz, GPS minTime ms) — 0 / None means stopped
+PROFILES = {
+    "aiming": (20, 10, 1000),      # on camera screen, locate pending
+    "moving": (15, 10, 1000),      # on camera screen, walking around
+    "steady": (10, 5, 1000),       # on camera screen, held still
+    "idle": (0, 0, 5000),          # result/history: keep a rough fix warm, see _apply()
+    "paused": (0, 0, None),        # app in background
+}
+
+# what everything ran at before the scheduler existed
+BASELINE = (15, 10, 1000)
+
+LOG_INTERVAL = 60.0  # seconds between wakeup summaries
+
+
+def wakeups_per_second(profile):
+    compass_hz, sensor_hz, gps_ms = profile
+    gps_hz = 1000.0 / gps_ms if gps_ms else 0.0
+    return compass_hz + sensor_hz + gps_hz
+
+
+class SamplingScheduler:
+    """Chooses sampling rates and applies them to the sensor services.
+
+    The services need:
+        compass.set_rate(hz), compass.start(), compass.stop()
+        sensors.set_rate(hz), sensors.start(), sensors.stop(), sensors.pause()
+        location.set_min_time(ms), location.start(), location.stop()
+    """
+
+    def __init__(self, compass, sensors, location, clock=time.monotonic):
+        self._compass = compass
+        self._sensors = sensors
+        self._location = location
+        self._clock = clock
+
+        self.screen = "camera"
+        self.moving = True
+        self.locate_pending = False
+        self.paused = False
+
+        self._running = False
+        self._profile_name = None
+        self._since = clock()
+        self._last_log = self._since
+        self.actual_wakeups = 0.0
+        self.baseline_wakeups = 0.0
+
+    # -- inputs --
+
+    def set_screen(self, name):
+        self.screen = name
+        self._update()
+
+    def set_moving(self, moving):
+        self.moving = moving
+        self._update()
+
+    def set_locate_pending(self, pending):
+        self.locate_pending = pending
+        self._update()
+
+    # -- lifecycle --
+
+    def start(self):
+        """Start the services at whatever rates the current state calls for."""
+        self._running = True
+        self.paused = False
+        self._since = self._clock()
+        self._profile_name = None
+        self._update()
+
+    def pause(self):
+        self.paused = True
+        self._update()
+
+    def resume(self):
+        self.paused = False
+        self._update()
+
+    def stop(self):
+        self._account()
+        self._apply(PROFILES["paused"])
+        self._running = False
+        self._profile_name = None
+        self._log_savings()
+
+    # -- policy --
+
+    @property
+    def profile_name(self):
+        return self._profile_name
+
+    def choose_profile(self):
+        if self.paused:
+            return "paused"
+        if self.screen != "camera":
+            return "idle"
+        if self.locate_pending:
+            return "aiming"
+        return "moving" if self.moving else "steady"
+
+    def _update(self):
+        if not self._running:
+            return
+        name = self.choose_profile()
+        if name == self._profile_name:
+            return
+        self._account()
+        Logger.info(f"SamplingScheduler: {self._profile_name} -> {name}")
+        self._profile_name = name
+        self._apply(PROFILES[name], hold=name == "idle")
+
+        now = self._clock()
+        if now - self._last_log >= LOG_INTERVAL:
+            self._log_savings()
+            self._last_log = now
+
+    def _apply(self, profile, hold=False):
+        """hold pauses the motion sensors instead of stopping them: a look
+        at history shouldn't make the phone seem to have moved and throw
+        away the GPS average."""
+        compass_hz, sensor_hz, gps_ms = profile
+
+        if compass_hz:
+            self._compass.set_rate(compass_hz)
+            self._compass.start()
+        else:
+            self._compass.stop()
+
+        if sensor_hz:
+            self._sensors.set_rate(sensor_hz)
+            self._sensors.start()
+        elif hold:
+            self._sensors.pause()
+        else:
+            self._sensors.stop()
+
+        if gps_ms:
+            self._location.set_min_time(gps_ms)
+            self._location.start()
+        else:
+            self._location.stop()
+
+    # -- accounting --
+
+    def _account(self):
+        """Add up wakeups for the time spent in the profile we're leaving."""
+        now = self._clock()
+        elapsed = now - self._since
+        self._since = now
+        if self._profile_name is None or elapsed <= 0:
+            return
+        self.actual_wakeups += elapsed * wakeups_per_second(PROFILES[self._profile_name])
+        # the old code kept everything running except when backgrounded
+        if self._profile_name != "paused":
+            self.baseline_wakeups += elapsed * wakeups_per_second(BASELINE)
+
+    @property
+    def saved_wakeups(self):
+        return self.baseline_wakeups - self.actual_wakeups
+
+    def _log_savings(self):
+        if self.baseline_wakeups <= 0:
+            return
+        pct = 100.0 * self.saved_wakeups / self.baseline_wakeups
+        Logger.info(
+            f"SamplingScheduler: {self.saved_wakeups:.0f} of "
+            f"{self.baseline_wakeups:.0f} sensor wakeups saved ({pct:.0f}%)"
+        )
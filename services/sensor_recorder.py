@@ -0,0 +1,122 @@
+"""Recording raw sensor callbacks to a compact binary log.
+
+Field bugs are hard to reproduce on desktop because the mock sensors
+only produce random noise. With a recorder attached, the services write
+every raw plyer reading (compass field, acceleration, rotation rate, GPS
+fix) with a timestamp, and services/sensor_replay.py can play it back.
+
+File layout (little-endian):
+    header:   magic "PPSR", version (u16), wall clock start time (f64)
+    records:  kind (u8), seconds since start (f32), payload
+              compass/accel/gyro payload: x, y, z (3 x f32)
+              gps payload: lat, lon, accuracy, altitude (4 x f64)
+
+That's 17 bytes per motion sample and 37 per fix — an hour of 15 Hz
+compass + 10 Hz accelerometer is about 1.5 MB.
+
+No kivy imports here, so recordings can be read by headless tools.
+"""
+import struct
+import threading
+import time
+
+from utils.lazy_import import get_logger
+
+# kivy's logger when the app is running, stdlib logging for headless use —
+# never imports kivy itself, see utils/lazy_import.py
+Logger = get_logger(__name__)
+
+
+MAGIC = b"PPSR"
+VERSION = 1
+
+KIND_COMPASS = 1
+KIND_ACCEL = 2
+KIND_GYRO = 3
+KIND_GPS = 4
+
+_HEADER = struct.Struct("<4sHd")
+_RECORD_HEAD = struct.Struct("<Bf")
+_PAYLOADS = {
+    KIND_COMPASS: struct.Struct("<3f"),
+    KIND_ACCEL: struct.Struct("<3f"),
+    KIND_GYRO: struct.Struct("<3f"),
+    KIND_GPS: struct.Struct("<4d"),
+}
+
+
+class SensorRecorder:
+    """Appends raw sensor readings to a recording file.
+
+    GPS callbacks can arrive on a different thread than the Clock-driven
+    sensor polls, so writes are serialized with a lock.
+    """
+
+    def __init__(self, path, clock=time.monotonic):
+        self.path = path
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._file = open(path, "wb")
+        self._t0 = clock()
+        self._file.write(_HEADER.pack(MAGIC, VERSION, time.time()))
+        self.count = 0
+        Logger.info(f"SensorRecorder: recording to {path}")
+
+    def _write(self, kind, values):
+        t = self._clock() - self._t0
+        data = _RECORD_HEAD.pack(kind, t) + _PAYLOADS[kind].pack(*values)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(data)
+            self.count += 1
+
+    def record_compass(self, x, y, z):
+        self._write(KIND_COMPASS, (x, y, z or 0.0))
+
+    def record_accel(self, x, y, z):
+        self._write(KIND_ACCEL, (x, y, z))
+
+    def record_gyro(self, x, y, z):
+        self._write(KIND_GYRO, (x, y, z))
+
+    def record_gps(self, lat, lon, accuracy, altitude=0.0):
+        self._write(KIND_GPS, (lat, lon, accuracy, altitude or 0.0))
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+        Logger.info(f"SensorRecorder: wrote {self.count} samples to {self.path}")
+
+
+def read_recording(path):
+    """Yield (kind, t, values) for every record in a recording.
+
+    A truncated last record (the app was killed mid-write) is skipped.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if len(data) < _HEADER.size:
+        raise ValueError(f"{path} is too short to be a sensor recording")
+    magic, version, _ = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a sensor recording")
+    if version != VERSION:
+        raise ValueError(f"unsupported recording version {version}")
+
+    offset = _HEADER.size
+    end = len(data)
+    while offset + _RECORD_HEAD.size <= end:
+        kind, t = _RECORD_HEAD.unpack_from(data, offset)
+        payload = _PAYLOADS.get(kind)
+        if payload is None:
+            raise ValueError(f"unknown record kind {kind} at byte {offset}")
+        offset += _RECORD_HEAD.size
+        if offset + payload.size > end:
+            break
+        yield kind, t, payload.unpack_from(data, offset)
+        offset += payload.size
@@ -0,0 +1,140 @@
+"""Deterministic playback of sensor recordings.
+
+Feeds a file written by SensorRecorder back through the same processing
+code the live sensors use, either paced by the Kivy clock (real time or
+sped up) or all at once for headless accuracy/performance runs.
+
+Sinks are plain callables, so the replay itself doesn't need kivy:
+    on_compass(x, y, z)
+    on_accel(x, y, z)
+    on_gyro(x, y, z)
+    on_gps(lat=..., lon=..., accuracy=..., altitude=..., timestamp=...)
+
+The GPS timestamp is the fix's time in the recording (seconds, still
+counting up across loops and rewinds), so the position filter sees the
+same gaps between fixes whatever the replay speed.
+
+for_services() wires them to the app's services.
+"""
+
+from services.sensor_recorder import (
+    read_recording, KIND_COMPASS, KIND_ACCEL, KIND_GYRO, KIND_GPS,
+)
+from utils.profiler import profiled
+from utils.lazy_import import get_logger
+
+# kivy's logger when the app is running, stdlib logging for headless use —
+# never imports kivy itself, see utils/lazy_import.py
+Logger = get_logger(__name__)
+
+
+class SensorReplay:
+
+    def __init__(self, path, on_compass=None, on_accel=None, on_gyro=None,
+                 on_gps=None, speed=1.0, loop=False):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self._sinks = {
+            KIND_COMPASS: on_compass,
+            KIND_ACCEL: on_accel,
+            KIND_GYRO: on_gyro,
+            KIND_GPS: on_gps,
+        }
+        self._records = list(read_recording(path))
+        self._pos = 0
+        self._elapsed = 0.0
+        self._offset = 0.0  # recording time played before the last rewind
+        self._event = None
+
+    @classmethod
+    def for_services(cls, path, compass_svc, sensor_svc, location_svc, **kwargs):
+        """Replay into the app's services instead of the real/mock sensors."""
+        replay = cls(
+            path,
+            on_compass=compass_svc.process_field,
+            on_accel=sensor_svc.process_acceleration,
+            on_gps=location_svc.process_fix,
+            **kwargs,
+        )
+        compass_svc.is_active = True
+        location_svc.is_active = True
+        return replay
+
+    @property
+    def duration(self):
+        return self._records[-1][1] if self._records else 0.0
+
+    @property
+    def finished(self):
+        return self._pos >= len(self._records)
+
+    def _dispatch(self, kind, t, values):
+        sink = self._sinks.get(kind)
+        if sink is None:
+            return
+        if kind == KIND_GPS:
+            lat, lon, accuracy, altitude = values
+            sink(lat=lat, lon=lon, accuracy=accuracy, altitude=altitude,
+                 timestamp=self._offset + t)
+        else:
+            sink(*values)
+
+    def advance(self, dt):
+        """Move the replay clock forward by dt (wall) seconds.
+
+        Returns:
+            number of records dispatched
+        """
+        self._elapsed += dt * self.speed
+        sent = 0
+        records = self._records
+        while self._pos < len(records) and records[self._pos][1] <= self._elapsed:
+            kind, t, values = records[self._pos]
+            self._dispatch(kind, t, values)
+            self._pos += 1
+            sent += 1
+
+        if self.finished and self.loop and records:
+            self.rewind()
+        return sent
+
+    def run_to_end(self):
+        """Dispatch everything immediately — for headless benchmark runs."""
+        sent = 0
+        records = self._records
+        while self._pos < len(records):
+            kind, t, values = records[self._pos]
+            self._dispatch(kind, t, values)
+            self._pos += 1
+            sent += 1
+        return sent
+
+    def rewind(self):
+        if self._pos:
+            self._offset += self._records[self._pos - 1][1]
+        self._pos = 0
+        self._elapsed = 0.0
+
+    def start(self):
+        """Play back paced by the Kivy clock."""
+        from kivy.clock import Clock
+        if self._event is None:
+            Logger.info(
+                f"SensorReplay: playing {len(self._records)} samples "
+                f"({self.duration:.0f}s) at {self.speed}x"
+            )
+            self._event = Clock.schedule_interval(self._tick, 0)
+
+    def stop(self):
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    @profiled("replay.tick")
+    def _tick(self, dt):
+        self.advance(dt)
+        if self.finished:
+            Logger.info("SensorReplay: finished")
+            self.stop()
+            return False
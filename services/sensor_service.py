@@ -2,40 +2,79 @@
 
 Provides smoothed pitch/roll/tilt readings. On desktop this is simulated.
 We use these values mainly to warn the user if the phone is tilted too much
-(pointing at the ground or sky instead of the horizon).
+(pointing at the ground or sky instead of the horizon), and to tell when
+the phone is being held still so GPS fixes can be averaged.
 """
 import math
+import random
+
 from kivy.event import EventDispatcher
 from kivy.properties import NumericProperty, BooleanProperty
 from kivy.clock import Clock
 from kivy.utils import platform
 from kivy.logger import Logger
 
-from utils.math_utils import smooth_values
+from utils.math_utils import camera_elevation, smooth_values
+from utils.streaming_stats import EwmStats
+from utils.profiler import profiled
 
 
 class SensorService(EventDispatcher):
     pitch = NumericProperty(0.0)    # degrees, 0 = horizontal
+    elevation = NumericProperty(0.0)  # degrees the camera points above the horizon
     roll = NumericProperty(0.0)
     tilt_ok = BooleanProperty(True)  # False if phone is tilted too much
+    motion_std = NumericProperty(0.0)  # recent spread of |acceleration|, m/s^2
+    is_stationary = BooleanProperty(False)
 
     TILT_THRESHOLD = 30.0  # warn if tilted more than this
+    STATIONARY_STD = 0.15  # m/s^2, hand tremor is well under this
+    MOTION_TAU = 0.95      # s, time constant of motion_std (alpha 0.1 at 10 Hz)
+    POLL_HZ = 10           # default rate, see services/sampling_scheduler.py
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self._accel = None
         self._gyro = None
         self._poll_event = None
+        self._poll_fn = None
+        self.poll_hz = self.POLL_HZ
+        self.recorder = None  # services/sensor_recorder.py, set to record
         self._pitch_hist = []
         self._roll_hist = []
+        self._elevation_hist = []
+        self._motion = EwmStats(alpha=self._motion_alpha(self.poll_hz))
+        self.gravity = None  # latest (ax, ay, az), for the compass's dip check
+
+    def _motion_alpha(self, hz):
+        """EwmStats weight per reading that forgets at MOTION_TAU at this rate."""
+        return 1.0 - math.exp(-1.0 / (hz * self.MOTION_TAU))
+
+    def set_rate(self, hz):
+        """Change the polling rate, rescheduling the timer if running."""
+        if hz == self.poll_hz:
+            return
+        self.poll_hz = hz
+        # same time span of readings whatever the rate
+        self._motion.alpha = self._motion_alpha(hz)
+        if self._poll_event:
+            self._poll_event.cancel()
+            self._poll_event = Clock.schedule_interval(self._poll_fn, 1 / hz)
 
     def start(self):
+        if self._poll_event:
+            return  # already running
         if platform in ("android", "ios"):
             self._start_real_sensors()
         else:
             self._start_mock()
 
-    def stop(self):
+    def pause(self):
+        """Stop sampling, but keep the motion stats and is_stationary.
+
+        For a short break (the scheduler's idle profile) — stop() starts
+        over, which also ends the GPS averaging.
+        """
         if self._accel:
             try:
                 self._accel.disable()
@@ -48,6 +87,12 @@ class SensorService(EventDispatcher):
                 pass
         if self._poll_event:
             self._poll_event.cancel()
+            self._poll_event = None
+
+    def stop(self):
+        self.pause()
+        self._motion.reset()
+        self.is_stationary = False
 
     def _start_real_sensors(self):
         try:
@@ -63,48 +108,81 @@ class SensorService(EventDispatcher):
                 Logger.warning("SensorService: gyroscope not available")
                 self._gyro = None
 
-            self._poll_event = Clock.schedule_interval(self._read_sensors, 1 / 10)
+            self._poll_fn = self._read_sensors
+            self._poll_event = Clock.schedule_interval(self._poll_fn, 1 / self.poll_hz)
             Logger.info("SensorService: sensors started")
         except Exception as e:
             Logger.error(f"SensorService: failed - {e}")
             self._start_mock()
 
+    @profiled("sensors.read")
     def _read_sensors(self, dt):
         if not self._accel:
             return
         try:
             acc = self._accel.acceleration
             if acc and acc[0] is not None:
-                ax, ay, az = acc
-                # compute pitch and roll from accelerometer
-                pitch = math.degrees(math.atan2(ax, math.sqrt(ay**2 + az**2)))
-                roll = math.degrees(math.atan2(ay, math.sqrt(ax**2 + az**2)))
-
-                self._pitch_hist.append(pitch)
-                self._roll_hist.append(roll)
-
-                # trim history
-                if len(self._pitch_hist) > 30:
-                    self._pitch_hist = self._pitch_hist[-20:]
-                    self._roll_hist = self._roll_hist[-20:]
-
-                self.pitch = smooth_values(self._pitch_hist, window=5)
-                self.roll = smooth_values(self._roll_hist, window=5)
-                self.tilt_ok = abs(self.pitch) < self.TILT_THRESHOLD
+                if self.recorder:
+                    self.recorder.record_accel(*acc)
+                self.process_acceleration(*acc)
+
+            if self._gyro and self.recorder:
+                rot = self._gyro.rotation
+                if rot and rot[0] is not None:
+                    self.recorder.record_gyro(*rot)
         except Exception:
             pass
 
+    def process_acceleration(self, ax, ay, az):
+        """Update pitch/roll/motion from one accelerometer reading.
+
+        Called by the poll timer, or directly by a sensor replay.
+        """
+        self.gravity = (ax, ay, az)
+
+        # compute pitch and roll from accelerometer
+        pitch = math.degrees(math.atan2(ax, math.sqrt(ay**2 + az**2)))
+        roll = math.degrees(math.atan2(ay, math.sqrt(ax**2 + az**2)))
+
+        self._pitch_hist.append(pitch)
+        self._roll_hist.append(roll)
+        # pitch/roll are for the tilt warning; the sight line needs this
+        self._elevation_hist.append(camera_elevation(ax, ay, az))
+
+        # trim history
+        if len(self._pitch_hist) > 30:
+            self._pitch_hist = self._pitch_hist[-20:]
+            self._roll_hist = self._roll_hist[-20:]
+            self._elevation_hist = self._elevation_hist[-20:]
+
+        self.pitch = smooth_values(self._pitch_hist, window=5)
+        self.roll = smooth_values(self._roll_hist, window=5)
+        self.elevation = smooth_values(self._elevation_hist, window=5)
+        self.tilt_ok = abs(self.pitch) < self.TILT_THRESHOLD
+
+        # gravity is constant, so any spread in |a| means we're moving
+        self._motion.add(math.sqrt(ax * ax + ay * ay + az * az))
+        self.motion_std = self._motion.std
+        self.is_stationary = (
+            self._motion.count >= 10
+            and self.motion_std < self.STATIONARY_STD
+        )
+
     def _start_mock(self):
         """Simulate level phone on desktop."""
         Logger.info("SensorService: mock mode (desktop)")
         self.pitch = 0.0
         self.roll = 0.0
+        self.elevation = 0.0
         self.tilt_ok = True
+        self.motion_std = 0.0
+        self.is_stationary = True  # desktop isn't going anywhere
 
-        import random
-        def _tick(dt):
-            self.pitch = random.uniform(-3.0, 3.0)
-            self.roll = random.uniform(-2.0, 2.0)
-            self.tilt_ok = True
+        self._poll_fn = self._mock_tick
+        self._poll_event = Clock.schedule_interval(self._poll_fn, 1 / self.poll_hz)
 
-        self._poll_event = Clock.schedule_interval(_tick, 0.5)
+    @profiled("sensors.mock_tick")
+    def _mock_tick(self, dt):
+        self.pitch = random.uniform(-3.0, 3.0)
+        self.roll = random.uniform(-2.0, 2.0)
+        self.tilt_ok = True
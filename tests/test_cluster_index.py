@@ -0,0 +1,130 @@
+"""Tests for the per-zoom grid clustering of saved points."""
+import unittest
+import random
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain.cluster_index import ClusterIndex
+from utils.tile_math import latlon_to_pixel
+
+
+def brute_force(points, south, west, north, east, zoom, cell_px=64):
+    """Cell -> count the slow way, for comparing against the index."""
+    x0, y1 = latlon_to_pixel(south, west, 0)
+    x1, y0 = latlon_to_pixel(north, east, 0)
+    scale = 2.0 ** zoom / cell_px
+    r0, c0, r1, c1 = int(y0 * scale), int(x0 * scale), int(y1 * scale), int(x1 * scale)
+    cells = {}
+    for lat, lon in points.values():
+        x, y = latlon_to_pixel(lat, lon, 0)
+        row, col = int(y * scale), int(x * scale)
+        if r0 <= row <= r1 and c0 <= col <= c1:
+            cells[(row, col)] = cells.get((row, col), 0) + 1
+    return sorted(cells.values())
+
+
+class TestClusterIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(3)
+        self.points = {}
+        # a dense town plus scattered points across Europe
+        for i in range(300):
+            self.points[f"town{i}"] = (47.37 + rng.uniform(-0.02, 0.02),
+                                       8.54 + rng.uniform(-0.02, 0.02))
+        for i in range(200):
+            self.points[f"far{i}"] = (rng.uniform(36, 60), rng.uniform(-10, 30))
+        self.index = ClusterIndex()
+        self.index.load((k, lat, lon) for k, (lat, lon) in self.points.items())
+
+    def test_len(self):
+        self.assertEqual(len(self.index), 500)
+        self.assertIn("town0", self.index)
+
+    def test_counts_add_up_at_every_zoom(self):
+        for zoom in range(0, 17):
+            clusters = self.index.query(-85, -180, 85, 180, zoom)
+            self.assertEqual(sum(c.count for c in clusters), 500, zoom)
+
+    def test_zoomed_out_town_is_one_cluster(self):
+        clusters = self.index.query(47.0, 8.0, 47.7, 9.0, 5)
+        biggest = max(clusters, key=lambda c: c.count)
+        self.assertGreaterEqual(biggest.count, 300)
+        self.assertAlmostEqual(biggest.lat, 47.37, delta=0.5)
+
+    def test_matches_brute_force(self):
+        for box, zoom in [((46, 5, 49, 12), 6), ((47.35, 8.52, 47.39, 8.56), 14),
+                          ((30, -20, 65, 40), 3)]:
+            got = sorted(c.count for c in self.index.query(*box, zoom))
+            self.assertEqual(got, brute_force(self.points, *box, zoom))
+
+    def test_single_point_cluster_has_key(self):
+        index = ClusterIndex()
+        index.add("a", 10.0, 10.0)
+        index.add("b", 20.0, 20.0)
+        clusters = index.query(-85, -180, 85, 180, 10)
+        self.assertEqual(sorted(c.key for c in clusters), ["a", "b"])
+        # zoomed out far enough they merge and the key goes away
+        merged = index.query(-85, -180, 85, 180, 0)
+        self.assertEqual(len(merged), 1)
+        self.assertEqual(merged[0].count, 2)
+        self.assertIsNone(merged[0].key)
+
+    def test_remove_is_incremental(self):
+        for key in [k for k in self.points if k.startswith("town")]:
+            self.assertTrue(self.index.remove(key))
+            del self.points[key]
+        self.assertFalse(self.index.remove("town0"))
+        self.assertEqual(len(self.index), 200)
+        for zoom in (2, 8, 14):
+            got = sorted(c.count for c in self.index.query(30, -20, 65, 40, zoom))
+            self.assertEqual(got, brute_force(self.points, 30, -20, 65, 40, zoom))
+
+    def test_readding_a_key_moves_it(self):
+        index = ClusterIndex()
+        index.add("a", 10.0, 10.0)
+        index.add("a", 20.0, 20.0)
+        self.assertEqual(len(index), 1)
+        cluster, = index.query(-85, -180, 85, 180, 8)
+        self.assertAlmostEqual(cluster.lat, 20.0, places=6)
+
+    def test_antimeridian_box(self):
+        index = ClusterIndex()
+        index.add("east", 0.0, 179.5)
+        index.add("west", 0.0, -179.5)
+        index.add("middle", 0.0, 0.0)
+        clusters = index.query(-5, 170, 5, -170, 8)
+        self.assertEqual(sorted(c.key for c in clusters), ["east", "west"])
+
+    def test_expansion_zoom_splits_cluster(self):
+        index = ClusterIndex()
+        index.add("a", 47.370, 8.540)
+        index.add("b", 47.372, 8.542)
+        cluster, = index.query(47, 8, 48, 9, 8)
+        zoom = index.expansion_zoom(cluster.lat, cluster.lon, 8)
+        self.assertGreater(zoom, 8)
+        self.assertEqual(len(index.query(47, 8, 48, 9, zoom)), 2)
+        self.assertEqual(len(index.query(47, 8, 48, 9, zoom - 1)), 1)
+
+    def test_bulk_load_matches_incremental_adds(self):
+        one_by_one = ClusterIndex()
+        for k, (lat, lon) in self.points.items():
+            one_by_one.add(k, lat, lon)
+        for zoom in range(0, 17, 3):
+            bulk = sorted(self.index.query(30, -20, 65, 40, zoom), key=lambda c: (c.lat, c.lon))
+            inc = sorted(one_by_one.query(30, -20, 65, 40, zoom), key=lambda c: (c.lat, c.lon))
+            self.assertEqual([(c.count, c.key) for c in bulk], [(c.count, c.key) for c in inc])
+            for a, b in zip(bulk, inc):
+                self.assertAlmostEqual(a.lat, b.lat, places=9)
+                self.assertAlmostEqual(a.lon, b.lon, places=9)
+
+    def test_clear(self):
+        self.index.clear()
+        self.assertEqual(len(self.index), 0)
+        self.assertEqual(self.index.query(-85, -180, 85, 180, 4), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
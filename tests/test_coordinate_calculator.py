@@ -5,6 +5,7 @@ bearings and distances to make sure the formula is implemented correctly.
 """
 import unittest
 import math
+import random
 import sys
 import os
 
@@ -12,6 +13,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from domain.coordinate_calculator import CoordinateCalculator
+from domain.observation import Observation
 
 
 class TestCoordinateCalculator(unittest.TestCase):
@@ -71,6 +73,10 @@ class TestCoordinateCalculator(unittest.TestCase):
         acc_far = self.calc.estimate_accuracy(10.0, 10000.0)
         self.assertGreater(acc_far, acc_near)
 
+        # a compass that knows it's off (interference) widens it
+        self.assertEqual(self.calc.estimate_accuracy(10.0, 1000.0), acc)
+        self.assertGreater(self.calc.estimate_accuracy(10.0, 1000.0, 20.0), acc)
+
     def test_full_circle_bearing(self):
         """Bearing 360 should be same as bearing 0 (due north)."""
         lat1, lon1 = self.calc.calculate_destination(45.0, 10.0, 0.0, 50000)
@@ -85,6 +91,119 @@ class TestCoordinateCalculator(unittest.TestCase):
         self.assertAlmostEqual(lat2, 40.0, delta=0.001)
         self.assertAlmostEqual(lon2, -74.0, delta=0.001)
 
+    def test_batch_matches_single_projection(self):
+        """project_batch is calculate_destination plus estimate_accuracy."""
+        # every other one with the compass's own error estimate
+        observations = [Observation(45.0 - i, 10.0 + i, 4.0 + i, i * 37.0, i * 37.0, 0.0,
+                                    100.0 * (i + 1),
+                                    compass_error=3.0 + i if i % 2 else None)
+                        for i in range(10)]
+        for obs, (lat, lon, accuracy) in zip(observations,
+                                             self.calc.project_batch(observations)):
+            expected = self.calc.calculate_destination(obs.src_lat, obs.src_lon,
+                                                       obs.heading, obs.distance)
+            self.assertAlmostEqual(lat, expected[0], places=9)
+            self.assertAlmostEqual(lon, expected[1], places=9)
+            self.assertEqual(accuracy, self.calc.estimate_accuracy(
+                obs.src_accuracy, obs.distance, obs.compass_error))
+        with self.assertRaises(ValueError):
+            self.calc.project_batch([observations[0]._replace(distance=0)])
+
+    def test_fuse(self):
+        """Equal weights meet in the middle and tighten; one result passes through."""
+        self.assertEqual(self.calc.fuse([(1.0, 2.0, 10.0)]), (1.0, 2.0, 10.0))
+        lat, lon, accuracy = self.calc.fuse([(1.0, 179.0, 10.0), (3.0, -179.0, 10.0)])
+        self.assertAlmostEqual(lat, 2.0)
+        self.assertAlmostEqual(abs(lon), 180.0)  # across the antimeridian, not via 0
+        self.assertAlmostEqual(accuracy, 10.0 / math.sqrt(2))
+
+
+class TestCovariancePropagation(unittest.TestCase):
+
+    def setUp(self):
+        self.calc = CoordinateCalculator()
+
+    def _sampled(self, lat, lon, bearing, distance, position_cov, heading_var,
+                 distance_var, n=20000):
+        """East/north covariance of the projections of n perturbed inputs."""
+        rng = random.Random(11)
+        radius = self.calc._R
+        # Cholesky factor of the start point covariance
+        (c_ee, c_en), (_, c_nn) = position_cov
+        a = math.sqrt(c_ee)
+        b = c_en / a
+        c = math.sqrt(c_nn - b * b)
+        lat0, lon0 = self.calc.calculate_destination(lat, lon, bearing, distance)
+        east = []
+        north = []
+        for _ in range(n):
+            z1, z2 = rng.gauss(0, 1), rng.gauss(0, 1)
+            start_lat = lat + math.degrees((b * z1 + c * z2) / radius)
+            start_lon = lon + math.degrees(a * z1 / (radius * math.cos(math.radians(lat))))
+            dest_lat, dest_lon = self.calc.calculate_destination(
+                start_lat, start_lon,
+                bearing + rng.gauss(0, math.sqrt(heading_var)),
+                distance + rng.gauss(0, math.sqrt(distance_var)),
+            )
+            east.append(math.radians(dest_lon - lon0) * radius * math.cos(math.radians(lat0)))
+            north.append(math.radians(dest_lat - lat0) * radius)
+        mean_e = sum(east) / n
+        mean_n = sum(north) / n
+        ee = sum((e - mean_e) ** 2 for e in east) / (n - 1)
+        nn = sum((v - mean_n) ** 2 for v in north) / (n - 1)
+        en = sum((e - mean_e) * (v - mean_n) for e, v in zip(east, north)) / (n - 1)
+        return (ee, en), (en, nn)
+
+    def test_matches_sampling(self):
+        cases = [
+            (47.0, 8.0, 30.0, 2000.0, ((25.0, 5.0), (5.0, 16.0)), 4.0, 2500.0),
+            # far north, long way, mostly along the line
+            (75.0, -120.0, 300.0, 50000.0, ((100.0, 0.0), (0.0, 100.0)), 1.0, 10000.0),
+            (-33.9, 151.2, 180.0, 500.0, ((9.0, -3.0), (-3.0, 4.0)), 2.0, 0.0),
+        ]
+        for case in cases:
+            analytic = self.calc.propagate_covariance(*case)
+            sampled = self._sampled(*case)
+            # first order, so a few percent of the total is fair
+            scale = analytic[0][0] + analytic[1][1]
+            for i in range(2):
+                for j in range(2):
+                    self.assertAlmostEqual(analytic[i][j], sampled[i][j], delta=0.03 * scale,
+                                           msg=f"{case} [{i}][{j}]")
+
+    def test_heading_error_is_sideways(self):
+        # due east, heading only: the error is north-south, distance × angle
+        cov = self.calc.propagate_covariance(0.0, 0.0, 90.0, 1000.0,
+                                             ((0.0, 0.0), (0.0, 0.0)), 1.0)
+        ellipse = self.calc.error_ellipse(cov)
+        self.assertAlmostEqual(ellipse.major, 1000.0 * math.radians(1.0), places=3)
+        self.assertAlmostEqual(ellipse.minor, 0.0, places=6)
+        self.assertAlmostEqual(ellipse.bearing % 180.0, 0.0, delta=1e-6)
+
+    def test_error_ellipse(self):
+        ellipse = self.calc.error_ellipse(((4.0, 0.0), (0.0, 1.0)))
+        self.assertEqual(ellipse, (2.0, 1.0, 90.0))
+        # stretched along north-east
+        ellipse = self.calc.error_ellipse(((2.5, 1.5), (1.5, 2.5)), scale=2.0)
+        self.assertAlmostEqual(ellipse.major, 4.0)
+        self.assertAlmostEqual(ellipse.minor, 2.0)
+        self.assertAlmostEqual(ellipse.bearing, 45.0)
+
+    def test_batch_matches_single(self):
+        observations = [
+            Observation(47.0, 8.0, 5.0, 30.0, 29.0, 1.5, 2000.0,
+                        position_cov=((25.0, 5.0), (5.0, 16.0)), distance_var=400.0,
+                        compass_error=3.0),
+            # no covariance or compass error kept: a circle and the default
+            Observation(-10.0, 100.0, 12.0, 200.0, 201.0, 0.0, 800.0),
+        ]
+        batch = self.calc.covariance_batch(observations)
+        self.assertEqual(batch[0], self.calc.propagate_covariance(
+            47.0, 8.0, 30.0, 2000.0, ((25.0, 5.0), (5.0, 16.0)), 9.0, 400.0))
+        self.assertEqual(batch[1], self.calc.propagate_covariance(
+            -10.0, 100.0, 200.0, 800.0, ((144.0, 0.0), (0.0, 144.0)),
+            self.calc.COMPASS_ERROR_DEG ** 2))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,149 @@
+"""Tests for the offline reverse geocoder."""
+import unittest
+import random
+import tempfile
+import shutil
+import math
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.gazetteer import Gazetteer, build_index, parse_geonames, INDEX_SUFFIX
+from utils.math_utils import EARTH_RADIUS
+
+
+def geonames_line(gid, name, lat, lon, feature_class="P", country="CH"):
+    cols = [str(gid), name, name, "", f"{lat:.5f}", f"{lon:.5f}",
+            feature_class, "PPL", country, "", "", "", "", "", "1000"]
+    return "\t".join(cols) + "\n"
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+class TestParseGeonames(unittest.TestCase):
+
+    def test_keeps_populated_places_only(self):
+        lines = [
+            "# comment\n",
+            geonames_line(1, "Zürich", 47.36667, 8.55),
+            geonames_line(2, "Uetliberg", 47.35, 8.49, feature_class="T"),
+            "3\tbroken line\n",
+            geonames_line(4, "Bern", 46.94809, 7.44744),
+        ]
+        self.assertEqual(list(parse_geonames(lines)), [
+            ("Zürich", "CH", 47.36667, 8.55),
+            ("Bern", "CH", 46.94809, 7.44744),
+        ])
+
+
+class TestGazetteer(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self.source = os.path.join(self._tmpdir, "places.txt")
+        self.index = os.path.join(self._tmpdir, "places" + INDEX_SUFFIX)
+
+        rng = random.Random(11)
+        self.places = []
+        for i in range(2000):
+            # uniform on the sphere, so the poles get some too
+            lat = math.degrees(math.asin(rng.uniform(-1, 1)))
+            self.places.append((f"place{i}", "XX", lat, rng.uniform(-180, 180)))
+        self.places.append(("Eastend", "FJ", -17.0, 179.99))
+        self.places.append(("Westend", "FJ", -17.0, -179.95))
+        with open(self.source, "w", encoding="utf-8") as f:
+            for i, (name, country, lat, lon) in enumerate(self.places):
+                f.write(geonames_line(i, name, lat, lon, country=country))
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def _brute_force(self, lat, lon):
+        return min(self.places, key=lambda p: haversine(lat, lon, p[2], p[3]))
+
+    def test_nearest_matches_brute_force(self):
+        gz = Gazetteer.open(self.source)
+        self.assertEqual(len(gz), len(self.places))
+        rng = random.Random(5)
+        for _ in range(200):
+            lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+            place = gz.nearest(lat, lon)
+            expected = self._brute_force(lat, lon)
+            self.assertEqual(place.name, expected[0])
+            self.assertAlmostEqual(
+                place.distance, haversine(lat, lon, expected[2], expected[3]),
+                delta=1.0,
+            )
+        gz.close()
+
+    def test_across_the_antimeridian(self):
+        gz = Gazetteer.open(self.source)
+        # closer to Eastend, but on the other side of 180°
+        place = gz.nearest(-17.0, -179.999)
+        self.assertEqual(place.name, "Eastend")
+        self.assertEqual(place.country, "FJ")
+        self.assertAlmostEqual(place.lat, -17.0, places=4)
+        self.assertAlmostEqual(place.lon, 179.99, places=4)
+        gz.close()
+
+    def test_label(self):
+        gz = Gazetteer.open(self.source)
+        self.assertEqual(gz.label(-17.0, 179.995), "near Eastend")
+        self.assertEqual(gz.label(-17.0, 179.995, max_distance=100), "")
+        gz.close()
+
+    def test_index_is_reused_then_rebuilt_when_dump_changes(self):
+        Gazetteer.open(self.source).close()
+        mtime = os.path.getmtime(self.index)
+
+        gz = Gazetteer.open(self.source)
+        self.assertEqual(os.path.getmtime(self.index), mtime)
+        gz.close()
+
+        with open(self.source, "a", encoding="utf-8") as f:
+            f.write(geonames_line(9999, "Newtown", 10.0, 10.0))
+        gz = Gazetteer.open(self.source)
+        self.assertEqual(len(gz), len(self.places) + 1)
+        self.assertEqual(gz.nearest(10.0, 10.0).name, "Newtown")
+        gz.close()
+
+    def test_index_without_dump(self):
+        Gazetteer.open(self.source).close()
+        os.remove(self.source)
+        gz = Gazetteer.open(self.source)
+        self.assertIsNotNone(gz)
+        self.assertEqual(len(gz), len(self.places))
+        gz.close()
+
+    def test_nothing_to_open(self):
+        os.remove(self.source)
+        self.assertIsNone(Gazetteer.open(self.source))
+
+    def test_corrupt_index_is_rebuilt(self):
+        with open(self.index, "wb") as f:
+            f.write(b"not an index at all, just some bytes")
+        gz = Gazetteer.open(self.source)
+        self.assertEqual(len(gz), len(self.places))
+        gz.close()
+
+    def test_empty_and_single_place(self):
+        build_index([], self.index)
+        gz = Gazetteer(self.index)
+        self.assertIsNone(gz.nearest(0, 0))
+        self.assertEqual(gz.label(0, 0), "")
+        gz.close()
+
+        build_index([("Solo", "AQ", -90.0, 0.0)], self.index)
+        gz = Gazetteer(self.index)
+        self.assertEqual(gz.nearest(-89.9, 45.0).name, "Solo")
+        gz.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
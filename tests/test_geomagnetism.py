@@ -0,0 +1,91 @@
+"""Tests for the offline geomagnetic model and the declination grid cache."""
+import unittest
+import sys
+import os
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain.geomagnetism import MagneticModel, DeclinationGrid, FieldElements, decimal_year
+
+
+class TestMagneticModel(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.model = MagneticModel()
+
+    def test_loads_bundled_coefficients(self):
+        self.assertEqual(self.model.epoch, 2025.0)
+        self.assertEqual(self.model.max_degree, 12)
+
+    def test_reference_points(self):
+        """Spot checks against the published WMM-2025 test values."""
+        f = self.model.field(80.0, 0.0, 0.0, 2025.0)
+        self.assertAlmostEqual(f.declination, 1.28, delta=0.05)
+        self.assertAlmostEqual(f.inclination, 83.21, delta=0.05)
+
+        f = self.model.field(-80.0, 240.0, 0.0, 2025.0)
+        self.assertAlmostEqual(f.declination, 68.78, delta=0.05)
+
+    def test_known_cities(self):
+        # rough 2025 declinations, just to catch sign/axis mixups
+        self.assertAlmostEqual(self.model.declination(40.0, -105.25, year=2025.0), 7.8, delta=0.5)
+        self.assertAlmostEqual(self.model.declination(-33.87, 151.21, year=2025.0), 12.8, delta=0.5)
+        self.assertAlmostEqual(self.model.declination(-33.9, 18.4, year=2025.0), -26.4, delta=0.5)
+
+    def test_field_points_down_in_north(self):
+        north = self.model.field(50.0, 10.0, 0.0, 2021.0)
+        south = self.model.field(-50.0, 10.0, 0.0, 2021.0)
+        self.assertGreater(north.inclination, 0)
+        self.assertLess(south.inclination, 0)
+        self.assertGreater(north.intensity, 20_000)
+        self.assertLess(north.intensity, 70_000)
+
+    def test_validity_window(self):
+        self.assertTrue(self.model.is_valid_for(2027.5))
+        self.assertFalse(self.model.is_valid_for(2024.0))
+        self.assertFalse(self.model.is_valid_for(2031.0))
+
+
+class TestDeclinationGrid(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.model = MagneticModel()
+
+    def test_matches_model(self):
+        grid = DeclinationGrid(self.model)
+        for lat, lon in [(40.1, -105.2), (51.5, -0.1), (-33.9, 151.2), (64.1, -21.9)]:
+            expected = self.model.declination(lat, lon, year=2022.3)
+            self.assertAlmostEqual(grid.declination(lat, lon, 2022.3), expected, delta=0.3)
+
+    def test_nodes_are_reused(self):
+        grid = DeclinationGrid(self.model)
+        grid.declination(40.1, -105.2, 2022.3)
+        nodes = grid.node_count
+        for i in range(100):
+            grid.declination(40.1 + i * 1e-4, -105.2, 2022.3)
+        self.assertEqual(grid.node_count, nodes)
+
+    def test_wraparound(self):
+        """Corners on both sides of +/-180 must not average out to ~0."""
+
+        class FlippingModel:
+            # declination jumps from +179 to -179 across lon 0, like it does
+            # around the magnetic poles
+            def field(self, lat, lon, alt_km, year):
+                decl = 179.0 if lon < 0 else -179.0
+                return FieldElements(0, 0, 0, decl, 80.0, 55_000.0)
+
+        grid = DeclinationGrid(FlippingModel(), cell_deg=2.0)
+        got = grid.declination(10.0, -1.0, 2022.0)
+        self.assertGreater(abs(got), 178.0)
+
+    def test_decimal_year(self):
+        self.assertAlmostEqual(decimal_year(datetime(2024, 1, 1)), 2024.0)
+        self.assertAlmostEqual(decimal_year(datetime(2023, 7, 2, 12)), 2023.5, delta=0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
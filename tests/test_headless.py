@@ -0,0 +1,71 @@
+"""The headless core must import (and run) without touching kivy."""
+import unittest
+import subprocess
+import sys
+import os
+import textwrap
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.lazy_import import CORE_MODULES, get_logger, lazy_import
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs in a fresh interpreter: records every attempt to import kivy, even
+# one that would be caught by an ImportError fallback
+PROBE = textwrap.dedent("""
+    import importlib, sys
+
+    attempts = []
+
+    class KivyWatcher:
+        def find_spec(self, name, path=None, target=None):
+            if name.split(".")[0] == "kivy":
+                attempts.append(name)
+            return None
+
+    sys.meta_path.insert(0, KivyWatcher())
+
+    for name in sys.argv[1:]:
+        importlib.import_module(name)
+
+    # no storage dir: must not go looking for the kivy App
+    from data.location_repository import LocationRepository
+    LocationRepository(load=False)
+
+    print(",".join(attempts))
+""")
+
+
+class TestHeadlessCore(unittest.TestCase):
+
+    def test_core_modules_do_not_import_kivy(self):
+        proc = subprocess.run(
+            [sys.executable, "-c", PROBE, *CORE_MODULES],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertEqual(proc.stdout.strip(), "")
+
+
+class TestLazyImport(unittest.TestCase):
+
+    def test_already_imported_module_returned_as_is(self):
+        self.assertIs(lazy_import("os"), os)
+
+    def test_lazy_module_loads_on_attribute_access(self):
+        sys.modules.pop("colorsys", None)
+        module = lazy_import("colorsys")
+        self.assertEqual(module.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
+
+    def test_missing_module(self):
+        with self.assertRaises(ImportError):
+            lazy_import("no_such_module_here")
+
+    def test_logger_resolves_on_first_use(self):
+        logger = get_logger("pinpoint.test")
+        self.assertEqual(logger.name, "pinpoint.test")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""Tests for the inverted index behind the history search box."""
+import unittest
+import random
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain.label_index import LabelIndex, tokenize
+
+
+class TestTokenize(unittest.TestCase):
+
+    def test_folds_case_and_accents(self):
+        self.assertEqual(tokenize("Near Zürich HB — Straße"), ["near", "zurich", "hb", "strasse"])
+        self.assertEqual(tokenize("  ·  "), [])
+
+
+class TestLabelIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = LabelIndex()
+        self.index.load([
+            ("a", "Water tower"),
+            ("b", "near Zürich — church"),
+            ("c", "Tower crane, Zug"),
+            ("d", ""),
+        ])
+
+    def test_prefix_and_accents(self):
+        self.assertEqual(self.index.search("tow"), ["c", "a"])
+        self.assertEqual(self.index.search("ZUR"), ["b"])
+        self.assertEqual(self.index.search("zür"), ["b"])
+        self.assertEqual(self.index.search("ower"), [])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.index.search("tower zu"), ["c"])
+        self.assertEqual(self.index.search("tower church"), [])
+
+    def test_empty_query_lists_everything_newest_first(self):
+        self.assertEqual(self.index.search(""), ["d", "c", "b", "a"])
+        self.assertEqual(self.index.search("  ", limit=2), ["d", "c"])
+
+    def test_update_keeps_rank_add_moves_to_top(self):
+        self.index.update("a", "Old church")
+        self.assertEqual(self.index.search("church"), ["b", "a"])
+        self.assertEqual(self.index.search("tower"), ["c"])
+        self.index.add("a", "Old church")
+        self.assertEqual(self.index.search("church"), ["a", "b"])
+
+    def test_remove(self):
+        self.assertTrue(self.index.remove("c"))
+        self.assertFalse(self.index.remove("c"))
+        self.assertEqual(self.index.search("tow"), ["a"])
+        self.assertNotIn("zug", self.index._tokens)
+        self.assertEqual(len(self.index), 3)
+
+    def test_matches_brute_force(self):
+        rng = random.Random(5)
+        words = ["tower", "town", "top", "church", "chur", "zug", "zurich", "hut"]
+        index = LabelIndex()
+        labels = {}
+        for i in range(300):
+            labels[i] = " ".join(rng.sample(words, rng.randint(0, 3)))
+        index.load(labels.items())
+        for i in rng.sample(range(300), 50):
+            labels[i] = " ".join(rng.sample(words, 2))
+            index.update(i, labels[i])
+
+        for query in ("t", "to", "tow zu", "chur", "church hut", "x", "z h"):
+            expected = [i for i in reversed(range(300))
+                        if all(any(tok.startswith(w) for tok in tokenize(labels[i]))
+                               for w in tokenize(query))]
+            self.assertEqual(index.search(query), expected)
+            self.assertEqual(index.search(query, limit=5), expected[:5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+"""Tests for the compressed archive segments behind tiered history."""
+import unittest
+import json
+import random
+import shutil
+import sys
+import os
+import tempfile
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.location_archive import (
+    LocationArchive, encode_segment, decode_segment, MANIFEST_FILE,
+)
+from data.location_repository import SavedLocation
+
+
+def _records(n, seed=1):
+    rng = random.Random(seed)
+    lat, lon = 47.0, 8.0
+    records = []
+    for i in range(n):
+        lat += rng.uniform(-0.01, 0.01)
+        lon += rng.uniform(-0.01, 0.01)
+        records.append(SavedLocation(
+            lat, lon, lat + 0.003, lon - 0.002, rng.uniform(0, 360),
+            rng.uniform(10, 2000), rng.uniform(3, 80),
+            timestamp=f"2023-03-{1 + i // 1440:02d}T{i // 60 % 24:02d}:{i % 60:02d}:00",
+            label=rng.choice(("", "near Zug", "mast")),
+        ).to_dict())
+    return records
+
+
+class TestSegmentCodec(unittest.TestCase):
+
+    def test_round_trip(self):
+        records = _records(500)
+        decoded = decode_segment(encode_segment(records))
+        self.assertEqual(len(decoded), len(records))
+        for before, after in zip(records, decoded):
+            for field, value in before.items():
+                if field.endswith(("_lat", "_lon")):
+                    self.assertAlmostEqual(after[field], value, delta=6e-8)
+                else:
+                    self.assertEqual(after[field], value)
+        # already on the grid, so a second round trip is exact
+        self.assertEqual(decode_segment(encode_segment(decoded)), decoded)
+
+    def test_smaller_than_the_json(self):
+        records = _records(2000)
+        self.assertLess(len(encode_segment(records)) * 3, len(json.dumps(records)))
+
+    def test_rejects_other_data(self):
+        with self.assertRaises(ValueError):
+            decode_segment(b"not compressed")
+        with self.assertRaises(ValueError):
+            decode_segment(zlib.compress(b'{"format": "pinpoint-archive", "version": 99}'))
+
+
+class TestLocationArchive(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self.directory = os.path.join(self._tmpdir, "archive")
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def test_nothing_on_disk_until_written(self):
+        archive = LocationArchive(self.directory)
+        self.assertEqual(len(archive), 0)
+        self.assertFalse(os.path.exists(self.directory))
+
+    def test_append_replace_and_reopen(self):
+        archive = LocationArchive(self.directory)
+        records = _records(300)
+        first = archive.append(records[:200])
+        second = archive.append(records[200:])
+        self.assertEqual((first.first, first.last), (records[0]["timestamp"],
+                                                     records[199]["timestamp"]))
+
+        replaced = archive.replace(first, records[:50])
+        self.assertFalse(os.path.exists(os.path.join(self.directory, first.file)))
+
+        reopened = LocationArchive(self.directory)
+        self.assertEqual(reopened.segments, (replaced, second))
+        self.assertEqual(len(reopened), 150)
+        self.assertEqual([r["id"] for r in reopened.read(replaced)],
+                         [r["id"] for r in records[:50]])
+
+        self.assertIsNone(reopened.replace(replaced, []))
+        reopened.clear()
+        self.assertEqual(LocationArchive(self.directory).segments, ())
+        self.assertEqual(os.listdir(self.directory), [MANIFEST_FILE])
+
+    def test_segments_know_their_newest_change(self):
+        records = _records(100)
+        for i, r in enumerate(records):
+            r["seq"] = (i * 37) % 101
+        archive = LocationArchive(self.directory)
+        info = archive.append(records)
+        self.assertEqual(info.seq, 100)
+        self.assertEqual(LocationArchive(self.directory).segments, (info,))
+
+        # manifests from before seq numbers read as seq 0
+        manifest = os.path.join(self.directory, MANIFEST_FILE)
+        with open(manifest) as f:
+            doc = json.load(f)
+        doc["version"] = 1
+        for segment in doc["segments"]:
+            del segment["seq"]
+        with open(manifest, "w") as f:
+            json.dump(doc, f)
+        self.assertEqual(LocationArchive(self.directory).segments, (info._replace(seq=0),))
+
+    def test_unreadable_manifest_raises(self):
+        os.makedirs(self.directory)
+        with open(os.path.join(self.directory, MANIFEST_FILE), "w") as f:
+            f.write('{"version": 1}')
+        with self.assertRaises(ValueError):
+            LocationArchive(self.directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
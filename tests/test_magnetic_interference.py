@@ -0,0 +1,93 @@
+"""Tests for spotting magnetic interference from field strength and dip."""
+import unittest
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain.magnetic_interference import InterferenceDetector
+
+FIELD = 48.0  # µT
+DIP = 65.0    # degrees
+GRAVITY = (0.0, 0.0, 9.81)  # what the accelerometer reads at rest: up
+
+
+def _earth_field(disturbance=(0.0, 0.0, 0.0)):
+    """Field in north/east/up coordinates, plus whatever iron adds."""
+    dip = math.radians(DIP)
+    return (FIELD * math.cos(dip) + disturbance[0], disturbance[1],
+            -FIELD * math.sin(dip) + disturbance[2])
+
+
+def _random_rotation(rng):
+    w, x, y, z = (rng.gauss(0, 1) for _ in range(4))
+    n = math.sqrt(w * w + x * x + y * y + z * z)
+    w, x, y, z = w / n, x / n, y / n, z / n
+    return ((1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)),
+            (2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)),
+            (2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)))
+
+
+def _in_phone_axes(rotation, v):
+    # the transpose takes world vectors into the phone's frame
+    return tuple(sum(rotation[k][r] * v[k] for k in range(3)) for r in range(3))
+
+
+class TestInterferenceDetector(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(5)
+        self.detector = InterferenceDetector()
+        self.detector.set_expected(DIP, FIELD)
+
+    def _feed(self, n, disturbance=lambda: (0.0, 0.0, 0.0), noise=0.3):
+        for _ in range(n):
+            rotation = _random_rotation(self.rng)
+            field = _in_phone_axes(rotation, _earth_field(disturbance()))
+            field = tuple(c + self.rng.gauss(0, noise) for c in field)
+            self.detector.add(*field, gravity=_in_phone_axes(rotation, GRAVITY))
+
+    def test_clean_field(self):
+        self._feed(200)
+        self.assertLess(self.detector.score, 0.2)
+        self.assertEqual(self.detector.heading_error, 0.0)
+        self.assertAlmostEqual(self.detector.dip.mean, DIP, delta=1.0)
+        self.assertAlmostEqual(self.detector.strength.mean, FIELD, delta=1.0)
+
+    def test_nothing_to_go_on_yet(self):
+        self._feed(5, disturbance=lambda: (0.0, 40.0, 0.0))
+        self.assertEqual(self.detector.score, 0.0)
+        self.assertEqual(self.detector.heading_error, 0.0)
+
+    def test_steady_interference(self):
+        # parked next to a car: strength and dip both off, but steady
+        self._feed(200, disturbance=lambda: (15.0, 5.0, -15.0))
+        self.assertGreater(self.detector.score, 0.5)
+        self.assertGreater(self.detector.heading_error, 5.0)
+
+    def test_wandering_field(self):
+        # walking past steel: right on average, all over the place
+        self._feed(200, disturbance=lambda: tuple(self.rng.gauss(0, 8) for _ in range(3)))
+        self.assertGreater(self.detector.score, 0.5)
+        self.assertGreater(self.detector.heading_error, 5.0)
+
+    def test_goes_away_again(self):
+        self._feed(100, disturbance=lambda: (15.0, 5.0, -15.0))
+        self._feed(100)
+        self.assertLess(self.detector.score, 0.5)
+
+    def test_without_expected_field_or_gravity(self):
+        detector = InterferenceDetector()
+        for _ in range(100):
+            detector.add(FIELD + self.rng.gauss(0, 0.3), 0.0, 0.0)
+        # steady and nothing to compare with
+        self.assertLess(detector.score, 0.5)
+        for _ in range(100):
+            detector.add(FIELD + self.rng.gauss(0, 10), 0.0, 0.0)
+        self.assertGreater(detector.score, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""Tests for the hard/soft-iron magnetometer calibration."""
+import unittest
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain.magnetometer_calibration import (
+    EllipsoidFit, MagnetometerCalibration, MIN_SAMPLES,
+)
+
+FIELD = 50.0  # µT
+# a phone with a magnetised part and some steel in it
+SOFT_IRON = ((1.10, 0.05, 0.02), (0.05, 0.90, -0.03), (0.02, -0.03, 1.00))
+HARD_IRON = (20.0, -15.0, 8.0)
+
+
+def _distort(v):
+    return tuple(sum(SOFT_IRON[r][k] * v[k] for k in range(3)) + HARD_IRON[r]
+                 for r in range(3))
+
+
+def _turned_all_round(n, rng, noise=0.0):
+    """(true field, raw reading) pairs with the phone in random orientations."""
+    pairs = []
+    for _ in range(n):
+        v = [rng.gauss(0, 1) for _ in range(3)]
+        norm = math.sqrt(sum(c * c for c in v))
+        v = tuple(FIELD * c / norm for c in v)
+        raw = tuple(c + rng.gauss(0, noise) for c in _distort(v))
+        pairs.append((v, raw))
+    return pairs
+
+
+def _angle(a, b):
+    cos = sum(x * y for x, y in zip(a, b)) / math.sqrt(sum(x * x for x in a)
+                                                        * sum(y * y for y in b))
+    return math.degrees(math.acos(max(-1.0, min(1.0, cos))))
+
+
+class TestEllipsoidFit(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(7)
+
+    def _fit(self, pairs):
+        fit = EllipsoidFit()
+        for _, raw in pairs:
+            fit.add(*raw)
+        return fit
+
+    def test_recovers_offset_and_directions(self):
+        pairs = _turned_all_round(200, self.rng)
+        calibration = self._fit(pairs).solve()
+        self.assertIsNotNone(calibration)
+        for got, expected in zip(calibration.offset, HARD_IRON):
+            self.assertAlmostEqual(got, expected, places=6)
+        for v, raw in pairs:
+            corrected = calibration.apply(*raw)
+            self.assertLess(_angle(corrected, v), 1e-4)
+            self.assertAlmostEqual(math.sqrt(sum(c * c for c in corrected)),
+                                   calibration.field, places=6)
+
+    def test_noisy_readings(self):
+        pairs = _turned_all_round(500, self.rng, noise=0.3)
+        calibration = self._fit(pairs).solve()
+        errors = [_angle(calibration.apply(*raw), v) for v, raw in pairs]
+        # uncalibrated, the same readings are off by up to ~40°
+        self.assertLess(sum(errors) / len(errors), 0.5)
+        self.assertLess(max(errors), 2.0)
+
+    def test_not_turned_enough(self):
+        # flat on the table, only ever turned about z
+        fit = EllipsoidFit()
+        for i in range(300):
+            a = i * 0.05
+            fit.add(*_distort((FIELD * 0.6 * math.cos(a), FIELD * 0.6 * math.sin(a),
+                               FIELD * 0.8)))
+        self.assertLess(fit.progress, 0.5)
+        self.assertIsNone(fit.solve())
+
+    def test_too_few_or_random_readings(self):
+        self.assertIsNone(self._fit(_turned_all_round(MIN_SAMPLES - 1, self.rng)).solve())
+        fit = EllipsoidFit()
+        for _ in range(300):
+            fit.add(*(self.rng.uniform(-60, 60) for _ in range(3)))
+        self.assertIsNone(fit.solve())
+
+    def test_progress(self):
+        fit = EllipsoidFit()
+        self.assertEqual(fit.progress, 0.0)
+        for _, raw in _turned_all_round(MIN_SAMPLES, self.rng):
+            fit.add(*raw)
+        self.assertEqual(fit.progress, 1.0)
+
+
+class TestMagnetometerCalibration(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def test_save_and_load(self):
+        calibration = MagnetometerCalibration((1.0, 2.0, 3.0),
+                                              ((1.0, 0.1, 0.0), (0.1, 1.0, 0.0), (0, 0, 1)),
+                                              field=48.0, samples=120, residual=0.01)
+        path = os.path.join(self._tmpdir, "sub", "calibration.json")
+        calibration.save(path)
+        again = MagnetometerCalibration.load(path)
+        self.assertEqual(again.to_dict(), calibration.to_dict())
+        self.assertEqual(again.apply(2.0, 2.0, 4.0), (1.0, 0.1, 1.0))
+
+    def test_missing_or_unusable_file(self):
+        path = os.path.join(self._tmpdir, "calibration.json")
+        self.assertIsNone(MagnetometerCalibration.load(path))
+        with open(path, "w") as f:
+            f.write('{"version": 1, "offset": [1, 2]}')
+        self.assertIsNone(MagnetometerCalibration.load(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
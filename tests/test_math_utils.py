@@ -8,7 +8,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.math_utils import (
     deg_to_rad, rad_to_deg, normalize_heading,
-    heading_to_cardinal, smooth_values, smooth_heading,
+    heading_to_cardinal, smooth_values, smooth_heading, heading_spread,
+    great_circle_distance, camera_elevation,
 )
 
 
@@ -30,6 +31,17 @@ class TestConversions(unittest.TestCase):
             self.assertAlmostEqual(rad_to_deg(deg_to_rad(deg)), deg)
 
 
+class TestDistance(unittest.TestCase):
+
+    def test_great_circle_distance(self):
+        # London -> Paris, ~343.5 km on the 6371 km sphere
+        d = great_circle_distance(51.5074, -0.1278, 48.8566, 2.3522)
+        self.assertAlmostEqual(d / 1000, 343.5, delta=1.0)
+        self.assertAlmostEqual(great_circle_distance(0, 179.9, 0, -179.9),
+                               great_circle_distance(0, 0, 0, 0.2))
+        self.assertEqual(great_circle_distance(10, 20, 10, 20), 0.0)
+
+
 class TestHeading(unittest.TestCase):
 
     def test_normalize_positive(self):
@@ -85,6 +97,36 @@ class TestSmoothing(unittest.TestCase):
     def test_smooth_heading_empty(self):
         self.assertEqual(smooth_heading([]), 0.0)
 
+    def test_heading_spread(self):
+        self.assertEqual(heading_spread([90, 90, 90]), 0.0)
+        self.assertEqual(heading_spread([90]), 0.0)
+        # about the standard deviation for a small spread, across 0/360 too
+        self.assertAlmostEqual(heading_spread([89, 91], window=2), 1.0, delta=0.01)
+        self.assertAlmostEqual(heading_spread([359, 1], window=2), 1.0, delta=0.01)
+
+
+class TestCameraElevation(unittest.TestCase):
+
+    def test_upright_portrait_looks_at_horizon(self):
+        self.assertAlmostEqual(camera_elevation(0.0, 9.81, 0.0), 0.0)
+        # turning the phone in its own plane doesn't move the camera
+        self.assertAlmostEqual(camera_elevation(9.81, 0.0, 0.0), 0.0)
+
+    def test_flat_on_a_table_looks_down(self):
+        self.assertAlmostEqual(camera_elevation(0.0, 0.0, 9.81), -90.0)
+        self.assertAlmostEqual(camera_elevation(0.0, 0.0, -9.81), 90.0)
+
+    def test_tilted(self):
+        g = 9.81
+        a = math.radians(20)
+        # top tipped away from the user: the camera looks 20° down
+        self.assertAlmostEqual(camera_elevation(0.0, g * math.cos(a), g * math.sin(a)), -20.0)
+        # tipped back towards the user: 20° up
+        self.assertAlmostEqual(camera_elevation(0.0, g * math.cos(a), -g * math.sin(a)), 20.0)
+        # leaning sideways as well doesn't change it
+        self.assertAlmostEqual(camera_elevation(3.0, math.sqrt(g * g * math.cos(a) ** 2 - 9.0),
+                                                g * math.sin(a)), -20.0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,140 @@
+"""Tests for the GPS position filter."""
+import unittest
+import random
+import math
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain.position_filter import PositionFilter, PositionAverager, METERS_PER_DEG
+
+
+def offset(lat, lon, east_m, north_m):
+    """Shift a lat/lon by a few meters (flat earth is fine at this scale)."""
+    return (lat + north_m / METERS_PER_DEG,
+            lon + east_m / (METERS_PER_DEG * math.cos(math.radians(lat))))
+
+
+class TestPositionFilter(unittest.TestCase):
+
+    def setUp(self):
+        self.filter = PositionFilter()
+        self.rng = random.Random(1)
+
+    def test_first_fix_passes_through(self):
+        self.assertTrue(self.filter.update(37.0, -122.0, 8.0, timestamp=0.0))
+        self.assertAlmostEqual(self.filter.latitude, 37.0)
+        self.assertAlmostEqual(self.filter.longitude, -122.0)
+        self.assertAlmostEqual(self.filter.accuracy, 8.0)
+
+    def test_stationary_noise_is_smoothed(self):
+        lat0, lon0 = 37.0, -122.0
+        raw_err = 0.0
+        for i in range(60):
+            lat, lon = offset(lat0, lon0, self.rng.gauss(0, 5), self.rng.gauss(0, 5))
+            raw_err = max(raw_err, abs(lat - lat0) * METERS_PER_DEG)
+            self.filter.update(lat, lon, 5.0, timestamp=float(i))
+
+        err_n = abs(self.filter.latitude - lat0) * METERS_PER_DEG
+        self.assertLess(err_n, raw_err)
+        self.assertLess(self.filter.accuracy, 5.0)
+
+    def test_covariance_shape(self):
+        self.filter.update(0.0, 0.0, 4.0, timestamp=0.0)
+        cov = self.filter.covariance
+        self.assertAlmostEqual(cov[0][0], 16.0)
+        self.assertAlmostEqual(cov[1][1], 16.0)
+        self.assertEqual(cov[0][1], 0.0)
+
+    def test_rejects_implausible_jump(self):
+        for i in range(5):
+            self.filter.update(37.0, -122.0, 5.0, timestamp=float(i))
+        lat, lon = offset(37.0, -122.0, 2000, 0)
+        self.assertFalse(self.filter.update(lat, lon, 5.0, timestamp=5.0))
+        self.assertAlmostEqual(self.filter.longitude, -122.0, places=5)
+        self.assertEqual(self.filter.rejected_count, 1)
+
+    def test_recovers_after_repeated_rejects(self):
+        for i in range(5):
+            self.filter.update(37.0, -122.0, 5.0, timestamp=float(i))
+        lat, lon = offset(37.0, -122.0, 2000, 0)
+        accepted = [self.filter.update(lat, lon, 5.0, timestamp=5.0 + i * 0.1)
+                    for i in range(PositionFilter.MAX_REJECTS)]
+        self.assertTrue(accepted[-1])
+        self.assertAlmostEqual(self.filter.longitude, lon, places=6)
+
+    def test_follows_walking_user(self):
+        lat, lon = 37.0, -122.0
+        for i in range(30):
+            # walk north at 1.4 m/s
+            self.filter.update(*offset(lat, lon, 0, 1.4 * i), 5.0, timestamp=float(i))
+        expected, _ = offset(lat, lon, 0, 1.4 * 29)
+        self.assertAlmostEqual(self.filter.latitude, expected, delta=8 / METERS_PER_DEG)
+
+    def test_reanchor_keeps_position(self):
+        f = PositionFilter(max_speed=1e6)
+        f.update(0.0, 0.0, 5.0, timestamp=0.0)
+        # jump 20 km with a long gap so it's accepted, forcing a re-anchor
+        lat, lon = offset(0.0, 0.0, 20_000, 0)
+        f.update(lat, lon, 5.0, timestamp=10_000.0)
+        self.assertAlmostEqual(f.longitude, lon, places=4)
+
+    def test_reset_to_position(self):
+        self.filter.update(37.0, -122.0, 5.0, timestamp=0.0)
+        self.filter.reset(10.0, 20.0, 1.0)
+        self.assertAlmostEqual(self.filter.latitude, 10.0)
+        self.assertAlmostEqual(self.filter.accuracy, 1.0)
+
+
+class TestPositionAverager(unittest.TestCase):
+
+    def setUp(self):
+        self.avg = PositionAverager()
+        self.rng = random.Random(3)
+
+    def test_single_fix(self):
+        self.avg.add(37.0, -122.0, 6.0)
+        self.assertEqual(self.avg.count, 1)
+        self.assertAlmostEqual(self.avg.latitude, 37.0)
+        self.assertAlmostEqual(self.avg.accuracy, 6.0)
+
+    def test_weighted_mean(self):
+        """A fix with half the error counts four times as much."""
+        lat, lon = offset(37.0, -122.0, 10.0, 0.0)
+        self.avg.add(37.0, -122.0, 2.0)
+        self.avg.add(lat, lon, 4.0)
+        east = (self.avg.longitude + 122.0) * METERS_PER_DEG * math.cos(math.radians(37.0))
+        self.assertAlmostEqual(east, 10.0 * 0.25 / 1.25, places=3)
+
+    def test_accuracy_improves_with_sqrt_n(self):
+        for _ in range(16):
+            lat, lon = offset(37.0, -122.0, self.rng.gauss(0, 4), self.rng.gauss(0, 4))
+            self.avg.add(lat, lon, 8.0)
+        # 8 / sqrt(16) = 2, scatter is smaller than reported accuracy here
+        self.assertAlmostEqual(self.avg.accuracy, 2.0, delta=0.01)
+
+    def test_scatter_limits_accuracy(self):
+        """If fixes scatter more than they claim, don't believe the claim."""
+        for _ in range(25):
+            lat, lon = offset(37.0, -122.0, self.rng.gauss(0, 20), self.rng.gauss(0, 20))
+            self.avg.add(lat, lon, 3.0)
+        self.assertGreater(self.avg.accuracy, 3.0 / 5)
+        (s_ee, _), (_, s_nn) = self.avg.spread
+        self.assertGreater(s_ee, 100)
+        self.assertGreater(s_nn, 100)
+
+    def test_accuracy_floor(self):
+        for _ in range(10_000):
+            self.avg.add(37.0, -122.0, 3.0)
+        self.assertEqual(self.avg.accuracy, PositionAverager.MIN_ACCURACY)
+
+    def test_reset(self):
+        self.avg.add(37.0, -122.0, 3.0)
+        self.avg.reset()
+        self.assertEqual(self.avg.count, 0)
+        self.assertEqual(self.avg.accuracy, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
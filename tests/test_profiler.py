@@ -0,0 +1,115 @@
+"""Tests for the opt-in frame/callback profiler."""
+import unittest
+import json
+import tempfile
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.profiler import Profiler, Histogram, FRAME_BUDGET
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_empty(self):
+        h = Histogram()
+        self.assertEqual(h.mean, 0.0)
+        self.assertEqual(h.percentile(95), 0.0)
+
+    def test_percentiles(self):
+        h = Histogram()
+        for _ in range(95):
+            h.add(0.0003)  # 0.5 ms bucket
+        for _ in range(5):
+            h.add(0.050)   # 66 ms bucket
+        self.assertEqual(h.count, 100)
+        self.assertAlmostEqual(h.percentile(50), 0.0005)
+        self.assertAlmostEqual(h.percentile(95), 0.0005)
+        self.assertAlmostEqual(h.percentile(99), 0.050)  # capped at the max seen
+        self.assertAlmostEqual(h.max, 0.050)
+
+    def test_overflow_bucket_reports_max(self):
+        h = Histogram()
+        h.add(2.5)
+        self.assertEqual(h.percentile(50), 2.5)
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_disabled_returns_function_unchanged(self):
+        p = Profiler(enabled=False)
+
+        def fn():
+            return 1
+
+        self.assertIs(p.wrap("x", fn), fn)
+
+    def test_wrap_records_duration(self):
+        now = [0.0]
+        p = Profiler(enabled=True, clock=lambda: now[0])
+
+        def slow(x):
+            now[0] += 0.004
+            return x * 2
+
+        timed = p.wrap("slow", slow)
+        self.assertEqual(timed(3), 6)
+        self.assertEqual(timed.__name__, "slow")
+        hist = p.callbacks["slow"]
+        self.assertEqual(hist.count, 1)
+        self.assertAlmostEqual(hist.total, 0.004)
+
+    def test_records_even_when_callback_raises(self):
+        now = [0.0]
+        p = Profiler(enabled=True, clock=lambda: now[0])
+
+        def broken():
+            now[0] += 0.001
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            p.wrap("broken", broken)()
+        self.assertEqual(p.callbacks["broken"].count, 1)
+
+    def test_frames_over_budget(self):
+        p = Profiler(enabled=True)
+        for _ in range(10):
+            p.record_frame(FRAME_BUDGET)
+        p.record_frame(FRAME_BUDGET * 3)
+        self.assertEqual(p.frames.count, 11)
+        self.assertEqual(p.frames_over_budget, 1)
+
+    def test_top_sorts_by_worst(self):
+        p = Profiler(enabled=True)
+        p.record("fast", 0.001)
+        p.record("slow", 0.020)
+        p.record("medium", 0.005)
+        names = [name for name, _ in p.top(2)]
+        self.assertEqual(names, ["slow", "medium"])
+        self.assertEqual(len(p.summary(2)), 3)
+
+    def test_dump(self):
+        p = Profiler(enabled=True)
+        p.record("repo.save", 0.012)
+        p.record_frame(0.1)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sub", "profile.json")
+            p.dump(path)
+            with open(path) as f:
+                data = json.load(f)
+        self.assertEqual(data["frames_over_budget"], 1)
+        self.assertEqual(data["callbacks"]["repo.save"]["count"], 1)
+
+    def test_reset(self):
+        p = Profiler(enabled=True)
+        p.record("x", 0.001)
+        p.record_frame(1.0)
+        p.reset()
+        self.assertEqual(p.callbacks, {})
+        self.assertEqual(p.frames.count, 0)
+        self.assertEqual(p.frames_over_budget, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+"""Tests for several LocationRepository instances (and processes) on one store."""
+import unittest
+import json
+import shutil
+import subprocess
+import sys
+import os
+import tempfile
+import textwrap
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data import location_repository
+from data.location_repository import LocationRepository, SavedLocation, STORAGE_FILE
+
+
+def _location(lat, label=""):
+    return SavedLocation(47.0, 8.0, lat, 8.0, 90.0, 500, 10.0, label=label)
+
+
+class TestSharedStore(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self.app = LocationRepository(storage_dir=self._tmpdir)
+        self.tool = LocationRepository(storage_dir=self._tmpdir)
+        self.events = []
+        self.app.add_listener(lambda event, loc: self.events.append(
+            (event, loc.id if loc else None)))
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def _ids(self, repo):
+        return [loc.id for loc in repo.get_all()]
+
+    def test_refresh_picks_up_only_the_new_changes(self):
+        a = self.app.add(_location(1.0))
+        self.assertTrue(self.tool.refresh())
+        b = self.tool.add(_location(2.0, label="mast"))
+        self.tool.update_label(a.id, "tower")
+        self.tool.delete_by_id(b.id)
+        c = self.tool.add(_location(3.0))
+
+        self.assertTrue(self.app.refresh())
+        self.assertEqual(self.events, [("add", a.id), ("add", b.id), ("update", a.id),
+                                       ("delete", b.id), ("add", c.id)])
+        self.assertEqual(self._ids(self.app), [c.id, a.id])
+        self.assertEqual(self.app.get(a.id).label, "tower")
+        self.assertEqual([loc.id for loc in self.app.search("tower")], [a.id])
+        self.assertFalse(self.app.refresh())
+        self.assertEqual([(change.id, change.location) for change in self.app.changes_since(1)],
+                         [(a.id, self.app.get(a.id)), (b.id, None), (c.id, self.app.get(c.id))])
+
+    def test_writes_from_both_sides_are_kept(self):
+        # no refreshing in between: every change catches up first
+        ids = []
+        for i in range(10):
+            ids.append(self.app.add(_location(float(i))).id)
+            ids.append(self.tool.add(_location(float(i) + 0.5)).id)
+        self.app.refresh()
+        self.assertEqual(self._ids(self.app), ids[::-1])
+        self.assertEqual(self._ids(self.tool), ids[::-1])
+        self.assertEqual(self._ids(LocationRepository(storage_dir=self._tmpdir)), ids[::-1])
+
+    def test_merge_from_the_other_side_updates_the_same_object(self):
+        first = self.app.add(_location(47.0, label="tower"))
+        self.tool.add(_location(47.00001), merge=True)
+        self.app.refresh()
+        self.assertEqual(self.events[-1], ("update", first.id))
+        self.assertEqual(first.observations, 2)
+        self.assertEqual(self.app.count, 1)
+
+    def test_compaction(self):
+        with mock.patch.object(location_repository, "COMPACT_MIN", 5):
+            behind = LocationRepository(storage_dir=self._tmpdir)
+            for i in range(5):
+                self.tool.add(_location(float(i)))
+            self.app.refresh()
+            del self.events[:]
+            # the first of these compacts the five before it
+            for i in range(5, 8):
+                self.tool.add(_location(float(i)))
+
+            with open(os.path.join(self._tmpdir, STORAGE_FILE)) as f:
+                stored = json.load(f)
+            self.assertEqual(stored["version"], 2)
+            self.assertEqual(stored["seq"], 5)
+            self.assertEqual(len(stored["locations"]), 6)
+
+            # caught up to the compaction: just the journal after it
+            self.assertTrue(self.app.refresh())
+            self.assertEqual([event for event, _ in self.events], ["add"] * 3)
+            # behind it: has to read the new storage file
+            behind_events = []
+            behind.add_listener(lambda event, loc: behind_events.append(event))
+            self.assertTrue(behind.refresh())
+            self.assertEqual(behind_events, ["reload"])
+            for repo in (self.app, behind):
+                self.assertEqual(self._ids(repo), self._ids(self.tool))
+
+    def test_journal_cut_off_by_a_crash(self):
+        a = self.tool.add(_location(1.0))
+        with open(self.tool._path + ".journal", "ab") as f:
+            f.write(b'{"seq": 2, "op": "add", "locat')
+
+        self.assertEqual(self._ids(LocationRepository(storage_dir=self._tmpdir)), [a.id])
+        self.app.refresh()
+        b = self.app.add(_location(2.0))
+        self.assertEqual(self._ids(LocationRepository(storage_dir=self._tmpdir)),
+                         [b.id, a.id])
+
+    def test_compaction_that_died_halfway(self):
+        for i in range(3):
+            self.tool.add(_location(float(i)))
+        a = self.tool.add(_location(9.0))
+        self.tool.update_label(a.id, "mast")
+        journal = self.tool._path + ".journal"
+        with open(journal, "rb") as f:
+            entries = f.read()
+        # storage file written, journal still the old one
+        self.tool._compact()
+        with open(journal, "wb") as f:
+            f.write(entries)
+
+        again = LocationRepository(storage_dir=self._tmpdir)
+        self.assertEqual(self._ids(again), self._ids(self.tool))
+        self.assertEqual(again.get(a.id).label, "mast")
+        self.assertEqual(again._seq, 5)
+
+    def test_reads_the_old_file_format(self):
+        old = [_location(float(i)).to_dict() for i in range(3)]
+        with open(os.path.join(self._tmpdir, STORAGE_FILE), "w") as f:
+            json.dump(old, f)
+        self.assertTrue(self.app.refresh())
+        self.assertEqual(self._ids(self.app), [d["id"] for d in old])
+        self.app.add(_location(5.0))
+        self.assertTrue(self.tool.refresh())
+        self.assertEqual(self.tool.count, 4)
+
+
+class TestSeparateProcesses(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def test_concurrent_writers_lose_nothing(self):
+        script = textwrap.dedent("""
+            import sys
+            sys.path.insert(0, sys.argv[1])
+            from data.location_repository import LocationRepository, SavedLocation
+            repo = LocationRepository(storage_dir=sys.argv[2])
+            for i in range(100):
+                repo.add(SavedLocation(0, 0, i, 0, 0, 100, 10, label=sys.argv[3]))
+        """)
+        with mock.patch.dict(os.environ, {"PYTHONDONTWRITEBYTECODE": "1"}):
+            writers = [subprocess.Popen([sys.executable, "-c", script, ROOT, self._tmpdir,
+                                         f"writer {n}"])
+                       for n in range(3)]
+            for p in writers:
+                self.assertEqual(p.wait(60), 0)
+
+        repo = LocationRepository(storage_dir=self._tmpdir)
+        self.assertEqual(repo.count, 300)
+        for n in range(3):
+            mine = [loc.dest_lat for loc in repo.get_all() if loc.label == f"writer {n}"]
+            self.assertEqual(mine, list(range(99, -1, -1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,208 @@
+"""Stress tests for LocationRepository shared between threads."""
+import unittest
+import json
+import math
+import random
+import shutil
+import sys
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.location_repository import LocationRepository, SavedLocation, STORAGE_FILE
+
+
+def _location(lat, timestamp=None, label=""):
+    return SavedLocation(47.0, 8.0, lat, 8.0, 90.0, 500, 10.0,
+                         timestamp=timestamp, label=label)
+
+
+class TestRepositoryThreads(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        # 600 from last year (archived on load) and 100 recent ones
+        old = datetime.now() - timedelta(days=365)
+        self.archived = [_location(40.0 + i * 1e-3, (old + timedelta(minutes=i)).isoformat(),
+                                   label=f"old {i}")
+                         for i in range(600)]
+        recent = [_location(45.0 + i * 1e-3) for i in range(100)]
+        with open(os.path.join(self._tmpdir, STORAGE_FILE), "w") as f:
+            json.dump([loc.to_dict() for loc in reversed(self.archived + recent)], f)
+        self.repo = LocationRepository(storage_dir=self._tmpdir, hot_days=30)
+        self.assertEqual(len(self.repo._by_id), 100)
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def test_readers_and_a_writer(self):
+        repo = self.repo
+        errors = []
+        done = threading.Event()
+        reads = []
+        # a target that keeps being sighted again with the same accuracy,
+        # so accuracy * sqrt(observations) stays 10 unless a read is torn
+        target = repo.add(_location(50.0), merge=False)
+        archived_ids = [loc.id for loc in self.archived]
+
+        def check_page(items):
+            ids = [loc.id for loc in items]
+            if len(ids) != len(set(ids)):
+                raise AssertionError("duplicate ids in one read")
+            for loc in items:
+                if loc.id == target.id:
+                    product = loc.accuracy * math.sqrt(loc.observations)
+                    if abs(product - 10.0) > 1e-6:
+                        raise AssertionError(f"torn merge: {product}")
+
+        def reader(seed):
+            rng = random.Random(seed)
+            count = 0
+            try:
+                while not done.is_set():
+                    everything = repo.get_all()
+                    check_page(everything)
+                    # moving to the top mustn't take it out of a read
+                    if not any(loc.id == target.id for loc in everything):
+                        raise AssertionError("merged record missing")
+                    check_page(repo.query(limit=25).items)
+                    check_page(repo.query(offset=rng.randrange(800), limit=25).items)
+                    check_page(repo.query(limit=10, sort="accuracy").items)
+                    check_page(repo.search("new"))
+                    check_page(repo.query(search="old 1", sort="oldest").items)
+                    repo.get(rng.choice(archived_ids))
+                    repo.count
+                    count += 1
+            except Exception as e:
+                errors.append(e)
+            reads.append(count)
+
+        def writer():
+            rng = random.Random(0)
+            added = []
+            archived = list(archived_ids)
+            try:
+                for i in range(60):
+                    loc = repo.add(_location(46.0 + i * 1e-3, label=f"new {i}"), merge=False)
+                    added.append(loc.id)
+                    repo.add(_location(50.0), merge=True)
+                    if i % 3 == 0:
+                        repo.delete_by_id(added.pop(rng.randrange(len(added))))
+                    if i % 10 == 0:
+                        repo.update_label(rng.choice(archived), f"relabelled {i}")
+                    if i % 25 == 0:
+                        repo.delete_by_id(archived.pop(rng.randrange(len(archived))))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                done.set()
+
+        readers = [threading.Thread(target=reader, args=(seed,)) for seed in range(3)]
+        for t in readers:
+            t.start()
+        writer_thread = threading.Thread(target=writer)
+        writer_thread.start()
+        writer_thread.join(60)
+        for t in readers:
+            t.join(60)
+
+        self.assertEqual(errors, [])
+        self.assertTrue(all(reads))
+        # 700 to start + target + 60 added - 20 deleted - 3 archived deleted
+        expected = 700 + 1 + 60 - 20 - 3
+        self.assertEqual(repo.count, expected)
+        stored = repo.get(target.id)
+        self.assertEqual(stored.observations, 61)
+
+        again = LocationRepository(storage_dir=self._tmpdir)
+        self.assertEqual([loc.id for loc in again.get_all()],
+                         [loc.id for loc in repo.get_all()])
+
+    def test_readers_while_archiving(self):
+        repo = self.repo
+        for i in range(400):
+            repo.add(_location(46.0 + i * 1e-3), merge=False)
+        total = repo.count
+        errors = []
+        reads = []
+        done = threading.Event()
+        original_append = repo._archive.append
+
+        def slow_append(records):
+            # let the readers in between chunks
+            time.sleep(0.005)
+            return original_append(records)
+
+        def reader():
+            count = 0
+            try:
+                while not done.is_set():
+                    ids = [loc.id for loc in repo.get_all()]
+                    if len(ids) != total or len(set(ids)) != total:
+                        raise AssertionError(f"{len(set(ids))} of {len(ids)} ids unique, "
+                                             f"expected {total}")
+                    if repo.count != total:
+                        raise AssertionError(f"count {repo.count}, expected {total}")
+                    page = repo.query(offset=total - 30, limit=25, sort="oldest").items
+                    if len(page) != 25:
+                        raise AssertionError(f"page of {len(page)}")
+                    count += 1
+            except Exception as e:
+                errors.append(e)
+            reads.append(count)
+
+        repo._archive.append = slow_append
+        readers = [threading.Thread(target=reader) for _ in range(2)]
+        for t in readers:
+            t.start()
+        try:
+            # every hot record has aged out, a chunk of 50 at a time
+            with mock.patch("data.location_repository.SEGMENT_RECORDS", 50):
+                archived = repo.archive_old(now=datetime.now() + timedelta(days=31))
+        finally:
+            done.set()
+            for t in readers:
+                t.join(60)
+
+        self.assertEqual(errors, [])
+        self.assertTrue(all(reads))
+        self.assertEqual(archived, 500)
+        self.assertEqual(len(repo._by_id), 0)
+        self.assertEqual(repo.count, total)
+
+    def test_readers_dont_wait_for_a_save(self):
+        repo = self.repo
+        saving = threading.Event()
+        release = threading.Event()
+        original_append = repo._append
+
+        def slow_append(*args, **kwargs):
+            saving.set()
+            release.wait(5)
+            original_append(*args, **kwargs)
+
+        repo._append = slow_append
+        writer = threading.Thread(target=lambda: repo.add(_location(48.0)))
+        writer.start()
+        try:
+            self.assertTrue(saving.wait(5))
+            # the writer holds the lock until release is set
+            start = time.perf_counter()
+            page = repo.query(limit=25)
+            everything = repo.get_all()
+            elapsed = time.perf_counter() - start
+        finally:
+            release.set()
+            writer.join(5)
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(len(page.items), 25)
+        self.assertEqual(len(everything), 701)
+
+
+if __name__ == "__main__":
+    unittest.main()
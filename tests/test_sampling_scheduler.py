@@ -0,0 +1,153 @@
+"""Tests for the adaptive sampling scheduler, using fake services."""
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.sampling_scheduler import (
+    SamplingScheduler, PROFILES, BASELINE, wakeups_per_second,
+)
+
+
+class FakeSensor:
+    """Stands in for CompassService / SensorService."""
+
+    def __init__(self):
+        self.rate = None
+        self.running = False
+        self.is_stationary = False
+        self.on_stationary = lambda stationary: None
+
+    def set_rate(self, hz):
+        self.rate = hz
+
+    def start(self):
+        self.running = True
+
+    def pause(self):
+        self.running = False
+
+    def stop(self):
+        self.running = False
+        if self.is_stationary:
+            self.is_stationary = False
+            self.on_stationary(False)
+
+
+class FakeLocation:
+    def __init__(self):
+        self.min_time = None
+        self.running = False
+        self.averaging = False
+        self.averaged = 0
+
+    def set_averaging(self, enabled):
+        if enabled != self.averaging:
+            self.averaged = 0
+        self.averaging = enabled
+
+    def set_min_time(self, ms):
+        self.min_time = ms
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+
+class TestSamplingScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.compass = FakeSensor()
+        self.sensors = FakeSensor()
+        self.location = FakeLocation()
+        self.now = [0.0]
+        self.sched = SamplingScheduler(self.compass, self.sensors, self.location,
+                                       clock=lambda: self.now[0])
+
+    def test_nothing_happens_before_start(self):
+        self.sched.set_screen("history")
+        self.assertFalse(self.compass.running)
+        self.assertIsNone(self.sched.profile_name)
+
+    def test_camera_screen_moving(self):
+        self.sched.start()
+        self.assertEqual(self.sched.profile_name, "moving")
+        self.assertTrue(self.compass.running)
+        self.assertEqual(self.compass.rate, PROFILES["moving"][0])
+        self.assertEqual(self.location.min_time, 1000)
+
+    def test_steady_lowers_rates(self):
+        self.sched.start()
+        self.sched.set_moving(False)
+        self.assertEqual(self.sched.profile_name, "steady")
+        self.assertLess(self.compass.rate, BASELINE[0])
+
+    def test_locate_pending_raises_compass_rate(self):
+        self.sched.start()
+        self.sched.set_moving(False)
+        self.sched.set_locate_pending(True)
+        self.assertEqual(self.sched.profile_name, "aiming")
+        self.assertGreater(self.compass.rate, BASELINE[0])
+
+    def test_other_screens_stop_sensors(self):
+        self.sched.start()
+        self.sched.set_screen("history")
+        self.assertEqual(self.sched.profile_name, "idle")
+        self.assertFalse(self.compass.running)
+        self.assertFalse(self.sensors.running)
+        # GPS keeps a slow fix so coming back is quick
+        self.assertTrue(self.location.running)
+        self.assertEqual(self.location.min_time, 5000)
+
+        self.sched.set_screen("camera")
+        self.assertTrue(self.compass.running)
+
+    def test_idle_keeps_the_gps_average(self):
+        # wired up like the app: averaging follows is_stationary
+        self.sensors.on_stationary = self.location.set_averaging
+        self.sched.start()
+        self.sensors.is_stationary = True
+        self.location.set_averaging(True)
+        self.sched.set_moving(False)
+        self.location.averaged = 7
+
+        self.sched.set_screen("history")
+        self.assertFalse(self.sensors.running)
+        self.sched.set_screen("camera")
+        self.assertEqual(self.sched.profile_name, "steady")
+        self.assertTrue(self.sensors.running)
+        self.assertTrue(self.sensors.is_stationary)
+        self.assertEqual(self.location.averaged, 7)
+
+        # a real stop starts over
+        self.sched.stop()
+        self.assertFalse(self.location.averaging)
+
+    def test_pause_and_resume(self):
+        self.sched.start()
+        self.sched.pause()
+        self.assertFalse(self.location.running)
+        self.sched.resume()
+        self.assertTrue(self.location.running)
+
+    def test_wakeup_accounting(self):
+        self.sched.start()
+        self.now[0] = 10.0
+        self.sched.set_screen("history")
+        self.now[0] = 40.0
+        self.sched.stop()
+
+        baseline = 40.0 * wakeups_per_second(BASELINE)
+        actual = (10.0 * wakeups_per_second(PROFILES["moving"])
+                  + 30.0 * wakeups_per_second(PROFILES["idle"]))
+        self.assertAlmostEqual(self.sched.baseline_wakeups, baseline)
+        self.assertAlmostEqual(self.sched.actual_wakeups, actual)
+        self.assertGreater(self.sched.saved_wakeups, 0)
+        self.assertFalse(self.compass.running)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""Tests for the sensor recorder and replay harness."""
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.sensor_recorder import (
+    SensorRecorder, read_recording, KIND_COMPASS, KIND_ACCEL, KIND_GYRO, KIND_GPS,
+)
+from services.sensor_replay import SensorReplay
+from domain.position_filter import PositionFilter
+
+
+class TestSensorRecording(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self._tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self._tmpdir, "trip.ppsr")
+        self.now = [100.0]
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def _record_sample_trip(self):
+        rec = SensorRecorder(self.path, clock=lambda: self.now[0])
+        rec.record_compass(20.0, -5.0, 40.0)
+        self.now[0] += 0.1
+        rec.record_accel(0.1, 0.2, 9.8)
+        self.now[0] += 0.1
+        rec.record_gyro(0.01, 0.0, -0.02)
+        self.now[0] += 0.8
+        rec.record_gps(37.774929, -122.419416, 4.5, 12.0)
+        rec.close()
+        return rec
+
+    def test_roundtrip(self):
+        rec = self._record_sample_trip()
+        self.assertEqual(rec.count, 4)
+
+        records = list(read_recording(self.path))
+        kinds = [r[0] for r in records]
+        self.assertEqual(kinds, [KIND_COMPASS, KIND_ACCEL, KIND_GYRO, KIND_GPS])
+
+        _, t, (x, y, z) = records[1]
+        self.assertAlmostEqual(t, 0.1, places=5)
+        self.assertAlmostEqual(z, 9.8, places=5)
+
+        # GPS keeps full double precision
+        _, t, (lat, lon, acc, alt) = records[3]
+        self.assertAlmostEqual(t, 1.0, places=5)
+        self.assertEqual(lat, 37.774929)
+        self.assertEqual(lon, -122.419416)
+
+    def test_compact(self):
+        self._record_sample_trip()
+        # header + 3 motion samples + 1 fix
+        self.assertEqual(os.path.getsize(self.path), 14 + 3 * 17 + 37)
+
+    def test_truncated_tail_is_ignored(self):
+        self._record_sample_trip()
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 5)
+        self.assertEqual(len(list(read_recording(self.path))), 3)
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a recording at all")
+        with self.assertRaises(ValueError):
+            list(read_recording(self.path))
+
+    def test_replay_to_end(self):
+        self._record_sample_trip()
+        got = []
+        replay = SensorReplay(
+            self.path,
+            on_compass=lambda x, y, z: got.append(("compass", x)),
+            on_accel=lambda x, y, z: got.append(("accel", z)),
+            on_gps=lambda **fix: got.append(("gps", fix["lat"])),
+        )
+        self.assertEqual(replay.run_to_end(), 4)
+        self.assertEqual([g[0] for g in got], ["compass", "accel", "gps"])
+        self.assertEqual(got[2][1], 37.774929)
+        self.assertTrue(replay.finished)
+
+    def test_replay_is_paced(self):
+        self._record_sample_trip()
+        fixes = []
+        replay = SensorReplay(self.path, on_gps=lambda **fix: fixes.append(fix), speed=2.0)
+        replay.advance(0.3)   # 0.6 s of recording
+        self.assertEqual(fixes, [])
+        replay.advance(0.25)  # 1.1 s
+        self.assertEqual(len(fixes), 1)
+        self.assertAlmostEqual(replay.duration, 1.0, places=5)
+
+    def _filtered_track(self, play):
+        """Filtered positions from replaying a walk into a PositionFilter,
+        the way LocationService.process_fix feeds it."""
+        rec = SensorRecorder(self.path, clock=lambda: self.now[0])
+        for i in range(20):
+            # walking north 1.5 m/s, a fix every 2 s, one of them way off
+            jump = 0.002 if i == 12 else 0.0
+            rec.record_gps(37.0 + i * 2.7e-5 + jump, -122.0, 5.0, 10.0)
+            self.now[0] += 2.0
+        rec.close()
+
+        position = PositionFilter()
+        track = []
+
+        def on_gps(lat, lon, accuracy, altitude, timestamp):
+            position.update(lat, lon, accuracy, timestamp=timestamp)
+            track.append((position.latitude, position.longitude, position.accuracy))
+
+        play(SensorReplay(self.path, on_gps=on_gps))
+        return track
+
+    def test_replay_speed_doesnt_change_the_track(self):
+        def paced(speed):
+            def play(replay):
+                replay.speed = speed
+                while not replay.finished:
+                    replay.advance(0.1)
+            return play
+
+        real_time = self._filtered_track(paced(1.0))
+        self.assertEqual(len(real_time), 20)
+        self.assertEqual(self._filtered_track(paced(4.0)), real_time)
+        self.assertEqual(self._filtered_track(lambda replay: replay.run_to_end()), real_time)
+
+    def test_timestamps_keep_counting_when_looping(self):
+        self._record_sample_trip()
+        times = []
+        replay = SensorReplay(self.path, on_gps=lambda **fix: times.append(fix["timestamp"]),
+                              loop=True)
+        replay.advance(1.05)
+        replay.advance(1.05)
+        self.assertEqual(len(times), 2)
+        self.assertAlmostEqual(times[0], 1.0, places=5)
+        self.assertAlmostEqual(times[1], 2.0, places=5)
+
+    def test_replay_loops(self):
+        self._record_sample_trip()
+        replay = SensorReplay(self.path, loop=True)
+        replay.advance(2.0)
+        self.assertFalse(replay.finished)
+        self.assertEqual(replay.advance(0.05), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -19,10 +19,7 @@ class TestLocationRepository(unittest.TestCase):
     def setUp(self):
         import tempfile
         self._tmpdir = tempfile.mkdtemp()
-        # patch out kivy app reference
-        self.repo = LocationRepository.__new__(LocationRepository)
-        self.repo._path = os.path.join(self._tmpdir, "test_locations.json")
-        self.repo._locations = []
+        self.repo = LocationRepository(storage_dir=self._tmpdir)
 
     def tearDown(self):
         import shutil
@@ -56,10 +53,7 @@ class TestLocationRepository(unittest.TestCase):
         self.repo.add(loc)
 
         # create a fresh repo pointing at the same file
-        repo2 = LocationRepository.__new__(LocationRepository)
-        repo2._path = self.repo._path
-        repo2._locations = []
-        repo2._load()
+        repo2 = LocationRepository(storage_dir=self._tmpdir)
 
         self.assertEqual(repo2.count, 1)
         self.assertAlmostEqual(repo2.get_all()[0].dest_lat, 3.0)
@@ -70,6 +64,232 @@ class TestLocationRepository(unittest.TestCase):
         self.repo.clear()
         self.assertEqual(self.repo.count, 0)
 
+    def test_background_load(self):
+        for i in range(20):
+            self.repo.add(SavedLocation(0, 0, float(i), 0, 0, 100, 10))
+
+        loaded = []
+        repo2 = LocationRepository(storage_dir=self._tmpdir, load=False)
+        repo2.load_in_background(on_loaded=lambda: loaded.append(True))
+        # callers block until the load is done instead of seeing an empty list
+        self.assertEqual(repo2.count, 20)
+        self.assertTrue(repo2.is_loaded)
+        self.assertEqual(loaded, [True])
+
+    def test_add_during_background_load_keeps_file_contents(self):
+        self.repo.add(SavedLocation(0, 0, 1.0, 0, 0, 100, 10))
+
+        repo2 = LocationRepository(storage_dir=self._tmpdir, load=False)
+        repo2.load_in_background()
+        repo2.add(SavedLocation(0, 0, 2.0, 0, 0, 100, 10))
+        self.assertEqual([loc.dest_lat for loc in repo2.get_all()], [2.0, 1.0])
+
+    def test_listeners_see_every_change(self):
+        events = []
+        self.repo.add_listener(lambda event, loc: events.append((event, loc)))
+        a = SavedLocation(0, 0, 1.0, 0, 0, 100, 10)
+        b = SavedLocation(0, 0, 2.0, 0, 0, 100, 10)
+        self.repo.add(a)
+        self.repo.add(b)
+        self.repo.delete(1)
+        self.repo.clear()
+        self.assertEqual(events, [("add", a), ("add", b), ("delete", a), ("reload", None)])
+
+    def test_merge_on_save(self):
+        events = []
+        self.repo.add_listener(lambda event, loc: events.append((event, loc)))
+        first = SavedLocation(0, 0, 47.0, 8.0, 0, 1000, 40.0, label="tower")
+        self.repo.add(first)
+        # ~56 m north, well inside the combined 70 m
+        again = SavedLocation(1, 1, 47.0005, 8.0, 90, 800, 30.0)
+        stored = self.repo.add(again, merge=True)
+
+        self.assertIs(stored, first)
+        self.assertEqual(self.repo.count, 1)
+        self.assertEqual(stored.observations, 2)
+        self.assertEqual(stored.label, "tower")
+        self.assertEqual(stored.bearing, 90)
+        # 1/acc² weights: 16/25 of the way towards the better sighting
+        self.assertAlmostEqual(stored.dest_lat, 47.0 + 0.0005 * 0.64, places=9)
+        self.assertAlmostEqual(stored.accuracy, (1 / 40.0 ** 2 + 1 / 30.0 ** 2) ** -0.5)
+        self.assertEqual(events[-1], ("update", first))
+
+        # a different target nearby isn't merged
+        other = SavedLocation(0, 0, 47.01, 8.0, 0, 1000, 40.0)
+        self.assertIs(self.repo.add(other, merge=True), other)
+        self.assertEqual(self.repo.count, 2)
+
+    def test_merge_is_off_by_default(self):
+        self.repo.add(SavedLocation(0, 0, 47.0, 8.0, 0, 1000, 40.0))
+        self.repo.add(SavedLocation(0, 0, 47.0, 8.0, 0, 1000, 40.0))
+        self.assertEqual(self.repo.count, 2)
+
+    def test_merge_picks_best_match_and_survives_reload(self):
+        self.repo.merge_duplicates = True
+        loose = SavedLocation(0, 0, 47.0, 8.0, 0, 1000, 500.0)
+        tight = SavedLocation(0, 0, 47.0020, 8.0, 0, 1000, 20.0)
+        self.repo.add(loose, merge=False)
+        self.repo.add(tight, merge=False)
+        # both circles cover it, `tight` is by far the likelier match
+        stored = self.repo.add(SavedLocation(0, 0, 47.0018, 8.0, 0, 1000, 20.0))
+        self.assertIs(stored, tight)
+
+        self.repo.delete(self.repo.get_all().index(tight))
+        stored = self.repo.add(SavedLocation(0, 0, 47.0018, 8.0, 0, 1000, 20.0))
+        self.assertIs(stored, loose)
+
+        reloaded = LocationRepository(storage_dir=self._tmpdir, load=False)
+        reloaded._load()
+        self.assertEqual(reloaded.get_all()[0].observations, 2)
+
+    def _fill_for_query(self):
+        # added oldest first, so index 0 of the store is the last one here
+        for i in range(10):
+            self.repo.add(SavedLocation(
+                0, 0, 47.0 + i * 0.01, 8.0, 0, 100, accuracy=float(10 + (i * 7) % 10 * 5),
+                timestamp=f"2024-01-{i + 1:02d}T12:00:00",
+                label="summit cross" if i % 3 == 0 else f"tree {i}",
+            ))
+
+    def test_query_pages(self):
+        self._fill_for_query()
+        page = self.repo.query(limit=4)
+        self.assertEqual([loc.timestamp[8:10] for loc in page.items], ["10", "09", "08", "07"])
+        self.assertTrue(page.has_more)
+        page = self.repo.query(offset=8, limit=4)
+        self.assertEqual([loc.timestamp[8:10] for loc in page.items], ["02", "01"])
+        self.assertFalse(page.has_more)
+        self.assertEqual(len(self.repo.query().items), 10)
+
+        oldest = self.repo.query(limit=2, sort="oldest").items
+        self.assertEqual([loc.timestamp[8:10] for loc in oldest], ["01", "02"])
+
+    def test_query_filters(self):
+        self._fill_for_query()
+        page = self.repo.query(since="2024-01-03", until="2024-01-06T23:59:59")
+        self.assertEqual([loc.timestamp[8:10] for loc in page.items], ["06", "05", "04", "03"])
+
+        from datetime import datetime
+        page = self.repo.query(since=datetime(2024, 1, 9))
+        self.assertEqual(len(page.items), 2)
+
+        page = self.repo.query(max_accuracy=20)
+        self.assertTrue(page.items)
+        self.assertTrue(all(loc.accuracy <= 20 for loc in page.items))
+
+        page = self.repo.query(label="SUMMIT")
+        self.assertEqual(len(page.items), 4)
+
+        # 47.05 +- ~2.3 km covers 47.03 .. 47.07
+        page = self.repo.query(near=(47.05, 8.0), within=2300)
+        self.assertEqual(sorted(round(loc.dest_lat, 2) for loc in page.items),
+                         [47.03, 47.04, 47.05, 47.06, 47.07])
+
+    def test_query_sorted_pages_match_full_sort(self):
+        self._fill_for_query()
+        everything = sorted(self.repo.get_all(), key=lambda loc: loc.accuracy)
+        paged = []
+        offset = 0
+        while True:
+            page = self.repo.query(offset=offset, limit=3, sort="accuracy")
+            paged += page.items
+            offset += len(page.items)
+            if not page.has_more:
+                break
+        self.assertEqual(paged, everything)
+
+        nearest = self.repo.query(limit=3, sort="distance", near=(47.031, 8.0)).items
+        self.assertEqual([round(loc.dest_lat, 2) for loc in nearest], [47.03, 47.04, 47.02])
+
+    def test_search_follows_changes(self):
+        self._fill_for_query()
+        self.assertEqual(len(self.repo.search("summ")), 4)
+        page = self.repo.query(search="summit cr", limit=2, sort="oldest")
+        self.assertEqual([loc.timestamp[8:10] for loc in page.items], ["01", "04"])
+        self.assertTrue(page.has_more)
+
+        loc = SavedLocation(0, 0, 1.0, 0, 0, 100, 10, label="Water tower")
+        self.repo.add(loc)
+        self.assertEqual(self.repo.search("tow"), [loc])
+        self.repo.update_label(loc.id, "Old chimney")
+        self.assertEqual(self.repo.search("tow"), [])
+        self.assertEqual(self.repo.query(search="chim").items, [loc])
+        self.repo.delete_by_id(loc.id)
+        self.assertEqual(self.repo.search("chim"), [])
+
+    def test_query_rejects_bad_arguments(self):
+        with self.assertRaises(ValueError):
+            self.repo.query(sort="random")
+        with self.assertRaises(ValueError):
+            self.repo.query(sort="distance")
+        with self.assertRaises(ValueError):
+            self.repo.query(within=100)
+
+    def test_remove(self):
+        a = SavedLocation(0, 0, 1.0, 0, 0, 100, 10)
+        b = SavedLocation(0, 0, 1.0, 0, 0, 100, 10)
+        self.repo.add(a)
+        self.repo.add(b)
+        self.assertTrue(self.repo.remove(a))
+        self.assertFalse(self.repo.remove(a))
+        self.assertEqual(self.repo.get_all(), [b])
+
+    def test_ids(self):
+        a = SavedLocation(0, 0, 1.0, 0, 0, 100, 10)
+        b = SavedLocation(0, 0, 2.0, 0, 0, 100, 10)
+        self.assertNotEqual(a.id, b.id)
+        self.repo.add(a)
+        self.repo.add(b)
+        self.assertIs(self.repo.get(a.id), a)
+        self.assertIsNone(self.repo.get("nope"))
+
+        self.assertTrue(self.repo.delete_by_id(a.id))
+        self.assertFalse(self.repo.delete_by_id(a.id))
+        self.assertEqual(self.repo.get_all(), [b])
+
+    def test_update_label(self):
+        events = []
+        loc = SavedLocation(0, 0, 1.0, 0, 0, 100, 10)
+        self.repo.add(loc)
+        self.repo.add_listener(lambda event, l: events.append((event, l)))
+        self.assertTrue(self.repo.update_label(loc.id, "water tower"))
+        self.assertFalse(self.repo.update_label("nope", "x"))
+        self.assertEqual(events, [("update", loc)])
+
+        repo2 = LocationRepository(storage_dir=self._tmpdir, load=False)
+        repo2._load()
+        self.assertEqual(repo2.get(loc.id).label, "water tower")
+
+    def test_ids_survive_reload_and_old_files_get_them(self):
+        import json
+        with open(self.repo._path, "w") as f:
+            json.dump([SavedLocation(0, 0, float(i), 0, 0, 100, 10).to_dict()
+                       for i in range(3)], f)
+        with open(self.repo._path) as f:
+            data = json.load(f)
+        for d in data:
+            del d["id"]
+        with open(self.repo._path, "w") as f:
+            json.dump(data, f)
+
+        self.repo._load()
+        ids = [loc.id for loc in self.repo.get_all()]
+        self.assertEqual(len(set(ids)), 3)
+        # newest first is kept through the dict
+        self.assertEqual([loc.dest_lat for loc in self.repo.get_all()], [0.0, 1.0, 2.0])
+
+        self.repo._load()
+        self.assertEqual([loc.id for loc in self.repo.get_all()], ids)
+
+    def test_readding_moves_to_top(self):
+        a = SavedLocation(0, 0, 1.0, 0, 0, 100, 10)
+        b = SavedLocation(0, 0, 2.0, 0, 0, 100, 10)
+        self.repo.add(a)
+        self.repo.add(b)
+        self.repo.add(a)
+        self.assertEqual(self.repo.get_all(), [a, b])
+        self.assertEqual(self.repo.count, 2)
+
     def test_saved_location_serialization(self):
         loc = SavedLocation(
             src_lat=10, src_lon=20,
@@ -82,6 +302,311 @@ class TestLocationRepository(unittest.TestCase):
         self.assertEqual(restored.src_lat, 10)
         self.assertEqual(restored.label, "test point")
         self.assertEqual(restored.distance, 5000)
+        self.assertEqual(restored.observations, 1)
+        self.assertEqual(restored.id, loc.id)
+
+
+class TestTieredHistory(unittest.TestCase):
+    """Old records rolled into archive segments."""
+
+    def setUp(self):
+        import json
+        import tempfile
+        from datetime import datetime, timedelta
+        self._tmpdir = tempfile.mkdtemp()
+        now = datetime.now()
+        # 2500 from a year ago, then 50 from the last few days, oldest first
+        stamps = [(now - timedelta(days=400) + timedelta(minutes=i)).isoformat()
+                  for i in range(2500)]
+        stamps += [(now - timedelta(days=5) + timedelta(minutes=i)).isoformat()
+                   for i in range(50)]
+        self.locations = [
+            SavedLocation(47.0, 8.0, 47.0 + i * 1e-4, 8.0, 90.0, 500, 10 + i % 7,
+                          timestamp=ts, label="mast" if i % 500 == 0 else "")
+            for i, ts in enumerate(stamps)
+        ]
+        with open(os.path.join(self._tmpdir, "saved_locations.json"), "w") as f:
+            json.dump([loc.to_dict() for loc in reversed(self.locations)], f)
+        self.repo = LocationRepository(storage_dir=self._tmpdir, hot_days=30)
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def _ids(self, locations):
+        return [loc.id for loc in locations]
+
+    def test_old_records_are_archived(self):
+        self.assertEqual(len(self.repo._by_id), 50)
+        self.assertEqual([info.count for info in self.repo._archive.segments], [2000, 500])
+        self.assertEqual(self.repo.count, 2550)
+        self.assertEqual(self._ids(self.repo.get_all()), self._ids(reversed(self.locations)))
+
+        # and they stay that way after a reload, without hot_days
+        again = LocationRepository(storage_dir=self._tmpdir)
+        self.assertEqual(len(again._by_id), 50)
+        self.assertEqual(self._ids(again.get_all()), self._ids(reversed(self.locations)))
+
+    def test_pages_read_segments_only_when_reached(self):
+        repo = LocationRepository(storage_dir=self._tmpdir)
+        page = repo.query(limit=25)
+        self.assertEqual(self._ids(page.items), self._ids(self.locations[::-1][:25]))
+        self.assertEqual(len(repo._segments), 0)
+
+        page = repo.query(offset=40, limit=25)
+        self.assertEqual(self._ids(page.items), self._ids(self.locations[::-1][40:65]))
+        self.assertEqual(len(repo._segments), 1)
+
+        oldest = repo.query(limit=3, sort="oldest").items
+        self.assertEqual(self._ids(oldest), self._ids(self.locations[:3]))
+
+        # offsets that skip whole segments, from either end
+        for offset in (1990, 2010, 2545):
+            page = repo.query(offset=offset, limit=20)
+            self.assertEqual(self._ids(page.items),
+                             self._ids(self.locations[::-1][offset:offset + 20]))
+            page = repo.query(offset=offset, limit=20, sort="oldest")
+            self.assertEqual(self._ids(page.items),
+                             self._ids(self.locations[offset:offset + 20]))
+
+        from datetime import datetime, timedelta
+        recent = repo.query(since=datetime.now() - timedelta(days=30))
+        self.assertEqual(len(recent.items), 50)
+
+        best = repo.query(limit=5, sort="accuracy").items
+        self.assertTrue(all(loc.accuracy == 10 for loc in best))
+
+    def test_search_get_and_changes_reach_the_archive(self):
+        masts = self.repo.search("mast")
+        self.assertEqual(self._ids(masts), self._ids(self.locations[2500::-500]))
+
+        old = self.locations[1000]
+        self.assertEqual(self.repo.get(old.id).label, "mast")
+        self.assertTrue(self.repo.update_label(old.id, "old tower"))
+        self.assertEqual(self._ids(self.repo.search("tower")), [old.id])
+        self.assertTrue(self.repo.delete_by_id(self.locations[2].id))
+        self.assertFalse(self.repo.delete_by_id(self.locations[2].id))
+
+        again = LocationRepository(storage_dir=self._tmpdir)
+        self.assertEqual(again.count, 2549)
+        self.assertEqual(again.get(old.id).label, "old tower")
+        self.assertIsNone(again.get(self.locations[2].id))
+        self.assertEqual(again.query(limit=3, sort="oldest").items[2].id,
+                         self.locations[3].id)
+
+    def test_interrupted_roll_leaves_no_duplicates(self):
+        import json
+        # as if the app died after writing the segment, before the hot file
+        newest = self.repo._archive.segments[-1]
+        records = self.repo._archive.read(newest)
+        with open(self.repo._path) as f:
+            hot = json.load(f)
+        with open(self.repo._path, "w") as f:
+            hot["locations"] += records[::-1]
+            json.dump(hot, f)
+
+        again = LocationRepository(storage_dir=self._tmpdir)
+        self.assertEqual(again.count, 2550)
+        self.assertEqual(len(again._by_id), 50)
+
+    def test_clear(self):
+        self.repo.clear()
+        self.assertEqual(self.repo.count, 0)
+        self.assertEqual(LocationRepository(storage_dir=self._tmpdir).get_all(), [])
+
+    def test_change_feed_reads_only_segments_with_changes(self):
+        start = self.repo.seq
+        self.repo._segments.clear()
+        added = self.repo.add(SavedLocation(0, 0, 1.0, 0, 0, 100, 10))
+        changes = list(self.repo.changes_since(start))
+        self.assertEqual([(c.id, c.location) for c in changes], [(added.id, added)])
+        self.assertEqual(len(self.repo._segments), 0)
+
+        old = self.locations[100]
+        self.repo.update_label(old.id, "relabelled")
+        self.repo.delete_by_id(self.locations[2100].id)
+        self.repo._segments.clear()
+        changes = list(self.repo.changes_since(start + 1))
+        self.assertEqual([(c.seq, c.id) for c in changes],
+                         [(start + 2, old.id), (start + 3, self.locations[2100].id)])
+        self.assertEqual(changes[0].location.label, "relabelled")
+        self.assertIsNone(changes[1].location)
+        # the relabelled record's segment, not the other one
+        self.assertEqual(len(self.repo._segments), 1)
+
+        again = LocationRepository(storage_dir=self._tmpdir)
+        self.assertEqual([(c.seq, c.id) for c in again.changes_since(start)],
+                         [(c.seq, c.id) for c in self.repo.changes_since(start)])
+
+
+class TestChangeFeed(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self._tmpdir = tempfile.mkdtemp()
+        self.repo = LocationRepository(storage_dir=self._tmpdir)
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def _changes(self, repo, seq):
+        return [(c.id, c.location is not None) for c in repo.changes_since(seq)]
+
+    def test_latest_change_of_each_record(self):
+        a, b, c = (self.repo.add(SavedLocation(0, 0, float(i), 0, 0, 100, 10))
+                   for i in range(3))
+        seq = self.repo.seq
+        self.assertEqual(seq, 3)
+        self.assertEqual(list(self.repo.changes_since(seq)), [])
+
+        self.repo.update_label(a.id, "tower")
+        self.repo.delete_by_id(b.id)
+        d = self.repo.add(SavedLocation(0, 0, 9.0, 0, 0, 100, 10))
+        self.repo.update_label(d.id, "mast")
+        self.assertEqual(self._changes(self.repo, seq),
+                         [(a.id, True), (b.id, False), (d.id, True)])
+        changes = list(self.repo.changes_since(0))
+        self.assertEqual([change.seq for change in changes], [3, 4, 5, 7])
+        self.assertEqual([change.id for change in changes], [c.id, a.id, b.id, d.id])
+        self.assertEqual(a.seq, 4)
+
+        # re-adding a deleted one takes its tombstone away
+        self.repo.add(b)
+        self.assertEqual(self._changes(self.repo, 7), [(b.id, True)])
+
+    def test_feed_survives_reload_and_compaction(self):
+        from unittest import mock
+        from data import location_repository
+        with mock.patch.object(location_repository, "COMPACT_MIN", 3):
+            locations = [self.repo.add(SavedLocation(0, 0, float(i), 0, 0, 100, 10))
+                         for i in range(10)]
+            for loc in locations[::3]:
+                self.repo.delete_by_id(loc.id)
+            self.repo.update_label(locations[1].id, "tower")
+        expected = self._changes(self.repo, 5)
+        # 5, 7, 8 added, 0, 3, 6, 9 deleted, 1 relabelled
+        self.assertEqual(len(expected), 8)
+        again = LocationRepository(storage_dir=self._tmpdir)
+        self.assertEqual(again.seq, self.repo.seq)
+        self.assertEqual(self._changes(again, 5), expected)
+
+    def test_forgotten_deletions(self):
+        from unittest import mock
+        from data import location_repository
+        a = self.repo.add(SavedLocation(0, 0, 1.0, 0, 0, 100, 10))
+        self.repo.add(SavedLocation(0, 0, 2.0, 0, 0, 100, 10))
+        self.repo.delete_by_id(a.id)
+        with mock.patch.object(location_repository, "TOMBSTONE_DAYS", -1):
+            with self.repo._writing():
+                self.repo._compact()
+        with self.assertRaises(ValueError):
+            self.repo.changes_since(2)
+        self.assertEqual(list(self.repo.changes_since(3)), [])
+        with self.assertRaises(ValueError):
+            LocationRepository(storage_dir=self._tmpdir).changes_since(0)
+
+        self.repo.clear()
+        with self.assertRaises(ValueError):
+            self.repo.changes_since(3)
+        self.assertEqual(list(self.repo.changes_since(self.repo.seq)), [])
+
+
+class TestReprojection(unittest.TestCase):
+    """Saved locations worked out again when the calculator changes."""
+
+    def setUp(self):
+        import tempfile
+        from domain.coordinate_calculator import CoordinateCalculator
+
+        class Corrected(CoordinateCalculator):
+            # say a 1° compass bias turned up
+            VERSION = 2
+
+            def project_batch(self, observations):
+                return super().project_batch([obs._replace(heading=obs.heading + 1.0)
+                                              for obs in observations])
+
+        self._tmpdir = tempfile.mkdtemp()
+        self.calc = CoordinateCalculator()
+        self.corrected = Corrected()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def _location(self, heading, timestamp=None):
+        from domain.observation import Observation
+        sighting = Observation(47.0, 8.0, 5.0, heading, heading - 2.0, 2.0, 1000.0,
+                               calculator_version=1)
+        lat, lon, accuracy = self.calc.project_sightings([sighting])
+        return SavedLocation(47.0, 8.0, lat, lon, heading, 1000.0, accuracy,
+                             timestamp=timestamp, sightings=[sighting],
+                             calculator_version=1)
+
+    def test_derived(self):
+        loc = self._location(30.0)
+        stored = (loc.dest_lat, loc.dest_lon, loc.accuracy)
+        self.assertEqual(loc.derived(self.calc), stored)
+        redone = loc.derived(self.corrected)
+        self.assertEqual(redone, self.corrected.project_sightings(loc.sightings))
+        self.assertNotAlmostEqual(redone[1], loc.dest_lon)
+        self.assertEqual((loc.dest_lat, loc.dest_lon, loc.accuracy), stored)
+        # nothing to redo it from
+        old = SavedLocation(47.0, 8.0, 47.1, 8.0, 0.0, 1000.0, 90.0)
+        self.assertEqual(old.derived(self.corrected), (47.1, 8.0, 90.0))
+
+    def test_sightings_follow_merges(self):
+        loc = self._location(30.0)
+        loc.absorb(self._location(31.0))
+        self.assertEqual(len(loc.sightings), 2)
+        # worked out from both sightings at once, same as merging one by one
+        for got, expected in zip(self.calc.project_sightings(loc.sightings),
+                                 (loc.dest_lat, loc.dest_lon, loc.accuracy)):
+            self.assertAlmostEqual(got, expected, places=9)
+        again = SavedLocation.from_dict(loc.to_dict())
+        self.assertEqual(again.sightings, loc.sightings)
+
+        # part of it from before sightings were kept: can't be redone
+        loc.absorb(SavedLocation(47.0, 8.0, 47.1, 8.0, 0.0, 1000.0, 90.0))
+        self.assertEqual(loc.sightings, [])
+        self.assertEqual(loc.calculator_version, 0)
+
+    def test_reproject_hot_and_archived(self):
+        from datetime import datetime, timedelta
+        now = datetime.now()
+        old = [self._location(i % 360, (now - timedelta(days=400, minutes=-i)).isoformat())
+               for i in range(250)]
+        recent = [self._location(i * 10.0, (now - timedelta(days=1, minutes=-i)).isoformat())
+                  for i in range(5)]
+        legacy = SavedLocation(47.0, 8.0, 47.1, 8.0, 0.0, 1000.0, 90.0,
+                               timestamp=now.isoformat())
+        repo = LocationRepository(storage_dir=self._tmpdir, hot_days=30)
+        for loc in old + recent + [legacy]:
+            repo.add(loc)
+        repo.archive_old()
+        self.assertEqual(len(repo._archive), 250)
+        events = []
+        repo.add_listener(lambda event, loc: events.append(event))
+        seq = repo.seq
+
+        self.assertEqual(repo.reproject(self.calc), 0)
+        self.assertEqual(repo.reproject(self.corrected), 255)
+        self.assertEqual(events, ["reload"])
+        self.assertEqual(repo.seq, seq + 1)
+        self.assertEqual(len(list(repo.changes_since(seq))), 255)
+        self.assertEqual(repo.reproject(self.corrected), 0)
+
+        again = LocationRepository(storage_dir=self._tmpdir)
+        self.assertEqual(again.reproject(self.corrected), 0)
+        for loc in again.get_all():
+            if loc.id == legacy.id:
+                self.assertEqual((loc.dest_lat, loc.calculator_version), (47.1, 0))
+                continue
+            lat, lon, accuracy = self.corrected.project_sightings(loc.sightings)
+            self.assertAlmostEqual(loc.dest_lat, lat, places=6)
+            self.assertAlmostEqual(loc.dest_lon, lon, places=6)
+            self.assertEqual(loc.calculator_version, 2)
 
 
 if __name__ == "__main__":
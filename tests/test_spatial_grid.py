@@ -0,0 +1,58 @@
+"""Tests for the lat/lon grid behind merge-on-save."""
+import unittest
+import random
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain.spatial_grid import SpatialGrid, local_distance
+
+
+class TestSpatialGrid(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        rng = random.Random(2)
+        grid = SpatialGrid()
+        entries = {}
+        for i in range(2000):
+            entry = (47 + rng.uniform(-0.3, 0.3), 8 + rng.uniform(-0.3, 0.3),
+                     rng.choice((5.0, 50.0, 300.0, 3000.0)))
+            entries[i] = entry
+            grid.insert(i, *entry)
+
+        for _ in range(100):
+            lat, lon = 47 + rng.uniform(-0.3, 0.3), 8 + rng.uniform(-0.3, 0.3)
+            radius = rng.choice((10.0, 100.0, 1000.0))
+            expected = {k for k, (e_lat, e_lon, e_r) in entries.items()
+                        if local_distance(lat, lon, e_lat, e_lon) <= radius + e_r}
+            got = {k for _, k in grid.overlapping(lat, lon, radius)}
+            self.assertEqual(got, expected)
+
+    def test_antimeridian(self):
+        grid = SpatialGrid()
+        grid.insert("east", 10.0, 179.9995, 100.0)
+        matches = grid.overlapping(10.0, -179.9995, 100.0)
+        self.assertEqual([k for _, k in matches], ["east"])
+        self.assertAlmostEqual(matches[0][0], local_distance(10.0, 179.9995, 10.0, -179.9995))
+        self.assertLess(matches[0][0], 200.0)
+
+    def test_near_pole(self):
+        grid = SpatialGrid()
+        grid.insert("a", 89.9999, 0.0, 50.0)
+        self.assertEqual([k for _, k in grid.overlapping(89.9999, 180.0, 50.0)], ["a"])
+
+    def test_remove_and_reinsert(self):
+        grid = SpatialGrid()
+        grid.insert("a", 47.0, 8.0, 20.0)
+        grid.insert("a", 48.0, 8.0, 20.0)
+        self.assertEqual(len(grid), 1)
+        self.assertEqual(grid.overlapping(47.0, 8.0, 20.0), [])
+        self.assertTrue(grid.remove("a"))
+        self.assertFalse(grid.remove("a"))
+        self.assertEqual(grid.overlapping(48.0, 8.0, 20.0), [])
+        self.assertEqual(grid._cells, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+"""Tests for the cold start timing breakdown."""
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.startup_timing import StartupTimer
+
+
+class TestStartupTimer(unittest.TestCase):
+
+    def setUp(self):
+        self.now = [100.0]
+        self.timer = StartupTimer(clock=lambda: self.now[0])
+
+    def test_stage_records_duration(self):
+        with self.timer.stage("import kivy"):
+            self.now[0] += 0.3
+        self.assertEqual(len(self.timer.stages), 1)
+        name, seconds = self.timer.stages[0]
+        self.assertEqual(name, "import kivy")
+        self.assertAlmostEqual(seconds, 0.3)
+
+    def test_stage_recorded_when_body_raises(self):
+        with self.assertRaises(ValueError):
+            with self.timer.stage("broken"):
+                self.now[0] += 0.1
+                raise ValueError
+        self.assertEqual(self.timer.stages[0][0], "broken")
+
+    def test_first_frame_only_marked_once(self):
+        self.now[0] += 0.5
+        self.timer.mark_first_frame()
+        self.now[0] += 2.0
+        self.timer.mark_first_frame()
+        self.assertAlmostEqual(self.timer.first_frame, 0.5)
+
+    def test_report_sorted_with_remainder(self):
+        with self.timer.stage("small"):
+            self.now[0] += 0.1
+        with self.timer.stage("big"):
+            self.now[0] += 0.4
+        self.now[0] += 0.2
+        self.timer.mark_first_frame()
+        lines = self.timer.report()
+        self.assertIn("700 ms", lines[0])
+        self.assertIn("big", lines[1])
+        self.assertIn("small", lines[2])
+        self.assertIn("(other)", lines[3])
+        self.assertIn("200 ms", lines[3])
+
+
+if __name__ == "__main__":
+    unittest.main()
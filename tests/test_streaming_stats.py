@@ -0,0 +1,61 @@
+"""Tests for the constant-memory running statistics."""
+import unittest
+import random
+import statistics
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.streaming_stats import RunningStats, EwmStats
+
+
+class TestRunningStats(unittest.TestCase):
+
+    def test_empty(self):
+        s = RunningStats()
+        self.assertEqual(s.count, 0)
+        self.assertEqual(s.variance, 0.0)
+
+    def test_matches_statistics_module(self):
+        rng = random.Random(5)
+        values = [rng.gauss(50, 3) for _ in range(500)]
+        s = RunningStats()
+        for v in values:
+            s.add(v)
+        self.assertAlmostEqual(s.mean, statistics.mean(values))
+        self.assertAlmostEqual(s.variance, statistics.variance(values))
+
+    def test_reset(self):
+        s = RunningStats()
+        s.add(1.0)
+        s.add(3.0)
+        s.reset()
+        self.assertEqual(s.count, 0)
+        self.assertEqual(s.mean, 0.0)
+
+
+class TestEwmStats(unittest.TestCase):
+
+    def test_constant_signal(self):
+        s = EwmStats(alpha=0.2)
+        for _ in range(50):
+            s.add(9.81)
+        self.assertAlmostEqual(s.mean, 9.81)
+        self.assertAlmostEqual(s.variance, 0.0)
+
+    def test_tracks_recent_behavior(self):
+        """Variance should die down after a burst of motion."""
+        s = EwmStats(alpha=0.2)
+        rng = random.Random(2)
+        for _ in range(50):
+            s.add(9.81 + rng.uniform(-3, 3))
+        noisy = s.variance
+        for _ in range(100):
+            s.add(9.81)
+        self.assertGreater(noisy, 1.0)
+        self.assertLess(s.variance, 0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
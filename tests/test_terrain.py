@@ -0,0 +1,162 @@
+"""Tests for the offline elevation tiles and terrain ray intersection.
+
+Uses small synthetic .hgt tiles written to a temp dir, so nothing here
+needs real SRTM data.
+"""
+import unittest
+import math
+import struct
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.elevation_tiles import ElevationTileStore, tile_name, parse_tile_name, VOID
+from domain.terrain_intersection import TerrainRaycaster, EYE_HEIGHT_M
+
+SAMPLES = 121  # small grid, same layout as a real 1201/3601 tile
+
+
+def write_tile(directory, lat0, lon0, height_fn, ext=".hgt"):
+    """Write a tile where height_fn(row, col) gives each post."""
+    order = ">" if ext == ".hgt" else "<"
+    path = os.path.join(directory, tile_name(lat0, lon0) + ext)
+    values = [height_fn(r, c) for r in range(SAMPLES) for c in range(SAMPLES)]
+    with open(path, "wb") as f:
+        f.write(struct.pack(f"{order}{len(values)}h", *values))
+    return path
+
+
+class TestElevationTiles(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self._tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def test_tile_names(self):
+        self.assertEqual(tile_name(37, -122), "N37W122")
+        self.assertEqual(tile_name(-34, 18), "S34E018")
+        self.assertEqual(parse_tile_name("N37W122"), (37, -122))
+        self.assertEqual(parse_tile_name("s34e018"), (-34, 18))
+        self.assertIsNone(parse_tile_name("hello"))
+
+    def test_corner_posts(self):
+        write_tile(self._tmpdir, 45, 7, lambda r, c: r * 10 + c)
+        store = ElevationTileStore(self._tmpdir)
+        tile = store.get_tile(45, 7)
+        # north-west corner is row 0, col 0
+        self.assertAlmostEqual(tile.sample(46.0, 7.0), 0.0)
+        # south-east corner is the last post
+        self.assertAlmostEqual(tile.sample(45.0, 8.0), 120 * 10 + 120)
+        store.close()
+
+    def test_bilinear_between_posts(self):
+        write_tile(self._tmpdir, 45, 7, lambda r, c: r * 10 + c)
+        store = ElevationTileStore(self._tmpdir)
+        step = 1.0 / (SAMPLES - 1)
+        # halfway between rows 2-3 and cols 4-5
+        h = store.elevation(46.0 - 2.5 * step, 7.0 + 4.5 * step)
+        self.assertAlmostEqual(h, 25 + 4.5, places=6)
+        store.close()
+
+    def test_little_endian_raw_grid(self):
+        write_tile(self._tmpdir, 45, 7, lambda r, c: 1234, ext=".raw")
+        store = ElevationTileStore(self._tmpdir)
+        self.assertAlmostEqual(store.elevation(45.5, 7.5), 1234)
+        store.close()
+
+    def test_void_posts_are_skipped(self):
+        write_tile(self._tmpdir, 45, 7, lambda r, c: VOID if c % 2 else 200)
+        store = ElevationTileStore(self._tmpdir)
+        step = 1.0 / (SAMPLES - 1)
+        self.assertAlmostEqual(store.elevation(45.5, 7.0 + 0.5 * step), 200)
+        store.close()
+
+    def test_missing_tile(self):
+        store = ElevationTileStore(self._tmpdir)
+        self.assertIsNone(store.elevation(10.5, 10.5))
+        self.assertFalse(store.has_tiles())
+
+    def test_lru_eviction(self):
+        for lon0 in range(4):
+            write_tile(self._tmpdir, 0, lon0, lambda r, c: lon0)
+        store = ElevationTileStore(self._tmpdir, max_open=2)
+        for lon0 in range(4):
+            self.assertAlmostEqual(store.elevation(0.5, lon0 + 0.5), lon0)
+        self.assertEqual(store.open_count, 2)
+        # evicted tiles are transparently reopened
+        self.assertAlmostEqual(store.elevation(0.5, 0.5), 0)
+        store.close()
+
+    def test_batch_matches_scalar(self):
+        write_tile(self._tmpdir, 45, 7, lambda r, c: (r * 7 + c * 3) % 500)
+        store = ElevationTileStore(self._tmpdir)
+        lats = [45.1 + i * 0.01 for i in range(20)]
+        lons = [7.2 + i * 0.013 for i in range(20)]
+        batch = store.elevations(lats, lons)
+        for lat, lon, h in zip(lats, lons, batch):
+            self.assertAlmostEqual(h, store.elevation(lat, lon))
+        store.close()
+
+
+class TestTerrainRaycaster(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self._tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def test_flat_ground(self):
+        """Looking down at flat ground from 100 m up hits at 100 / tan(pitch)."""
+        write_tile(self._tmpdir, 45, 7, lambda r, c: 0)
+        store = ElevationTileStore(self._tmpdir)
+        ray = TerrainRaycaster(store)
+        pitch = -math.degrees(math.atan2(100, 1000))
+        dist = ray.intersect(45.2, 7.5, 0.0, pitch, altitude_m=100.0)
+        self.assertAlmostEqual(dist, 1000, delta=2.0)
+        store.close()
+
+    def test_default_altitude_uses_terrain(self):
+        write_tile(self._tmpdir, 45, 7, lambda r, c: 300)
+        store = ElevationTileStore(self._tmpdir)
+        ray = TerrainRaycaster(store)
+        pitch = -math.degrees(math.atan2(EYE_HEIGHT_M, 20))
+        dist = ray.intersect(45.2, 7.5, 90.0, pitch)
+        self.assertAlmostEqual(dist, 20, delta=1.0)
+        store.close()
+
+    def test_level_ray_hits_ridge(self):
+        """A level sight line should stop at a ridge rising out of a plain."""
+        ridge_row = 60  # 46.0 - 60/120 = latitude 45.5
+        write_tile(self._tmpdir, 45, 7, lambda r, c: 500 if r <= ridge_row else 0)
+        store = ElevationTileStore(self._tmpdir)
+        ray = TerrainRaycaster(store, max_distance_m=60_000)
+        # high enough that earth curvature doesn't bring the plain up first
+        dist = ray.intersect(45.1, 7.5, 0.0, 0.0, altitude_m=200.0)
+        expected = (45.5 - 45.1) * 111_195  # meters per degree of latitude
+        # the ridge face is one grid cell wide (~925 m) after interpolation
+        self.assertAlmostEqual(dist, expected, delta=1000)
+        store.close()
+
+    def test_looking_up_misses(self):
+        write_tile(self._tmpdir, 45, 7, lambda r, c: 0)
+        store = ElevationTileStore(self._tmpdir)
+        ray = TerrainRaycaster(store, max_distance_m=5000)
+        self.assertIsNone(ray.intersect(45.2, 7.5, 0.0, 10.0))
+        store.close()
+
+    def test_no_tiles(self):
+        store = ElevationTileStore(self._tmpdir)
+        ray = TerrainRaycaster(store)
+        self.assertIsNone(ray.intersect(45.2, 7.5, 0.0, -5.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
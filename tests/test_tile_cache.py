@@ -0,0 +1,109 @@
+"""Tests for the MBTiles tile cache and the LRU used for map textures."""
+import unittest
+import sqlite3
+import tempfile
+import shutil
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.tile_cache import MBTiles
+from utils.lru_cache import LRUCache
+
+
+class TestMBTiles(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self._tmpdir, "tiles.mbtiles")
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def _seed(self):
+        tiles = MBTiles.create(self.path, name="test")
+        tiles.put_tile(3, 4, 2, b"tile-3-4-2")
+        tiles.put_tile(5, 17, 11, b"tile-5-17-11")
+        tiles.commit()
+        tiles.close()
+
+    def test_round_trip(self):
+        self._seed()
+        tiles = MBTiles.open(self.path)
+        self.assertEqual(tiles.tile_data(3, 4, 2), b"tile-3-4-2")
+        self.assertIsNone(tiles.tile_data(3, 4, 3))
+        self.assertEqual(tiles.zoom_range, (3, 5))
+        self.assertEqual(tiles.metadata()["name"], "test")
+        self.assertEqual(tiles.image_format, "png")
+        tiles.close()
+
+    def test_rows_stored_as_tms(self):
+        self._seed()
+        db = sqlite3.connect(self.path)
+        row = db.execute(
+            "SELECT tile_row FROM tiles WHERE zoom_level = 3 AND tile_column = 4"
+        ).fetchone()
+        db.close()
+        self.assertEqual(row[0], 2 ** 3 - 1 - 2)
+
+    def test_open_missing_file(self):
+        self.assertIsNone(MBTiles.open(self.path))
+
+    def test_open_is_read_only(self):
+        self._seed()
+        tiles = MBTiles.open(self.path)
+        with self.assertRaises(sqlite3.OperationalError):
+            tiles.put_tile(1, 0, 0, b"x")
+        tiles.close()
+
+    def test_empty_file_has_no_zoom_range(self):
+        MBTiles.create(self.path).close()
+        self.assertIsNone(MBTiles.open(self.path).zoom_range)
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        evicted = []
+        cache = LRUCache(2, on_evict=lambda k, v: evicted.append(k))
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")          # "b" is now the oldest
+        cache.put("c", 3)
+        self.assertEqual(evicted, ["b"])
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_hit_miss_counts(self):
+        cache = LRUCache(4)
+        cache.put(1, "x")
+        cache.get(1)
+        cache.get(2)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_replace_does_not_evict(self):
+        evicted = []
+        cache = LRUCache(1, on_evict=lambda k, v: evicted.append(k))
+        cache.put("a", 1)
+        cache.put("a", 2)
+        self.assertEqual(cache.get("a"), 2)
+        self.assertEqual(evicted, [])
+
+    def test_clear_releases_everything(self):
+        evicted = []
+        cache = LRUCache(3, on_evict=lambda k, v: evicted.append(k))
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.clear()
+        self.assertEqual(sorted(evicted), ["a", "b"])
+        self.assertEqual(len(cache), 0)
+
+    def test_bad_capacity(self):
+        with self.assertRaises(ValueError):
+            LRUCache(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
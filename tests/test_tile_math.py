@@ -0,0 +1,99 @@
+"""Tests for the web mercator tile math."""
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.tile_math import (
+    TILE_SIZE, latlon_to_pixel, pixel_to_latlon, tile_for, tms_row,
+    meters_per_pixel, visible_tiles, fit_zoom, map_size,
+)
+
+
+class TestProjection(unittest.TestCase):
+
+    def test_origin_is_map_centre(self):
+        x, y = latlon_to_pixel(0.0, 0.0, 0)
+        self.assertAlmostEqual(x, TILE_SIZE / 2)
+        self.assertAlmostEqual(y, TILE_SIZE / 2)
+
+    def test_round_trip(self):
+        for lat, lon, zoom in [(47.3769, 8.5417, 15), (-33.86, 151.21, 10),
+                               (64.1, -21.9, 3.5)]:
+            x, y = latlon_to_pixel(lat, lon, zoom)
+            lat2, lon2 = pixel_to_latlon(x, y, zoom)
+            self.assertAlmostEqual(lat, lat2, places=9)
+            self.assertAlmostEqual(lon, lon2, places=9)
+
+    def test_known_tile(self):
+        # Zurich at z15, checked against the OSM wiki's asinh(tan) formula
+        self.assertEqual(tile_for(47.3769, 8.5417, 15), (17161, 11474))
+
+    def test_poles_clamped(self):
+        _, y = latlon_to_pixel(90.0, 0.0, 2)
+        self.assertAlmostEqual(y, 0.0, places=6)
+        _, y = latlon_to_pixel(-90.0, 0.0, 2)
+        self.assertAlmostEqual(y, map_size(2), places=6)
+
+    def test_tms_row_flips(self):
+        self.assertEqual(tms_row(0, 3), 7)
+        self.assertEqual(tms_row(tms_row(5, 3), 3), 5)
+
+    def test_meters_per_pixel(self):
+        # ~156 km per pixel at z0 on the equator, halving per zoom level
+        self.assertAlmostEqual(meters_per_pixel(0, 0), 156543.03, places=1)
+        self.assertAlmostEqual(meters_per_pixel(0, 1), 156543.03 / 2, places=1)
+        self.assertLess(meters_per_pixel(60, 10), meters_per_pixel(0, 10))
+
+
+class TestVisibleTiles(unittest.TestCase):
+
+    def test_covers_viewport(self):
+        x, y = latlon_to_pixel(47.37, 8.54, 12)
+        tiles = visible_tiles(x, y, 400, 750, 12)
+        cols = {t[2] for t in tiles}
+        rows = {t[1] for t in tiles}
+        # 400 px wide needs 2-3 columns, 750 px tall 3-4 rows
+        self.assertIn(len(cols), (2, 3))
+        self.assertIn(len(rows), (3, 4))
+        self.assertEqual(len(tiles), len(cols) * len(rows))
+        # nearest to the centre first
+        self.assertEqual(tiles[0][:2], tile_for(47.37, 8.54, 12))
+
+    def test_wraps_antimeridian(self):
+        x, y = latlon_to_pixel(0.0, 179.99, 2)
+        tiles = visible_tiles(x, y, 600, 256, 2)
+        self.assertIn(0, {t[0] for t in tiles})   # wrapped to the west edge
+        self.assertIn(4, {t[2] for t in tiles})   # drawn east of the last column
+
+    def test_rows_clipped_at_poles(self):
+        tiles = visible_tiles(128, 0, 256, 2000, 0)
+        self.assertEqual({t[1] for t in tiles}, {0})
+
+
+class TestFitZoom(unittest.TestCase):
+
+    def test_points_fit(self):
+        lats = [47.370, 47.380]
+        lons = [8.540, 8.560]
+        zoom, clat, clon = fit_zoom(lats, lons, 400, 600, padding=20)
+        self.assertAlmostEqual(clon, 8.55, places=6)
+        self.assertTrue(47.370 < clat < 47.380)
+        # fits at this zoom but not one level closer
+        for z, should_fit in ((zoom, True), (zoom + 1, False)):
+            xs = [latlon_to_pixel(la, lo, z)[0] for la, lo in zip(lats, lons)]
+            self.assertEqual(max(xs) - min(xs) <= 360, should_fit)
+
+    def test_single_point_uses_max_zoom(self):
+        zoom, lat, lon = fit_zoom([10.0], [20.0], 400, 400, max_zoom=17)
+        self.assertEqual(zoom, 17)
+        self.assertAlmostEqual(lat, 10.0)
+        self.assertAlmostEqual(lon, 20.0)
+
+    def test_empty(self):
+        self.assertEqual(fit_zoom([], [], 400, 400, min_zoom=1), (1, 0.0, 0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""Lazy imports and the headless core boundary.
+
+The modules in CORE_MODULES are the part of PinPoint that batch tools,
+servers and the tests use: geodesic math, filters, storage, recordings.
+They must import without pulling in kivy (kivy's import alone sets up
+logging, parses argv and reads its config) — tests/test_headless.py
+checks that, and benchmarks/bench_imports.py keeps their -X importtime
+cost within benchmarks/import_budget.json.
+
+get_logger() is how core modules log: kivy's Logger when the app has
+loaded kivy, a plain stdlib logger otherwise. It's resolved on the first
+log call, so even `logging` (~15 ms) isn't imported until something is
+actually logged.
+
+lazy_import() defers loading a module until an attribute is first used,
+for things like webbrowser that are only needed on a button press.
+"""
+import sys
+
+CORE_MODULES = (
+    "utils.math_utils",
+    "utils.streaming_stats",
+    "utils.profiler",
+    "utils.startup_timing",
+    "utils.lazy_import",
+    "utils.lru_cache",
+    "utils.file_lock",
+    "utils.tile_math",
+    "domain.coordinate_calculator",
+    "domain.observation",
+    "domain.position_filter",
+    "domain.geomagnetism",
+    "domain.magnetometer_calibration",
+    "domain.magnetic_interference",
+    "domain.terrain_intersection",
+    "domain.cluster_index",
+    "domain.spatial_grid",
+    "domain.label_index",
+    "data.location_repository",
+    "data.location_archive",
+    "data.elevation_tiles",
+    "data.tile_cache",
+    "data.gazetteer",
+    "services.sampling_scheduler",
+    "services.sensor_recorder",
+    "services.sensor_replay",
+)
+
+
+def kivy_loaded(module="kivy"):
+    """The kivy module if the app already imported it, else None.
+
+    Never imports it — a headless tool asking doesn't pay for kivy.
+    """
+    return sys.modules.get(module)
+
+
+class _LazyLogger:
+    """Stands in for a logger until the first call on it."""
+
+    def __init__(self, name):
+        self._name = name
+        self._logger = None
+
+    def _resolve(self):
+        kivy_logger = kivy_loaded("kivy.logger")
+        if kivy_logger is not None:
+            return kivy_logger.Logger
+        import logging
+        return logging.getLogger(self._name)
+
+    def __getattr__(self, attr):
+        if self._logger is None:
+            self._logger = self._resolve()
+        return getattr(self._logger, attr)
+
+
+def get_logger(name):
+    """Kivy's Logger if kivy is imported by first use, else logging.getLogger(name).
+
+    Never imports kivy itself.
+    """
+    return _LazyLogger(name)
+
+
+def lazy_import(name):
+    """Return module `name`, loading it on first attribute access.
+
+    If it's already imported the real module is returned straight away.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    import importlib.util
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named {name!r}")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,54 @@
+"""Small bounded LRU cache.
+
+functools.lru_cache only wraps functions; this is for things like map
+textures that are created somewhere else and need releasing when they
+fall out (on_evict).
+"""
+from collections import OrderedDict
+
+
+class LRUCache:
+
+    def __init__(self, capacity, on_evict=None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._on_evict = on_evict
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self._items[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        items = self._items
+        if key in items:
+            items.move_to_end(key)
+        items[key] = value
+        while len(items) > self.capacity:
+            old_key, old_value = items.popitem(last=False)
+            if self._on_evict:
+                self._on_evict(old_key, old_value)
+
+    def pop(self, key, default=None):
+        return self._items.pop(key, default)
+
+    def clear(self):
+        if self._on_evict:
+            for key, value in self._items.items():
+                self._on_evict(key, value)
+        self._items.clear()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
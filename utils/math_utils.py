@@ -11,6 +11,16 @@ def rad_to_deg(rad):
     return rad * 180.0 / math.pi
 
 
+def great_circle_distance(lat1, lon1, lat2, lon2, radius=EARTH_RADIUS):
+    """Haversine distance in meters between two points on the sphere."""
+    p1 = deg_to_rad(lat1)
+    p2 = deg_to_rad(lat2)
+    dp = p2 - p1
+    dl = deg_to_rad(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2.0 * radius * math.asin(min(1.0, math.sqrt(a)))
+
+
 def normalize_heading(heading):
     """Keep heading in [0, 360) range."""
     return heading % 360.0
@@ -28,6 +38,17 @@ def heading_to_cardinal(heading):
     return directions[idx]
 
 
+def camera_elevation(ax, ay, az):
+    """Degrees the rear camera points above the horizon, negative below.
+
+    From an accelerometer reading at rest, in the axes Android reports:
+    x to the right of the screen, y to its top, z out of the screen, and
+    the reading pointing up. The rear camera looks along -z, so a phone
+    held upright in portrait reads (0, g, 0) and looks at the horizon.
+    """
+    return math.degrees(math.atan2(-az, math.sqrt(ax * ax + ay * ay)))
+
+
 def smooth_values(values, window=5):
     """Simple moving average for sensor smoothing.
 
@@ -59,3 +80,23 @@ def smooth_heading(headings, window=5):
     avg_deg = rad_to_deg(avg_rad)
 
     return normalize_heading(avg_deg)
+
+
+def heading_spread(headings, window=5):
+    """Circular standard deviation of the recent headings, in degrees.
+
+    How much the readings smooth_heading() averages disagree with each
+    other — 0 if they're all the same, wraparound handled the same way.
+    """
+    if len(headings) < 2:
+        return 0.0
+    window = min(window, len(headings))
+    recent = headings[-window:]
+
+    sin_mean = sum(math.sin(deg_to_rad(h)) for h in recent) / len(recent)
+    cos_mean = sum(math.cos(deg_to_rad(h)) for h in recent) / len(recent)
+    # mean resultant length, 1 when they all agree
+    r = min(math.hypot(sin_mean, cos_mean), 1.0)
+    if r <= 0.0:
+        return 180.0  # no direction at all
+    return rad_to_deg(math.sqrt(-2.0 * math.log(r)))
@@ -0,0 +1,175 @@
+"""Opt-in profiling of Clock callbacks and sensor hot paths.
+
+When the app stutters in the field we want to know which callback is
+eating the frame. Set PINPOINT_PROFILE=1 and every function decorated
+with @profiled gets its duration recorded into a histogram, frame times
+are tracked against the frame budget, the camera screen shows a small
+overlay with the worst offenders, and everything is dumped to JSON on
+exit for offline analysis.
+
+With profiling off, @profiled returns the function untouched, so there
+is no overhead at all in normal builds.
+
+No kivy imports here — the frame hook is wired up by the app.
+"""
+import functools
+import os
+import time
+
+ENV_FLAG = "PINPOINT_PROFILE"
+FRAME_BUDGET = 1 / 60
+# a frame counts as over budget once it's at least half a frame late,
+# i.e. we dropped one
+OVER_BUDGET_FACTOR = 1.5
+
+# histogram bucket upper bounds in seconds
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.004,
+    0.008, 0.016, 0.033, 0.066, 0.133, float("inf"),
+)
+
+
+def _bucket_index(seconds):
+    for i, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            return i
+    return len(BUCKETS) - 1
+
+
+class Histogram:
+    """Duration histogram with fixed log-ish buckets."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[_bucket_index(seconds)] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (0-100).
+
+        The open-ended last bucket reports the observed max instead.
+        """
+        if not self.count:
+            return 0.0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                bound = BUCKETS[i]
+                return self.max if bound == float("inf") else min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "buckets": dict(zip([str(b) for b in BUCKETS], self.buckets)),
+        }
+
+
+class Profiler:
+
+    def __init__(self, enabled=False, frame_budget=FRAME_BUDGET, clock=time.perf_counter):
+        self.enabled = enabled
+        self.frame_budget = frame_budget
+        self._clock = clock
+        self.callbacks = {}  # name -> Histogram
+        self.frames = Histogram()
+        self.frames_over_budget = 0
+
+    def wrap(self, name, fn):
+        """Return fn timed under `name` (or fn itself when disabled)."""
+        if not self.enabled:
+            return fn
+
+        clock = self._clock
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(name, clock() - start)
+
+        return timed
+
+    def record(self, name, seconds):
+        hist = self.callbacks.get(name)
+        if hist is None:
+            hist = self.callbacks[name] = Histogram()
+        hist.add(seconds)
+
+    def record_frame(self, dt):
+        """Call once per frame with the time since the previous one."""
+        self.frames.add(dt)
+        if dt > self.frame_budget * OVER_BUDGET_FACTOR:
+            self.frames_over_budget += 1
+
+    def top(self, n=5, key="max"):
+        """The n worst callbacks as (name, Histogram), sorted by `key`."""
+        def sort_key(item):
+            hist = item[1]
+            return getattr(hist, key) if key != "p95" else hist.percentile(95)
+        return sorted(self.callbacks.items(), key=sort_key, reverse=True)[:n]
+
+    def summary(self, n=3):
+        """Short text lines for the on-screen overlay."""
+        frames = self.frames
+        lines = [
+            f"frames {frames.count}  slow {self.frames_over_budget}  "
+            f"worst {frames.max * 1000:.0f}ms"
+        ]
+        for name, hist in self.top(n):
+            lines.append(
+                f"{name}  p95 {hist.percentile(95) * 1000:.1f}ms  "
+                f"max {hist.max * 1000:.1f}ms"
+            )
+        return lines
+
+    def reset(self):
+        self.callbacks.clear()
+        self.frames = Histogram()
+        self.frames_over_budget = 0
+
+    def snapshot(self):
+        return {
+            "frame_budget": self.frame_budget,
+            "frames": self.frames.to_dict(),
+            "frames_over_budget": self.frames_over_budget,
+            "callbacks": {name: h.to_dict() for name, h in sorted(self.callbacks.items())},
+        }
+
+    def dump(self, path):
+        import json
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+# app-wide instance, switched on by the environment at import time
+profiler = Profiler(enabled=os.environ.get(ENV_FLAG) == "1")
+
+
+def profiled(name):
+    """Decorator: time calls to the function under `name` when profiling is on."""
+    def decorator(fn):
+        return profiler.wrap(name, fn)
+    return decorator
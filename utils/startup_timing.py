@@ -0,0 +1,64 @@
+"""Cold start timing.
+
+main.py imports this before anything else and wraps each import block
+and each component it constructs in startup.stage(...). When the first
+frame has been drawn the app calls startup.log() and the breakdown ends
+up in the log, e.g.:
+
+    Startup: first frame after 812 ms
+    Startup:   import kivy              301 ms
+    Startup:   camera screen            122 ms
+    ...
+
+No kivy imports at module level — it has to load before kivy does,
+otherwise kivy's own init would be hidden in the baseline.
+"""
+import time
+from contextlib import contextmanager
+
+from utils.lazy_import import get_logger
+
+
+class StartupTimer:
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self.t0 = clock()
+        self.stages = []  # (name, seconds) in the order they finished
+        self.first_frame = None  # seconds after t0
+
+    @contextmanager
+    def stage(self, name):
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.stages.append((name, self._clock() - start))
+
+    def elapsed(self):
+        return self._clock() - self.t0
+
+    def mark_first_frame(self):
+        if self.first_frame is None:
+            self.first_frame = self.elapsed()
+
+    def report(self):
+        """Breakdown as text lines, slowest stage first."""
+        total = self.first_frame if self.first_frame is not None else self.elapsed()
+        lines = [f"first frame after {total * 1000:.0f} ms"]
+        accounted = 0.0
+        for name, seconds in sorted(self.stages, key=lambda s: s[1], reverse=True):
+            lines.append(f"  {name:<24} {seconds * 1000:6.0f} ms")
+            accounted += seconds
+        lines.append(f"  {'(other)':<24} {max(total - accounted, 0.0) * 1000:6.0f} ms")
+        return lines
+
+    def log(self):
+        # looked up now rather than at import, when kivy wasn't loaded yet
+        Logger = get_logger(__name__)
+        for line in self.report():
+            Logger.info(f"Startup: {line}")
+
+
+# process-wide timer, started when main.py first imports this module
+startup = StartupTimer()
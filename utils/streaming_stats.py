@@ -0,0 +1,69 @@
+"""Constant-memory running statistics for sensor streams.
+
+Both classes update in O(1) per sample and keep no history, so they can
+sit on a sensor callback without the trimming dance the history-list
+smoothers need.
+"""
+import math
+
+
+class RunningStats:
+    """Welford's online mean and variance over every sample seen."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self):
+        """Sample variance (n - 1 denominator), 0 until two samples."""
+        if self.count < 2:
+            return 0.0
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class EwmStats:
+    """Exponentially weighted mean and variance.
+
+    Like RunningStats but forgets old samples, so it tracks the recent
+    behavior of a signal. `alpha` is the weight of each new sample —
+    roughly 2 / (window + 1) for an N-sample window.
+    """
+
+    def __init__(self, alpha=0.1):
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+
+    def add(self, x):
+        self.count += 1
+        if self.count == 1:
+            self.mean = x
+            self.variance = 0.0
+            return
+        delta = x - self.mean
+        incr = self.alpha * delta
+        self.mean += incr
+        self.variance = (1.0 - self.alpha) * (self.variance + delta * incr)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
@@ -0,0 +1,108 @@
+"""Web mercator ("slippy map") tile math.
+
+Global pixel coordinates at zoom z run from 0 to 256 * 2^z, x eastward
+from 180°W and y southward from the top of the map, which is the XYZ
+scheme tile servers use. MBTiles files store rows the other way up
+(TMS), see tms_row().
+"""
+import math
+
+TILE_SIZE = 256
+MAX_LATITUDE = 85.0511287798  # where the square mercator map ends
+EARTH_CIRCUMFERENCE = 40075016.686  # m at the equator, WGS84 sphere
+
+
+def map_size(zoom):
+    """Width (and height) of the whole map in pixels."""
+    return TILE_SIZE * 2.0 ** zoom
+
+
+def latlon_to_pixel(lat, lon, zoom):
+    """Global pixel (x, y) for a position. Zoom can be fractional."""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    size = map_size(zoom)
+    x = (lon + 180.0) / 360.0 * size
+    sin_lat = math.sin(math.radians(lat))
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * size
+    return x, y
+
+
+def pixel_to_latlon(x, y, zoom):
+    size = map_size(zoom)
+    lon = x / size * 360.0 - 180.0
+    n = math.pi * (1 - 2 * y / size)
+    lat = math.degrees(math.atan(math.sinh(n)))
+    return lat, lon
+
+
+def tile_for(lat, lon, zoom):
+    """(x, y) of the tile containing a position at integer zoom."""
+    x, y = latlon_to_pixel(lat, lon, zoom)
+    n = 2 ** zoom
+    tx = min(int(x // TILE_SIZE), n - 1)
+    ty = min(int(y // TILE_SIZE), n - 1)
+    return tx, ty
+
+
+def tms_row(y, zoom):
+    """Convert an XYZ row to the TMS row MBTiles stores (and back)."""
+    return (2 ** zoom - 1) - y
+
+
+def meters_per_pixel(lat, zoom):
+    return EARTH_CIRCUMFERENCE * math.cos(math.radians(lat)) / map_size(zoom)
+
+
+def visible_tiles(center_x, center_y, width, height, zoom):
+    """Tiles covering a viewport centred on a global pixel position.
+
+    Returns:
+        list of (tile_x, tile_y, wrapped_x) — tile_x wraps around the
+        antimeridian, wrapped_x is the unwrapped column to draw it at;
+        rows past the poles are left out. Nearest to the centre first,
+        so those get loaded first.
+    """
+    n = 2 ** zoom
+    x0 = int(math.floor((center_x - width / 2.0) / TILE_SIZE))
+    x1 = int(math.floor((center_x + width / 2.0) / TILE_SIZE))
+    y0 = max(int(math.floor((center_y - height / 2.0) / TILE_SIZE)), 0)
+    y1 = min(int(math.floor((center_y + height / 2.0) / TILE_SIZE)), n - 1)
+
+    cx = center_x / TILE_SIZE - 0.5
+    cy = center_y / TILE_SIZE - 0.5
+    tiles = []
+    for ty in range(y0, y1 + 1):
+        for col in range(x0, x1 + 1):
+            tiles.append((col % n, ty, col))
+    tiles.sort(key=lambda t: (t[2] - cx) ** 2 + (t[1] - cy) ** 2)
+    return tiles
+
+
+def fit_zoom(lats, lons, width, height, padding=0, min_zoom=0, max_zoom=18):
+    """Largest zoom at which all positions fit in a width x height view.
+
+    Returns:
+        (zoom, center_lat, center_lon)
+    """
+    if not lats:
+        return min_zoom, 0.0, 0.0
+    # bounding box in zoom 0 pixels, then scale up
+    xs, ys = [], []
+    for lat, lon in zip(lats, lons):
+        x, y = latlon_to_pixel(lat, lon, 0)
+        xs.append(x)
+        ys.append(y)
+    span_x = max(xs) - min(xs)
+    span_y = max(ys) - min(ys)
+    center = pixel_to_latlon((max(xs) + min(xs)) / 2.0, (max(ys) + min(ys)) / 2.0, 0)
+
+    avail_w = max(width - 2 * padding, 1)
+    avail_h = max(height - 2 * padding, 1)
+    zoom = max_zoom
+    if span_x > 0 or span_y > 0:
+        scale = min(
+            avail_w / span_x if span_x > 0 else float("inf"),
+            avail_h / span_y if span_y > 0 else float("inf"),
+        )
+        zoom = min(max_zoom, math.floor(math.log2(scale)))
+    return max(min_zoom, zoom), center[0], center[1]